@@ -0,0 +1,514 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/19 16:20
+# @Author  : Histranger
+# @File    : asset_cache.py
+# @Software: PyCharm
+"""
+Static assets (scripts, stylesheets, fonts, images) shared by every browser on one host.
+
+每个crawler都以--incognito或新的user-data-dir启动，HTTP缓存为空，同一个站点的JS、CSS、字体在每次启动后都要重新下载。
+AssetInterceptor通过CDP Fetch拦截这些请求：新鲜的缓存直接由fulfillRequest返回，不经过网络和代理；
+过期但有ETag/Last-Modified的缓存发送条件请求，304时仍然返回缓存。
+AssetCache是一个sqlite文件，同一台机器上的所有crawler进程共享，总大小超过max_bytes时按最近访问时间淘汰。
+
+>>> cache = AssetCache()  # doctest: +SKIP
+>>> with ChromeCrawler(asset_cache=cache) as cc:  # doctest: +SKIP
+...     cc.try_get('https://etherscan.io/address/0x...', key_msg='Balance')
+>>> cache.stats.hit_ratio, cache.stats.bytes_saved  # doctest: +SKIP
+(0.92, 3145728)
+"""
+import base64
+import email.utils
+import json
+import logging
+import sqlite3
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import *
+
+from disk_utils import CACHE_DIR, sqlite_transaction
+from metrics import REGISTRY
+
+ASSET_CACHE_PATH: Path = CACHE_DIR / 'assets.sqlite3'
+
+ASSET_REQUESTS_TOTAL = REGISTRY.counter('crawler_asset_requests_total', "Intercepted static asset requests by result: "
+                                        "hit, revalidated, miss, uncacheable.", ['result'])
+ASSET_BYTES_SAVED_TOTAL = REGISTRY.counter('crawler_asset_bytes_saved_total',
+                                           "Bytes of static assets served from the shared cache instead of the network.")
+
+# Fetch.requestPaused中的resourceType
+STATIC_RESOURCE_TYPES: Tuple[str, ...] = ('Script', 'Stylesheet', 'Font', 'Image')
+
+# 浏览器收到的body已经解码，返回缓存时不能带上这些头
+_DROP_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection', 'keep-alive', 'set-cookie',
+                 'age', 'date'}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS assets (
+    url TEXT PRIMARY KEY,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    body BLOB NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS assets_accessed_at ON assets (accessed_at);
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta (name, value) VALUES ('bytes', 0);
+CREATE TRIGGER IF NOT EXISTS assets_insert AFTER INSERT ON assets BEGIN
+    UPDATE meta SET value = value + NEW.size WHERE name = 'bytes';
+END;
+CREATE TRIGGER IF NOT EXISTS assets_delete AFTER DELETE ON assets BEGIN
+    UPDATE meta SET value = value - OLD.size WHERE name = 'bytes';
+END;
+"""
+
+
+@dataclass
+class AssetCacheConfig:
+    max_bytes: int = 1 << 30  # 总大小上限
+    max_entry_bytes: int = 16 << 20  # 单个资源的大小上限
+    heuristic_max: float = 24 * 3600  # 只有Last-Modified时，启发式有效期的上限(s)
+    busy_timeout: float = 30.0  # 等待其他进程释放写锁的时间(s)
+    workers: int = 8  # 每个浏览器处理拦截请求的线程数
+
+
+@dataclass
+class AssetCacheStats:
+    hits: int = 0  # 新鲜的缓存
+    revalidated: int = 0  # 304，同时计入hits
+    misses: int = 0  # 未由缓存返回的拦截请求，包括不可缓存的响应和错误，hit_ratio的分母为全部拦截请求
+    uncacheable: int = 0  # 不能存入共享缓存的响应(no-store、private、非200、带Authorization的请求、过大等)，同时计入misses
+    stores: int = 0
+    evictions: int = 0
+    bytes_saved: int = 0  # 由缓存返回的body大小(解码后)
+    bytes_fetched: int = 0  # 从网络读取的可缓存响应的body大小(解码后)
+
+    @property
+    def hit_ratio(self) -> float:
+        return self.hits / (self.hits + self.misses) if self.hits + self.misses else 0.0
+
+
+@dataclass
+class CachedAsset:
+    url: str
+    status: int
+    headers: List[Tuple[str, str]]
+    body: bytes
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    expires_at: float = 0.0
+
+    def fresh(self, now: Optional[float] = None) -> bool:
+        return self.expires_at > (now or time.time())
+
+    @property
+    def revalidatable(self) -> bool:
+        return bool(self.etag or self.last_modified)
+
+
+def parse_cache_control(value: Optional[str]) -> Dict[str, Optional[str]]:
+    """
+    >>> parse_cache_control('public, max-age=31536000, immutable')
+    {'public': None, 'max-age': '31536000', 'immutable': None}
+    """
+    directives = {}
+    for item in (value or '').split(','):
+        name, _, arg = item.strip().partition('=')
+        if name:
+            directives[name.lower()] = arg.strip().strip('"') if arg else None
+    return directives
+
+
+def _http_date(value: Optional[str]) -> Optional[float]:
+    try:
+        return email.utils.parsedate_to_datetime(value).timestamp() if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def freshness_lifetime(headers: Dict[str, str], now: Optional[float] = None,
+                       heuristic_max: float = AssetCacheConfig.heuristic_max) -> Optional[float]:
+    """
+    按RFC 9111计算共享缓存的有效期
+    :param headers: 响应头，名称为小写
+    :return: 有效期(s)，0表示每次都需要重新验证；None表示不能存入共享缓存
+    >>> freshness_lifetime({'cache-control': 'public, max-age=600'})
+    600.0
+    >>> freshness_lifetime({'cache-control': 'no-cache', 'etag': '"abc"'})
+    0.0
+    >>> freshness_lifetime({'cache-control': 'private, max-age=600'}) is None
+    True
+    """
+    now = now or time.time()
+    cc = parse_cache_control(headers.get('cache-control'))
+    if 'no-store' in cc or 'private' in cc or 'set-cookie' in headers:
+        return None
+    vary = {_.strip().lower() for _ in headers.get('vary', '').split(',') if _.strip()}
+    if vary - {'accept-encoding'}:
+        return None
+    validators = 'etag' in headers or 'last-modified' in headers
+    if 'no-cache' in cc:
+        return 0.0 if validators else None
+    for name in ('s-maxage', 'max-age'):
+        if name in cc:
+            try:
+                return max(float(cc[name]), 0.0)
+            except (TypeError, ValueError):
+                return 0.0 if validators else None
+    expires = _http_date(headers.get('expires'))
+    if 'expires' in headers:
+        if expires is None:
+            return 0.0 if validators else None
+        return max(expires - (_http_date(headers.get('date')) or now), 0.0)
+    last_modified = _http_date(headers.get('last-modified'))
+    if last_modified is not None:
+        # 启发式有效期：距上次修改时间的10%
+        return min(max((_http_date(headers.get('date')) or now) - last_modified, 0.0) * 0.1, heuristic_max)
+    return 0.0 if validators else None
+
+
+class AssetCache:
+    """
+    Response bodies of static assets, in a sqlite file shared by processes on one host.
+
+    计数器(stats)只统计当前进程。
+    """
+
+    def __init__(self, path: Union[str, Path] = ASSET_CACHE_PATH, max_bytes: int = AssetCacheConfig.max_bytes,
+                 max_entry_bytes: int = AssetCacheConfig.max_entry_bytes,
+                 heuristic_max: float = AssetCacheConfig.heuristic_max,
+                 busy_timeout: float = AssetCacheConfig.busy_timeout):
+        """
+        :param path: sqlite文件路径
+        :param max_bytes: 总大小上限
+        :param max_entry_bytes: 单个资源的大小上限
+        :param heuristic_max: 只有Last-Modified时，启发式有效期的上限(s)
+        :param busy_timeout: 等待其他进程释放写锁的时间(s)
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.heuristic_max = heuristic_max
+        self.stats = AssetCacheStats()
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, timeout=busy_timeout, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(_SCHEMA)
+
+    def __repr__(self):
+        return f"AssetCache(path={self.path}, max_bytes={self.max_bytes}, stats={self.stats})"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    @property
+    def size(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT value FROM meta WHERE name = 'bytes'").fetchone()[0]
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM assets').fetchone()[0]
+
+    def get(self, url: str, now: Optional[float] = None) -> Optional[CachedAsset]:
+        """
+        :return: 缓存的资源，可能已经过期，由调用者检查fresh
+        """
+        now = now or time.time()
+        with self._lock:
+            row = self._db.execute('SELECT status, headers, body, etag, last_modified, expires_at FROM assets '
+                                   'WHERE url = ?', (url,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute('UPDATE assets SET accessed_at = ? WHERE url = ?', (now, url))
+        status, headers, body, etag, last_modified, expires_at = row
+        return CachedAsset(url, status, [tuple(_) for _ in json.loads(headers)], body, etag, last_modified, expires_at)
+
+    def put(self, asset: CachedAsset, now: Optional[float] = None) -> bool:
+        """
+        :return: 是否存入，超过max_entry_bytes时不存入
+        """
+        now = now or time.time()
+        if len(asset.body) > min(self.max_entry_bytes, self.max_bytes):
+            return False
+        with self._lock, sqlite_transaction(self._db):
+            # 不使用INSERT OR REPLACE，REPLACE删除旧行时不会触发assets_delete
+            self._db.execute('DELETE FROM assets WHERE url = ?', (asset.url,))
+            self._db.execute('INSERT INTO assets (url, status, headers, body, etag, last_modified, size, expires_at, '
+                             'accessed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                             (asset.url, asset.status, json.dumps(asset.headers), asset.body, asset.etag,
+                              asset.last_modified, len(asset.body), asset.expires_at, now))
+            self.stats.stores += 1
+            self._evict()
+        return True
+
+    def refresh(self, url: str, expires_at: float):
+        """
+        重新验证(304)后更新有效期
+        """
+        with self._lock:
+            self._db.execute('UPDATE assets SET expires_at = ? WHERE url = ?', (expires_at, url))
+
+    def clear(self):
+        with self._lock, sqlite_transaction(self._db):
+            self._db.execute('DELETE FROM assets')
+
+    def record(self, result: str, n_bytes: int = 0):
+        """
+        :param result: 'hit'、'revalidated'、'miss'或'uncacheable'，每个拦截的请求记录一次
+        :param n_bytes: hit和revalidated时为节省的字节数，miss时为读取的字节数
+        """
+        with self._lock:
+            if result in ('miss', 'uncacheable'):
+                self.stats.misses += 1
+                self.stats.uncacheable += result == 'uncacheable'
+                self.stats.bytes_fetched += n_bytes
+            else:
+                self.stats.hits += 1
+                self.stats.revalidated += result == 'revalidated'
+                self.stats.bytes_saved += n_bytes
+        ASSET_REQUESTS_TOTAL.labels(result=result).inc()
+        if result in ('hit', 'revalidated'):
+            ASSET_BYTES_SAVED_TOTAL.inc(n_bytes)
+
+    def _evict(self):
+        """
+        总大小超过max_bytes时按最近访问时间淘汰，需要在事务中调用；过期的条目可以重新验证，不主动删除
+        """
+        total = self._db.execute("SELECT value FROM meta WHERE name = 'bytes'").fetchone()[0]
+        while total > self.max_bytes:
+            rows = self._db.execute('SELECT url, size FROM assets ORDER BY accessed_at LIMIT 64').fetchall()
+            if not rows:
+                break
+            for url, size in rows:
+                if total <= self.max_bytes:
+                    break
+                self._db.execute('DELETE FROM assets WHERE url = ?', (url,))
+                total -= size
+                self.stats.evictions += 1
+
+
+def _content_length(headers: Dict[str, str]) -> int:
+    """
+    :return: Content-Length，没有或无效时为0；压缩时是压缩后的大小，存入前仍按解码后的大小检查
+    """
+    try:
+        return int(headers.get('content-length', 0))
+    except ValueError:
+        return 0
+
+
+def devtools_connection(driver, timeout: float = 5.0):
+    """
+    通过chromedriver的debuggerAddress连接浏览器本身，与chromedriver并存
+    :param driver: selenium或undetected_chromedriver的WebDriver
+    :return: cdp_crawler.CDPConnection
+    """
+    from cdp_crawler import CDPConnection  # cdp_crawler依赖crawler_base，crawler_base依赖本模块
+    address = driver.capabilities['goog:chromeOptions']['debuggerAddress']
+    with urllib.request.urlopen(f"http://{address}/json/version", timeout=timeout) as response:
+        ws_url = json.loads(response.read())['webSocketDebuggerUrl']
+    return CDPConnection(ws_url)
+
+
+class AssetInterceptor:
+    """
+    Serve static assets of every page target of one browser from an AssetCache through CDP `Fetch`.
+
+    在browser级别的连接上发现page target，用独立的session附加到每个target并开启Fetch；
+    新打开的标签页在Target.targetCreated后附加，之前的少量请求不经过缓存。
+    事件在CDPConnection的接收线程中分发，不能在其中调用send，因此由线程池处理。
+    """
+
+    def __init__(self, cache: AssetCache, resource_types: Sequence[str] = STATIC_RESOURCE_TYPES,
+                 workers: int = AssetCacheConfig.workers):
+        """
+        :param cache: 共享的AssetCache
+        :param resource_types: 拦截的资源类型，见STATIC_RESOURCE_TYPES
+        :param workers: 处理拦截请求的线程数
+        """
+        self.cache = cache
+        self.resource_types = list(resource_types)
+        self.connection = None  # cdp_crawler.CDPConnection
+        self._own_connection: bool = False
+        self._sessions: Dict[str, Tuple[str, Callable]] = {}  # targetId ==> (sessionId, listener)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='AssetInterceptor')
+
+    def __repr__(self):
+        return f"AssetInterceptor(resource_types={self.resource_types}, targets={len(self._sessions)})"
+
+    @property
+    def patterns(self) -> List[Dict]:
+        return [{'urlPattern': '*', 'resourceType': type_, 'requestStage': stage}
+                for type_ in self.resource_types for stage in ('Request', 'Response')]
+
+    def attach(self, connection, own: bool = False):
+        """
+        :param connection: browser级别的CDPConnection
+        :param own: close时是否关闭connection
+        """
+        self.connection = connection
+        self._own_connection = own
+        connection.add_listener(self._on_browser_event)
+        connection.send('Target.setDiscoverTargets', {'discover': True})
+        for target in connection.send('Target.getTargets')['targetInfos']:
+            if target['type'] == 'page':
+                self._attach_target(target['targetId'])
+        logging.info(f"{self!r} attached.")
+
+    def close(self):
+        if self.connection is None:
+            return
+        self.connection.remove_listener(self._on_browser_event)
+        with self._lock:
+            sessions, self._sessions = self._sessions, {}
+        for session_id, listener in sessions.values():
+            self.connection.remove_listener(listener, session_id)
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        if self._own_connection:
+            self.connection.close()
+        elif not self.connection.closed:
+            for target_id, (session_id, _) in sessions.items():
+                try:
+                    self.connection.send('Target.detachFromTarget', {'sessionId': session_id}, timeout=5)
+                except Exception as e:
+                    logging.debug(f"detach target[{target_id}] failed. | {repr(e)}")
+        self.connection = None
+
+    def _on_browser_event(self, method: str, params: Dict):
+        if method == 'Target.targetCreated' and params['targetInfo']['type'] == 'page':
+            self._submit(self._attach_target, params['targetInfo']['targetId'])
+        elif method == 'Target.targetDestroyed':
+            with self._lock:
+                session = self._sessions.pop(params['targetId'], None)
+            if session:
+                self.connection.remove_listener(session[1], session[0])
+
+    def _on_event(self, method: str, params: Dict, session_id: Optional[str] = None):
+        if method == 'Fetch.requestPaused':
+            self._submit(self._handle, session_id, params)
+
+    def _submit(self, fn, *args):
+        try:
+            self._executor.submit(fn, *args)
+        except RuntimeError:
+            pass  # 已经关闭
+
+    def _attach_target(self, target_id: str):
+        with self._lock:
+            if target_id in self._sessions:
+                return
+        try:
+            session_id = self.connection.send('Target.attachToTarget', {'targetId': target_id, 'flatten': True})[
+                'sessionId']
+            listener = partial(self._on_event, session_id=session_id)
+            with self._lock:
+                self._sessions[target_id] = (session_id, listener)
+            self.connection.add_listener(listener, session_id)
+            self.connection.send('Fetch.enable', {'patterns': self.patterns}, session_id=session_id)
+        except Exception as e:
+            logging.warning(f"intercept target[{target_id}] failed. | {repr(e)}")
+
+    def _handle(self, session_id: str, params: Dict):
+        request_id = params['requestId']
+        try:
+            if 'responseStatusCode' in params or 'responseErrorReason' in params:
+                self._handle_response(session_id, params)
+            else:
+                self._handle_request(session_id, params)
+        except Exception as e:
+            logging.warning(f"handle asset[{params['request']['url']}] failed. | {repr(e)}")
+            try:
+                self.connection.send('Fetch.continueRequest', {'requestId': request_id}, session_id=session_id)
+            except Exception as e:
+                logging.debug(f"continue request[{request_id}] failed. | {repr(e)}")
+
+    def _handle_request(self, session_id: str, params: Dict):
+        request = params['request']
+        url = request['url'].split('#')[0]
+        headers = {k.lower(): v for k, v in request.get('headers', {}).items()}
+        # 带Authorization的请求的响应可能因用户而异，不使用共享缓存
+        cacheable = request['method'] == 'GET' and 'range' not in headers and 'authorization' not in headers
+        asset = self.cache.get(url) if cacheable else None
+        if asset is not None and asset.fresh():
+            self._fulfill(session_id, params['requestId'], asset)
+            self.cache.record('hit', len(asset.body))
+            return
+        args = {'requestId': params['requestId']}
+        if asset is not None and asset.revalidatable:
+            conditional = dict(request.get('headers', {}))
+            if asset.etag:
+                conditional['If-None-Match'] = asset.etag
+            if asset.last_modified:
+                conditional['If-Modified-Since'] = asset.last_modified
+            args['headers'] = [{'name': k, 'value': v} for k, v in conditional.items()]
+        self.connection.send('Fetch.continueRequest', args, session_id=session_id)
+
+    def _handle_response(self, session_id: str, params: Dict):
+        request_id = params['requestId']
+        request = params['request']
+        url = request['url'].split('#')[0]
+        status = params.get('responseStatusCode')
+        headers = {_['name'].lower(): _['value'] for _ in params.get('responseHeaders', [])}
+        authorized = any(k.lower() == 'authorization' for k in request.get('headers', {}))
+        if request['method'] != 'GET' or status not in (200, 304) or authorized:
+            self.cache.record('uncacheable')
+            self.connection.send('Fetch.continueRequest', {'requestId': request_id}, session_id=session_id)
+            return
+
+        if status == 304:
+            asset = self.cache.get(url)
+            if asset is None:
+                # 条件请求之后缓存被淘汰，304由浏览器自己处理
+                self.cache.record('miss')
+                self.connection.send('Fetch.continueRequest', {'requestId': request_id}, session_id=session_id)
+                return
+            lifetime = freshness_lifetime(headers, heuristic_max=self.cache.heuristic_max)
+            if lifetime:
+                self.cache.refresh(url, time.time() + lifetime)
+            self._fulfill(session_id, request_id, asset)
+            self.cache.record('revalidated', len(asset.body))
+            return
+
+        lifetime = freshness_lifetime(headers, heuristic_max=self.cache.heuristic_max)
+        if lifetime is None or _content_length(headers) > min(self.cache.max_entry_bytes, self.cache.max_bytes):
+            # 超过大小上限的body不通过websocket读取
+            self.cache.record('uncacheable')
+            self.connection.send('Fetch.continueRequest', {'requestId': request_id}, session_id=session_id)
+            return
+        result = self.connection.send('Fetch.getResponseBody', {'requestId': request_id}, session_id=session_id)
+        body = base64.b64decode(result['body']) if result.get('base64Encoded') else result['body'].encode('utf-8')
+        self.connection.send('Fetch.continueRequest', {'requestId': request_id}, session_id=session_id)
+        self.cache.record('miss', len(body))
+        kept = [(_['name'], _['value']) for _ in params.get('responseHeaders', [])
+                if _['name'].lower() not in _DROP_HEADERS]
+        self.cache.put(CachedAsset(url, status, kept, body, headers.get('etag'), headers.get('last-modified'),
+                                   time.time() + lifetime))
+
+    def _fulfill(self, session_id: str, request_id: str, asset: CachedAsset):
+        self.connection.send('Fetch.fulfillRequest', {
+            'requestId': request_id,
+            'responseCode': asset.status,
+            'responseHeaders': [{'name': k, 'value': v} for k, v in asset.headers],
+            'body': base64.b64encode(asset.body).decode('ascii'),
+        }, session_id=session_id)
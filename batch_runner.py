@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 15:10
+# @Author  : Histranger
+# @File    : batch_runner.py
+# @Software: PyCharm
+"""
+Run crawl jobs from a JSONL file, e.g.
+    python batch_runner.py run requests.jsonl --workers 8 --out results.jsonl
+
+每一行是一个任务：{"url": "...", "key_msg": "...", "err_msg": "...", "retries": 3, "interval": 0.2}，
+除url外均可省略。结果逐行写入--out，已完成行的偏移量记录在checkpoint中，中断后重新运行同一命令即可续跑。
+"""
+import argparse
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import *
+
+from asset_cache import AssetCache
+from browser_recycler import RecycleConfig
+from concurrency_controller import ConcurrencyConfig, ConcurrencyController
+from crawler_base import TryGetResult
+from crawler_factory import CRAWLER_TYPES, get_crawler_cls
+from crawler_pool import CrawlerPool
+from disk_utils import atomic_write_text
+from metrics import start_metrics_server
+from page_cache import PageCache, PageCacheConfig
+from segment_store import SegmentWriter
+from url_seen import SeenSet, canonicalize_url
+
+# 任务中可以传递给try_get的字段
+JOB_FIELDS: Tuple[str, ...] = ('key_msg', 'err_msg', 'retries', 'interval')
+
+
+@dataclass
+class BatchStats:
+    done: int = 0
+    ok: int = 0
+    failed: int = 0
+    bad_lines: int = 0
+    skipped: int = 0  # 上次运行已完成的行
+    duplicates: int = 0  # url已经访问过的行
+    elapsed: float = 0.0
+
+    @property
+    def pages_per_sec(self) -> float:
+        return self.done / self.elapsed if self.elapsed else 0.0
+
+
+class Checkpoint:
+    """
+    Completed line offsets of the input file.
+
+    watermark之前的行全部已完成，之后已完成的行记录为 offset ==> 下一行的offset；
+    并发完成的顺序是乱的，但大部分行完成后会立即并入watermark，因此checkpoint始终很小。
+    out_size是保存时结果文件的大小，之后写入的结果不在checkpoint中，恢复时据此去重，见written_offsets。
+    """
+
+    def __init__(self, path: Union[str, Path], save_every: float = 5.0):
+        """
+        :param path: checkpoint文件路径
+        :param save_every: 最短保存间隔(s)
+        """
+        self.path = Path(path)
+        self.save_every = save_every
+        self.watermark: int = 0
+        self.done: Dict[int, int] = {}
+        self.out_size: Optional[int] = None
+        self._last_save: float = 0.0
+
+        if self.path.exists():
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            self.watermark = data['watermark']
+            self.done = {int(k): v for k, v in data['done'].items()}
+            self.out_size = data.get('out_size')
+            logging.info(f"resume from {self.path}. | watermark={self.watermark}, done={len(self.done)}")
+
+    def __repr__(self):
+        return f"Checkpoint(path={self.path}, watermark={self.watermark}, done={len(self.done)})"
+
+    def __contains__(self, offset: int) -> bool:
+        return offset < self.watermark or offset in self.done
+
+    def mark(self, offset: int, next_offset: int):
+        self.done[offset] = next_offset
+        while self.watermark in self.done:
+            self.watermark = self.done.pop(self.watermark)
+        if time.monotonic() - self._last_save >= self.save_every:
+            self.save()
+
+    def save(self):
+        atomic_write_text(self.path, json.dumps({'watermark': self.watermark, 'done': self.done,
+                                                 'out_size': self.out_size}))
+        self._last_save = time.monotonic()
+
+
+def iter_lines(path: Union[str, Path], start: int = 0) -> Iterator[Tuple[int, int, bytes]]:
+    """
+    逐行读取文件，不会一次性载入内存
+    :return: (行首偏移量, 下一行偏移量, 行内容)
+    """
+    with open(path, 'rb') as f:
+        f.seek(start)
+        offset = start
+        for line in f:
+            next_offset = offset + len(line)
+            yield offset, next_offset, line
+            offset = next_offset
+
+
+def written_offsets(out_path: Union[str, Path], start: Optional[int]) -> Set[int]:
+    """
+    checkpoint每save_every秒才保存一次，被kill时上次保存之后完成的结果已经写入结果文件，但不在checkpoint中
+    :param start: 上次保存checkpoint时结果文件的大小，None表示未知(没有checkpoint或旧格式)
+    :return: 其后已经写入的结果的行偏移量
+    """
+    offsets: Set[int] = set()
+    if start is None or not Path(out_path).exists():
+        return offsets
+    for _, _, line in iter_lines(out_path, start):
+        try:
+            offsets.add(json.loads(line)['offset'])
+        except (ValueError, KeyError, TypeError):
+            continue  # 被kill时写了一半的行
+    return offsets
+
+
+def run_batch(input_path: Union[str, Path], out_path: Union[str, Path], pool: CrawlerPool,
+              checkpoint_path: Optional[Union[str, Path]] = None, stop_event: Optional[threading.Event] = None,
+              seen=None, store=None, controller=None, **try_get_kwargs) -> BatchStats:
+    """
+    :param input_path: 任务文件(JSONL)
+    :param out_path: 结果文件(JSONL)，以追加方式写入
+    :param pool: 执行任务的CrawlerPool，并发数即池的大小（resize后随之变化）
+    :param checkpoint_path: checkpoint文件路径，默认为out_path + '.ckpt'
+    :param stop_event: 停止信号，set后不再开始新的任务
+    :param seen: url_seen.SeenSet，跳过url已经成功访问过的行（可跨多次运行、多个任务文件共享）
+    :param store: segment_store.SegmentWriter，保存每个任务的页面
+    :param controller: concurrency_controller.ConcurrencyController，观察每个结果，由调用方start(pool)
+    :param try_get_kwargs: 任务中未给定时使用的try_get参数
+    """
+    checkpoint = Checkpoint(checkpoint_path or f"{out_path}.ckpt")
+    written = written_offsets(out_path, checkpoint.out_size)
+    stats = BatchStats()
+    # 正在访问的url，成功后才写入seen，中断后恢复时不会把未完成或失败的url当作已访问
+    inflight: Set[str] = set()
+
+    def _pending_jobs() -> Iterator[Tuple[int, int, Any]]:
+        for offset, next_offset, line in iter_lines(input_path, checkpoint.watermark):
+            if offset in checkpoint:
+                stats.skipped += 1
+                continue
+            if offset in written:
+                # 上次运行写入了结果，但被kill前没有保存checkpoint
+                stats.skipped += 1
+                checkpoint.mark(offset, next_offset)
+                continue
+            if not line.strip():
+                checkpoint.mark(offset, next_offset)
+                continue
+            try:
+                job = json.loads(line)
+                assert isinstance(job, dict) and job.get('url'), "job must be a dict with key url."
+            except (ValueError, AssertionError) as e:
+                job = e
+            if seen is not None and isinstance(job, dict):
+                url = canonicalize_url(job['url'])
+                if url in inflight or url in seen:
+                    stats.duplicates += 1
+                    checkpoint.mark(offset, next_offset)
+                    continue
+                inflight.add(url)
+            yield offset, next_offset, job
+
+    def _crawl(crawler, item) -> Tuple[int, int, Dict, TryGetResult]:
+        offset, next_offset, job = item
+        if isinstance(job, Exception):
+            return offset, next_offset, {}, TryGetResult(ok=False, msg=f"bad line. | {repr(job)}")
+        kwargs = {**try_get_kwargs, **{k: job[k] for k in JOB_FIELDS if k in job}}
+        try:
+            result = crawler.try_get(job['url'], **kwargs)
+        except Exception as e:
+            logging.warning(f"crawl url[{job['url']}] failed. | {repr(e)}")
+            result = TryGetResult(ok=False, msg=repr(e), url=job['url'])
+        if controller is not None:
+            controller.observe(result)
+        return offset, next_offset, job, result
+
+    t0 = time.perf_counter()
+    try:
+        with open(out_path, 'a', encoding='utf-8') as out:
+            if out.buffer.tell() and _last_byte(out_path) != b'\n':
+                out.write('\n')  # 被kill时写了一半的行
+            for offset, next_offset, job, result in pool.map_unordered(_crawl, _pending_jobs(), stop_event=stop_event):
+                record = {'offset': offset, 'url': result.url, 'ok': result.ok, 'msg': result.msg,
+                          'marker': result.marker}
+                if 'id' in job:
+                    record['id'] = job['id']
+                if store is not None and result.page_source is not None:
+                    record['segment'], record['segment_offset'], _ = store.write_result(result)
+                # 先写结果再记录checkpoint；被kill时上次保存checkpoint之后的结果由written_offsets去重
+                out.write(json.dumps(record, ensure_ascii=False) + '\n')
+                out.flush()
+                checkpoint.out_size = out.buffer.tell()
+                checkpoint.mark(offset, next_offset)
+                if seen is not None and job:
+                    # 与crawler_pool.crawl_many相同，只记录成功的url，失败的url下次运行会重新访问
+                    url = canonicalize_url(job['url'])
+                    if result.ok:
+                        seen.add(url)
+                    inflight.discard(url)
+
+                stats.done += 1
+                if not job:
+                    stats.bad_lines += 1
+                elif result.ok:
+                    stats.ok += 1
+                else:
+                    stats.failed += 1
+    finally:
+        checkpoint.save()
+        stats.elapsed = time.perf_counter() - t0
+        logging.info(f"{stats}, {stats.pages_per_sec:.2f} pages/s, {checkpoint!r}")
+    return stats
+
+
+def _last_byte(path: Union[str, Path]) -> bytes:
+    with open(path, 'rb') as f:
+        f.seek(-1, 2)
+        return f.read(1)
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="CrawlerEngine batch runner.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help="run jobs from a JSONL file.")
+    run_parser.add_argument('input', help="job file, one JSON object with key url per line.")
+    run_parser.add_argument('--out', required=True, help="result file, appended.")
+    run_parser.add_argument('--workers', type=int, default=4, help="number of browsers.")
+    run_parser.add_argument('--max-workers', type=int, default=None,
+                            help="adapt the number of browsers between 1 and N, starting from --workers.")
+    run_parser.add_argument('--checkpoint', default=None, help="checkpoint file, default OUT.ckpt.")
+    run_parser.add_argument('--crawler', choices=list(CRAWLER_TYPES), default='chrome')
+    run_parser.add_argument('--no-headless', dest='headless', action='store_false')
+    run_parser.add_argument('--driver-path', default=None)
+    run_parser.add_argument('--block-resources', default=None, help="e.g. text-only, no-media.")
+    run_parser.add_argument('--max-rss', type=int, default=None, help="restart a browser above this RSS in MiB.")
+    run_parser.add_argument('--max-uptime', type=float, default=None, help="restart a browser after N seconds.")
+    run_parser.add_argument('--seen', default=None, help="seen-set directory, skip urls crawled before.")
+    run_parser.add_argument('--cache', default=None, help="page cache file, reuse pages rendered before.")
+    run_parser.add_argument('--cache-ttl', type=float, default=PageCacheConfig.ttl, help="page cache ttl in seconds.")
+    run_parser.add_argument('--asset-cache', default=None,
+                            help="static asset cache file shared by all browsers on this host.")
+    run_parser.add_argument('--store', default=None, help="segment store directory, save page sources.")
+    run_parser.add_argument('--metrics-port', type=int, default=None, help="serve prometheus metrics on this port.")
+    args = parser.parse_args(argv)
+
+    crawler_kwargs = {'headless': args.headless}
+    if args.driver_path:
+        crawler_kwargs['driver_path'] = args.driver_path
+    if args.block_resources:
+        crawler_kwargs['block_resources'] = args.block_resources
+    if args.max_rss or args.max_uptime:
+        crawler_kwargs['recycle'] = RecycleConfig(max_rss=args.max_rss << 20 if args.max_rss else None,
+                                                  max_uptime=args.max_uptime)
+
+    asset_cache = AssetCache(args.asset_cache) if args.asset_cache else None
+    if asset_cache is not None:
+        crawler_kwargs['asset_cache'] = asset_cache
+
+    if args.metrics_port is not None:
+        start_metrics_server(args.metrics_port)
+    seen = SeenSet(args.seen) if args.seen else None
+    cache = PageCache(args.cache, ttl=args.cache_ttl) if args.cache else None
+    store = SegmentWriter(args.store) if args.store else None
+    controller = None
+    if args.max_workers:
+        controller = ConcurrencyController(ConcurrencyConfig(max_size=args.max_workers, initial=args.workers))
+    try:
+        with CrawlerPool(get_crawler_cls(args.crawler), size=min(args.workers, args.max_workers or args.workers),
+                         max_size=args.max_workers, **crawler_kwargs) as pool:
+            if controller is not None:
+                controller.start(pool)
+            try:
+                run_batch(args.input, args.out, pool, checkpoint_path=args.checkpoint, seen=seen, store=store,
+                          cache=cache, controller=controller)
+            except KeyboardInterrupt:
+                logging.warning("interrupted, run the same command again to resume.")
+            finally:
+                if controller is not None:
+                    controller.stop()
+    finally:
+        if seen is not None:
+            seen.close()
+        if store is not None:
+            store.close()
+        if cache is not None:
+            logging.info(f"{cache.stats}, hit rate {cache.stats.hit_rate:.2%}")
+            cache.close()
+        if asset_cache is not None:
+            logging.info(f"{asset_cache.stats}, hit ratio {asset_cache.stats.hit_ratio:.2%}")
+            asset_cache.close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
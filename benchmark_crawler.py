@@ -0,0 +1,418 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/19 00:20
+# @Author  : Histranger
+# @File    : benchmark_crawler.py
+# @Software: PyCharm
+"""
+Offline benchmark of try_get throughput and latency against a local synthetic site, e.g.
+    python benchmark_crawler.py --crawlers chrome uc --concurrency 1 4 --pages 200 --out bench.json
+    python benchmark_crawler.py --crawlers cdp --concurrency 1 2 --tabs 1 4 8 --out tabs.json
+    python benchmark_crawler.py --compare old.json bench.json
+    python benchmark_crawler.py --crawlers chrome cdp --startup 10 --out startup.json
+
+合成站点提供不同DOM大小的页面、执行耗时JS的页面、资源延迟加载的页面、404和500页面，
+每种组合(crawler, headless, concurrency, tabs)输出pages/s、p50/p95/p99延迟和浏览器进程树的峰值RSS。
+--startup N时只测量冷启动：从构造crawler到第一次try_get完成的耗时，分别使用和不使用profile_template.py中的模板。
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import *
+from urllib.parse import parse_qs, urlsplit
+
+from crawler_factory import CRAWLER_TYPES, get_crawler_cls
+from crawler_base import TryGetResult
+from crawler_pool import CrawlerPool
+from multi_tab import tab_pool
+from proc_stats import tree_rss_bytes
+from profile_template import ProfileTemplate
+
+# 页面类型 ==> 路径
+PAGE_KINDS: Dict[str, str] = {
+    'small_dom': '/page?elements=100',
+    'large_dom': '/page?elements=20000',
+    'slow_js': '/slow-js?ms=300',
+    'delayed_resource': '/delayed-resource?ms=500',
+    'not_found': '/not-found',
+    'server_error': '/server-error',
+}
+KEY_MSG = 'Balance'
+
+
+@dataclass
+class BenchmarkConfig:
+    pages: int = 120  # 每种组合访问的页面数
+    retries: int = 1
+    interval: float = 0.0
+    rss_interval: float = 0.2  # RSS采样间隔(s)
+
+
+def _page(elements: int, script: str = '', extra: str = '') -> str:
+    rows = ''.join(f'<tr><td>0x{i:040x}</td><td>{i % 997}.{i % 89} ETH</td></tr>' for i in range(elements // 3))
+    return f'<html><head><title>Synthetic</title>{script}</head><body>' \
+           f'<div id="balance">{KEY_MSG}: 1 ETH</div>{extra}<table>{rows}</table></body></html>'
+
+
+class SyntheticSiteHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        ms = int(query.get('ms', 0))
+        status, content_type = 200, 'text/html; charset=utf-8'
+
+        if parts.path == '/page':
+            body = _page(int(query.get('elements', 100)))
+        elif parts.path == '/slow-js':
+            # 在解析阶段阻塞主线程
+            body = _page(100, script=f'<script>var t = Date.now(); while (Date.now() - t < {ms});</script>')
+        elif parts.path == '/delayed-resource':
+            body = _page(100, extra=f'<img src="/asset?ms={ms}&r={time.time_ns()}">')
+        elif parts.path == '/asset':
+            time.sleep(ms / 1000)
+            # 1x1 GIF
+            body = b'GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04\x01\x00\x00\x00\x00' \
+                   b',\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;'
+            content_type = 'image/gif'
+        elif parts.path == '/server-error':
+            status, body = 500, '<html><body><h1>500 Internal Server Error</h1></body></html>'
+        else:
+            status, body = 404, '<html><body><h1>404 Not Found</h1></body></html>'
+
+        body = body if isinstance(body, bytes) else body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SyntheticSite:
+    """
+    >>> with SyntheticSite() as site:  # doctest: +SKIP
+    ...     site.workload(6)
+    [('small_dom', 'http://127.0.0.1:.../page?elements=100&n=0'), ...]
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        self.server = ThreadingHTTPServer((host, port), SyntheticSiteHandler)
+        self.server.daemon_threads = True
+        self.base = f"http://{host}:{self.server.server_port}"
+
+    def __repr__(self):
+        return f"SyntheticSite(base={self.base})"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, name='synthetic-site', daemon=True).start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def workload(self, pages: int, kinds: Sequence[str] = tuple(PAGE_KINDS)) -> List[Tuple[str, str]]:
+        """
+        :return: [(页面类型, 网址)]，轮流使用各类页面，网址互不相同
+        """
+        urls = []
+        for n in range(pages):
+            kind = kinds[n % len(kinds)]
+            path = PAGE_KINDS[kind]
+            urls.append((kind, f"{self.base}{path}{'&' if '?' in path else '?'}n={n}"))
+        return urls
+
+
+class RSSSampler:
+    """
+    Samples the RSS of this process and all its children (chromedriver, Chrome) in a background thread.
+    """
+
+    def __init__(self, interval: float = BenchmarkConfig.rss_interval, pid: Optional[int] = None):
+        self.interval = interval
+        self.pid = pid or os.getpid()
+        self.peak: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='rss-sampler', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            rss = tree_rss_bytes(self.pid)
+            if rss is not None:
+                self.peak = max(self.peak or 0, rss)
+            if self._stop.wait(self.interval):
+                return
+
+
+def percentile(values: Sequence[float], q: float) -> Optional[float]:
+    """
+    >>> percentile([1, 2, 3, 4], 0.5)
+    2.5
+    """
+    if not values:
+        return None
+    values = sorted(values)
+    k = (len(values) - 1) * q
+    lower = int(k)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (k - lower)
+
+
+def _latency_summary(values: Sequence[float]) -> Dict[str, Optional[float]]:
+    return {
+        'p50': percentile(values, 0.5),
+        'p95': percentile(values, 0.95),
+        'p99': percentile(values, 0.99),
+        'mean': statistics.fmean(values) if values else None,
+    }
+
+
+@dataclass
+class BenchmarkResult:
+    crawler: str
+    headless: bool
+    concurrency: int
+    tabs: int = 1  # 每个浏览器的标签页数
+    pages: int = 0
+    ok: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
+    pages_per_sec: float = 0.0
+    launch_seconds: float = 0.0  # 启动全部浏览器的耗时
+    latency: Dict[str, Optional[float]] = field(default_factory=dict)
+    latency_by_kind: Dict[str, Dict[str, Optional[float]]] = field(default_factory=dict)
+    peak_rss_bytes: Optional[int] = None
+    error: Optional[str] = None
+
+    @property
+    def key(self) -> Tuple[str, bool, int, int]:
+        return self.crawler, self.headless, self.concurrency, self.tabs
+
+
+def run_benchmark(crawler_cls: Callable[..., Any], name: str, site: SyntheticSite, concurrency: int,
+                  headless: bool = True, pages: int = BenchmarkConfig.pages, crawler_kwargs: Optional[Dict] = None,
+                  tabs: int = 1, **try_get_kwargs) -> BenchmarkResult:
+    """
+    :param crawler_cls: ChromeCrawler、UCCrawler等
+    :param name: 结果中的crawler名称
+    :param site: 已启动的SyntheticSite
+    :param concurrency: 浏览器数量
+    :param headless: 是否使用无头模式
+    :param pages: 访问的页面数
+    :param crawler_kwargs: 传递给crawler_cls的其他参数
+    :param tabs: 每个浏览器的标签页数，大于1时并发数为concurrency * tabs，见multi_tab.py
+    :param try_get_kwargs: 传递给try_get的参数，默认key_msg=KEY_MSG, retries=1, interval=0
+    """
+    try_get_kwargs = {'key_msg': KEY_MSG, 'retries': BenchmarkConfig.retries,
+                      'interval': BenchmarkConfig.interval, **try_get_kwargs}
+    result = BenchmarkResult(name, headless, concurrency, tabs)
+    latencies: Dict[str, List[float]] = {}
+
+    def _timed_try_get(crawler, item: Tuple[str, str]) -> Tuple[str, float, TryGetResult]:
+        kind, url = item
+        t0 = time.perf_counter()
+        try:
+            ret = crawler.try_get(url, **try_get_kwargs)
+        except Exception as e:
+            ret = TryGetResult(ok=False, msg=repr(e), url=url)
+        return kind, time.perf_counter() - t0, ret
+
+    with RSSSampler() as sampler:
+        t0 = time.perf_counter()
+        pool = CrawlerPool(crawler_cls, size=concurrency, headless=headless, **(crawler_kwargs or {}))
+        result.launch_seconds = time.perf_counter() - t0
+        if pool.stats.launch_failures:
+            pool.close()
+            result.error = f"{pool.stats.launch_failures} of {concurrency} crawlers failed to launch."
+            logging.warning(f"benchmark {result.key} skipped. | {result.error}")
+            return result
+
+        with pool, contextlib.ExitStack() as stack:
+            runner = pool
+            if tabs > 1:
+                # 借出全部浏览器，在其中打开标签页
+                browsers = [stack.enter_context(pool.checkout()) for _ in range(concurrency)]
+                runner = stack.enter_context(tab_pool(browsers, tabs, max_pages=None, max_idle=None))
+            t0 = time.perf_counter()
+            for kind, latency, ret in runner.map_unordered(_timed_try_get, site.workload(pages)):
+                latencies.setdefault(kind, []).append(latency)
+                result.pages += 1
+                if ret.ok:
+                    result.ok += 1
+                else:
+                    result.failed += 1
+            result.elapsed = time.perf_counter() - t0
+    result.peak_rss_bytes = sampler.peak
+
+    result.pages_per_sec = result.pages / result.elapsed if result.elapsed else 0.0
+    result.latency = _latency_summary([_ for values in latencies.values() for _ in values])
+    result.latency_by_kind = {kind: _latency_summary(values) for kind, values in sorted(latencies.items())}
+    logging.info(f"{result.key}: {result.pages_per_sec:.2f} pages/s, p95 {result.latency['p95'] or 0:.3f}s, "
+                 f"peak rss {(result.peak_rss_bytes or 0) / 2 ** 20:.0f}MiB")
+    return result
+
+
+@dataclass
+class StartupResult:
+    crawler: str
+    headless: bool
+    template: bool  # 是否使用ProfileTemplate
+    runs: int = 0
+    first_get: Dict[str, Optional[float]] = field(default_factory=dict)  # 构造到第一次try_get完成的耗时
+    error: Optional[str] = None
+
+
+def run_startup_benchmark(crawler_cls: Callable[..., Any], name: str, site: SyntheticSite, runs: int = 5,
+                          headless: bool = True, template: Optional[ProfileTemplate] = None,
+                          crawler_kwargs: Optional[Dict] = None) -> StartupResult:
+    """
+    依次启动runs个crawler，每个访问一个小页面后关闭
+    :param template: 给定时传递profile_template，模板在计时前构建
+    """
+    result = StartupResult(name, headless, template is not None)
+    crawler_kwargs = dict(crawler_kwargs or {})
+    if template is not None:
+        template.ensure()
+        crawler_kwargs['profile_template'] = template
+    url = site.workload(1, kinds=('small_dom',))[0][1]
+    durations = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        try:
+            crawler = crawler_cls(headless=headless, **crawler_kwargs)
+        except Exception as e:
+            result.error = repr(e)
+            logging.warning(f"startup benchmark {name} skipped. | {result.error}")
+            break
+        try:
+            crawler.try_get(url, key_msg=KEY_MSG, retries=1, interval=0)
+            durations.append(time.perf_counter() - t0)
+        finally:
+            crawler.close()
+    result.runs = len(durations)
+    result.first_get = _latency_summary(durations)
+    logging.info(f"startup {name} template={result.template}: p50 {result.first_get['p50'] or 0:.3f}s")
+    return result
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment() -> Dict:
+    return {
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
+
+
+def compare(old: Dict, new: Dict, threshold: float = 0.1) -> List[str]:
+    """
+    比较两次运行的结果
+    :param threshold: pages/s下降或p95上升超过该比例时标记为REGRESSION
+    :return: 每个组合一行
+    """
+    old_results = {(_['crawler'], _['headless'], _['concurrency'], _.get('tabs', 1)): _
+                   for _ in old.get('results', [])}
+    lines = []
+    for result in new.get('results', []):
+        key = (result['crawler'], result['headless'], result['concurrency'], result.get('tabs', 1))
+        before = old_results.get(key)
+        if before is None or before.get('error') or result.get('error'):
+            lines.append(f"{key}: not comparable")
+            continue
+        speed = result['pages_per_sec'] / before['pages_per_sec'] - 1 if before['pages_per_sec'] else 0.0
+        p95 = result['latency']['p95'] / before['latency']['p95'] - 1 if before['latency']['p95'] else 0.0
+        flag = ' REGRESSION' if speed < -threshold or p95 > threshold else ''
+        lines.append(f"{key}: pages/s {before['pages_per_sec']:.2f} ==> {result['pages_per_sec']:.2f} ({speed:+.1%}), "
+                     f"p95 {before['latency']['p95']:.3f}s ==> {result['latency']['p95']:.3f}s ({p95:+.1%}){flag}")
+    return lines
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="CrawlerEngine offline benchmark.")
+    parser.add_argument('--crawlers', nargs='+', choices=list(CRAWLER_TYPES), default=['chrome'])
+    parser.add_argument('--headless', nargs='+', choices=['true', 'false'], default=['true'])
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 4], help="number of browsers.")
+    parser.add_argument('--tabs', nargs='+', type=int, default=[1], help="tabs per browser.")
+    parser.add_argument('--pages', type=int, default=BenchmarkConfig.pages)
+    parser.add_argument('--driver-path', default=None)
+    parser.add_argument('--out', default=None, help="result JSON file, default stdout.")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help="compare two result files and exit.")
+    parser.add_argument('--startup', type=int, default=None, metavar='RUNS',
+                        help="measure constructor-to-first-get time with and without a profile template instead.")
+    parser.add_argument('--template', default=None, help="profile template directory for --startup.")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0], encoding='utf-8') as f_old, open(args.compare[1], encoding='utf-8') as f_new:
+            print('\n'.join(compare(json.load(f_old), json.load(f_new))))
+        return
+
+    crawler_kwargs = {'driver_path': args.driver_path} if args.driver_path else {}
+    if args.startup:
+        template = ProfileTemplate(args.template) if args.template else ProfileTemplate()
+        startup = []
+        with SyntheticSite() as site:
+            for name in args.crawlers:
+                for headless in args.headless:
+                    for use_template in (False, True):
+                        startup.append(run_startup_benchmark(get_crawler_cls(name), name, site, args.startup,
+                                                             headless=headless == 'true',
+                                                             template=template if use_template else None,
+                                                             crawler_kwargs=crawler_kwargs))
+        _write_report({'environment': environment(), 'startup': [asdict(_) for _ in startup]}, args.out)
+        return
+
+    results = []
+    with SyntheticSite() as site:
+        for name in args.crawlers:
+            crawler_cls = get_crawler_cls(name)
+            for headless in args.headless:
+                for concurrency in args.concurrency:
+                    for tabs in args.tabs:
+                        results.append(run_benchmark(crawler_cls, name, site, concurrency, headless=headless == 'true',
+                                                     pages=args.pages, crawler_kwargs=crawler_kwargs, tabs=tabs))
+
+    _write_report({'environment': environment(), 'results': [asdict(_) for _ in results]}, args.out)
+
+
+def _write_report(report: Dict, out: Optional[str]):
+    report = json.dumps(report, indent=2)
+    if out:
+        with open(out, 'w', encoding='utf-8') as f:
+            f.write(report)
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/19 09:30
+# @Author  : Histranger
+# @File    : browser_recycler.py
+# @Software: PyCharm
+"""
+RSS, page-count and uptime budgets for a long-running crawler.
+
+渲染进程会泄漏内存，长时间运行的浏览器越来越大。crawler在两个页面之间检查预算，
+超出时透明地重启浏览器，并带上cookies和构造参数，调用者无需感知。
+
+>>> cc = ChromeCrawler(recycle=RecycleConfig(max_rss=1 << 30, max_pages=500))  # doctest: +SKIP
+>>> cc.recycler.stats  # doctest: +SKIP
+RecycleStats(recycles=3, reasons={'rss': 2, 'pages': 1}, peak_rss=1100000000)
+"""
+import collections
+import time
+from dataclasses import dataclass, field
+from typing import *
+
+from metrics import REGISTRY
+from proc_stats import process_tree, rss_bytes
+
+RECYCLES_TOTAL = REGISTRY.counter('crawler_recycles_total', "Browser restarts by reason: rss, pages, uptime.",
+                                  ['reason'])
+BROWSER_RSS_BYTES = REGISTRY.histogram('crawler_browser_rss_bytes', "RSS of the browser process tree, "
+                                       "sampled between pages.",
+                                       buckets=tuple(_ << 20 for _ in (128, 256, 512, 1024, 2048, 4096, 8192)))
+
+
+@dataclass
+class RecycleConfig:
+    max_rss: Optional[int] = None  # 浏览器进程树的RSS上限(bytes)，None表示不限制
+    max_pages: Optional[int] = None  # 本次启动后最多访问的页面数
+    max_uptime: Optional[float] = None  # 本次启动后最长运行时间(s)
+    check_every: int = 10  # 每访问多少个页面读取一次RSS，读取/proc需要遍历所有进程
+    samples: int = 1000  # 保留最近多少个RSS样本
+
+
+@dataclass
+class RecycleStats:
+    recycles: int = 0
+    reasons: Dict[str, int] = field(default_factory=dict)
+    peak_rss: int = 0
+    # (时间戳, 本次启动后的页面数, RSS)
+    rss_samples: Deque[Tuple[float, int, int]] = field(default_factory=collections.deque, repr=False)
+
+
+def tree_rss(root_pids: Iterable[int]) -> Optional[int]:
+    """
+    :param root_pids: 如chromedriver和Chrome主进程，子孙进程只计算一次
+    :return: 所有进程的RSS之和，没有/proc时返回None
+    """
+    pids = set()
+    for pid in root_pids:
+        pids.update(process_tree(pid))
+    if not pids:
+        return None
+    return sum(_ for _ in map(rss_bytes, pids) if _)
+
+
+class BrowserRecycler:
+    """
+    记录一个crawler的启动时间、页面数和RSS，判断是否需要重启浏览器
+    """
+
+    def __init__(self, config: RecycleConfig):
+        self.config = config
+        self.stats = RecycleStats(rss_samples=collections.deque(maxlen=config.samples))
+        self.launched_at: float = time.monotonic()
+        self.pages: int = 0  # 本次启动后的页面数
+        self._last_check: int = 0
+
+    def __repr__(self):
+        return f"BrowserRecycler({self.config})"
+
+    def launched(self):
+        self.launched_at = time.monotonic()
+        self.pages = self._last_check = 0
+
+    def page(self):
+        self.pages += 1
+
+    def sample(self, root_pids: Iterable[int]) -> Optional[int]:
+        rss = tree_rss(root_pids)
+        if rss is not None:
+            self.stats.rss_samples.append((time.time(), self.pages, rss))
+            self.stats.peak_rss = max(self.stats.peak_rss, rss)
+            BROWSER_RSS_BYTES.observe(rss)
+        return rss
+
+    def reason(self, root_pids: Iterable[int]) -> Optional[str]:
+        """
+        :return: 需要重启的原因(rss、pages、uptime)，不需要时返回None
+        """
+        if not self.pages:
+            return None
+        config = self.config
+        if config.max_pages is not None and self.pages >= config.max_pages:
+            return 'pages'
+        if config.max_uptime is not None and time.monotonic() - self.launched_at >= config.max_uptime:
+            return 'uptime'
+        if self.pages - self._last_check >= config.check_every:
+            self._last_check = self.pages
+            rss = self.sample(root_pids)
+            if config.max_rss is not None and rss is not None and rss >= config.max_rss:
+                return 'rss'
+        return None
+
+    def recycled(self, reason: str):
+        self.stats.recycles += 1
+        self.stats.reasons[reason] = self.stats.reasons.get(reason, 0) + 1
+        RECYCLES_TOTAL.labels(reason=reason).inc()
+        self.launched()
@@ -0,0 +1,492 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/19 01:20
+# @Author  : Histranger
+# @File    : cdp_crawler.py
+# @Software: PyCharm
+"""
+A crawler backend that talks to Chrome's DevTools websocket directly, without chromedriver.
+
+ChromeCrawler的每个命令都要经过 Python --HTTP--> chromedriver --CDP--> Chrome 两跳，
+CDPCrawler直接连接Chrome的DevTools websocket，每个进程少一个chromedriver，
+CDP事件也是推送过来的，不必再读取performance日志。
+"""
+import collections
+import copy
+import itertools
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import *
+
+import websocket
+from selenium.common import JavascriptException, TimeoutException, WebDriverException
+
+from asset_cache import AssetCache
+from browser_recycler import BrowserRecycler, RecycleConfig
+from cdp_events import CDPEvent, CDPListener
+from crawler_base import BaseCrawler
+from metrics import LAUNCH_SECONDS
+from profile_template import ProfileTemplate
+from session_store import SessionSpec
+
+# 按顺序查找Chrome的可执行文件
+CHROME_BINARIES: Dict[str, List[str]] = {
+    'Linux': ['google-chrome', 'google-chrome-stable', 'chromium', 'chromium-browser', 'chrome'],
+    'Darwin': ['/Applications/Google Chrome.app/Contents/MacOS/Google Chrome',
+               '/Applications/Chromium.app/Contents/MacOS/Chromium'],
+    'Windows': [r'C:\Program Files\Google\Chrome\Application\chrome.exe',
+                r'C:\Program Files (x86)\Google\Chrome\Application\chrome.exe',
+                os.path.expandvars(r'%LOCALAPPDATA%\Google\Chrome\Application\chrome.exe')],
+}
+
+# 与chromedriver的page_source相同
+_PAGE_SOURCE_JS = "new XMLSerializer().serializeToString(document)"
+
+# page_load_strategy ==> 等待的生命周期事件
+_LOAD_EVENTS: Dict[str, Optional[str]] = {'normal': 'load', 'eager': 'DOMContentLoaded', 'none': None}
+
+
+@dataclass
+class CDPCrawlerConfig:
+    launch_timeout: float = 30.0  # 等待Chrome启动的时间(s)
+    command_timeout: float = 60.0  # 单个CDP命令的超时时间(s)
+    page_load_timeout: float = 300.0  # 与chromedriver的默认值相同
+
+
+def find_chrome_binary() -> Optional[str]:
+    """
+    :return: 环境变量CHROME_PATH，或常见安装位置中的Chrome，找不到返回None
+    """
+    if path := os.getenv('CHROME_PATH'):
+        return path
+    for candidate in CHROME_BINARIES.get(platform.system(), []):
+        path = shutil.which(candidate) or (candidate if os.path.isfile(candidate) else None)
+        if path:
+            return path
+    return None
+
+
+class CDPError(WebDriverException):
+    """
+    CDP命令返回的错误，继承WebDriverException，try_get按同样的方式处理
+    """
+
+
+class CDPConnection:
+    """
+    One DevTools websocket. 命令可以在任意线程中发送，响应和事件由后台线程接收；
+    使用flatten模式，同一个连接上的多个target(标签页)通过sessionId区分。
+    """
+
+    def __init__(self, ws_url: str, timeout: float = CDPCrawlerConfig.command_timeout):
+        self.ws_url = ws_url
+        self.timeout = timeout
+        self._ws = websocket.create_connection(ws_url, timeout=timeout, suppress_origin=True, enable_multithread=True)
+        self._ws.settimeout(None)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._pending: Dict[int, List] = {}  # id ==> [threading.Event, 响应]
+        self._listeners: Dict[Optional[str], List[CDPListener]] = {}
+        self.closed: bool = False
+        self._reader = threading.Thread(target=self._read_loop, name='cdp-reader', daemon=True)
+        self._reader.start()
+
+    def __repr__(self):
+        return f"CDPConnection(ws_url={self.ws_url})"
+
+    def send(self, method: str, params: Optional[Dict] = None, session_id: Optional[str] = None,
+             timeout: Optional[float] = None) -> Dict:
+        """
+        :param session_id: target的sessionId，None表示browser本身
+        :return: 命令的result，错误时抛出CDPError，超时抛出TimeoutException
+        """
+        if self.closed:
+            raise CDPError(f"connection closed. | {method}")
+        message_id = next(self._ids)
+        message = {'id': message_id, 'method': method, 'params': params or {}}
+        if session_id:
+            message['sessionId'] = session_id
+        waiter = [threading.Event(), None]
+        with self._lock:
+            self._pending[message_id] = waiter
+        try:
+            self._ws.send(json.dumps(message))
+            if not waiter[0].wait(self.timeout if timeout is None else timeout):
+                raise TimeoutException(f"{method} timeout.")
+        except websocket.WebSocketException as e:
+            raise CDPError(f"{method} failed. | {repr(e)}")
+        finally:
+            with self._lock:
+                self._pending.pop(message_id, None)
+
+        response = waiter[1]
+        if response is None:
+            raise CDPError(f"connection closed. | {method}")
+        if 'error' in response:
+            raise CDPError(f"{method} failed. | {response['error'].get('message')} {response['error'].get('data', '')}")
+        return response.get('result', {})
+
+    def add_listener(self, listener: CDPListener, session_id: Optional[str] = None):
+        """
+        listener在接收线程中被调用，不能阻塞，也不能调用send
+        """
+        with self._lock:
+            self._listeners.setdefault(session_id, []).append(listener)
+
+    def remove_listener(self, listener: CDPListener, session_id: Optional[str] = None):
+        with self._lock:
+            listeners = self._listeners.get(session_id, [])
+            if listener in listeners:
+                listeners.remove(listener)
+
+    def close(self):
+        self.closed = True
+        try:
+            self._ws.close()
+        except Exception as e:
+            logging.debug(f"close websocket failed. | {repr(e)}")
+
+    def _read_loop(self):
+        try:
+            while True:
+                message = json.loads(self._ws.recv())
+                if 'id' in message:
+                    with self._lock:
+                        waiter = self._pending.get(message['id'])
+                    if waiter is not None:
+                        waiter[1] = message
+                        waiter[0].set()
+                    continue
+                with self._lock:
+                    listeners = list(self._listeners.get(message.get('sessionId'), []))
+                for listener in listeners:
+                    try:
+                        listener(message.get('method', ''), message.get('params', {}))
+                    except Exception as e:
+                        logging.warning(f"cdp listener failed. | {repr(e)}")
+        except (websocket.WebSocketException, OSError, ValueError) as e:
+            if not self.closed:
+                logging.warning(f"cdp connection lost. | {repr(e)}")
+        finally:
+            self.closed = True
+            with self._lock:
+                pending = list(self._pending.values())
+            for waiter in pending:
+                waiter[0].set()
+
+
+class CDPEventStream:
+    """
+    Same interface as cdp_events.CDPEventLog, but events are pushed over the websocket.
+
+    接收线程只把事件放入队列，poll时在调用者线程中分发，与CDPEventLog的行为一致。
+    """
+
+    def __init__(self, connection: CDPConnection, session_id: Optional[str] = None, maxlen: int = 100000):
+        self.connection = connection
+        self.session_id = session_id
+        self._queue: Deque[CDPEvent] = collections.deque(maxlen=maxlen)
+        self._listeners: List[CDPListener] = []
+        connection.add_listener(self._on_event, session_id)
+
+    def __repr__(self):
+        return f"CDPEventStream(session_id={self.session_id}, listeners={len(self._listeners)})"
+
+    def subscribe(self, listener: CDPListener):
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: CDPListener):
+        self._listeners.remove(listener)
+
+    def poll(self) -> List[CDPEvent]:
+        events: List[CDPEvent] = []
+        while self._queue:
+            events.append(self._queue.popleft())
+        for method, params in events:
+            for listener in self._listeners:
+                listener(method, params)
+        return events
+
+    def close(self):
+        self.connection.remove_listener(self._on_event, self.session_id)
+
+    def _on_event(self, method: str, params: Dict):
+        self._queue.append((method, params))
+
+
+class CDPPage:
+    """
+    A driver-like handle of one page target, offering the subset of the WebDriver API used by this project:
+    get、page_source、current_url、execute_script、execute_cdp_cmd、get_cookies。
+    """
+
+    def __init__(self, connection: CDPConnection, target_id: str, session_id: str,
+                 page_load_strategy: str = 'normal', page_load_timeout: float = CDPCrawlerConfig.page_load_timeout):
+        assert page_load_strategy in _LOAD_EVENTS, f"page_load_strategy not in {list(_LOAD_EVENTS)}"
+        self.connection = connection
+        self.target_id = target_id
+        self.session_id = session_id
+        self.page_load_strategy = page_load_strategy
+        self.page_load_timeout = page_load_timeout
+
+        # 当前导航的生命周期事件：(loaderId, name)
+        self._lifecycle: Set[Tuple[str, str]] = set()
+        self._lifecycle_cond = threading.Condition()
+        connection.add_listener(self._on_event, session_id)
+        self.execute_cdp_cmd('Page.enable', {})
+        self.execute_cdp_cmd('Page.setLifecycleEventsEnabled', {'enabled': True})
+        self.execute_cdp_cmd('Runtime.enable', {})
+
+    def __repr__(self):
+        return f"CDPPage(target_id={self.target_id})"
+
+    def execute_cdp_cmd(self, cmd: str, cmd_args: Optional[Dict] = None) -> Dict:
+        return self.connection.send(cmd, cmd_args, session_id=self.session_id)
+
+    def get(self, url: str):
+        """
+        导航到url，按page_load_strategy等待load或DOMContentLoaded；
+        与chromedriver相同，网络错误抛出WebDriverException，超时抛出TimeoutException
+        """
+        wanted = _LOAD_EVENTS[self.page_load_strategy]
+        with self._lifecycle_cond:
+            self._lifecycle.clear()
+        result = self.execute_cdp_cmd('Page.navigate', {'url': url})
+        if result.get('errorText'):
+            raise WebDriverException(f"unknown error: {result['errorText']}")
+        loader_id = result.get('loaderId')
+        # 同一文档内的导航(如只改变fragment)没有loaderId，也不会有生命周期事件
+        if wanted is None or loader_id is None:
+            return
+        deadline = time.monotonic() + self.page_load_timeout
+        with self._lifecycle_cond:
+            while (loader_id, wanted) not in self._lifecycle:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutException(f"timeout: Timed out receiving message from renderer: {self.page_load_timeout}")
+                if self.connection.closed:
+                    raise CDPError("connection closed while loading page.")
+                self._lifecycle_cond.wait(min(remaining, 1.0))
+
+    @property
+    def page_source(self) -> str:
+        return self._evaluate(_PAGE_SOURCE_JS)
+
+    @property
+    def current_url(self) -> str:
+        return self._evaluate("location.href")
+
+    @property
+    def title(self) -> str:
+        return self._evaluate("document.title")
+
+    def execute_script(self, script: str, *args):
+        """
+        与WebDriver相同，script是函数体，参数通过arguments访问；参数和返回值只支持可以被JSON序列化的值
+        """
+        return self._evaluate(f"(function() {{\n{script}\n}}).apply(null, {json.dumps(args)})")
+
+    def get_cookies(self) -> List[Dict]:
+        cookies = self.execute_cdp_cmd('Network.getCookies', {})['cookies']
+        return [{**{k: v for k, v in _.items() if k != 'expires'}, 'expiry': int(_['expires'])}
+                if _.get('expires', -1) > 0 else _ for _ in cookies]
+
+    def implicitly_wait(self, time_to_wait: float):
+        # 没有find_element，隐式等待没有意义
+        pass
+
+    def close(self):
+        """
+        关闭标签页
+        """
+        self.connection.remove_listener(self._on_event, self.session_id)
+        if not self.connection.closed:
+            self.connection.send('Target.closeTarget', {'targetId': self.target_id})
+
+    def _evaluate(self, expression: str):
+        result = self.execute_cdp_cmd('Runtime.evaluate', {'expression': expression, 'returnByValue': True,
+                                                           'awaitPromise': True})
+        if 'exceptionDetails' in result:
+            details = result['exceptionDetails']
+            raise JavascriptException(details.get('exception', {}).get('description') or details.get('text'))
+        return result['result'].get('value')
+
+    def _on_event(self, method: str, params: Dict):
+        if method != 'Page.lifecycleEvent' or params.get('frameId') != self.target_id:
+            return
+        with self._lifecycle_cond:
+            self._lifecycle.add((params.get('loaderId'), params.get('name')))
+            self._lifecycle_cond.notify_all()
+
+
+class CDPCrawler(BaseCrawler):
+    """
+    The same try_get and context manager interface as ChromeCrawler, backed by a direct DevTools connection.
+
+    每个CDPCrawler使用一个新的临时user-data-dir，关闭时删除，与ChromeCrawler的--incognito效果相同。
+    self.driver是CDPPage，只提供WebDriver API的一个子集（没有find_element）。
+
+    >>> with CDPCrawler(headless=True) as cc:  # doctest: +SKIP
+    ...     cc.try_get('https://etherscan.io/address/0x...', key_msg='Balance')
+    """
+
+    def __init__(self, headless: bool = True, debug: bool = False, proxy: Optional[Dict] = None,
+                 binary_path: Optional[str] = None, block_resources: Optional[Union[str, Sequence[str]]] = None,
+                 page_load_strategy: str = 'normal', session: Optional[SessionSpec] = None,
+                 recycle: Optional[RecycleConfig] = None, asset_cache: Optional[AssetCache] = None,
+                 profile_template: Optional[ProfileTemplate] = None, extra_args: Sequence[str] = (),
+                 track_responses: bool = False):
+        """
+        :param headless: 是否使用无头模式
+        :param debug: 是否开启调试模式，开启时DevTools监听9222端口，否则使用随机端口
+        :param proxy: 是否开启代理，proxy必须是一个字典，且键必须包含ip和port
+        :param binary_path: Chrome可执行文件的路径，默认见find_chrome_binary
+        :param block_resources: 同ChromeCrawler
+        :param page_load_strategy: 同ChromeCrawler
+        :param session: 同ChromeCrawler
+        :param recycle: 同ChromeCrawler
+        :param asset_cache: 同ChromeCrawler
+        :param profile_template: 同ChromeCrawler，代替空的临时user-data-dir
+        :param extra_args: 其他Chrome命令行参数
+        :param track_responses: 同ChromeCrawler
+        """
+        self.headless = headless
+        self.debug = debug
+        self.proxy = copy.deepcopy(proxy)
+        self.binary_path = binary_path or find_chrome_binary()
+        self.block_resources = copy.deepcopy(block_resources)
+        self.page_load_strategy = page_load_strategy
+        self.session = session
+        self.asset_cache = asset_cache
+        self.profile_template = profile_template
+        self.track_responses = track_responses
+        assert self.binary_path, "chrome not found, use param binary_path or env CHROME_PATH."
+
+        self.args = [
+            self.binary_path,
+            f"--remote-debugging-port={9222 if self.debug else 0}",
+            '--no-first-run',
+            '--no-default-browser-check',
+            '--disable-blink-features=AutomationControlled',
+        ]
+        if self.debug:
+            logging.info("Debug Mode, remote debugging port is 9222.")
+        if self.headless:
+            self.args += ['--no-sandbox', '--disable-dev-shm-usage', '--headless=new', '--disable-gpu']
+        if self.proxy:
+            assert 'ip' in self.proxy and 'port' in self.proxy, "proxy must be a dict with key ip and port."
+            self.args.append(f"--proxy-server={self.proxy['ip']}:{self.proxy['port']}")
+        if self.profile_template:
+            self.args += [_ for _ in self.profile_template.flags if _ not in self.args]
+        self.args += list(extra_args)
+
+        self.user_data_dir: Optional[str] = None
+        self.process: Optional[subprocess.Popen] = None
+        self.connection: Optional[CDPConnection] = None
+        self._launch()
+        self.recycler = BrowserRecycler(recycle) if recycle else None
+        # 已访问的页面数，CrawlerPool据此回收浏览器
+        self.pages: int = 0
+
+        logging.info("CDPCrawler Started.")
+
+    def close(self):
+        self._quit()
+        logging.info("CDPCrawler Closed.")
+
+    def _launch(self):
+        self.user_data_dir = self._clone_profile() or tempfile.mkdtemp(prefix='crawlerengine-cdp-')
+        try:
+            with LAUNCH_SECONDS.labels(crawler='cdp').time():
+                self.process = subprocess.Popen(self.args + [f"--user-data-dir={self.user_data_dir}", 'about:blank'],
+                                                stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                                stderr=subprocess.DEVNULL)
+                self.connection = CDPConnection(self._wait_devtools_url())
+                self.driver = self._attach_page()
+                self._setup_cdp_events()
+                self._setup_asset_cache()
+                self._inject_session()
+        except BaseException:
+            self._quit()
+            raise
+
+    @property
+    def root_pids(self) -> List[int]:
+        return [self.process.pid] if self.process else []
+
+    def __repr__(self):
+        return f"CDPCrawler(headless={self.headless}, debug={self.debug}, proxy={self.proxy}, " \
+               f"block_resources={self.block_resources}, page_load_strategy={self.page_load_strategy})"
+
+    def new_page(self) -> CDPPage:
+        """
+        打开一个新的标签页，见multi_tab.py
+        """
+        target_id = self.connection.send('Target.createTarget', {'url': 'about:blank'})['targetId']
+        return self._attach(target_id)
+
+    def create_event_source(self, page: CDPPage) -> CDPEventStream:
+        return CDPEventStream(self.connection, page.session_id)
+
+    def _create_event_source(self):
+        return self.create_event_source(self.driver)
+
+    def _devtools_connection(self):
+        # 已经连接到browser本身
+        return self.connection, False
+
+    def _wait_devtools_url(self) -> str:
+        """
+        Chrome启动后把端口和browser的websocket路径写入user-data-dir/DevToolsActivePort
+        """
+        path = Path(self.user_data_dir) / 'DevToolsActivePort'
+        deadline = time.monotonic() + CDPCrawlerConfig.launch_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise WebDriverException(f"chrome exited with code {self.process.returncode}.")
+            try:
+                port, ws_path = path.read_text().split('\n')[:2]
+                if port and ws_path:
+                    return f"ws://127.0.0.1:{port.strip()}{ws_path.strip()}"
+            except (OSError, ValueError):
+                pass
+            time.sleep(0.05)
+        raise TimeoutException(f"chrome not ready after {CDPCrawlerConfig.launch_timeout}s.")
+
+    def _attach_page(self) -> CDPPage:
+        targets = self.connection.send('Target.getTargets')['targetInfos']
+        pages = [_ for _ in targets if _['type'] == 'page']
+        if not pages:
+            return self.new_page()
+        return self._attach(pages[0]['targetId'])
+
+    def _attach(self, target_id: str) -> CDPPage:
+        session_id = self.connection.send('Target.attachToTarget', {'targetId': target_id, 'flatten': True})['sessionId']
+        return CDPPage(self.connection, target_id, session_id, self.page_load_strategy)
+
+    def _quit(self):
+        self._teardown_asset_cache()
+        if self.connection is not None and not self.connection.closed:
+            try:
+                self.connection.send('Browser.close', timeout=5)
+            except (WebDriverException, TimeoutException) as e:
+                logging.debug(f"Browser.close failed. | {repr(e)}")
+            self.connection.close()
+        if self.process is not None:
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        if self.profile_dir:
+            self._remove_profile()
+        elif self.user_data_dir:
+            shutil.rmtree(self.user_data_dir, ignore_errors=True)
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 13:00
+# @Author  : Histranger
+# @File    : cdp_events.py
+# @Software: PyCharm
+import json
+import logging
+import threading
+from typing import *
+
+# (method, params)
+CDPEvent = Tuple[str, Dict]
+CDPListener = Callable[[str, Dict], None]
+
+
+def enable_performance_log(options):
+    """
+    开启chromedriver的performance日志，其中包含Network、Page等域的CDP事件。
+    必须在启动浏览器前调用，options为selenium或undetected_chromedriver的ChromeOptions。
+    """
+    options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+
+
+class CDPEventLog:
+    """
+    Read CDP events from the chromedriver performance log.
+
+    WebDriver无法订阅CDP事件，但chromedriver会把它们缓存在performance日志中。
+    get_log会清空缓存，因此同一个driver只能有一个读取者，多个功能通过subscribe共享事件。
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+        # (listener, webview)，webview为None时接收全部窗口的事件
+        self._listeners: List[Tuple[CDPListener, Optional[str]]] = []
+
+    def __repr__(self):
+        return f"CDPEventLog(listeners={len(self._listeners)})"
+
+    def subscribe(self, listener: CDPListener, webview: Optional[str] = None):
+        """
+        :param webview: 只接收这个窗口的事件，即chromedriver的window handle
+        """
+        self._listeners.append((listener, webview))
+
+    def unsubscribe(self, listener: CDPListener):
+        for i, (subscribed, _) in enumerate(self._listeners):
+            if subscribed == listener:
+                del self._listeners[i]
+                return
+        raise ValueError(f"{listener!r} not subscribed.")
+
+    def poll(self, webview: Optional[str] = None) -> List[CDPEvent]:
+        """
+        读取并清空performance日志，把事件分发给所有订阅者
+        :param webview: 只返回这个窗口的事件，其他窗口的事件仍然分发给它们的订阅者
+        :return: 本次读取到的事件
+        """
+        events: List[Tuple[Optional[str], str, Dict]] = []
+        for entry in self.driver.get_log('performance'):
+            try:
+                message = json.loads(entry['message'])
+                method, params = message['message'].get('method', ''), message['message'].get('params', {})
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                logging.debug(f"bad performance log entry. | {repr(e)}")
+                continue
+            events.append((message.get('webview'), method, params))
+
+        for source, method, params in events:
+            for listener, webview_ in list(self._listeners):
+                if webview_ is None or webview_ == source:
+                    listener(method, params)
+        return [(method, params) for source, method, params in events if webview is None or webview == source]
+
+
+class WebviewEventLog:
+    """
+    The events of one window in a shared CDPEventLog, with the same subscribe/unsubscribe/poll.
+
+    同一个WebDriver会话的多个窗口共享performance日志，日志的每一项都带有产生它的窗口(webview)；
+    任何一个窗口的poll都会把其他窗口的事件分发给它们自己的订阅者，因此事件不会被读错窗口或丢失。
+    """
+
+    def __init__(self, log: CDPEventLog, handle: str, lock=None):
+        """
+        :param log: 会话共享的CDPEventLog
+        :param handle: 窗口的window handle，旧版chromedriver的CDwindow-前缀会被去掉
+        :param lock: 与其他窗口的WebDriver命令共用的锁
+        """
+        self.log = log
+        self.handle = handle[len('CDwindow-'):] if handle.startswith('CDwindow-') else handle
+        self._lock = lock or threading.RLock()
+
+    def __repr__(self):
+        return f"WebviewEventLog(handle={self.handle})"
+
+    def subscribe(self, listener: CDPListener):
+        with self._lock:
+            self.log.subscribe(listener, self.handle)
+
+    def unsubscribe(self, listener: CDPListener):
+        with self._lock:
+            self.log.unsubscribe(listener)
+
+    def poll(self) -> List[CDPEvent]:
+        with self._lock:
+            return self.log.poll(self.handle)
+
+
+class DocumentResponse:
+    """
+    A CDP listener that keeps the first Network.responseReceived of type Document after it subscribes.
+
+    重定向不会产生responseReceived，iframe在主文档之后加载，因此导航前订阅时，第一个Document响应就是主文档的最终响应。
+    """
+
+    def __init__(self):
+        self.url: Optional[str] = None
+        self.status: Optional[int] = None
+        self.headers: Dict[str, str] = {}  # 键为小写
+
+    def __repr__(self):
+        return f"DocumentResponse(url={self.url!r}, status={self.status})"
+
+    def __call__(self, method: str, params: Dict):
+        if method != 'Network.responseReceived' or params.get('type') != 'Document' or self.status is not None:
+            return
+        response = params.get('response') or {}
+        self.url = response.get('url')
+        self.status = int(response.get('status') or 0)
+        self.headers = {str(k).lower(): str(v) for k, v in (response.get('headers') or {}).items()}
+
+    def header(self, name: str) -> Optional[str]:
+        return self.headers.get(name.lower())
@@ -5,15 +5,21 @@
 # @Software: PyCharm
 import copy
 import logging
-import time
 from typing import *
 from dataclasses import dataclass
 
 from selenium import webdriver
-from selenium.common import TimeoutException, WebDriverException
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
+
+from asset_cache import AssetCache
+from browser_recycler import BrowserRecycler, RecycleConfig
+from cdp_events import enable_performance_log
+from crawler_base import BaseCrawler
+from driver_resolver import resolve_driver_path
+from metrics import LAUNCH_SECONDS
+from profile_template import ProfileTemplate
+from session_store import SessionSpec
 
 
 @dataclass
@@ -22,19 +28,39 @@ class ChromeCrawlerConfig:
     explicitly_wait: int = 5
 
 
-class ChromeCrawler:
+class ChromeCrawler(BaseCrawler):
 
-    def __init__(self, headless: bool = True, debug: bool = False, proxy: Optional[Dict] = None, driver_path: Optional[str] = None):
+    def __init__(self, headless: bool = True, debug: bool = False, proxy: Optional[Dict] = None, driver_path: Optional[str] = None,
+                 block_resources: Optional[Union[str, Sequence[str]]] = None, page_load_strategy: str = 'normal',
+                 session: Optional[SessionSpec] = None, recycle: Optional[RecycleConfig] = None,
+                 asset_cache: Optional[AssetCache] = None, profile_template: Optional[ProfileTemplate] = None,
+                 track_responses: bool = False):
         """
         :param headless: 是否使用无头模式
         :param debug: 是否开启调试模式
         :param proxy: 是否开启代理，proxy必须是一个字典，且键必须包含ip和port
         :param driver_path: 是否使用自定义chromedriver_path
+        :param block_resources: 是否屏蔽图片、字体、媒体等资源，可以是预设名("text-only"、"no-media"、"no-trackers")、
+                                资源类别("image"、"font"等)或自定义通配符，或它们的列表，见resource_blocker.py
+        :param page_load_strategy: 页面加载策略，'normal'等待load事件，'eager'等待DOMContentLoaded，'none'不等待；
+                                   后两者配合try_get的ready参数，满足就绪条件后立即返回，见readiness.py
+        :param session: 启动时注入的已保存会话(cookies和localStorage)，见session_store.py
+        :param recycle: 浏览器进程树的RSS、页面数、运行时间预算，超出时在两个页面之间重启浏览器，见browser_recycler.py
+        :param asset_cache: 所有浏览器共享的静态资源缓存，通过CDP Fetch拦截JS、CSS、字体和图片，见asset_cache.py
+        :param profile_template: 预先构建的user-data-dir模板，每次启动时克隆一份代替--incognito，见profile_template.py
+        :param track_responses: 通过CDP事件读取主文档的状态码，429/503时把Retry-After写入result.retry_after，见scheduler.py；
+                                屏蔽资源或eager/none策略下总是读取
         """
         self.driver_path = driver_path
         self.headless = headless
         self.debug = debug
         self.proxy = copy.deepcopy(proxy)
+        self.block_resources = copy.deepcopy(block_resources)
+        self.page_load_strategy = page_load_strategy
+        self.session = session
+        self.asset_cache = asset_cache
+        self.profile_template = profile_template
+        self.track_responses = track_responses
 
         self.chrome_options = Options()
 
@@ -49,7 +75,12 @@ class ChromeCrawler:
             self.chrome_options.add_argument("--disable-gpu")  # disable gpu
 
         self.chrome_options.add_experimental_option("excludeSwitches", ["enable-logging", "enable-automation"])
-        self.chrome_options.add_argument("--incognito")
+        if self.profile_template:
+            # 每次启动都使用新的副本，与--incognito同样不保留上一次的状态
+            for flag in self.profile_template.flags:
+                self.chrome_options.add_argument(flag)
+        else:
+            self.chrome_options.add_argument("--incognito")
         self.chrome_options.add_experimental_option('useAutomationExtension', False)
         self.chrome_options.add_argument("--disable-blink-features=AutomationControlled")
 
@@ -57,73 +88,56 @@ class ChromeCrawler:
             assert 'ip' in self.proxy and 'port' in self.proxy, "proxy must be a dict with key ip and port."
             self.chrome_options.add_argument(f"--proxy-server={proxy['ip']}:{proxy['port']}")
 
+        self.chrome_options.page_load_strategy = self.page_load_strategy
+        if self.uses_cdp_events:
+            enable_performance_log(self.chrome_options)
+
         if self.driver_path:
             logging.info(f"Use ChromeDriver[{self.driver_path}].")
         else:
-            self.chromedriver_manager = ChromeDriverManager()
-            self.driver_path = self.chromedriver_manager.install()
+            # 每个进程、每个Chrome版本只解析一次，见driver_resolver.py
+            self.driver_path = resolve_driver_path()
 
-        self.service = Service(self.driver_path)
-        self.driver = webdriver.Chrome(service=self.service, options=self.chrome_options)
-        self.driver.implicitly_wait(ChromeCrawlerConfig.implicitly_wait)
+        self._launch()
+        self.recycler = BrowserRecycler(recycle) if recycle else None
+        # 已访问的页面数，CrawlerPool据此回收浏览器
+        self.pages: int = 0
 
         logging.info("ChromeCrawler Started.")
 
     def close(self):
-        self.driver.quit()
+        self._quit()
         logging.info("ChromeCrawler Closed.")
 
-    def __enter__(self):
-        return self
-
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        self.close()
+    def _launch(self):
+        self.service = Service(self.driver_path)
+        with LAUNCH_SECONDS.labels(crawler='chrome').time():
+            options = self.chrome_options
+            if profile_dir := self._clone_profile():
+                options = copy.deepcopy(self.chrome_options)
+                options.add_argument(f"--user-data-dir={profile_dir}")
+            self.driver = webdriver.Chrome(service=self.service, options=options)
+            self.driver.implicitly_wait(ChromeCrawlerConfig.implicitly_wait)
+            self._setup_cdp_events()
+            self._setup_asset_cache()
+            self._inject_session()
+
+    def _quit(self):
+        self._teardown_asset_cache()
+        try:
+            self.driver.quit()
+        finally:
+            self._remove_profile()
+
+    @property
+    def root_pids(self) -> List[int]:
+        # Chrome是chromedriver的子进程
+        process = getattr(self.service, 'process', None)
+        return [process.pid] if process else []
 
     def __repr__(self):
-        return f"ChromeCrawler(headless={self.headless}, debug={self.debug}, proxy={self.proxy})"
-
-    def try_get(self, url: str, interval: float = 0.2, retries: int = 3,
-                key_msg: str = None, err_msg: str = 'ERR_') -> (bool, str):
-        """
-        尝试访问url
-        :param url: 网址
-        :param interval: 尝试间隔
-        :param retries: 尝试次数
-        :param key_msg: 关键词
-        :param err_msg: 错误信息
-        :return: 是否成功访问url，详细信息
-        """
-        ok: bool = True
-        msg: str = ""
-
-        index = 0
-        while index < retries:
-            if index:
-                time.sleep(interval)
-            index += 1
-
-            try:
-                self.driver.get(url)
-            except (WebDriverException, TimeoutException) as e:
-                ok, msg = False, repr(e)
-                continue
-            else:
-                # 如果页面中存在key_msg，那么访问成功
-                if key_msg:
-                    if key_msg in self.driver.page_source:
-                        ok, msg = True, f"key_msg[{key_msg}] in page source."
-                        break
-                    else:
-                        ok, msg = False, f"key_msg[{key_msg}] NOT in page source."
-                        continue
-                # 如果错误信息err_msg在页面中
-                if err_msg in self.driver.page_source:
-                    ok, msg = False, f"err_msg[{err_msg}] in page source."
-                    continue
-                else:
-                    ok, msg = True, f"get url[{url}] OK."
-                    break
-        return ok, msg
+        return f"ChromeCrawler(headless={self.headless}, debug={self.debug}, proxy={self.proxy}, " \
+               f"block_resources={self.block_resources}, page_load_strategy={self.page_load_strategy})"
 
 
 if __name__ == '__main__':
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/19 21:00
+# @Author  : Histranger
+# @File    : concurrency_controller.py
+# @Software: PyCharm
+"""
+AIMD concurrency controller that resizes a CrawlerPool from live page latency, error rate and host resources.
+
+浏览器太少浪费机器，太多则CPU和内存争用，页面加载变慢、超时增多。ConcurrencyController每隔interval秒
+根据最近的页面加载时间、与负载相关的失败比例、每个CPU的平均负载和MemAvailable调整池的大小：
+
+- 内存不足、负载过高、失败率过高或页面加载中位数明显高于基线时，乘性减小(decrease)；
+- 各项指标正常且所有浏览器都在使用中时，加性增大(increase)，第一次减小之前每次翻倍(slow start)；
+- 基线是观察到的最小中位数，缓慢上浮，因此不需要按站点类型调参。
+
+每次决策都记录为Decision，计入crawler_concurrency_decisions_total，并设置crawler_concurrency_target。
+
+>>> controller = ConcurrencyController(ConcurrencyConfig(min_size=2, max_size=16))  # doctest: +SKIP
+>>> for result in crawl_many(urls, controller=controller, key_msg='Balance'):  # doctest: +SKIP
+...     print(result)
+>>> controller.decisions[-1]  # doctest: +SKIP
+Decision(size=8 ==> 5, reason='p50 12.40s > 1.5 × baseline 6.10s')
+"""
+import logging
+import math
+import statistics
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import *
+
+from metrics import REGISTRY
+from proc_stats import load_per_cpu, mem_available
+
+CONCURRENCY_DECISIONS_TOTAL = REGISTRY.counter('crawler_concurrency_decisions_total',
+                                               "Concurrency controller decisions by action: increase, decrease, hold.",
+                                               ['action'])
+CONCURRENCY_TARGET = REGISTRY.gauge('crawler_concurrency_target', "Number of browsers chosen by the controller.")
+
+
+@dataclass
+class ConcurrencyConfig:
+    min_size: int = 1
+    max_size: int = 16
+    initial: Optional[int] = None  # 初始大小，默认为min_size
+    interval: float = 10.0  # 决策间隔(s)
+    min_samples: int = 10  # 上次调整后至少观察到多少次页面加载才根据延迟和失败率决策
+    window: int = 200  # 最多保留最近多少次页面加载
+    increase: int = 1  # 加性增大的步长
+    decrease: float = 0.7  # 乘性减小的比例
+    slow_start: bool = True  # 第一次减小之前每次翻倍
+    latency_slack: float = 1.5  # 中位数超过基线的多少倍视为拥塞
+    baseline_drift: float = 0.05  # 基线每次决策最多上浮的比例，站点本身变慢时不会一直减小
+    max_error_rate: float = 0.2  # 与负载相关的失败比例上限
+    max_load: float = 1.0  # 每个CPU的1分钟平均负载上限
+    min_mem_available: int = 1 << 30  # MemAvailable下限(字节)
+    browser_mem: int = 400 << 20  # 每个浏览器进程树的内存估计(字节)，增大前确认还能容纳一个
+    decrease_cooldown: float = 30.0  # 两次减小之间的最短时间(s)，平均负载和内存的变化有滞后
+
+
+# 机器过载时才会增多的失败，dns、connection等是host的问题，见retry_policy.py
+OVERLOAD_FAILURES = ('timeout', 'webdriver', 'network')
+
+
+@dataclass
+class Decision:
+    at: float  # time.time()
+    old: int
+    new: int
+    action: str  # 'increase'、'decrease'或'hold'
+    reason: str
+    samples: int = 0
+    latency_p50: Optional[float] = None
+    baseline: Optional[float] = None
+    error_rate: Optional[float] = None
+    load: Optional[float] = None
+    mem_available: Optional[int] = None
+
+    def __repr__(self):
+        return f"Decision(size={self.old} ==> {self.new}, reason={self.reason!r})"
+
+
+class ConcurrencyController:
+    """
+    监控页面加载并调整CrawlerPool的大小，start后在后台线程中每隔interval秒调用一次tick
+    """
+
+    def __init__(self, config: Optional[ConcurrencyConfig] = None,
+                 on_decision: Optional[Callable[[Decision], None]] = None,
+                 overload_failures: Sequence[str] = OVERLOAD_FAILURES):
+        """
+        :param config: ConcurrencyConfig
+        :param on_decision: 每次决策后的回调，参数为Decision
+        :param overload_failures: 计入失败率的失败类别
+        """
+        self.config = config or ConcurrencyConfig()
+        assert 0 < self.config.min_size <= self.config.max_size, "min_size must be positive and <= max_size."
+        assert 0 < self.config.decrease < 1, "decrease must be in (0, 1)."
+        self.on_decision = on_decision
+        self.overload_failures = set(overload_failures)
+
+        self.pool = None
+        self.baseline: Optional[float] = None
+        self.decisions: Deque[Decision] = deque(maxlen=1000)
+        self._samples: Deque[Tuple[float, bool]] = deque(maxlen=self.config.window)  # (页面加载时间, 是否过载失败)
+        self._congested: bool = not self.config.slow_start
+        self._last_decrease: float = -math.inf
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __repr__(self):
+        return f"ConcurrencyController(size={self.size}, min_size={self.config.min_size}, " \
+               f"max_size={self.config.max_size}, baseline={self.baseline})"
+
+    @property
+    def initial(self) -> int:
+        return min(max(self.config.initial or self.config.min_size, self.config.min_size), self.config.max_size)
+
+    @property
+    def size(self) -> Optional[int]:
+        return self.pool.size if self.pool is not None else None
+
+    def observe(self, result):
+        """
+        记录一个TryGetResult中每次尝试的加载时间和失败类别，缓存命中和熔断的结果没有尝试
+        """
+        with self._lock:
+            for attempt in getattr(result, 'attempts', ()):
+                self._samples.append((attempt.elapsed, attempt.failure in self.overload_failures))
+
+    def decide(self, size: int, in_use: int, now: Optional[float] = None) -> Decision:
+        """
+        :param size: 当前池的大小
+        :param in_use: 正在使用的浏览器数量
+        :return: Decision，new为新的大小
+        """
+        config = self.config
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            samples = list(self._samples)
+        load, mem = load_per_cpu(), mem_available()
+        decision = Decision(time.time(), size, size, 'hold', "", len(samples), load=load, mem_available=mem)
+
+        if samples:
+            decision.latency_p50 = statistics.median(_[0] for _ in samples)
+            decision.error_rate = sum(_[1] for _ in samples) / len(samples)
+        if len(samples) >= config.min_samples and decision.latency_p50 > 0:
+            # 基线为最小的中位数，缓慢上浮
+            if self.baseline is None:
+                self.baseline = decision.latency_p50
+            else:
+                self.baseline = min(decision.latency_p50, self.baseline * (1 + config.baseline_drift))
+        decision.baseline = self.baseline
+
+        if mem is not None and mem < config.min_mem_available:
+            reason = f"mem_available {mem >> 20}MiB < {config.min_mem_available >> 20}MiB"
+        elif load is not None and load > config.max_load:
+            reason = f"load {load:.2f}/cpu > {config.max_load}"
+        elif len(samples) < config.min_samples:
+            decision.reason = f"{len(samples)} samples < {config.min_samples}"
+            return decision
+        elif decision.error_rate > config.max_error_rate:
+            reason = f"error rate {decision.error_rate:.0%} > {config.max_error_rate:.0%}"
+        elif decision.latency_p50 > self.baseline * config.latency_slack:
+            reason = f"p50 {decision.latency_p50:.2f}s > {config.latency_slack} × baseline {self.baseline:.2f}s"
+        else:
+            reason = None
+
+        if reason is not None:
+            if size <= config.min_size:
+                decision.reason = f"{reason}, already at min_size"
+            elif now - self._last_decrease < config.decrease_cooldown:
+                decision.reason = f"{reason}, cooling down"
+            else:
+                decision.new = max(min(int(size * config.decrease), size - 1), config.min_size)
+                decision.action, decision.reason = 'decrease', reason
+            return decision
+
+        if in_use < size:
+            decision.reason = f"{in_use}/{size} browsers in use"
+        elif size >= config.max_size:
+            decision.reason = "already at max_size"
+        elif mem is not None and mem - config.browser_mem < config.min_mem_available:
+            decision.reason = f"mem_available {mem >> 20}MiB leaves no room for another browser"
+        else:
+            step = size if not self._congested else config.increase
+            decision.new = min(size + step, config.max_size)
+            decision.action = 'increase'
+            decision.reason = f"p50 {decision.latency_p50:.2f}s, error rate {decision.error_rate:.0%}, " \
+                              f"{in_use}/{size} browsers in use"
+        return decision
+
+    def tick(self, now: Optional[float] = None) -> Decision:
+        """
+        决策一次并调整池的大小
+        """
+        now = time.monotonic() if now is None else now
+        decision = self.decide(self.pool.size, self.pool.in_use, now)
+        if decision.new != decision.old:
+            logging.info(f"concurrency {decision.action} {decision.old} ==> {decision.new}. | {decision.reason}")
+            self.pool.resize(decision.new)
+            if decision.action == 'decrease':
+                self._congested = True
+                self._last_decrease = now
+            # 新的大小下重新观察
+            with self._lock:
+                self._samples.clear()
+        else:
+            logging.debug(f"concurrency hold {decision.old}. | {decision.reason}")
+        CONCURRENCY_DECISIONS_TOTAL.labels(action=decision.action).inc()
+        CONCURRENCY_TARGET.set(decision.new)
+        self.decisions.append(decision)
+        if self.on_decision is not None:
+            try:
+                self.on_decision(decision)
+            except Exception as e:
+                logging.warning(f"on_decision failed. | {repr(e)}")
+        return decision
+
+    def start(self, pool):
+        """
+        :param pool: CrawlerPool，大小被调整为initial，最大不超过pool.max_size
+        """
+        assert self.config.max_size <= pool.max_size, f"pool.max_size must be >= {self.config.max_size}."
+        self.pool = pool
+        pool.resize(self.initial)
+        CONCURRENCY_TARGET.set(pool.size)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='ConcurrencyController', daemon=True)
+        self._thread.start()
+        logging.info(f"{self!r} Started.")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.config.interval):
+            try:
+                self.tick()
+            except Exception as e:
+                logging.warning(f"concurrency tick failed. | {repr(e)}")
@@ -0,0 +1,460 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 11:40
+# @Author  : Histranger
+# @File    : crawler_base.py
+# @Software: PyCharm
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import *
+
+from selenium.common import TimeoutException, WebDriverException
+
+from asset_cache import AssetCache, AssetInterceptor, devtools_connection
+from browser_recycler import BrowserRecycler, tree_rss
+from cdp_events import CDPEventLog, DocumentResponse
+from dom_snapshot import DOMSnapshot
+from extractor import Extractor, Schema
+from markers import MarkerMatcher, Markers
+from metrics import ATTEMPTS_TOTAL, PHASE_SECONDS, RETRIES, TRY_GET_TOTAL
+from page_cache import CachedPage, PageCache, cache_key
+from profile_template import ProfileTemplate
+from readiness import Lifecycle, ReadyCondition, ReadyConfig, wait_until
+from resource_blocker import BlockStats, ResourceBlocker
+from retry_policy import FAILURES_TOTAL, AttemptRecord, RetryPolicy, classify_failure
+from session_store import SessionSpec, SessionStore
+
+
+@dataclass
+class TryGetResult:
+    """
+    try_get的返回值，可以像原来的(ok, msg)元组一样解包：
+    >>> ok, msg = TryGetResult(True, "get url[https://example.com] OK.")
+    >>> ok
+    True
+    """
+    ok: bool
+    msg: str
+    url: str = ""
+    marker: Optional[str] = None  # 命中的key_msg/err_msg
+    page_source: Optional[str] = None  # 最后一次尝试的页面快照
+    via: str = 'browser'  # 'browser'、'http'(见hybrid_fetcher.py)或'cache'(见page_cache.py)
+    retry_after: Optional[float] = None  # 服务器要求等待的时间(s)，429/503响应的Retry-After，见scheduler.py
+    final_url: Optional[str] = None  # 重定向后的网址，仅在使用cache时读取
+    # 'ok'、'key_msg_missing'、'err_msg_hit'、'webdriver_exception'、'timeout'、'circuit_open'，见metrics.py
+    outcome: Optional[str] = None
+    attempts: List[AttemptRecord] = field(default_factory=list)  # 每次尝试的结果，见retry_policy.py
+
+    def __iter__(self):
+        return iter((self.ok, self.msg))
+
+    def __getitem__(self, item):
+        return (self.ok, self.msg)[item]
+
+    def __len__(self):
+        return 2
+
+    def __repr__(self):
+        return f"TryGetResult(ok={self.ok}, msg={self.msg!r}, marker={self.marker!r}, via={self.via!r})"
+
+
+def check_page(matcher: MarkerMatcher, url: str, page_source: str) -> TryGetResult:
+    """
+    根据key_msg/err_msg判断页面是否访问成功
+    """
+    match = matcher.search(page_source)
+    # 如果页面中存在key_msg，那么访问成功
+    if matcher.key_markers:
+        if match:
+            return TryGetResult(True, f"key_msg[{match.text}] in page source.", url, match.text, page_source,
+                                outcome='ok')
+        return TryGetResult(False, f"key_msg[{matcher.describe(matcher.key_markers)}] NOT in page source.",
+                            url, None, page_source, outcome='key_msg_missing')
+    # 如果错误信息err_msg在页面中
+    if match:
+        return TryGetResult(False, f"err_msg[{match.text}] in page source.", url, match.text, page_source,
+                            outcome='err_msg_hit')
+    return TryGetResult(True, f"get url[{url}] OK.", url, None, page_source, outcome='ok')
+
+
+_NAVIGATE = PHASE_SECONDS.labels(phase='navigate')
+_READY_WAIT = PHASE_SECONDS.labels(phase='ready_wait')
+_PAGE_SOURCE = PHASE_SECONDS.labels(phase='page_source')
+_RETRY_SLEEP = PHASE_SECONDS.labels(phase='retry_sleep')
+
+
+def _retry_after(document: Optional[DocumentResponse]) -> Optional[float]:
+    """
+    :return: 主文档为429/503时Retry-After要求等待的时间(s)
+    """
+    if document is None or document.status not in (429, 503):
+        return None
+    # scheduler依赖crawler_base，在这里导入
+    from scheduler import parse_retry_after
+    return parse_retry_after(document.header('Retry-After'))
+
+
+def _observe(phase, t0: float) -> float:
+    t1 = time.perf_counter()
+    phase.observe(t1 - t0)
+    return t1
+
+
+class BaseCrawler:
+    """
+    ChromeCrawler和UCCrawler的公共部分，子类需要在__init__中创建self.driver并实现close。
+    """
+    driver: Any
+    pages: int = 0
+    cdp_events: Optional[CDPEventLog] = None
+    resource_blocker: Optional[ResourceBlocker] = None
+    block_stats: Optional[BlockStats] = None  # 最近一个页面的资源屏蔽统计
+    block_resources: Optional[Union[str, Sequence[str]]] = None
+    page_load_strategy: str = 'normal'
+    track_responses: bool = False  # 为读取主文档的状态码和Retry-After而启用CDP事件
+    session: Optional[SessionSpec] = None
+    recycler: Optional[BrowserRecycler] = None
+    asset_cache: Optional[AssetCache] = None
+    asset_interceptor: Optional[AssetInterceptor] = None
+    profile_template: Optional[ProfileTemplate] = None
+    profile_dir: Optional[str] = None  # 当前浏览器使用的模板副本
+    _dom: Optional[DOMSnapshot] = None
+
+    def close(self):
+        raise NotImplementedError
+
+    def _launch(self):
+        """
+        启动浏览器并创建self.driver，构造时和recycle_browser时调用，子类实现
+        """
+        raise NotImplementedError
+
+    def _quit(self):
+        """
+        关闭浏览器及driver的全部进程，子类实现
+        """
+        raise NotImplementedError
+
+    @property
+    def root_pids(self) -> List[int]:
+        """
+        浏览器相关的根进程，如chromedriver、Chrome主进程，它们的子孙进程都计入浏览器的内存
+        """
+        return []
+
+    def rss_bytes(self) -> Optional[int]:
+        """
+        :return: 浏览器进程树的RSS，没有/proc时返回None
+        """
+        return tree_rss(self.root_pids)
+
+    def recycle_browser(self, reason: str = 'manual'):
+        """
+        重启浏览器，带上当前的cookies和localStorage，构造参数(代理、屏蔽资源、会话等)保持不变
+        """
+        carry = None
+        try:
+            carry = SessionStore.snapshot(self.driver)
+        except Exception as e:
+            logging.warning(f"snapshot cookies before recycle failed. | {repr(e)}")
+        try:
+            self._quit()
+        except Exception as e:
+            logging.warning(f"quit browser failed. | {repr(e)}")
+        self._launch()
+        if carry and (carry['cookies'] or carry['local_storage']):
+            SessionStore.inject(self.driver, carry)
+        if self.recycler is not None:
+            self.recycler.recycled(reason)
+        logging.info(f"{self!r} recycled. | {reason}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def uses_cdp_events(self) -> bool:
+        """
+        屏蔽资源、eager/none加载策略下的就绪判断以及读取429/503的Retry-After需要CDP事件，
+        此时启动浏览器前需要对options调用cdp_events.enable_performance_log
+        """
+        return bool(self.block_resources) or self.page_load_strategy != 'normal' or self.track_responses
+
+    @property
+    def default_ready(self) -> Optional[ReadyCondition]:
+        # none策略下driver.get立即返回，至少等到DOMContentLoaded
+        return Lifecycle('DOMContentLoaded') if self.page_load_strategy == 'none' else None
+
+    def _create_event_source(self):
+        """
+        :return: 提供subscribe和poll的CDP事件源，默认读取chromedriver的performance日志
+        """
+        return CDPEventLog(self.driver)
+
+    def _setup_cdp_events(self):
+        """
+        在浏览器启动后调用
+        """
+        if not self.uses_cdp_events:
+            return
+        self.cdp_events = self._create_event_source()
+        self.driver.execute_cdp_cmd('Page.enable', {})
+        self.driver.execute_cdp_cmd('Page.setLifecycleEventsEnabled', {'enabled': True})
+        self.driver.execute_cdp_cmd('Network.enable', {})
+        if self.block_resources:
+            self.resource_blocker = ResourceBlocker(self.block_resources)
+            self.resource_blocker.attach(self.driver, self.cdp_events)
+
+    def _clone_profile(self) -> Optional[str]:
+        """
+        在启动浏览器前调用，删除上一个副本并克隆profile_template，见profile_template.py
+        :return: 新副本的路径，作为--user-data-dir；没有profile_template时为None
+        """
+        self._remove_profile()
+        if self.profile_template is None:
+            return None
+        self.profile_dir = self.profile_template.clone()
+        return self.profile_dir
+
+    def _remove_profile(self):
+        """
+        在浏览器退出后调用
+        """
+        if self.profile_dir is not None:
+            self.profile_template.remove_clone(self.profile_dir)
+            self.profile_dir = None
+
+    def _devtools_connection(self):
+        """
+        :return: (browser级别的CDPConnection, 是否由调用者关闭)，默认通过chromedriver的debuggerAddress连接
+        """
+        return devtools_connection(self.driver), True
+
+    def _setup_asset_cache(self):
+        """
+        在浏览器启动后调用，通过CDP Fetch从共享的AssetCache返回静态资源，见asset_cache.py
+        """
+        if self.asset_cache is None:
+            return
+        connection, own = self._devtools_connection()
+        self.asset_interceptor = AssetInterceptor(self.asset_cache)
+        try:
+            self.asset_interceptor.attach(connection, own=own)
+        except BaseException:
+            self._teardown_asset_cache()
+            raise
+
+    def _teardown_asset_cache(self):
+        """
+        在关闭浏览器前调用
+        """
+        if self.asset_interceptor is None:
+            return
+        try:
+            self.asset_interceptor.close()
+        except Exception as e:
+            logging.warning(f"close asset interceptor failed. | {repr(e)}")
+        self.asset_interceptor = None
+
+    def _inject_session(self):
+        """
+        在浏览器启动后调用，只注入未过期的会话，是否仍然有效由调用者检查，见session_store.ensure_session
+        """
+        if self.session is None:
+            return
+        if session := self.session.load():
+            self.session.store.inject(self.driver, session)
+
+    def wait_ready(self, condition: ReadyCondition, timeout: float = ReadyConfig.timeout) -> float:
+        """
+        等待当前页面满足condition，如点击后等待某个元素出现：cc.wait_ready(Selector('#balance'))
+        :return: 等待的时间(s)，超时抛出TimeoutException
+        """
+        # 条件对象可能被多个crawler共享，等待状态保存在副本上
+        condition = condition.fresh()
+        condition.start(self, navigation=False)
+        return wait_until(self, condition, timeout)
+
+    @property
+    def dom(self) -> DOMSnapshot:
+        """
+        当前页面的局部快照，只读取选中元素的outerHTML或文本，dom.stats为传输的字节数，见dom_snapshot.py
+        """
+        if self._dom is None or self._dom.driver is not self.driver:
+            # 重启浏览器后driver会变化，统计保留
+            self._dom = DOMSnapshot(self.driver, self._dom.stats if self._dom else None)
+        return self._dom
+
+    def extract(self, schema: Union[Schema, Extractor], root: Optional[str] = None) -> Dict[str, Any]:
+        """
+        在当前页面上提取schema中的全部字段，只有一次execute_script往返，缺失的字段为MISSING，见extractor.py
+        :param schema: 字段名 ==> CSS选择器或Field，或已编译的Extractor
+        :param root: 根元素的CSS选择器，schema为Extractor时忽略
+        """
+        extractor = schema if isinstance(schema, Extractor) else Extractor(schema, root)
+        return extractor.extract(self.driver)
+
+    def try_get(self, url: str, interval: float = 0.2, retries: int = 3,
+                key_msg: Markers = None, err_msg: Markers = 'ERR_',
+                ready: Optional[ReadyCondition] = None, ready_timeout: float = ReadyConfig.timeout,
+                cache: Optional[PageCache] = None, cache_ttl: Optional[float] = None,
+                snapshot: Optional[str] = None, policy: Optional[RetryPolicy] = None) -> TryGetResult:
+        """
+        尝试访问url，每次尝试只读取一次page_source
+        :param url: 网址
+        :param interval: 尝试间隔
+        :param retries: 尝试次数
+        :param key_msg: 关键词，str或re.Pattern，或它们的列表，命中任意一个即成功
+        :param err_msg: 错误信息，str或re.Pattern，或它们的列表，命中任意一个即失败（仅在未给定key_msg时生效）
+        :param ready: 页面就绪条件，如Lifecycle('DOMContentLoaded')、NetworkIdle(500)、Selector('#balance')，
+                      配合page_load_strategy='eager'或'none'使用，满足条件后立即读取页面，不必等待全部资源加载完成
+        :param ready_timeout: 等待就绪的最长时间(s)，超时视为本次尝试失败
+        :param cache: PageCache，命中时不使用浏览器，成功的结果写入缓存
+        :param cache_ttl: 写入缓存的有效期(s)，默认使用cache.ttl
+        :param snapshot: CSS选择器，给定时只读取匹配元素的outerHTML作为page_source，key_msg和err_msg也只在其中匹配
+        :param policy: RetryPolicy，按失败类别指数退避代替固定的interval，并在host熔断时立即返回outcome='circuit_open'，
+                       retries仍是总尝试次数的上限，见retry_policy.py
+        :return: TryGetResult，可解包为(是否成功访问url，详细信息)
+        """
+        matcher = MarkerMatcher(key_msg, err_msg)
+        ready = ready or self.default_ready
+        result = TryGetResult(ok=True, msg="", url=url, outcome='ok')
+
+        key = None
+        if cache is not None:
+            key = cache_key(url, self._cache_options(key_msg, err_msg, ready, snapshot))
+            if page := cache.get(key):
+                logging.debug(f"try_get url[{url}] cache hit.")
+                TRY_GET_TOTAL.labels(outcome='cache').inc()
+                return TryGetResult(ok=True, msg=page.msg, url=url, marker=page.marker,
+                                    page_source=page.page_source, via='cache', final_url=page.final_url)
+
+        # 在两个页面之间检查内存、页面数和运行时间预算
+        if self.recycler is not None and (reason := self.recycler.reason(self.root_pids)):
+            self.recycle_browser(reason)
+
+        attempts: List[AttemptRecord] = []
+        failures: Dict[str, int] = {}
+        started = time.perf_counter()
+        delay = interval
+        index = 0
+        while index < retries:
+            if policy is not None:
+                allowed, retry_in = policy.allow(url)
+                if not allowed:
+                    # host已熔断，不占用浏览器
+                    result = TryGetResult(ok=False, msg=f"circuit open for url[{url}], retry in {retry_in:.1f}s.",
+                                          url=url, retry_after=retry_in, outcome='circuit_open')
+                    break
+            if index:
+                t0 = time.perf_counter()
+                time.sleep(delay)
+                _RETRY_SLEEP.observe(time.perf_counter() - t0)
+            index += 1
+
+            phase = _NAVIGATE
+            # ready可能被多个crawler线程共享（如crawl_many(ready=...)），每次尝试使用各自的副本
+            condition = ready.fresh() if ready else None
+            document = None
+            t0 = attempt_t0 = time.perf_counter()
+            try:
+                self.pages += 1
+                if self.recycler is not None:
+                    self.recycler.page()
+                if self.resource_blocker:
+                    self.resource_blocker.start_page(url)
+                if condition:
+                    condition.start(self)
+                if self.cdp_events is not None:
+                    document = DocumentResponse()
+                    # 丢弃上一个页面的事件，已订阅的condition只会收到start之后的事件
+                    self.cdp_events.poll()
+                    self.cdp_events.subscribe(document)
+                self.driver.get(url)
+                if condition:
+                    t0 = _observe(phase, t0)
+                    phase = _READY_WAIT
+                    wait_until(self, condition, ready_timeout)
+                t0 = _observe(phase, t0)
+                phase = _PAGE_SOURCE
+                if snapshot is None:
+                    page_source = self.dom.page_source()
+                else:
+                    page_source = ''.join(self.dom.outer_html(snapshot, all=True))
+                final_url = self.driver.current_url if cache is not None else None
+                if document is not None and document.status is None:
+                    self.cdp_events.poll()
+                _observe(phase, t0)
+            except (WebDriverException, TimeoutException) as e:
+                _observe(phase, t0)
+                result = TryGetResult(ok=False, msg=repr(e), url=url)
+                result.outcome = 'timeout' if isinstance(e, TimeoutException) else 'webdriver_exception'
+                # repr(WebDriverException)不含错误信息，分类时使用str(e)中的net::ERR_
+                detail = str(e)
+            except BaseException:
+                if policy is not None:
+                    policy.release(url)
+                raise
+            else:
+                result = check_page(matcher, url, page_source)
+                result.final_url = final_url
+                if not result.ok:
+                    result.retry_after = _retry_after(document)
+                detail = result.msg
+            finally:
+                if document is not None:
+                    self.cdp_events.unsubscribe(document)
+                if condition:
+                    condition.stop(self)
+                if self.resource_blocker:
+                    self.block_stats = self.resource_blocker.finish_page()
+
+            ATTEMPTS_TOTAL.labels(outcome=result.outcome).inc()
+            failure = classify_failure(result.outcome, detail, result.page_source)
+            attempts.append(AttemptRecord(index, result.outcome, failure, result.msg,
+                                          time.perf_counter() - attempt_t0))
+            if failure is not None:
+                FAILURES_TOTAL.labels(failure=failure).inc()
+            if policy is not None:
+                policy.record(url, failure)
+            if result.ok:
+                break
+            if result.retry_after is not None:
+                # 服务器要求等待，立即重试同样会被限流，交给调用方（如scheduler）暂停该host
+                break
+            if policy is not None and index < retries:
+                failures[failure] = failures.get(failure, 0) + 1
+                delay = policy.next_delay(failure, failures[failure], time.perf_counter() - started, result.retry_after)
+                if delay is None:
+                    break
+                attempts[-1].delay = delay
+            elif index < retries:
+                attempts[-1].delay = interval
+
+        result.attempts = attempts
+        TRY_GET_TOTAL.labels(outcome=result.outcome).inc()
+        RETRIES.observe(max(index - 1, 0))
+        if cache is not None and result.ok:
+            cache.put(key, CachedPage(url, result.final_url, result.page_source, result.marker, result.msg),
+                      ttl=cache_ttl)
+        logging.debug(f"try_get url[{url}] {result!r}")
+        return result
+
+    def _cache_options(self, key_msg: Markers, err_msg: Markers, ready: Optional[ReadyCondition],
+                       snapshot: Optional[str] = None) -> Dict:
+        """
+        影响页面内容或判断结果的参数，作为缓存键的一部分
+        """
+        options = {
+            'key_msg': key_msg,
+            'err_msg': err_msg,
+            'ready': ready,
+            'block_resources': self.block_resources,
+            'page_load_strategy': self.page_load_strategy,
+            'session': (self.session.site, self.session.account) if self.session else None,
+        }
+        if snapshot is not None:
+            options['snapshot'] = snapshot
+        return options
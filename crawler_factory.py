@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/19 01:50
+# @Author  : Histranger
+# @File    : crawler_factory.py
+# @Software: PyCharm
+"""
+Choose the crawler backend at construction time.
+
+>>> with create_crawler('cdp', headless=True) as crawler:  # doctest: +SKIP
+...     crawler.try_get('https://etherscan.io/', key_msg='Etherscan')
+"""
+import importlib
+from typing import *
+
+from crawler_base import BaseCrawler
+
+# type ==> (模块, 类)，按需导入，未使用的后端的依赖不必安装
+CRAWLER_TYPES: Dict[str, Tuple[str, str]] = {
+    'chrome': ('chrome_crawler', 'ChromeCrawler'),  # selenium + chromedriver
+    'uc': ('uc_crawler', 'UCCrawler'),  # undetected_chromedriver
+    'cdp': ('cdp_crawler', 'CDPCrawler'),  # 直接连接DevTools websocket，没有chromedriver
+}
+
+
+def get_crawler_cls(type_: str) -> Type[BaseCrawler]:
+    """
+    :param type_: crawler的类型，现阶段仅支持：chrome、uc、cdp
+    """
+    assert type_ in CRAWLER_TYPES, f"type_ not in {list(CRAWLER_TYPES.keys())}"
+    module, name = CRAWLER_TYPES[type_]
+    return getattr(importlib.import_module(module), name)
+
+
+def create_crawler(type_: str = 'chrome', **kwargs) -> BaseCrawler:
+    """
+    :param type_: 同get_crawler_cls
+    :param kwargs: crawler的构造参数，如headless、proxy、block_resources
+    """
+    return get_crawler_cls(type_)(**kwargs)
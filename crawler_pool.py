@@ -0,0 +1,397 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 10:30
+# @Author  : Histranger
+# @File    : crawler_pool.py
+# @Software: PyCharm
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import *
+
+from chrome_crawler import ChromeCrawler
+from crawler_base import TryGetResult
+from url_seen import canonicalize_url
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+@dataclass
+class CrawlerPoolConfig:
+    size: int = 4
+    max_pages: int = 200  # 单个浏览器最多访问的页面数，超过则回收
+    max_idle: float = 300.0  # 单个浏览器最长空闲时间(s)，超过则回收
+    checkout_timeout: Optional[float] = None  # 等待空闲浏览器的最长时间(s)，None表示一直等待
+
+
+@dataclass
+class CrawlerPoolStats:
+    launches: int = 0
+    launch_failures: int = 0
+    recycles: int = 0
+    health_check_failures: int = 0
+    checkouts: int = 0
+    checkout_wait_total: float = 0.0
+    checkout_wait_max: float = 0.0
+
+    @property
+    def checkout_wait_avg(self) -> float:
+        return self.checkout_wait_total / self.checkouts if self.checkouts else 0.0
+
+
+@dataclass
+class _Slot:
+    crawler: Any
+    launched_at: float = field(default_factory=time.monotonic)
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class CrawlerPool:
+    """
+    A thread-safe pool of pre-launched crawlers.
+
+    启动一个浏览器往往需要数秒，CrawlerPool预先启动size个crawler并复用它们：
+    checkout时检查浏览器是否仍然可用，并在访问页面数或空闲时间超出限制时回收重启。
+
+    >>> with CrawlerPool(ChromeCrawler, size=4, headless=True) as pool:  # doctest: +SKIP
+    ...     with pool.checkout() as cc:
+    ...         ok, msg = cc.try_get('https://etherscan.io')
+    """
+
+    def __init__(self, crawler_cls: Callable[..., Any] = ChromeCrawler, size: int = CrawlerPoolConfig.size,
+                 max_pages: Optional[int] = CrawlerPoolConfig.max_pages,
+                 max_idle: Optional[float] = CrawlerPoolConfig.max_idle,
+                 warm: bool = True, max_size: Optional[int] = None, **crawler_kwargs):
+        """
+        :param crawler_cls: crawler的类型(或工厂函数)，如ChromeCrawler、UCCrawler
+        :param size: 池中浏览器的最大数量
+        :param max_pages: 单个浏览器最多访问的页面数，None表示不限制
+        :param max_idle: 单个浏览器最长空闲时间(s)，None表示不限制
+        :param warm: 是否在构造时预先启动全部浏览器
+        :param max_size: resize允许的最大数量，默认为size，见concurrency_controller.py
+        :param crawler_kwargs: 传递给crawler_cls的参数，如headless、proxy、driver_path
+        """
+        assert 0 < size <= (max_size or size), "size must be positive and not above max_size."
+        self.crawler_cls = crawler_cls
+        self.size = size
+        self.max_size = max_size or size
+        self.max_pages = max_pages
+        self.max_idle = max_idle
+        self.crawler_kwargs = crawler_kwargs
+
+        self.stats = CrawlerPoolStats()
+
+        self._cond = threading.Condition()
+        self._idle: Deque[_Slot] = deque()
+        self._total: int = 0  # 空闲、借出以及正在启动的浏览器总数
+        self._closed: bool = False
+
+        if warm:
+            self.warm()
+
+        logging.info(f"{self!r} Started.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __repr__(self):
+        return f"CrawlerPool(crawler_cls={getattr(self.crawler_cls, '__name__', self.crawler_cls)}, size={self.size})"
+
+    def warm(self):
+        """
+        并行启动浏览器，直到池满
+        """
+        with self._cond:
+            n = self.size - self._total
+            self._total += n
+        if n <= 0:
+            return
+
+        def _launch_one(_):
+            try:
+                return self._launch()
+            except Exception as e:
+                logging.warning(f"warm up crawler failed. | {repr(e)}")
+                with self._cond:
+                    self._total -= 1
+                    self._cond.notify()
+                return None
+
+        with ThreadPoolExecutor(max_workers=n) as executor:
+            slots = [_ for _ in executor.map(_launch_one, range(n)) if _ is not None]
+        with self._cond:
+            self._idle.extend(slots)
+            self._cond.notify_all()
+
+    @property
+    def in_use(self) -> int:
+        """
+        借出以及正在启动的浏览器数量
+        """
+        with self._cond:
+            return self._total - len(self._idle)
+
+    def resize(self, size: int):
+        """
+        调整浏览器的最大数量：增大时按需启动新的浏览器，减小时立即关闭多余的空闲浏览器，借出的浏览器在归还时关闭
+        """
+        assert 0 < size <= self.max_size, f"size must be in [1, {self.max_size}]."
+        slots = []
+        with self._cond:
+            self.size = size
+            while self._total > self.size and self._idle:
+                slots.append(self._idle.popleft())
+                self._total -= 1
+            self._cond.notify_all()
+        for slot in slots:
+            self._close_crawler(slot.crawler)
+
+    @contextmanager
+    def checkout(self, timeout: Optional[float] = CrawlerPoolConfig.checkout_timeout):
+        """
+        借出一个可用的crawler，with块结束后自动归还
+        :param timeout: 等待空闲浏览器的最长时间(s)，超时抛出TimeoutError
+        """
+        t0 = time.perf_counter()
+        slot = self._acquire(timeout)
+        waited = time.perf_counter() - t0
+        with self._cond:
+            self.stats.checkouts += 1
+            self.stats.checkout_wait_total += waited
+            self.stats.checkout_wait_max = max(self.stats.checkout_wait_max, waited)
+        try:
+            yield slot.crawler
+        finally:
+            self._release(slot)
+
+    def map_unordered(self, func: Callable[[Any, T], R], items: Iterable[T], concurrency: Optional[int] = None,
+                      stop_event: Optional[threading.Event] = None,
+                      on_error: Optional[Callable[[T, Exception], R]] = None) -> Iterator[R]:
+        """
+        在池中的crawler上并发执行func(crawler, item)，按完成顺序逐个返回结果。
+        同时只从items中取出concurrency个元素，因此items可以是一个很大的惰性迭代器。
+        stop_event被set或生成器被关闭时，不再提交新任务，并等待正在执行的任务结束。
+        :param func: 任务函数，参数为借出的crawler和item
+        :param items: 任务的可迭代对象
+        :param concurrency: 并发数，默认跟随池的大小（resize后随之变化）
+        :param stop_event: 停止信号
+        :param on_error: 借出crawler(启动浏览器、等待空闲浏览器)或func失败时，以on_error(item, e)的返回值作为结果，
+                         默认抛出异常并结束迭代
+        """
+        items = iter(items)
+
+        def _run(item):
+            try:
+                with self.checkout() as crawler:
+                    return func(crawler, item)
+            except Exception as e:
+                if on_error is None:
+                    raise
+                return on_error(item, e)
+
+        executor = ThreadPoolExecutor(max_workers=concurrency or self.max_size, thread_name_prefix='CrawlerPool')
+        pending = set()
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(pending) < (concurrency or self.size):
+                    if stop_event is not None and stop_event.is_set():
+                        exhausted = True
+                        break
+                    try:
+                        item = next(items)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    pending.add(executor.submit(_run, item))
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            slots = list(self._idle)
+            self._idle.clear()
+            self._total -= len(slots)
+            self._cond.notify_all()
+        for slot in slots:
+            self._close_crawler(slot.crawler)
+        logging.info(f"{self!r} Closed.")
+
+    def _acquire(self, timeout: Optional[float]) -> _Slot:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("CrawlerPool is closed.")
+                if self._idle:
+                    slot, launch = self._idle.pop(), False
+                    break
+                if self._total < self.size:
+                    self._total += 1
+                    slot, launch = None, True
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"no idle crawler after {timeout}s.")
+                self._cond.wait(remaining)
+
+        # 启动、健康检查、回收均较慢，不能持有锁
+        try:
+            if launch:
+                return self._launch()
+            if reason := self._recycle_reason(slot):
+                logging.info(f"recycle crawler. | {reason}")
+                with self._cond:
+                    self.stats.recycles += 1
+                self._close_crawler(slot.crawler)
+                return self._launch()
+            return slot
+        except BaseException:
+            with self._cond:
+                self._total -= 1
+                self._cond.notify()
+            raise
+
+    def _release(self, slot: _Slot):
+        slot.last_used = time.monotonic()
+        with self._cond:
+            # resize减小后，多余的浏览器归还时关闭
+            if not self._closed and self._total <= self.size:
+                self._idle.append(slot)
+                self._cond.notify()
+                return
+            self._total -= 1
+        self._close_crawler(slot.crawler)
+
+    def _recycle_reason(self, slot: _Slot) -> Optional[str]:
+        if self.max_pages is not None and getattr(slot.crawler, 'pages', 0) >= self.max_pages:
+            return f"pages >= {self.max_pages}"
+        if self.max_idle is not None and time.monotonic() - slot.last_used >= self.max_idle:
+            return f"idle >= {self.max_idle}s"
+        if not self._is_healthy(slot.crawler):
+            with self._cond:
+                self.stats.health_check_failures += 1
+            return "health check failed"
+        return None
+
+    @staticmethod
+    def _is_healthy(crawler) -> bool:
+        """
+        浏览器崩溃或driver失联时，execute_script会抛出异常
+        """
+        try:
+            return crawler.driver.execute_script("return 1;") == 1
+        except Exception as e:
+            logging.warning(f"crawler not responsive. | {repr(e)}")
+            return False
+
+    def _launch(self) -> _Slot:
+        try:
+            crawler = self.crawler_cls(**self.crawler_kwargs)
+        except Exception:
+            with self._cond:
+                self.stats.launch_failures += 1
+            raise
+        with self._cond:
+            self.stats.launches += 1
+        return _Slot(crawler)
+
+    @staticmethod
+    def _close_crawler(crawler):
+        try:
+            crawler.close()
+        except Exception as e:
+            logging.warning(f"close crawler failed. | {repr(e)}")
+
+
+def crawl_many(urls: Iterable[str], concurrency: int = CrawlerPoolConfig.size,
+               crawler_cls: Callable[..., Any] = ChromeCrawler, pool: Optional[CrawlerPool] = None,
+               stop_event: Optional[threading.Event] = None, crawler_kwargs: Optional[Dict] = None,
+               seen=None, controller=None, **try_get_kwargs) -> Iterator[TryGetResult]:
+    """
+    使用多个浏览器并发访问urls，按完成顺序逐个返回TryGetResult
+
+    >>> for result in crawl_many(open('urls.txt').read().split(), concurrency=8):  # doctest: +SKIP
+    ...     print(result.url, result.ok, result.msg)
+
+    :param urls: 网址的可迭代对象，按需读取，不会一次性载入内存
+    :param concurrency: 并发数（浏览器数量）
+    :param crawler_cls: 未给定pool时，用于创建CrawlerPool的crawler类型
+    :param pool: 已有的CrawlerPool，给定时不会在结束后关闭它
+    :param stop_event: 停止信号，set后不再访问新的url
+    :param crawler_kwargs: 未给定pool时，传递给crawler_cls的参数
+    :param seen: url_seen.SeenSet，跳过已经访问过或正在访问的url（按规范化后的url判断）；
+                 成功的结果返回给调用方时才记录，失败、中断时仍在进行中的url下次运行会重新访问
+    :param controller: concurrency_controller.ConcurrencyController，根据延迟、失败率和机器负载调整浏览器数量，
+                       给定时忽略concurrency，由controller.config的min_size和max_size限定
+    :param try_get_kwargs: 传递给try_get的参数，如retries、key_msg、err_msg
+    """
+
+    # 正在访问的url，成功后才写入seen，与batch_runner.run_batch相同
+    inflight: Set[str] = set()
+
+    def _pending(urls: Iterable[str]) -> Iterator[str]:
+        for url in urls:
+            key = canonicalize_url(url)
+            if key in inflight or key in seen:
+                continue
+            inflight.add(key)
+            yield url
+
+    def _try_get(crawler, url: str) -> TryGetResult:
+        try:
+            result = crawler.try_get(url, **try_get_kwargs)
+        except Exception as e:
+            logging.warning(f"crawl url[{url}] failed. | {repr(e)}")
+            result = TryGetResult(ok=False, msg=repr(e), url=url)
+        if controller is not None:
+            controller.observe(result)
+        return result
+
+    def _failed(url: str, e: Exception) -> Tuple[str, TryGetResult]:
+        # 启动浏览器失败时只影响这一个url，其余的url继续访问
+        logging.warning(f"checkout crawler for url[{url}] failed. | {repr(e)}")
+        return url, TryGetResult(ok=False, msg=repr(e), url=url)
+
+    own_pool = pool is None
+    if own_pool:
+        if controller is not None:
+            pool = CrawlerPool(crawler_cls, size=controller.initial, max_size=controller.config.max_size,
+                               **(crawler_kwargs or {}))
+        else:
+            pool = CrawlerPool(crawler_cls, size=concurrency, **(crawler_kwargs or {}))
+    if controller is not None:
+        # 并发数跟随池的大小
+        concurrency = None
+        controller.start(pool)
+    if seen is not None:
+        urls = _pending(urls)
+    try:
+        for url, result in pool.map_unordered(lambda crawler, url: (url, _try_get(crawler, url)), urls,
+                                              concurrency=concurrency, stop_event=stop_event, on_error=_failed):
+            if seen is not None:
+                key = canonicalize_url(url)
+                if result.ok:
+                    seen.add(key)
+                inflight.discard(key)
+            yield result
+    finally:
+        if controller is not None:
+            controller.stop()
+        if own_pool:
+            pool.close()
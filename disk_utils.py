@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 14:10
+# @Author  : Histranger
+# @File    : disk_utils.py
+# @Software: PyCharm
+import os
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import *
+
+# 多个crawler进程共享的缓存目录，可以通过环境变量CRAWLER_CACHE_DIR修改
+CACHE_DIR: Path = Path(os.getenv('CRAWLER_CACHE_DIR', Path.home() / '.cache' / 'crawlerengine'))
+
+
+class FileLock:
+    """
+    An exclusive or shared inter-process lock based on flock (posix) or msvcrt.locking (windows).
+
+    >>> with FileLock(CACHE_DIR / 'foo.lock'):  # doctest: +SKIP
+    ...     pass
+    """
+
+    def __init__(self, path: Union[str, Path], timeout: Optional[float] = None, poll: float = 0.05,
+                 shared: bool = False):
+        """
+        :param path: 锁文件路径，父目录不存在时会自动创建
+        :param timeout: 最长等待时间(s)，超时抛出TimeoutError，None表示一直等待
+        :param poll: 轮询的间隔(s)
+        :param shared: 是否为共享锁，多个共享锁可以同时持有，与排他锁互斥；windows上总是排他锁
+        """
+        self.path = Path(path)
+        self.timeout = timeout
+        self.poll = poll
+        self.shared = shared
+        self._fd: Optional[int] = None
+
+    def __repr__(self):
+        return f"FileLock(path={self.path}, shared={self.shared})"
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+    def acquire(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        try:
+            while not self._try_lock(fd, blocking=deadline is None):
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise TimeoutError(f"acquire {self!r} timeout.")
+                time.sleep(self.poll)
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd = fd
+
+    def release(self):
+        if self._fd is None:
+            return
+        try:
+            if os.name == 'nt':
+                import msvcrt
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def _try_lock(self, fd: int, blocking: bool) -> bool:
+        if os.name == 'nt':
+            import msvcrt
+            # msvcrt没有无限等待的模式，blocking时由acquire轮询
+            try:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                return False
+
+        import fcntl
+        operation = fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX
+        try:
+            fcntl.flock(fd, operation if blocking else operation | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+
+def atomic_write_text(path: Union[str, Path], text: str, encoding: str = 'utf-8'):
+    """
+    先写入同目录下的临时文件再替换，读取者不会看到写了一半的文件
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding=encoding) as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+@contextmanager
+def sqlite_transaction(db: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    """
+    BEGIN IMMEDIATE：开始时即获取写锁，避免多个进程同时升级读锁导致的SQLITE_BUSY；异常时回滚。
+    db需要以isolation_level=None打开，由这里管理事务
+    """
+    db.execute('BEGIN IMMEDIATE')
+    try:
+        yield db
+    except BaseException:
+        db.execute('ROLLBACK')
+        raise
+    db.execute('COMMIT')
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/19 13:30
+# @Author  : Histranger
+# @File    : dom_snapshot.py
+# @Software: PyCharm
+"""
+Snapshots of selected subtrees instead of the whole page_source.
+
+page_source序列化并传输整个文档，大页面往往有数MB，而通常只需要其中一个表格或容器。
+DOMSnapshot只返回选中元素的outerHTML或文本；很大的元素可以分块读取，每次只序列化一部分子节点，
+浏览器和Python都不必构造一个完整的大字符串，如直接写入文件或交给html.parser.HTMLParser.feed。
+
+>>> dom = DOMSnapshot(cc.driver)  # doctest: +SKIP
+>>> table = dom.outer_html('#transactions table')  # doctest: +SKIP
+>>> with open('txs.html', 'w') as f:  # doctest: +SKIP
+...     for chunk in dom.iter_html('#transactions tbody', chunk_size=1 << 20):
+...         f.write(chunk)
+>>> dom.stats  # doctest: +SKIP
+SnapshotStats(round_trips=7, bytes=5242880)
+"""
+import itertools
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import *
+
+from metrics import REGISTRY
+
+SNAPSHOT_BYTES_TOTAL = REGISTRY.counter('crawler_snapshot_bytes_total', "Bytes of DOM transferred by mode: "
+                                        "page_source, html, text.", ['mode'])
+
+
+@dataclass
+class DOMSnapshotConfig:
+    chunk_size: int = 1 << 20  # 分块读取时每块的字符数
+
+
+@dataclass
+class SnapshotStats:
+    round_trips: int = 0
+    bytes: int = 0  # 传输的UTF-8字节数
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def add(self, mode: str, payload: Union[None, str, Sequence[str]]):
+        if payload is None:
+            n = 0
+        elif isinstance(payload, str):
+            n = len(payload.encode('utf-8'))
+        else:
+            n = sum(len(_.encode('utf-8')) for _ in payload if _)
+        with self._lock:
+            self.round_trips += 1
+            self.bytes += n
+        SNAPSHOT_BYTES_TOTAL.labels(mode=mode).inc(n)
+
+
+# arguments: selector, mode('html'或'text'), all
+_SNAPSHOT_JS = """
+var selector = arguments[0], mode = arguments[1], all = arguments[2];
+var nodes = all ? Array.prototype.slice.call(document.querySelectorAll(selector))
+                : [document.querySelector(selector)].filter(Boolean);
+var parts = nodes.map(function (e) { return mode === 'text' ? e.innerText : e.outerHTML; });
+return all ? parts : (parts.length ? parts[0] : null);
+"""
+
+# 分块读取：open在页面上保存游标，next每次返回不超过size个字符，close删除游标。
+# 游标逐个序列化子节点，只有单个子节点超过size时才切分它的字符串。
+_CHUNK_JS = """
+var store = window.__crawlerEngineSnapshots = window.__crawlerEngineSnapshots || {};
+var op = arguments[0], id = arguments[1];
+if (op === 'open') {
+    var e = document.querySelector(arguments[2]), mode = arguments[3];
+    if (!e) return null;
+    var head = '', tail = '';
+    if (mode === 'html') {
+        var shell = e.cloneNode(false).outerHTML, end = '</' + e.tagName.toLowerCase() + '>';
+        var hasEnd = shell.slice(-end.length).toLowerCase() === end;
+        head = hasEnd ? shell.slice(0, -end.length) : shell;
+        tail = hasEnd ? end : '';
+    }
+    store[id] = {nodes: Array.prototype.slice.call(e.childNodes), i: 0, rest: head, tail: tail, mode: mode};
+    return true;
+}
+var s = store[id];
+if (op === 'close' || !s) { delete store[id]; return null; }
+var size = arguments[2], out = [], n = 0;
+function serialize(node) {
+    if (s.mode === 'text') return node.textContent || '';
+    if (node.nodeType === 1) return node.outerHTML;
+    if (node.nodeType === 3) { var d = document.createElement('div'); d.appendChild(node.cloneNode()); return d.innerHTML; }
+    if (node.nodeType === 8) return '<!--' + node.data + '-->';
+    return '';
+}
+while (n < size) {
+    if (!s.rest) {
+        if (s.i < s.nodes.length) s.rest = serialize(s.nodes[s.i++]);
+        else if (s.tail) { s.rest = s.tail; s.tail = ''; }
+        else break;
+    }
+    var take = s.rest.slice(0, size - n), last = take.charCodeAt(take.length - 1);
+    // 不能在代理对中间切分，否则两边都不是合法的UTF-16
+    if (last >= 0xD800 && last <= 0xDBFF) {
+        if (take.length > 1) take = take.slice(0, -1);
+        else if (n) break;
+        else take = s.rest.slice(0, 2);
+    }
+    s.rest = s.rest.slice(take.length);
+    out.push(take);
+    n += take.length;
+}
+if (!n) { delete store[id]; return null; }
+return out.join('');
+"""
+
+_ids = itertools.count(1)
+
+
+class DOMSnapshot:
+    """
+    Read selected subtrees of the current page. 每个方法的每次调用都是一次execute_script往返。
+    """
+
+    def __init__(self, driver, stats: Optional[SnapshotStats] = None):
+        """
+        :param driver: WebDriver、CDPPage或TabHandle的driver
+        :param stats: 共享的统计，默认新建
+        """
+        self.driver = driver
+        self.stats = stats or SnapshotStats()
+
+    def __repr__(self):
+        return f"DOMSnapshot({self.stats})"
+
+    def page_source(self) -> str:
+        page_source = self.driver.page_source
+        self.stats.add('page_source', page_source)
+        return page_source
+
+    def outer_html(self, selector: str, all: bool = False) -> Union[Optional[str], List[str]]:
+        """
+        :param selector: CSS选择器
+        :param all: 是否返回所有匹配的元素
+        :return: 第一个匹配元素的outerHTML，不存在时为None；all时为列表
+        """
+        return self._snapshot(selector, 'html', all)
+
+    def text(self, selector: str, all: bool = False) -> Union[Optional[str], List[str]]:
+        """
+        同outer_html，返回可见文本(innerText)
+        """
+        return self._snapshot(selector, 'text', all)
+
+    def iter_html(self, selector: str, chunk_size: int = DOMSnapshotConfig.chunk_size) -> Iterator[str]:
+        """
+        分块读取第一个匹配元素的outerHTML，拼接起来与outer_html相同；元素不存在时不返回任何块
+        """
+        return self._iter_chunks(selector, 'html', chunk_size)
+
+    def iter_text(self, selector: str, chunk_size: int = DOMSnapshotConfig.chunk_size) -> Iterator[str]:
+        """
+        分块读取第一个匹配元素的文本(textContent，不计算布局)
+        """
+        return self._iter_chunks(selector, 'text', chunk_size)
+
+    def _snapshot(self, selector: str, mode: str, all: bool):
+        payload = self.driver.execute_script(_SNAPSHOT_JS, selector, mode, all)
+        self.stats.add(mode, payload)
+        return payload
+
+    def _iter_chunks(self, selector: str, mode: str, chunk_size: int) -> Iterator[str]:
+        assert chunk_size > 0, "chunk_size must be positive."
+        snapshot_id = f"{id(self)}-{next(_ids)}"
+        opened = self.driver.execute_script(_CHUNK_JS, 'open', snapshot_id, selector, mode)
+        self.stats.add(mode, None)
+        if not opened:
+            return
+        chunk = ''
+        try:
+            while True:
+                chunk = self.driver.execute_script(_CHUNK_JS, 'next', snapshot_id, chunk_size)
+                self.stats.add(mode, chunk)
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            # 生成器提前关闭时，删除页面上的游标
+            if chunk is not None:
+                try:
+                    self.driver.execute_script(_CHUNK_JS, 'close', snapshot_id)
+                except Exception as e:
+                    logging.debug(f"close snapshot[{snapshot_id}] failed. | {repr(e)}")
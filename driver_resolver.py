@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 14:30
+# @Author  : Histranger
+# @File    : driver_resolver.py
+# @Software: PyCharm
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import *
+
+from disk_utils import CACHE_DIR, FileLock, atomic_write_text
+
+MANIFEST_PATH: Path = CACHE_DIR / 'chromedriver_manifest.json'
+
+
+def detect_chrome_version() -> Optional[str]:
+    """
+    :return: 本机Chrome的版本号，检测失败返回None
+    """
+    try:
+        try:
+            # webdriver-manager >= 4.0
+            from webdriver_manager.core.os_manager import OperationSystemManager, ChromeType
+            version = OperationSystemManager().get_browser_version_from_os(ChromeType.GOOGLE)
+        except ImportError:
+            from webdriver_manager.core.utils import get_browser_version_from_os, ChromeType
+            version = get_browser_version_from_os(ChromeType.GOOGLE)
+    except Exception as e:
+        logging.warning(f"detect chrome version failed. | {repr(e)}")
+        return None
+    return version or None
+
+
+def install_chromedriver() -> str:
+    from webdriver_manager.chrome import ChromeDriverManager
+    return ChromeDriverManager().install()
+
+
+class DriverResolver:
+    """
+    Resolve the chromedriver path once per process and per Chrome version.
+
+    ChromeDriverManager().install()每次都要检测版本、查询缓存，多个worker同时启动时尤其慢。
+    DriverResolver把 Chrome版本 ==> chromedriver路径 记录在磁盘上的manifest中，
+    进程内再缓存一份；manifest中没有记录时，持有文件锁调用install，避免多个进程同时下载。
+    """
+
+    def __init__(self, manifest_path: Union[str, Path] = MANIFEST_PATH,
+                 installer: Callable[[], str] = install_chromedriver,
+                 version_detector: Callable[[], Optional[str]] = detect_chrome_version):
+        """
+        :param manifest_path: manifest文件路径，同一台机器上的进程应使用同一个文件
+        :param installer: 下载chromedriver并返回其路径
+        :param version_detector: 返回本机Chrome的版本号
+        """
+        self.manifest_path = Path(manifest_path)
+        self.lock_path = self.manifest_path.with_suffix('.lock')
+        self.installer = installer
+        self.version_detector = version_detector
+
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+        self._version_detected: bool = False
+        self._resolved: Dict[str, str] = {}
+
+    def __repr__(self):
+        return f"DriverResolver(manifest_path={self.manifest_path})"
+
+    @property
+    def chrome_version(self) -> Optional[str]:
+        with self._lock:
+            if not self._version_detected:
+                self._version = self.version_detector()
+                self._version_detected = True
+            return self._version
+
+    def resolve(self) -> str:
+        """
+        :return: 与本机Chrome版本匹配的chromedriver路径
+        """
+        version = self.chrome_version
+        key = version or 'unknown'
+        with self._lock:
+            if key in self._resolved:
+                return self._resolved[key]
+
+            # 版本未知时无法判断磁盘上的记录是否过期，只缓存在进程内
+            path = self._lookup(version) if version else None
+            if path is None:
+                path = self._install(version)
+            self._resolved[key] = path
+            return path
+
+    def clear(self):
+        """
+        清除进程内缓存，下次resolve时重新检测Chrome版本
+        """
+        with self._lock:
+            self._version_detected = False
+            self._resolved.clear()
+
+    def _lookup(self, version: str) -> Optional[str]:
+        path = self._read_manifest().get(version)
+        if path and os.path.isfile(path):
+            return path
+        return None
+
+    def _install(self, version: Optional[str]) -> str:
+        with FileLock(self.lock_path):
+            # 等锁期间其他进程可能已经完成了安装
+            if version and (path := self._lookup(version)):
+                return path
+            path = self.installer()
+            logging.info(f"chromedriver for chrome[{version}] installed. | {path}")
+            if version:
+                manifest = self._read_manifest()
+                manifest[version] = path
+                atomic_write_text(self.manifest_path, json.dumps(manifest, indent=2))
+            return path
+
+    def _read_manifest(self) -> Dict[str, str]:
+        try:
+            with open(self.manifest_path, encoding='utf-8') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logging.warning(f"read {self.manifest_path} failed. | {repr(e)}")
+            return {}
+        return manifest if isinstance(manifest, dict) else {}
+
+
+_default_resolver = DriverResolver()
+
+
+def resolve_driver_path() -> str:
+    """
+    ChromeCrawler未指定driver_path时使用，进程内第一次调用之后只是一次字典查询
+    """
+    return _default_resolver.resolve()
+
+
+def prewarm() -> str:
+    """
+    提前检测Chrome版本并下载chromedriver，供部署脚本在启动worker前调用：
+        python driver_resolver.py
+    """
+    path = resolve_driver_path()
+    logging.info(f"chromedriver prewarmed. | {path}")
+    return path
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    print(prewarm())
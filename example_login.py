@@ -5,7 +5,6 @@
 # @Software: PyCharm
 import logging
 import os
-import random
 import time
 from functools import wraps
 from typing import List, Callable, Optional, Dict
@@ -18,6 +17,8 @@ from dotenv import load_dotenv
 from twocaptcha import TwoCaptcha
 
 from chrome_crawler import ChromeCrawler
+from readiness import Selector
+from session_store import SessionSpec, SessionStore, ensure_session
 
 env_file = Path(__file__).parent / '.env'
 load_dotenv(env_file)
@@ -60,6 +61,7 @@ def solve_reCaptcha_v2(site_key: str, url: str) -> Optional[Dict]:
 
 class EtherscanCrawler:
     etherscan_login_url: str = "https://etherscan.io/login"
+    etherscan_myaccount_url: str = "https://etherscan.io/myaccount"
     explicitly_wait_time: int = 10
     username: str = os.getenv("ETHERSCAN_USERNAME", 'foo')
     password: str = os.getenv("ETHERSCAN_PASSWORD", 'bar')
@@ -77,6 +79,31 @@ class EtherscanCrawler:
     def close(self):
         self.cc.close()
 
+    def is_logged_in(self) -> bool:
+        """
+        未登录时访问myaccount会被重定向到登录页
+        """
+        ok, msg = self.cc.try_get(self.etherscan_myaccount_url)
+        return ok and self.driver.current_url == self.etherscan_myaccount_url
+
+    def ensure_login(self, manual: bool = False, store: Optional[SessionStore] = None) -> bool:
+        """
+        优先复用已保存的会话，失效时才重新登录。多个EtherscanCrawler同时调用时只会登录一次。
+        :param manual: 是否手动通过reCaptcha
+        :param store: 会话保存的位置
+        """
+        spec = SessionSpec(site='etherscan.io', account=self.username, store=store or SessionStore())
+        return ensure_session(self.cc, spec, is_valid=lambda _: self.is_logged_in(),
+                              login=lambda _: self.login_manual() if manual else self.login())
+
+    def _wait_redirect_to_myaccount(self) -> bool:
+        try:
+            WebDriverWait(self.driver, self.explicitly_wait_time).until(EC.url_to_be(self.etherscan_myaccount_url))
+        except Exception as e:
+            logging.warning(f"wait redirect failed. | {repr(e)}")
+            return False
+        return True
+
     def login_manual(self) -> bool:
         """
         login in etherscan.io bypass reCaptcha by manual.
@@ -144,14 +171,12 @@ class EtherscanCrawler:
         # self.driver.find_element(By.ID, 'ContentPlaceHolder1_btnLogin').click()
         login_button = self.driver.find_element(By.ID, 'ContentPlaceHolder1_btnLogin')
         self.driver.execute_script("arguments[0].click();", login_button)
-        time.sleep(random.uniform(2, 3))
 
-        # Do Check the Account url after redirect
-        if self.driver.current_url != 'https://etherscan.io/myaccount':
+        # Do Check the Account url after redirect, return as soon as redirected
+        if not self._wait_redirect_to_myaccount():
             logging.error("login failed. | not myaccount site.")
             return False
 
-        time.sleep(random.uniform(1, 2))
         logging.info("Login succeed.")
         return True
 
@@ -208,20 +233,23 @@ class EtherscanCrawler:
         self.driver.execute_script("arguments[0].removeAttribute('style')", textarea_ele)
         # send keys
         textarea_ele.send_keys(captcha_code)
-        time.sleep(random.uniform(1, 2))
+        # return as soon as the login button can be clicked, instead of sleeping for a fixed time
+        try:
+            self.cc.wait_ready(Selector('#ContentPlaceHolder1_btnLogin', visible=True), timeout=self.explicitly_wait_time)
+        except Exception as e:
+            logging.error(f'wait login button failed. | {repr(e)}')
+            return False
 
         # LOGIN ==> common click may not work
         self.driver.find_element(By.ID, 'ContentPlaceHolder1_btnLogin').click()
         # login_button = self.driver.find_element(By.ID, 'ContentPlaceHolder1_btnLogin')
         # self.driver.execute_script("arguments[0].click();", login_button)
-        time.sleep(random.uniform(2, 3))
 
-        # Do Check the Account url after redirect
-        if self.driver.current_url != 'https://etherscan.io/myaccount':
+        # Do Check the Account url after redirect, return as soon as redirected
+        if not self._wait_redirect_to_myaccount():
             logging.error("login failed. | not myaccount site.")
             return False
 
-        time.sleep(random.uniform(1, 2))
         logging.info("Login succeed.")
         return True
 
@@ -230,5 +258,6 @@ if __name__ == '__main__':
     # Google Chrome Version 116
     with EtherscanCrawler(headless=False, driver_path='./chromedriver/v116/chromedriver.exe') as ec:
         # ec.login()
-        ec.login_manual()
+        # ec.login_manual()
+        ec.ensure_login(manual=True)
         input("Press Enter to stop.")
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/19 12:30
+# @Author  : Histranger
+# @File    : extractor.py
+# @Software: PyCharm
+"""
+Declarative extraction of many fields in one execute_script round trip.
+
+逐个调用find_element + .text/get_attribute时，每个字段都是一次WebDriver往返，
+缺失的元素还要等待implicitly_wait(3s)。Extractor把整个schema交给一段注入的脚本，每个页面只执行一次，
+缺失的字段返回MISSING，不会等待。
+
+>>> schema = {
+...     'balance': '#ContentPlaceHolder1_divSummary .card-body > div:first-child',
+...     'txs': Field('#transactions tbody tr', many=True, fields={
+...         'hash': 'td:nth-child(2) a',
+...         'block': Field('td:nth-child(4)', type_=int),
+...         'href': Field('td:nth-child(2) a', attr='href'),
+...     }),
+...     'title': Field('//title', by='xpath'),
+... }
+>>> data = cc.extract(schema)  # doctest: +SKIP
+>>> data['balance'], len(data['txs']), missing_fields(data)  # doctest: +SKIP
+('0.1 ETH', 25, [])
+"""
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import *
+
+
+class _Missing:
+    """
+    缺失字段的标记：元素不存在、属性不存在或类型转换失败
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __repr__(self):
+        return 'MISSING'
+
+    def __bool__(self):
+        return False
+
+    def __reduce__(self):
+        return type(self), ()
+
+
+MISSING = _Missing()
+
+# selenium的By.CSS_SELECTOR、By.XPATH也可以使用
+_BY: Dict[str, str] = {'css': 'css', 'css selector': 'css', 'xpath': 'xpath'}
+
+# arguments[0]是编译后的schema，arguments[1]是根元素的CSS选择器；缺失为null，选择器错误为{"__error__": ...}
+_EXTRACT_JS = """
+var spec = arguments[0], rootSelector = arguments[1];
+function find(ctx, f) {
+    if (f.by === 'xpath') {
+        var r = document.evaluate(f.selector, ctx, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+        var nodes = [];
+        for (var i = 0; i < r.snapshotLength && (f.many || i < 1); i++) nodes.push(r.snapshotItem(i));
+        return nodes;
+    }
+    if (f.many) return Array.prototype.slice.call(ctx.querySelectorAll(f.selector));
+    var e = ctx.querySelector(f.selector);
+    return e ? [e] : [];
+}
+function value(e, f) {
+    if (f.fields) return extract(e, f.fields);
+    if (f.attr === 'text') return e.nodeType === 1 ? e.innerText : e.textContent;
+    if (f.attr === 'textContent') return e.textContent;
+    if (f.attr === 'html') return e.outerHTML;
+    if (f.attr === 'innerHTML') return e.innerHTML;
+    if (e.nodeType !== 1) return null;
+    // 与get_attribute相同，优先读取property，如a.href返回绝对网址
+    var v = e[f.attr];
+    if (v === undefined || v === null || typeof v === 'object' || typeof v === 'function') v = e.getAttribute(f.attr);
+    return v;
+}
+function extract(ctx, fields) {
+    var out = {};
+    for (var i = 0; i < fields.length; i++) {
+        var f = fields[i];
+        try {
+            var nodes = find(ctx, f);
+            out[f.name] = f.many ? nodes.map(function (e) { return value(e, f); })
+                                 : (nodes.length ? value(nodes[0], f) : null);
+        } catch (err) {
+            out[f.name] = {'__error__': String(err)};
+        }
+    }
+    return out;
+}
+var root = rootSelector ? document.querySelector(rootSelector) : document;
+return root ? extract(root, spec) : null;
+"""
+
+
+@dataclass
+class Field:
+    """
+    :param selector: CSS选择器或XPath
+    :param by: 'css'或'xpath'
+    :param attr: 'text'(可见文本，同WebElement.text)、'textContent'、'html'(outerHTML)、'innerHTML'或属性名
+    :param many: 是否返回所有匹配的元素，结果为列表
+    :param type_: 结果的类型，str、int、float或任意一个接受str的函数；int和float会去掉千位分隔符
+    :param default: 缺失时的值
+    :param strip: 是否去掉首尾空白
+    :param fields: 子schema，相对于每个匹配的元素提取，结果为dict（many时为dict的列表）
+    """
+    selector: str
+    by: str = 'css'
+    attr: str = 'text'
+    many: bool = False
+    type_: Callable[[str], Any] = str
+    default: Any = MISSING
+    strip: bool = True
+    fields: Optional[Dict[str, Union[str, 'Field']]] = None
+
+    def __post_init__(self):
+        assert self.by in _BY, f"by not in {list(_BY.keys())}"
+        self.by = _BY[self.by]
+        if self.fields is not None:
+            self.fields = {k: as_field(v) for k, v in self.fields.items()}
+
+
+Schema = Dict[str, Union[str, Field]]
+
+
+def as_field(value: Union[str, Field]) -> Field:
+    return value if isinstance(value, Field) else Field(value)
+
+
+def compile_schema(schema: Schema) -> List[Dict]:
+    """
+    :return: 注入脚本的参数，可以被JSON序列化
+    """
+    spec = []
+    for name, f in schema.items():
+        f = as_field(f)
+        item = {'name': name, 'selector': f.selector, 'by': f.by, 'attr': f.attr, 'many': f.many}
+        if f.fields is not None:
+            item['fields'] = compile_schema(f.fields)
+        spec.append(item)
+    return spec
+
+
+def _convert(raw, f: Field, name: str):
+    if raw is None:
+        return f.default
+    if isinstance(raw, dict) and '__error__' in raw:
+        logging.warning(f"extract field[{name}] failed. | {raw['__error__']}")
+        return f.default
+    if f.fields is not None:
+        return convert(raw, f.fields)
+    if isinstance(raw, str):
+        if f.strip:
+            raw = raw.strip()
+        if f.type_ in (int, float):
+            raw = raw.replace(',', '')
+    try:
+        return f.type_(raw) if f.type_ is not str else str(raw)
+    except (TypeError, ValueError) as e:
+        logging.debug(f"convert field[{name}] failed. | {repr(e)}")
+        return f.default
+
+
+def convert(raw: Dict, schema: Schema) -> Dict[str, Any]:
+    """
+    把注入脚本的结果转换为schema中声明的类型，缺失的字段为default(默认MISSING)
+    """
+    data = {}
+    for name, f in schema.items():
+        f = as_field(f)
+        value = raw.get(name)
+        if f.many:
+            data[name] = [_convert(_, f, name) for _ in value] if isinstance(value, list) else \
+                ([] if value is None else _convert(value, f, name))
+        else:
+            data[name] = _convert(value, f, name)
+    return data
+
+
+class Extractor:
+    """
+    A compiled schema, reusable across pages and threads.
+    """
+
+    def __init__(self, schema: Schema, root: Optional[str] = None):
+        """
+        :param schema: 字段名 ==> CSS选择器或Field
+        :param root: 根元素的CSS选择器，所有字段相对于它提取；不存在时所有字段都缺失
+        """
+        self.schema: Dict[str, Field] = {k: as_field(v) for k, v in schema.items()}
+        self.root = root
+        self.spec = compile_schema(self.schema)
+        json.dumps(self.spec)  # 尽早发现无法序列化的参数
+
+    def __repr__(self):
+        return f"Extractor(fields={list(self.schema)}, root={self.root!r})"
+
+    def extract(self, driver) -> Dict[str, Any]:
+        """
+        :param driver: WebDriver或CDPPage，只调用一次execute_script
+        """
+        raw = driver.execute_script(_EXTRACT_JS, self.spec, self.root)
+        return convert(raw or {}, self.schema)
+
+
+def missing_fields(data: Dict[str, Any], prefix: str = '') -> List[str]:
+    """
+    :return: 缺失的字段名，子schema中的字段为'parent.child'，列表中的为'parent[i].child'
+    """
+    missing = []
+    for name, value in data.items():
+        if value is MISSING:
+            missing.append(prefix + name)
+        elif isinstance(value, dict):
+            missing.extend(missing_fields(value, f"{prefix}{name}."))
+        elif isinstance(value, list):
+            for i, item in enumerate(value):
+                if item is MISSING:
+                    missing.append(f"{prefix}{name}[{i}]")
+                elif isinstance(item, dict):
+                    missing.extend(missing_fields(item, f"{prefix}{name}[{i}]."))
+    return missing
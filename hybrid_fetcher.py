@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 17:10
+# @Author  : Histranger
+# @File    : hybrid_fetcher.py
+# @Software: PyCharm
+import copy
+import json
+import logging
+import re
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import *
+from urllib.parse import urlsplit
+
+import urllib3
+
+from crawler_base import TryGetResult, check_page
+from disk_utils import CACHE_DIR, FileLock, atomic_write_text
+from markers import MarkerMatcher, Markers
+from scheduler import parse_retry_after
+
+DECISIONS_PATH: Path = CACHE_DIR / 'hybrid_decisions.json'
+
+# 原始HTML中出现这些内容，说明页面需要执行JS才能得到真正的内容
+NEEDS_JS_PATTERNS: List[Pattern] = [
+    re.compile(r'<noscript[^>]*>[^<]*(enable|requires?)\s+javascript', re.I),
+    re.compile(r'<title>\s*Just a moment\.\.\.\s*</title>', re.I),  # Cloudflare challenge
+    re.compile(r'<div\s+id=["\'](root|app|__next)["\']\s*>\s*</div>', re.I),  # SPA的空挂载点
+]
+
+
+@dataclass
+class HybridFetcherConfig:
+    timeout: float = 10.0
+    learn_after: int = 3  # 连续多少次结果一致后固定该域名的决策
+    reprobe_every: int = 100  # 固定使用浏览器的域名，每隔多少次请求重新尝试一次HTTP
+    user_agent: str = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 ' \
+                      '(KHTML, like Gecko) Chrome/116.0.0.0 Safari/537.36'
+
+
+@dataclass
+class DomainDecision:
+    mode: str = 'probe'  # 'probe': 先尝试HTTP, 'http': HTTP已足够, 'browser': 总是使用浏览器
+    http_streak: int = 0  # 连续HTTP成功(>0)或失败(<0)的次数
+    browser_requests: int = 0  # 固定使用浏览器以来的请求数
+
+
+def needs_javascript(body: str) -> bool:
+    return any(_.search(body) for _ in NEEDS_JS_PATTERNS)
+
+
+class DomainDecisions:
+    """
+    Per-domain "HTTP is enough" / "always browser" decisions, persisted to a JSON file shared by processes.
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]] = DECISIONS_PATH):
+        """
+        :param path: 决策文件路径，None表示不持久化
+        """
+        self.path = Path(path) if path else None
+        self._lock = threading.Lock()
+        self._decisions: Dict[str, DomainDecision] = {}
+        if self.path:
+            self._decisions.update(self._read())
+
+    def __repr__(self):
+        return f"DomainDecisions(path={self.path}, domains={len(self._decisions)})"
+
+    def get(self, host: str) -> DomainDecision:
+        with self._lock:
+            return copy.copy(self._decisions.get(host, DomainDecision()))
+
+    def record(self, host: str, http_ok: Optional[bool], learn_after: int):
+        """
+        :param http_ok: HTTP是否成功，None表示本次没有尝试HTTP
+        """
+        with self._lock:
+            decision = self._decisions.setdefault(host, DomainDecision())
+            old_mode = decision.mode
+            if http_ok is None:
+                decision.browser_requests += 1
+                return
+            decision.browser_requests = 0
+            if http_ok:
+                decision.http_streak = max(decision.http_streak, 0) + 1
+            else:
+                decision.http_streak = min(decision.http_streak, 0) - 1
+            if http_ok and decision.mode == 'browser':
+                # 重新尝试HTTP成功，说明页面可能已经改为服务端渲染
+                decision.mode = 'probe'
+            if decision.http_streak >= learn_after:
+                decision.mode = 'http'
+            elif decision.http_streak <= -learn_after:
+                decision.mode = 'browser'
+            changed = decision.mode != old_mode
+
+        if changed:
+            logging.info(f"domain[{host}] {old_mode} ==> {decision.mode}")
+            self.save()
+
+    def save(self):
+        if not self.path:
+            return
+        with FileLock(self.path.with_suffix('.lock')):
+            # 合并其他进程写入的决策
+            decisions = self._read()
+            with self._lock:
+                decisions.update(self._decisions)
+                data = {host: asdict(_) for host, _ in decisions.items()}
+            atomic_write_text(self.path, json.dumps(data, indent=2))
+
+    def _read(self) -> Dict[str, DomainDecision]:
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return {host: DomainDecision(**_) for host, _ in json.load(f).items()}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError, TypeError) as e:
+            logging.warning(f"read {self.path} failed. | {repr(e)}")
+            return {}
+
+
+class HybridFetcher:
+    """
+    Try a pooled keep-alive HTTP request first, fall back to the browser only when needed.
+
+    HTTP响应同样使用key_msg/err_msg判断，状态码非2xx、标记判断失败或页面需要JS时使用浏览器重新访问。
+    每个域名的结果被记录下来：连续learn_after次HTTP足够的域名之后直接使用HTTP，
+    连续learn_after次需要浏览器的域名之后直接使用浏览器（每reprobe_every次请求重新尝试一次HTTP）。
+
+    >>> with CrawlerPool(ChromeCrawler, size=4) as pool:  # doctest: +SKIP
+    ...     fetcher = HybridFetcher(pool)
+    ...     result = fetcher.try_get('https://etherscan.io/address/0x...', key_msg='Balance')
+    ...     result.via
+    'http'
+    """
+
+    def __init__(self, browser, proxy: Optional[Dict] = None, decisions: Optional[DomainDecisions] = None,
+                 timeout: float = HybridFetcherConfig.timeout, learn_after: int = HybridFetcherConfig.learn_after,
+                 reprobe_every: int = HybridFetcherConfig.reprobe_every, maxsize: int = 10):
+        """
+        :param browser: 回退时使用的crawler，或CrawlerPool
+        :param proxy: 代理，与crawler相同，必须是一个字典，且键必须包含ip和port
+        :param decisions: 域名决策，默认保存在CACHE_DIR/hybrid_decisions.json
+        :param timeout: HTTP超时时间(s)
+        :param learn_after: 连续多少次结果一致后固定该域名的决策
+        :param reprobe_every: 固定使用浏览器的域名，每隔多少次请求重新尝试一次HTTP
+        :param maxsize: 每个host保持的keep-alive连接数
+        """
+        self.browser = browser
+        self.proxy = copy.deepcopy(proxy)
+        self.decisions = decisions if decisions is not None else DomainDecisions()
+        self.timeout = timeout
+        self.learn_after = learn_after
+        self.reprobe_every = reprobe_every
+
+        headers = {'User-Agent': HybridFetcherConfig.user_agent}
+        if self.proxy:
+            assert 'ip' in self.proxy and 'port' in self.proxy, "proxy must be a dict with key ip and port."
+            self.http = urllib3.ProxyManager(f"http://{self.proxy['ip']}:{self.proxy['port']}",
+                                             maxsize=maxsize, headers=headers)
+        else:
+            self.http = urllib3.PoolManager(maxsize=maxsize, headers=headers)
+
+    def __repr__(self):
+        return f"HybridFetcher(browser={self.browser!r}, proxy={self.proxy})"
+
+    def close(self):
+        self.http.clear()
+
+    def try_get(self, url: str, interval: float = 0.2, retries: int = 3,
+                key_msg: Markers = None, err_msg: Markers = 'ERR_', **browser_kwargs) -> TryGetResult:
+        """
+        参数与BaseCrawler.try_get相同，browser_kwargs仅在使用浏览器时传递给try_get
+        :return: TryGetResult，via表示最终使用的是'http'还是'browser'
+        """
+        host = urlsplit(url).netloc
+        decision = self.decisions.get(host)
+
+        use_http = decision.mode != 'browser' or decision.browser_requests + 1 >= self.reprobe_every
+        if use_http:
+            result = self._http_get(url, MarkerMatcher(key_msg, err_msg))
+            if result.ok:
+                self.decisions.record(host, True, self.learn_after)
+                return result
+            if result.retry_after is not None:
+                # 服务器要求等待，此时立即用浏览器重新访问同样会被限流
+                return result
+            logging.debug(f"http failed, fallback to browser. | {result.msg}")
+
+        with self._checkout() as crawler:
+            result = crawler.try_get(url, interval=interval, retries=retries,
+                                     key_msg=key_msg, err_msg=err_msg, **browser_kwargs)
+        # 浏览器也失败时，无法判断HTTP是否足够；但固定使用浏览器的域名重新尝试HTTP失败后，
+        # 需要重新计数，否则之后的每个请求都会先尝试HTTP
+        if not use_http:
+            self.decisions.record(host, None, self.learn_after)
+        elif result.ok or decision.mode == 'browser':
+            self.decisions.record(host, False, self.learn_after)
+        return result
+
+    def _http_get(self, url: str, matcher: MarkerMatcher) -> TryGetResult:
+        try:
+            response = self.http.request('GET', url, timeout=self.timeout, retries=urllib3.Retry(connect=1, read=False, redirect=5))
+        except urllib3.exceptions.HTTPError as e:
+            return TryGetResult(ok=False, msg=repr(e), url=url, via='http')
+
+        if not 200 <= response.status < 300:
+            retry_after = None
+            if response.status in (429, 503):
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            return TryGetResult(ok=False, msg=f"http status[{response.status}].", url=url, via='http',
+                                retry_after=retry_after)
+
+        charset = response.headers.get('Content-Type', '').partition('charset=')[2].split(';')[0].strip()
+        try:
+            body = response.data.decode(charset or 'utf-8', errors='replace')
+        except LookupError:
+            body = response.data.decode('utf-8', errors='replace')
+
+        if needs_javascript(body):
+            return TryGetResult(ok=False, msg="page needs javascript.", url=url, page_source=body, via='http')
+        result = check_page(matcher, url, body)
+        result.via = 'http'
+        return result
+
+    @contextmanager
+    def _checkout(self):
+        if hasattr(self.browser, 'checkout'):
+            with self.browser.checkout() as crawler:
+                yield crawler
+        else:
+            yield self.browser
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 11:20
+# @Author  : Histranger
+# @File    : markers.py
+# @Software: PyCharm
+import re
+from dataclasses import dataclass
+from typing import *
+
+Marker = Union[str, Pattern]
+Markers = Optional[Union[Marker, Sequence[Marker]]]
+
+# re的标志位 ==> 内联标志，用于把不同标志的正则合并为一个
+_INLINE_FLAGS = ((re.IGNORECASE, 'i'), (re.MULTILINE, 'm'), (re.DOTALL, 's'), (re.VERBOSE, 'x'))
+
+
+def _as_list(markers: Markers) -> List[Marker]:
+    if markers is None:
+        return []
+    if isinstance(markers, (str, re.Pattern)):
+        markers = [markers]
+    # 与原try_get一致，空字符串视为未给定
+    return [_ for _ in markers if isinstance(_, re.Pattern) or _]
+
+
+def marker_text(marker: Marker) -> str:
+    return marker.pattern if isinstance(marker, re.Pattern) else marker
+
+
+def _to_regex(marker: Marker) -> str:
+    """
+    字符串按字面量匹配，re.Pattern按正则匹配（不支持反向引用）
+    """
+    if isinstance(marker, str):
+        return re.escape(marker)
+    flags = ''.join(c for f, c in _INLINE_FLAGS if marker.flags & f)
+    return f"(?{flags}:{marker.pattern})" if flags else f"(?:{marker.pattern})"
+
+
+@dataclass(frozen=True)
+class MarkerMatch:
+    kind: str  # 'key' or 'err'
+    marker: Marker
+
+    @property
+    def text(self) -> str:
+        return marker_text(self.marker)
+
+
+class MarkerMatcher:
+    """
+    Match a list of success markers (key_msg) and failure markers (err_msg) in a single pass.
+
+    所有marker被编译为一个带命名分组的正则，只需扫描一次页面源码：
+    - 若给定了key markers，找到任意一个key marker即停止，err markers不参与判定（与原try_get语义一致）；
+    - 否则找到任意一个err marker即停止。
+    同一位置上key markers优先于err markers。
+
+    >>> m = MarkerMatcher(key_markers=None, err_markers=['ERR_', re.compile(r'404\\s+Not Found', re.I)])
+    >>> m.search('<h1>404   not found</h1>').text
+    '404\\\\s+Not Found'
+    >>> m.search('<h1>Welcome</h1>') is None
+    True
+    >>> MarkerMatcher(key_markers='Welcome', err_markers='ERR_').search('ERR_ Welcome').kind
+    'key'
+    """
+
+    def __init__(self, key_markers: Markers = None, err_markers: Markers = None):
+        """
+        :param key_markers: 关键词（成功标志），str或re.Pattern，或它们的列表
+        :param err_markers: 错误信息（失败标志），str或re.Pattern，或它们的列表
+        """
+        self.key_markers: List[Marker] = _as_list(key_markers)
+        self.err_markers: List[Marker] = _as_list(err_markers)
+
+        # 组名 ==> MarkerMatch
+        self._groups: Dict[str, MarkerMatch] = {}
+        alternatives: List[str] = []
+        # key markers出现时err markers不参与判定，因此无需编译进正则
+        for kind, markers in (('key', self.key_markers),) if self.key_markers else (('err', self.err_markers),):
+            for i, marker in enumerate(markers):
+                name = f"_{kind}{i}"
+                self._groups[name] = MarkerMatch(kind, marker)
+                alternatives.append(f"(?P<{name}>{_to_regex(marker)})")
+        self._regex: Optional[Pattern] = re.compile('|'.join(alternatives)) if alternatives else None
+
+    def __repr__(self):
+        return f"MarkerMatcher(key_markers={self.key_markers}, err_markers={self.err_markers})"
+
+    def search(self, text: str) -> Optional[MarkerMatch]:
+        """
+        :return: 首个命中的marker，未命中返回None
+        """
+        if self._regex is None:
+            return None
+        m = self._regex.search(text)
+        return self._groups[m.lastgroup] if m else None
+
+    @staticmethod
+    def describe(markers: Markers) -> str:
+        return '|'.join(marker_text(_) for _ in _as_list(markers))
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 23:10
+# @Author  : Histranger
+# @File    : metrics.py
+# @Software: PyCharm
+"""
+Lightweight counters, gauges and histograms with a Prometheus text-format endpoint.
+
+>>> start_metrics_server(9100)  # doctest: +SKIP
+>>> # curl http://127.0.0.1:9100/metrics
+>>> TRY_GET_TOTAL.labels(outcome='ok').value  # doctest: +SKIP
+"""
+import bisect
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import *
+
+
+@dataclass
+class MetricsConfig:
+    host: str = '127.0.0.1'
+    port: int = 9100
+    # 浏览器相关的操作通常在几毫秒到几十秒之间
+    buckets: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(str(v))}"' for k, v in labels.items()) + '}'
+
+
+class _CounterChild:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value: float = 0.0
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeChild(_CounterChild):
+
+    def set(self, value: float):
+        with self._lock:
+            self.value = value
+
+
+class _HistogramChild:
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts: List[int] = [0] * (len(buckets) + 1)  # 最后一个是+Inf
+        self.sum: float = 0.0
+        self.count: int = 0
+
+    def observe(self, value: float):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    @contextmanager
+    def time(self):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0)
+
+    def quantile(self, q: float) -> float:
+        """
+        按桶线性插值估算分位数，落在+Inf桶时返回最大的有限桶边界
+        """
+        with self._lock:
+            counts, total = list(self.counts), self.count
+        if not total:
+            return math.nan
+        rank = q * total
+        cumulative = 0
+        for i, n in enumerate(counts):
+            if cumulative + n >= rank and n:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - cumulative) / n
+            cumulative += n
+        return self.buckets[-1]
+
+
+class _Metric:
+    type_: str = ''
+
+    def __init__(self, name: str, help_: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.name!r}, labelnames={self.labelnames})"
+
+    def labels(self, **labels):
+        assert set(labels) == set(self.labelnames), f"{self.name} needs labels {self.labelnames}."
+        key = tuple(str(labels[_]) for _ in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def children(self) -> Iterator[Tuple[Dict[str, str], Any]]:
+        with self._lock:
+            items = list(self._children.items())
+        for key, child in items:
+            yield dict(zip(self.labelnames, key)), child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type_ = 'counter'
+
+    def inc(self, amount: float = 1.0):
+        self._children[()].inc(amount)
+
+    @property
+    def value(self) -> float:
+        return self._children[()].value
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_format_labels(labels)} {_format_value(child.value)}" for labels, child in self.children()]
+
+
+class Gauge(Counter):
+    type_ = 'gauge'
+
+    def set(self, value: float):
+        self._children[()].set(value)
+
+    def _new_child(self):
+        return _GaugeChild()
+
+
+class Histogram(_Metric):
+    type_ = 'histogram'
+
+    def __init__(self, name: str, help_: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = MetricsConfig.buckets):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help_, labelnames)
+
+    def observe(self, value: float):
+        self._children[()].observe(value)
+
+    def time(self):
+        return self._children[()].time()
+
+    def quantile(self, q: float) -> float:
+        return self._children[()].quantile(q)
+
+    @property
+    def count(self) -> int:
+        return self._children[()].count
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def render(self) -> List[str]:
+        lines = []
+        for labels, child in self.children():
+            with child._lock:
+                counts, total, sum_ = list(child.counts), child.count, child.sum
+            cumulative = 0
+            for bound, n in zip(self.buckets + (math.inf,), counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': _format_value(bound)})} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(sum_)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {total}")
+        return lines
+
+
+class Registry:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+
+    def __repr__(self):
+        return f"Registry(metrics={list(self._metrics)})"
+
+    def register(self, metric: _Metric) -> _Metric:
+        """
+        同名的指标只注册一次，返回已注册的指标
+        """
+        with self._lock:
+            existing = self._metrics.setdefault(metric.name, metric)
+        assert type(existing) is type(metric) and existing.labelnames == metric.labelnames, \
+            f"metric[{metric.name}] already registered as {existing!r}."
+        return existing
+
+    def counter(self, name: str, help_: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help_, labelnames))
+
+    def gauge(self, name: str, help_: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help_, labelnames))
+
+    def histogram(self, name: str, help_: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = MetricsConfig.buckets) -> Histogram:
+        return self.register(Histogram(name, help_, labelnames, buckets))
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """
+        :return: Prometheus文本格式
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type_}")
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+LAUNCH_SECONDS = REGISTRY.histogram('crawler_launch_seconds', "Time to start a browser.", ['crawler'])
+PHASE_SECONDS = REGISTRY.histogram('crawler_phase_seconds', "Time spent per try_get phase: "
+                                   "navigate, ready_wait, page_source, retry_sleep.", ['phase'])
+ATTEMPTS_TOTAL = REGISTRY.counter('crawler_attempts_total', "Page load attempts by outcome.", ['outcome'])
+TRY_GET_TOTAL = REGISTRY.counter('crawler_try_get_total', "try_get calls by final outcome.", ['outcome'])
+RETRIES = REGISTRY.histogram('crawler_try_get_retries', "Retries per try_get call.",
+                             buckets=(0, 1, 2, 3, 5, 10))
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: Registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int = MetricsConfig.port, host: str = MetricsConfig.host,
+                         registry: Registry = REGISTRY) -> ThreadingHTTPServer:
+    """
+    在后台线程中提供/metrics，默认只监听本机
+    :param port: 端口，0表示随机端口，见返回值的server_address
+    :return: ThreadingHTTPServer，调用shutdown停止
+    """
+    handler = type('MetricsHandler', (_MetricsHandler,), {'registry': registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    logging.info(f"metrics server started at http://{host}:{server.server_address[1]}/metrics")
+    return server
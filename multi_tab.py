@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/19 11:00
+# @Author  : Histranger
+# @File    : multi_tab.py
+# @Software: PyCharm
+"""
+Several tabs inside one browser, each with its own try_get.
+
+每个Chrome进程都有浏览器进程本身的开销，同一个浏览器中的多个标签页可以共享它。
+MultiTabCrawler为一个已启动的crawler打开标签页，每个标签页是一个TabHandle，提供与crawler相同的try_get；
+用CrawlerPool管理这些标签页，即可复用借出、健康检查、回收和map_unordered/crawl_many。
+
+- CDPCrawler：每个标签页是一个独立的target，命令通过sessionId路由，多个标签页真正并行加载；
+- ChromeCrawler/UCCrawler：WebDriver同一时刻只能操作一个窗口，TabHandle在共享的锁中切换窗口后执行命令，
+  命令是串行的；配合page_load_strategy='none'或'eager'时，driver.get很快返回，多个页面仍然可以同时加载。
+  会话共享的performance日志按窗口分发给各个标签页，每个标签页的DocumentResponse和retry_after只来自自己的导航。
+
+>>> with MultiTabCrawler(CDPCrawler(), tabs=8) as browser:  # doctest: +SKIP
+...     for result in crawl_many(urls, concurrency=8, pool=browser.tab_pool(), key_msg='Balance'):
+...         print(result.url, result.ok)
+"""
+import logging
+import threading
+from dataclasses import dataclass
+from typing import *
+
+from cdp_events import WebviewEventLog
+from crawler_base import BaseCrawler
+from crawler_pool import CrawlerPool
+
+
+@dataclass
+class MultiTabConfig:
+    tabs: int = 4  # 每个浏览器的标签页数
+    max_pages: int = 100  # 单个标签页最多访问的页面数，超过则关闭并重新打开，释放渲染进程的内存
+
+
+class _WindowDriver:
+    """
+    Route every WebDriver call to one window, switching windows under the browser-wide lock.
+    """
+
+    def __init__(self, browser: 'MultiTabCrawler', handle: str):
+        self._browser = browser
+        self.window_handle = handle
+
+    def __repr__(self):
+        return f"_WindowDriver(window_handle={self.window_handle})"
+
+    def __getattr__(self, name: str):
+        browser = self._browser
+        with browser.lock:
+            browser.switch_to(self.window_handle)
+            # 属性(如page_source、current_url)在切换后立即读取
+            attr = getattr(browser.crawler.driver, name)
+        if not callable(attr):
+            return attr
+
+        def _call(*args, **kwargs):
+            with browser.lock:
+                browser.switch_to(self.window_handle)
+                return attr(*args, **kwargs)
+
+        return _call
+
+
+class TabHandle(BaseCrawler):
+    """
+    One tab of a MultiTabCrawler, with the same try_get as the crawler that owns it. close只关闭这个标签页。
+    """
+
+    def __init__(self, browser: 'MultiTabCrawler', driver, index: int):
+        crawler = browser.crawler
+        self.browser = browser
+        self.driver = driver
+        self.index = index
+        self.page_load_strategy = crawler.page_load_strategy
+        self.session = crawler.session
+        self.track_responses = crawler.track_responses
+        # Network.setBlockedURLs只作用于执行它时的窗口，WebDriver的标签页不屏蔽资源
+        self.block_resources = crawler.block_resources if browser.per_tab_events else None
+        self.pages = 0
+        self.closed = False
+        self._setup_cdp_events()
+        self._inject_session()
+
+    def __repr__(self):
+        return f"TabHandle(index={self.index}, browser={self.browser.crawler!r})"
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.browser.close_tab(self)
+
+    def _create_event_source(self):
+        if self.browser.per_tab_events:
+            return self.browser.crawler.create_event_source(self.driver)
+        # performance日志是整个WebDriver会话共享的，按窗口分发，DocumentResponse和就绪条件只看到本标签页的事件
+        assert self.browser.crawler.cdp_events is not None, \
+            "the crawler must be launched with the performance log to use CDP events in tabs."
+        return WebviewEventLog(self.browser.crawler.cdp_events, self.driver.window_handle, self.browser.lock)
+
+
+class MultiTabCrawler:
+    """
+    Open and route K tabs inside one browser. 关闭时关闭全部标签页和浏览器。
+
+    打开标签页后不要再直接使用crawler.try_get，WebDriver的当前窗口由MultiTabCrawler记录和切换。
+    """
+
+    def __init__(self, crawler: BaseCrawler, tabs: int = MultiTabConfig.tabs):
+        """
+        :param crawler: 已启动的ChromeCrawler、UCCrawler或CDPCrawler
+        :param tabs: tab_pool默认的标签页数
+        """
+        assert tabs > 0, "tabs must be positive."
+        self.crawler = crawler
+        self.tabs = tabs
+        # CDPCrawler的每个标签页有独立的会话和事件流
+        self.per_tab_events: bool = hasattr(crawler, 'new_page')
+        self.lock = threading.RLock()
+        self._current: Optional[str] = None
+        self._open: List[TabHandle] = []
+        self._index: int = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __repr__(self):
+        return f"MultiTabCrawler(crawler={self.crawler!r}, tabs={len(self._open)})"
+
+    @property
+    def open_tabs(self) -> int:
+        return len(self._open)
+
+    def new_tab(self) -> TabHandle:
+        """
+        打开一个新的标签页。原有的窗口保留为空白页，关闭最后一个窗口会结束WebDriver会话
+        """
+        if self.per_tab_events:
+            driver = self.crawler.new_page()
+        else:
+            with self.lock:
+                self.crawler.driver.switch_to.new_window('tab')
+                self._current = handle = self.crawler.driver.current_window_handle
+            driver = _WindowDriver(self, handle)
+        with self.lock:
+            self._index += 1
+            index = self._index
+        tab = TabHandle(self, driver, index)
+        with self.lock:
+            self._open.append(tab)
+        logging.debug(f"{tab!r} opened.")
+        return tab
+
+    def close_tab(self, tab: TabHandle):
+        with self.lock:
+            if tab in self._open:
+                self._open.remove(tab)
+        try:
+            if tab.cdp_events is not None and hasattr(tab.cdp_events, 'close'):
+                tab.cdp_events.close()
+            if self.per_tab_events:
+                tab.driver.close()
+            else:
+                with self.lock:
+                    self.switch_to(tab.driver.window_handle)
+                    self.crawler.driver.close()
+                    self._current = None
+        except Exception as e:
+            logging.warning(f"close {tab!r} failed. | {repr(e)}")
+
+    def switch_to(self, handle: str):
+        """
+        在self.lock中调用，只在当前窗口不是handle时切换
+        """
+        if self._current != handle:
+            self.crawler.driver.switch_to.window(handle)
+            self._current = handle
+
+    def tab_pool(self, size: Optional[int] = None, max_pages: Optional[int] = MultiTabConfig.max_pages,
+                 **pool_kwargs) -> CrawlerPool:
+        """
+        :param size: 标签页数，默认为self.tabs
+        :param max_pages: 单个标签页最多访问的页面数
+        :param pool_kwargs: 传递给CrawlerPool的其他参数
+        :return: 借出TabHandle的CrawlerPool，关闭它只关闭标签页，不关闭浏览器
+        """
+        return CrawlerPool(self.new_tab, size=size or self.tabs, max_pages=max_pages, **pool_kwargs)
+
+    def close(self):
+        for tab in list(self._open):
+            tab.close()
+        self.crawler.close()
+
+
+def tab_pool(crawlers: Sequence[BaseCrawler], tabs: int = MultiTabConfig.tabs,
+             max_pages: Optional[int] = MultiTabConfig.max_pages, **pool_kwargs) -> CrawlerPool:
+    """
+    在多个浏览器上各打开tabs个标签页，用于比较"每个浏览器的标签页数"与"浏览器数"的内存和吞吐量
+    :param crawlers: 已启动的crawler
+    :param tabs: 每个浏览器的标签页数
+    :return: 大小为len(crawlers) * tabs的CrawlerPool，新标签页总是打开在标签页最少的浏览器中；
+             关闭它只关闭标签页，浏览器由调用者关闭
+    """
+    browsers = [MultiTabCrawler(_, tabs) for _ in crawlers]
+    lock = threading.Lock()
+
+    def _new_tab() -> TabHandle:
+        # 打开标签页很快，在锁中打开，避免并行打开时都选中同一个浏览器
+        with lock:
+            return min(browsers, key=lambda _: _.open_tabs).new_tab()
+
+    return CrawlerPool(_new_tab, size=len(browsers) * tabs, max_pages=max_pages, **pool_kwargs)
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 21:00
+# @Author  : Histranger
+# @File    : page_cache.py
+# @Software: PyCharm
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import *
+
+from disk_utils import CACHE_DIR, sqlite_transaction
+from url_seen import canonicalize_url
+
+PAGE_CACHE_PATH: Path = CACHE_DIR / 'pages.sqlite3'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    final_url TEXT,
+    page_source BLOB NOT NULL,
+    marker TEXT,
+    msg TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pages_accessed_at ON pages (accessed_at);
+CREATE INDEX IF NOT EXISTS pages_expires_at ON pages (expires_at);
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta (name, value) VALUES ('bytes', 0);
+CREATE TRIGGER IF NOT EXISTS pages_insert AFTER INSERT ON pages BEGIN
+    UPDATE meta SET value = value + NEW.size WHERE name = 'bytes';
+END;
+CREATE TRIGGER IF NOT EXISTS pages_delete AFTER DELETE ON pages BEGIN
+    UPDATE meta SET value = value - OLD.size WHERE name = 'bytes';
+END;
+"""
+
+
+@dataclass
+class PageCacheConfig:
+    ttl: float = 24 * 3600  # 默认有效期(s)
+    max_bytes: int = 1 << 30  # 压缩后的总大小上限
+    busy_timeout: float = 30.0  # 等待其他进程释放写锁的时间(s)
+
+
+@dataclass
+class PageCacheStats:
+    hits: int = 0
+    misses: int = 0
+    expired: int = 0  # 过期的命中，同时计入misses
+    stores: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / (self.hits + self.misses) if self.hits + self.misses else 0.0
+
+
+@dataclass
+class CachedPage:
+    url: str
+    final_url: Optional[str]
+    page_source: str
+    marker: Optional[str]
+    msg: str
+
+
+def cache_key(url: str, options: Optional[Dict] = None) -> str:
+    """
+    :param url: 网址，规范化后作为键的一部分
+    :param options: 影响页面内容或判断结果的参数，如key_msg、block_resources、page_load_strategy
+    """
+    options = json.dumps(options or {}, sort_keys=True, default=repr)
+    return hashlib.sha1(f"{canonicalize_url(url)}\0{options}".encode('utf-8')).hexdigest()
+
+
+class PageCache:
+    """
+    Rendered pages of successful try_get calls, in a sqlite file shared by processes on one host.
+
+    只缓存成功的结果；每个条目有自己的有效期，压缩后的总大小超过max_bytes时按最近访问时间淘汰。
+    计数器(stats)只统计当前进程。
+
+    >>> cache = PageCache(ttl=3600)  # doctest: +SKIP
+    >>> crawler.try_get('https://etherscan.io/address/0x...', key_msg='Balance', cache=cache)  # doctest: +SKIP
+    """
+
+    def __init__(self, path: Union[str, Path] = PAGE_CACHE_PATH, ttl: float = PageCacheConfig.ttl,
+                 max_bytes: int = PageCacheConfig.max_bytes, busy_timeout: float = PageCacheConfig.busy_timeout):
+        """
+        :param path: sqlite文件路径
+        :param ttl: 默认有效期(s)
+        :param max_bytes: 压缩后的总大小上限
+        :param busy_timeout: 等待其他进程释放写锁的时间(s)
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.stats = PageCacheStats()
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, timeout=busy_timeout, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(_SCHEMA)
+
+    def __repr__(self):
+        return f"PageCache(path={self.path}, ttl={self.ttl}, max_bytes={self.max_bytes}, stats={self.stats})"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    @property
+    def size(self) -> int:
+        """
+        :return: 压缩后的总大小
+        """
+        with self._lock:
+            return self._db.execute("SELECT value FROM meta WHERE name = 'bytes'").fetchone()[0]
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM pages').fetchone()[0]
+
+    def get(self, key: str, now: Optional[float] = None) -> Optional[CachedPage]:
+        now = now or time.time()
+        with self._lock:
+            row = self._db.execute('SELECT url, final_url, page_source, marker, msg, expires_at FROM pages '
+                                   'WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.stats.misses += 1
+                return None
+            url, final_url, page_source, marker, msg, expires_at = row
+            if expires_at <= now:
+                self.stats.misses += 1
+                self.stats.expired += 1
+                with self._transaction():
+                    self._db.execute('DELETE FROM pages WHERE key = ? AND expires_at <= ?', (key, now))
+                return None
+            self._db.execute('UPDATE pages SET accessed_at = ? WHERE key = ?', (now, key))
+            self.stats.hits += 1
+        return CachedPage(url, final_url, zlib.decompress(page_source).decode('utf-8'), marker, msg)
+
+    def put(self, key: str, page: CachedPage, ttl: Optional[float] = None, now: Optional[float] = None):
+        """
+        :param ttl: 有效期(s)，默认使用self.ttl
+        """
+        now = now or time.time()
+        data = zlib.compress(page.page_source.encode('utf-8'))
+        if len(data) > self.max_bytes:
+            logging.warning(f"page[{page.url}] is larger than the cache, skip. | {len(data)} bytes")
+            return
+        with self._lock, self._transaction():
+            # 不使用INSERT OR REPLACE，REPLACE删除旧行时不会触发pages_delete
+            self._db.execute('DELETE FROM pages WHERE key = ?', (key,))
+            self._db.execute('INSERT INTO pages (key, url, final_url, page_source, marker, msg, size, expires_at, '
+                             'accessed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                             (key, page.url, page.final_url, data, page.marker, page.msg, len(data),
+                              now + (self.ttl if ttl is None else ttl), now))
+            self.stats.stores += 1
+            self._evict(now)
+
+    def delete(self, key: str):
+        with self._lock, self._transaction():
+            self._db.execute('DELETE FROM pages WHERE key = ?', (key,))
+
+    def clear(self):
+        with self._lock, self._transaction():
+            self._db.execute('DELETE FROM pages')
+
+    def _evict(self, now: float):
+        """
+        先删除过期的条目，仍超过max_bytes时按最近访问时间淘汰，需要在事务中调用
+        """
+        evicted = self._db.execute('DELETE FROM pages WHERE expires_at <= ?', (now,)).rowcount
+        total = self._db.execute("SELECT value FROM meta WHERE name = 'bytes'").fetchone()[0]
+        while total > self.max_bytes:
+            rows = self._db.execute('SELECT key, size FROM pages ORDER BY accessed_at LIMIT 64').fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                self._db.execute('DELETE FROM pages WHERE key = ?', (key,))
+                total -= size
+                evicted += 1
+        self.stats.evictions += evicted
+
+    def _transaction(self):
+        return sqlite_transaction(self._db)
+
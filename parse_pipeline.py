@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/19 15:00
+# @Author  : Histranger
+# @File    : parse_pipeline.py
+# @Software: PyCharm
+"""
+Parse page_source in a process pool instead of the thread that owns the browser.
+
+在持有driver的线程中解析大页面(正则、DOM遍历)时，浏览器空闲，且GIL阻塞其他crawler线程。
+ParsePipeline把两者分成两个阶段：浏览器只负责访问并把HTML放入有界队列，进程池负责解析。
+队列满时submit阻塞，浏览器不再访问新的网址(背压)；较大的HTML通过共享内存传给解析进程，不经过pickle。
+
+解析函数在子进程中执行，必须可以被pickle，即模块顶层定义的函数：
+
+>>> def parse_txs(url, html):  # doctest: +SKIP
+...     return re.findall(r'0x[0-9a-f]{64}', html)
+>>> with ParsePipeline(parse_txs, parsers=4) as pipeline:  # doctest: +SKIP
+...     for parsed in parse_many(urls, pipeline, concurrency=8, key_msg='Balance'):
+...         print(parsed.url, parsed.ok, len(parsed.data or []))
+...     print(pipeline.stats.report())
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from multiprocessing.shared_memory import SharedMemory
+from typing import *
+
+from crawler_base import TryGetResult
+from crawler_pool import CrawlerPoolConfig, crawl_many
+from metrics import REGISTRY
+
+PIPELINE_ITEMS_TOTAL = REGISTRY.counter('crawler_pipeline_items_total', "Pages through the parse pipeline by stage: "
+                                        "fetch, parse, parse_error.", ['stage'])
+PIPELINE_BACKPRESSURE_SECONDS = REGISTRY.counter('crawler_pipeline_backpressure_seconds_total',
+                                                 "Seconds fetchers waited for a free slot in the parse queue.")
+PARSE_SECONDS = REGISTRY.histogram('crawler_parse_seconds', "Time spent in the parse function per page.")
+
+
+@dataclass
+class ParsePipelineConfig:
+    parsers: int = os.cpu_count() or 1  # 解析进程数
+    queue_size: Optional[int] = None  # 等待解析和正在解析的页面数上限，默认为2 * parsers
+    shm_threshold: int = 64 << 10  # 不小于该字节数的HTML通过共享内存传递
+
+
+@dataclass
+class StageStats:
+    items: int = 0
+    bytes: int = 0
+    busy: float = 0.0  # 该阶段所有worker的工作时间之和(s)
+    first_at: Optional[float] = None
+    last_at: Optional[float] = None
+
+    def add(self, n_bytes: int, busy: float = 0.0, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        self.items += 1
+        self.bytes += n_bytes
+        self.busy += busy
+        if self.first_at is None:
+            self.first_at = now
+        self.last_at = now
+
+    @property
+    def elapsed(self) -> float:
+        return self.last_at - self.first_at if self.items > 1 else 0.0
+
+    @property
+    def throughput(self) -> float:
+        """
+        :return: 每秒完成的页面数(按第一个到最后一个页面的时间计算)
+        """
+        return (self.items - 1) / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def per_worker(self) -> float:
+        """
+        :return: 单个worker满负荷时每秒能完成的页面数
+        """
+        return self.items / self.busy if self.busy else 0.0
+
+
+@dataclass
+class PipelineStats:
+    fetch: StageStats = field(default_factory=StageStats)
+    parse: StageStats = field(default_factory=StageStats)
+    parse_errors: int = 0
+    shm_transfers: int = 0
+    backpressure: float = 0.0  # submit等待空位的总时间(s)
+    max_queued: int = 0
+
+    def report(self, parsers: Optional[int] = None) -> Dict[str, Any]:
+        """
+        每个阶段的吞吐量。backpressure占比高说明解析是瓶颈，应增加parsers；
+        parse_utilization低说明浏览器是瓶颈，应增加concurrency
+        :param parsers: 解析进程数，给定时计算parse_utilization
+        """
+        report = {
+            'fetch_pages_per_s': round(self.fetch.throughput, 3),
+            'fetch_mb_per_s': round(self.fetch.throughput * self.fetch.bytes / self.fetch.items / (1 << 20), 3)
+            if self.fetch.items else 0.0,
+            'parse_pages_per_s': round(self.parse.throughput, 3),
+            'parse_pages_per_s_per_worker': round(self.parse.per_worker, 3),
+            'parse_errors': self.parse_errors,
+            'backpressure_s': round(self.backpressure, 3),
+            'max_queued': self.max_queued,
+        }
+        if parsers and self.parse.elapsed:
+            report['parse_utilization'] = round(self.parse.busy / (parsers * self.parse.elapsed), 3)
+        return report
+
+
+@dataclass
+class ParseResult:
+    url: str
+    ok: bool  # 访问和解析都成功
+    data: Any = None  # 解析函数的返回值
+    error: Optional[str] = None  # 访问失败时为TryGetResult.msg，解析失败时为异常
+    fetch: Optional[TryGetResult] = field(default=None, repr=False)
+    parse_time: float = 0.0
+
+
+def _parse_worker(parse: Callable[[str, str], Any], url: str, payload: str, size: Optional[int]):
+    """
+    在解析进程中执行；size不为None时payload是共享内存的名称
+    """
+    t0 = time.perf_counter()
+    if size is not None:
+        shm = SharedMemory(name=payload)
+        try:
+            with shm.buf[:size] as view:
+                payload = str(view, 'utf-8')
+        finally:
+            shm.close()
+    return parse(url, payload), time.perf_counter() - t0
+
+
+class ParsePipeline:
+    """
+    A bounded queue in front of a process pool that parses page_source.
+
+    submit在队列满时阻塞，results按完成顺序返回ParseResult。所有方法都是线程安全的。
+    """
+
+    def __init__(self, parse: Callable[[str, str], Any], parsers: int = ParsePipelineConfig.parsers,
+                 queue_size: Optional[int] = ParsePipelineConfig.queue_size,
+                 shm_threshold: int = ParsePipelineConfig.shm_threshold,
+                 parse_failed: bool = False, mp_context=None):
+        """
+        :param parse: 解析函数parse(url, html)，必须可以被pickle
+        :param parsers: 解析进程数
+        :param queue_size: 等待解析和正在解析的页面数上限，默认为2 * parsers
+        :param shm_threshold: 不小于该字节数的HTML通过共享内存传递
+        :param parse_failed: 是否也解析访问失败(如key_msg缺失)但有page_source的页面
+        :param mp_context: multiprocessing的context，默认为平台默认值
+        """
+        assert parsers > 0, "parsers must be positive."
+        assert shm_threshold > 0, "shm_threshold must be positive."
+        self.parse = parse
+        self.parsers = parsers
+        self.queue_size = queue_size or 2 * parsers
+        self.shm_threshold = shm_threshold
+        self.parse_failed = parse_failed
+
+        self.stats = PipelineStats()
+
+        self._executor = ProcessPoolExecutor(max_workers=parsers, mp_context=mp_context)
+        self._slots = threading.BoundedSemaphore(self.queue_size)
+        self._cond = threading.Condition()
+        self._done: Deque[ParseResult] = deque()
+        self._pending: int = 0
+        self._closed: bool = False
+
+        logging.info(f"{self!r} Started.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __repr__(self):
+        return f"ParsePipeline(parse={getattr(self.parse, '__name__', self.parse)}, parsers={self.parsers}, " \
+               f"queue_size={self.queue_size})"
+
+    @property
+    def queued(self) -> int:
+        """
+        等待解析和正在解析的页面数
+        """
+        return self._pending
+
+    def submit(self, result: TryGetResult, timeout: Optional[float] = None):
+        """
+        把访问结果交给解析进程，队列满时阻塞
+        :param result: try_get的返回值
+        :param timeout: 等待空位的最长时间(s)，超时抛出TimeoutError
+        """
+        html = result.page_source
+        encoded = html.encode('utf-8') if html else b''
+        n_bytes = len(encoded)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("ParsePipeline is closed.")
+            self.stats.fetch.add(n_bytes)
+        PIPELINE_ITEMS_TOTAL.labels(stage='fetch').inc()
+
+        if html is None or not (result.ok or self.parse_failed):
+            self._finish(ParseResult(result.url, False, error=result.msg, fetch=result))
+            return
+
+        t0 = time.perf_counter()
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError(f"parse queue still full after {timeout}s.")
+        waited = time.perf_counter() - t0
+        PIPELINE_BACKPRESSURE_SECONDS.inc(waited)
+        with self._cond:
+            self._pending += 1
+            self.stats.backpressure += waited
+            self.stats.max_queued = max(self.stats.max_queued, self._pending)
+
+        shm = None
+        try:
+            if n_bytes >= self.shm_threshold:
+                shm = SharedMemory(create=True, size=n_bytes)
+                shm.buf[:n_bytes] = encoded
+                shm.close()  # 本进程不再需要映射，unlink之前共享内存一直存在
+                future = self._executor.submit(_parse_worker, self.parse, result.url, shm.name, n_bytes)
+            else:
+                future = self._executor.submit(_parse_worker, self.parse, result.url, html, None)
+        except BaseException:
+            self._release_slot(shm)
+            raise
+        if shm is not None:
+            with self._cond:
+                self.stats.shm_transfers += 1
+        future.add_done_callback(partial(self._on_done, result, shm, n_bytes))
+
+    def results(self, wait: bool = False) -> Iterator[ParseResult]:
+        """
+        按完成顺序返回已经解析完成的ParseResult
+        :param wait: 是否等待所有已提交的页面解析完成
+        """
+        while True:
+            with self._cond:
+                while wait and not self._done and self._pending:
+                    self._cond.wait()
+                if not self._done:
+                    return
+                parsed = self._done.popleft()
+            yield parsed
+
+    def close(self):
+        """
+        等待正在解析的页面，关闭进程池；未取出的结果仍然可以通过results读取
+        """
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        logging.info(f"{self!r} Closed. | {self.stats.report(self.parsers)}")
+
+    def _on_done(self, result: TryGetResult, shm: Optional[SharedMemory], n_bytes: int, future: Future):
+        failed = True
+        if future.cancelled():
+            parsed = ParseResult(result.url, False, error='cancelled', fetch=result)
+        elif (e := future.exception()) is not None:
+            logging.warning(f"parse url[{result.url}] failed. | {repr(e)}")
+            parsed = ParseResult(result.url, False, error=repr(e), fetch=result)
+        else:
+            data, parse_time = future.result()
+            parsed = ParseResult(result.url, result.ok, data, None if result.ok else result.msg, result, parse_time)
+            failed = False
+        with self._cond:
+            self.stats.parse.add(n_bytes, parsed.parse_time)
+            self.stats.parse_errors += failed
+        PIPELINE_ITEMS_TOTAL.labels(stage='parse_error' if failed else 'parse').inc()
+        PARSE_SECONDS.observe(parsed.parse_time)
+        self._release_slot(shm)
+        self._finish(parsed)
+
+    def _release_slot(self, shm: Optional[SharedMemory]):
+        if shm is not None:
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logging.warning(f"unlink shared memory[{shm.name}] failed. | {repr(e)}")
+        with self._cond:
+            self._pending -= 1
+            self._cond.notify_all()
+        self._slots.release()
+
+    def _finish(self, parsed: ParseResult):
+        with self._cond:
+            self._done.append(parsed)
+            self._cond.notify_all()
+
+
+def parse_many(urls: Iterable[str], pipeline: ParsePipeline, concurrency: int = CrawlerPoolConfig.size,
+               **crawl_kwargs) -> Iterator[ParseResult]:
+    """
+    使用多个浏览器并发访问urls，由pipeline解析，按解析完成的顺序逐个返回ParseResult。
+    解析跟不上时submit阻塞，crawl_many不再取出新的网址，浏览器等待。
+    :param urls: 网址的可迭代对象
+    :param pipeline: ParsePipeline，不会在结束后关闭它
+    :param concurrency: 并发数（浏览器数量）
+    :param crawl_kwargs: 传递给crawl_many的参数，如pool、crawler_cls、key_msg、retries
+    """
+    for result in crawl_many(urls, concurrency=concurrency, **crawl_kwargs):
+        pipeline.submit(result)
+        yield from pipeline.results()
+    yield from pipeline.results(wait=True)
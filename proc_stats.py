@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/19 00:10
+# @Author  : Histranger
+# @File    : proc_stats.py
+# @Software: PyCharm
+"""
+Process-tree memory statistics read from /proc, e.g. the RSS of chromedriver plus all Chrome processes,
+and host-wide load average and available memory.
+非Linux系统上没有/proc，函数返回None或空列表。
+"""
+import os
+from pathlib import Path
+from typing import *
+
+PROC = Path('/proc')
+_PAGE_SIZE: int = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def _children_map() -> Dict[int, List[int]]:
+    children: Dict[int, List[int]] = {}
+    for entry in PROC.glob('[0-9]*'):
+        try:
+            stat = (entry / 'stat').read_text()
+        except OSError:
+            continue
+        # comm可能包含空格和括号，ppid在最后一个')'之后的第二个字段
+        ppid = int(stat.rpartition(')')[2].split()[1])
+        children.setdefault(ppid, []).append(int(entry.name))
+    return children
+
+
+def process_tree(pid: int) -> List[int]:
+    """
+    :return: pid及其所有子孙进程
+    """
+    if not PROC.exists():
+        return []
+    children = _children_map()
+    tree, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        tree.append(current)
+        stack.extend(children.get(current, []))
+    return tree
+
+
+def rss_bytes(pid: int) -> Optional[int]:
+    """
+    :return: 进程的RSS，进程不存在时返回None
+    """
+    try:
+        return int((PROC / str(pid) / 'statm').read_text().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def tree_rss_bytes(pid: int) -> Optional[int]:
+    """
+    :return: pid及其所有子孙进程的RSS之和，没有/proc时返回None
+    """
+    if not PROC.exists():
+        return None
+    return sum(_ for _ in map(rss_bytes, process_tree(pid)) if _)
+
+
+def mem_available() -> Optional[int]:
+    """
+    :return: /proc/meminfo中的MemAvailable(字节)，即不换页时还能分配的内存，没有/proc时返回None
+    """
+    try:
+        with open(PROC / 'meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) << 10
+    except (OSError, IndexError, ValueError):
+        pass
+    return None
+
+
+def load_per_cpu() -> Optional[float]:
+    """
+    :return: 1分钟平均负载除以CPU数，大于1说明有进程在排队等待CPU，Windows上返回None
+    """
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        return None
@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/19 18:00
+# @Author  : Histranger
+# @File    : profile_template.py
+# @Software: PyCharm
+"""
+A pre-built "golden" user-data-dir, cloned for every new browser.
+
+每个浏览器都从空的user-data-dir启动，首次运行的初始化(Local State、Preferences、First Run等)和组件更新都计入启动时间。
+ProfileTemplate只构建一次模板(关闭组件更新和后台网络)，之后为每个crawler克隆一份：
+文件系统支持时使用reflink(写时复制)；否则只读或原子替换的文件使用硬链接，其余文件复制。副本在close时删除。
+
+>>> template = ProfileTemplate()  # doctest: +SKIP
+>>> with ChromeCrawler(profile_template=template) as cc:  # doctest: +SKIP
+...     cc.try_get('https://etherscan.io')
+"""
+import errno
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import *
+
+from disk_utils import CACHE_DIR, FileLock
+
+PROFILE_TEMPLATE_DIR: Path = CACHE_DIR / 'profile-template'
+
+# 模板和每个副本都使用的参数：关闭组件更新、后台网络和首次运行的界面
+TEMPLATE_FLAGS: List[str] = [
+    '--no-first-run',
+    '--no-default-browser-check',
+    '--disable-component-update',
+    '--disable-background-networking',
+    '--disable-sync',
+    '--disable-default-apps',
+    '--disable-domain-reliability',
+    '--disable-client-side-phishing-detection',
+    '--disable-features=OptimizationHints,MediaRouter,Translate',
+    '--metrics-recording-only',
+    '--password-store=basic',
+    '--use-mock-keychain',
+]
+
+# 构建后删除：进程锁、端口、崩溃报告和缓存
+_VOLATILE = ('SingletonLock', 'SingletonSocket', 'SingletonCookie', 'DevToolsActivePort', 'lockfile', 'Crashpad',
+             'BrowserMetrics', 'Cache', 'Code Cache', 'GPUCache', 'ShaderCache', 'GrShaderCache', 'GraphiteDawnCache',
+             'Sessions', 'Session Storage')
+
+# Chrome通过临时文件+rename写入这些文件，不会原地修改，可以硬链接
+_REPLACED_FILES = ('Local State', 'Preferences', 'Secure Preferences', 'First Run', 'Last Version', 'Last Browser')
+
+# 配置文件目录，其中的sqlite、leveldb日志等会被原地修改
+_PROFILE_DIRS = ('Default', 'Guest Profile', 'System Profile')
+
+_MARKER = '.template.json'
+
+_FICLONE = 0x40049409  # linux/fs.h
+
+
+@dataclass
+class ProfileTemplateConfig:
+    settle: float = 2.0  # 首次启动后等待初始化写入磁盘的时间(s)
+    build_timeout: float = 60.0
+    lock_timeout: float = 300.0  # 等待其他进程构建模板的时间(s)
+
+
+@dataclass
+class CloneStats:
+    files: int = 0
+    bytes: int = 0
+    reflinked: int = 0
+    hardlinked: int = 0
+    copied: int = 0
+    seconds: float = 0.0
+
+
+def chrome_version(binary_path: str) -> str:
+    try:
+        return subprocess.run([binary_path, '--version'], capture_output=True, text=True, timeout=30).stdout.strip()
+    except (OSError, subprocess.SubprocessError) as e:
+        logging.warning(f"get chrome version failed. | {repr(e)}")
+        return ''
+
+
+def _reflink(src: str, dst: str):
+    if not platform.system() == 'Linux':
+        raise OSError(errno.EOPNOTSUPP, "reflink is only supported on linux.")
+    import fcntl
+    with open(src, 'rb') as f_src, open(dst, 'wb') as f_dst:
+        fcntl.ioctl(f_dst.fileno(), _FICLONE, f_src.fileno())
+
+
+def _hardlink_safe(rel: Path) -> bool:
+    """
+    只读或原子替换的文件：leveldb的.ldb表文件写入后不再修改，组件目录按版本号写入后只读
+    """
+    if rel.name in _REPLACED_FILES or rel.suffix == '.ldb':
+        return True
+    # 如ZxcvbnData/3/passwords.txt
+    return len(rel.parts) > 2 and rel.parts[0] not in _PROFILE_DIRS
+
+
+def clone_tree(src: Union[str, Path], dst: Union[str, Path], reflink: bool = True,
+               hardlink: bool = True) -> CloneStats:
+    """
+    克隆目录：reflink失败(如ext4、跨文件系统)后不再尝试；硬链接只用于_hardlink_safe的文件，失败后复制
+    :param src: 源目录
+    :param dst: 目标目录，必须已经存在
+    """
+    t0 = time.perf_counter()
+    stats = CloneStats()
+    src = Path(src)
+    for root, dirs, files in os.walk(src):
+        rel_root = Path(root).relative_to(src)
+        for name in dirs:
+            os.makedirs(Path(dst) / rel_root / name, exist_ok=True)
+        for name in files:
+            if rel_root == Path('.') and name == _MARKER:
+                continue
+            rel = rel_root / name
+            source, target = os.path.join(root, name), os.path.join(dst, rel)
+            if os.path.islink(source):
+                os.symlink(os.readlink(source), target)
+                continue
+            stats.files += 1
+            stats.bytes += os.path.getsize(source)
+            if reflink:
+                try:
+                    _reflink(source, target)
+                    stats.reflinked += 1
+                    continue
+                except OSError as e:
+                    if e.errno not in (errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL, errno.ENOSYS):
+                        raise
+                    reflink = False
+                    os.unlink(target)
+            if hardlink and _hardlink_safe(rel):
+                try:
+                    os.link(source, target)
+                    stats.hardlinked += 1
+                    continue
+                except OSError:
+                    hardlink = False
+            shutil.copy2(source, target)
+            stats.copied += 1
+    stats.seconds = time.perf_counter() - t0
+    return stats
+
+
+def _pid_alive(pid: int) -> bool:
+    if os.name == 'nt':
+        return True  # windows上os.kill(pid, 0)会结束进程，不清理
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ProfileTemplate:
+    """
+    Build a tuned user-data-dir once per Chrome version, and clone it cheaply for each browser.
+
+    多个进程共享同一个模板，构建时持有排他的文件锁，克隆时持有共享锁，不会复制到替换了一半的模板；
+    副本与模板在同一个目录下，以便使用reflink或硬链接。
+    """
+
+    def __init__(self, path: Union[str, Path] = PROFILE_TEMPLATE_DIR, binary_path: Optional[str] = None,
+                 flags: Sequence[str] = tuple(TEMPLATE_FLAGS), reflink: bool = True, hardlink: bool = True):
+        """
+        :param path: 模板目录，副本在path.parent/profiles下
+        :param binary_path: 构建模板使用的Chrome，默认见cdp_crawler.find_chrome_binary，应与crawler使用的版本相同
+        :param flags: 模板和副本使用的Chrome参数，见TEMPLATE_FLAGS
+        :param reflink: 是否尝试reflink
+        :param hardlink: 是否对只读或原子替换的文件使用硬链接
+        """
+        self.path = Path(path)
+        self.clones_dir = self.path.parent / 'profiles'
+        self.binary_path = binary_path
+        self.flags = list(flags)
+        self.reflink = reflink
+        self.hardlink = hardlink
+        self.last_clone: Optional[CloneStats] = None
+        self._checked: bool = False  # 每个实例只检查一次Chrome版本
+
+    def __repr__(self):
+        return f"ProfileTemplate(path={self.path})"
+
+    @property
+    def ready(self) -> bool:
+        return (self.path / _MARKER).exists()
+
+    def info(self) -> Optional[Dict]:
+        """
+        :return: 构建时记录的Chrome版本、参数和时间
+        """
+        try:
+            return json.loads((self.path / _MARKER).read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+
+    def ensure(self):
+        """
+        模板不存在、Chrome版本或参数变化时构建
+        """
+        if self._checked and self.ready:
+            return
+        if not self._up_to_date():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with FileLock(self._lock_path, timeout=ProfileTemplateConfig.lock_timeout):
+                if not self._up_to_date():  # 其他进程可能已经构建完成
+                    self.build()
+        self._checked = True
+
+    def build(self):
+        """
+        启动一次Chrome完成首次运行的初始化，正常关闭后删除易变的文件，原子地替换旧模板
+        """
+        binary_path = self._binary_path()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        building = tempfile.mkdtemp(prefix=f'.{self.path.name}-', dir=self.path.parent)
+        t0 = time.perf_counter()
+        try:
+            self._run_once(binary_path, building)
+            for root, dirs, files in os.walk(building, topdown=True):
+                for name in [_ for _ in dirs if _.startswith(_VOLATILE)]:
+                    shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+                    dirs.remove(name)
+                for name in files:
+                    if name.startswith(_VOLATILE):
+                        os.unlink(os.path.join(root, name))
+            info = {'version': chrome_version(binary_path), 'flags': self.flags, 'built_at': time.time()}
+            Path(building, _MARKER).write_text(json.dumps(info), encoding='utf-8')
+            # 已有的副本是独立的文件或链接，删除旧模板不影响它们
+            old = None
+            if self.path.exists():
+                old = tempfile.mkdtemp(prefix=f'.{self.path.name}-old-', dir=self.path.parent)
+                os.replace(self.path, Path(old) / 'template')
+            os.replace(building, self.path)
+            if old:
+                shutil.rmtree(old, ignore_errors=True)
+        except BaseException:
+            shutil.rmtree(building, ignore_errors=True)
+            raise
+        logging.info(f"{self!r} built in {time.perf_counter() - t0:.1f}s. | {info['version']}")
+
+    def clone(self) -> str:
+        """
+        :return: 新副本的路径，作为--user-data-dir使用，用完后调用remove_clone
+        """
+        self.ensure()
+        self.clones_dir.mkdir(parents=True, exist_ok=True)
+        self.prune_stale_clones()
+        dst = tempfile.mkdtemp(prefix=f'clone-{os.getpid()}-', dir=self.clones_dir)
+        try:
+            # 其他进程重新构建时会替换模板目录，等待替换完成后再复制
+            with FileLock(self._lock_path, timeout=ProfileTemplateConfig.lock_timeout, shared=True):
+                self.last_clone = clone_tree(self.path, dst, reflink=self.reflink, hardlink=self.hardlink)
+        except BaseException:
+            shutil.rmtree(dst, ignore_errors=True)
+            raise
+        logging.debug(f"clone profile[{dst}]. | {self.last_clone}")
+        return dst
+
+    @property
+    def _lock_path(self) -> Path:
+        return self.path.parent / f'{self.path.name}.lock'
+
+    def remove_clone(self, path: Union[str, Path]):
+        shutil.rmtree(path, ignore_errors=True)
+
+    def prune_stale_clones(self) -> int:
+        """
+        删除已经退出的进程留下的副本(如被kill时来不及close)
+        :return: 删除的副本数
+        """
+        removed = 0
+        if not self.clones_dir.exists():
+            return removed
+        for clone in self.clones_dir.iterdir():
+            try:
+                pid = int(clone.name.split('-')[1])
+            except (IndexError, ValueError):
+                continue
+            if not _pid_alive(pid):
+                shutil.rmtree(clone, ignore_errors=True)
+                removed += 1
+        return removed
+
+    def _up_to_date(self) -> bool:
+        info = self.info()
+        if info is None or info.get('flags') != self.flags:
+            return False
+        return info.get('version') == chrome_version(self._binary_path())
+
+    def _binary_path(self) -> str:
+        if self.binary_path is None:
+            from cdp_crawler import find_chrome_binary  # cdp_crawler依赖crawler_base
+            self.binary_path = find_chrome_binary()
+        assert self.binary_path, "chrome not found, use param binary_path or env CHROME_PATH."
+        return self.binary_path
+
+    def _run_once(self, binary_path: str, user_data_dir: str):
+        process = subprocess.Popen([binary_path, f'--user-data-dir={user_data_dir}', '--headless=new', '--no-sandbox',
+                                    '--disable-gpu', '--remote-debugging-port=0', *self.flags, 'about:blank'],
+                                   stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            port_file = Path(user_data_dir) / 'DevToolsActivePort'
+            deadline = time.monotonic() + ProfileTemplateConfig.build_timeout
+            while not port_file.exists():
+                if process.poll() is not None:
+                    raise RuntimeError(f"chrome exited with code {process.returncode}.")
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"chrome not ready after {ProfileTemplateConfig.build_timeout}s.")
+                time.sleep(0.05)
+            time.sleep(ProfileTemplateConfig.settle)
+        finally:
+            # SIGTERM时Chrome会正常关闭并写入Preferences
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
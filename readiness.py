@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 16:00
+# @Author  : Histranger
+# @File    : readiness.py
+# @Software: PyCharm
+import copy
+import time
+from dataclasses import dataclass
+from typing import *
+
+from selenium.common import TimeoutException, WebDriverException
+
+# 导航前在旧文档上设置该标记，新文档上没有它，避免把旧页面误判为已就绪
+_MARKER = '__crawlerEngineOldDocument'
+_SET_MARKER_JS = f"window.{_MARKER} = true;"
+_NEW_DOCUMENT_JS = f"window.{_MARKER} === undefined"
+
+# 不依赖CDP事件时，用JS判断的生命周期事件
+_LIFECYCLE_JS: Dict[str, str] = {
+    'DOMContentLoaded': "document.readyState !== 'loading'",
+    'load': "document.readyState === 'complete'",
+    'firstContentfulPaint': "performance.getEntriesByName('first-contentful-paint').length > 0",
+}
+
+
+@dataclass
+class ReadyConfig:
+    timeout: float = 10.0
+    poll: float = 0.05
+
+
+class ReadyCondition:
+    """
+    A page readiness condition, checked by BaseCrawler.wait_ready until it holds.
+
+    start在导航前调用(navigation=True)或在等待页面上的变化前调用(navigation=False)，
+    check返回True表示页面已就绪，stop在等待结束后调用。
+    start到stop之间的状态保存在对象上，同一个条件被多个crawler线程共享时（如crawl_many(ready=...)），
+    每次等待都要使用fresh()返回的副本，BaseCrawler.try_get和wait_ready会自动这样做。
+    """
+    navigation: bool = False
+
+    def fresh(self) -> 'ReadyCondition':
+        """
+        :return: 参数相同、没有等待状态的副本
+        """
+        condition = copy.copy(self)
+        condition._reset()
+        return condition
+
+    def _reset(self):
+        self.navigation = False
+
+    def start(self, crawler, navigation: bool = True):
+        self.navigation = navigation
+        if navigation:
+            try:
+                crawler.driver.execute_script(_SET_MARKER_JS)
+            except Exception:
+                # 还没有打开过页面，或当前页面不允许执行脚本
+                pass
+
+    def check(self, crawler) -> bool:
+        raise NotImplementedError
+
+    def stop(self, crawler):
+        pass
+
+    def _js(self, crawler, expression: str, *args) -> bool:
+        if self.navigation:
+            expression = f"{_NEW_DOCUMENT_JS} && ({expression})"
+        return bool(crawler.driver.execute_script(f"return !!({expression});", *args))
+
+
+class Lifecycle(ReadyCondition):
+    """
+    Wait for a CDP Page.lifecycleEvent of the main frame, e.g.
+    DOMContentLoaded、load、firstContentfulPaint、firstMeaningfulPaint、networkAlmostIdle、networkIdle。
+    crawler未开启CDP事件时，仅支持DOMContentLoaded、load、firstContentfulPaint，通过JS判断。
+    """
+
+    def __init__(self, name: str = 'DOMContentLoaded'):
+        self.name = name
+        self._reset()
+
+    def _reset(self):
+        super()._reset()
+        self._seen: Set[str] = set()
+        self._frame_id: Optional[str] = None
+        self._events = None
+
+    def __repr__(self):
+        return f"Lifecycle({self.name!r})"
+
+    def start(self, crawler, navigation: bool = True):
+        super().start(crawler, navigation)
+        self._events = crawler.cdp_events
+        if self._events is None:
+            assert self.name in _LIFECYCLE_JS, \
+                f"lifecycle event [{self.name}] needs CDP events, use page_load_strategy='eager' or 'none'."
+            return
+        self._events.poll()
+        self._seen.clear()
+        self._frame_id = crawler.driver.execute_cdp_cmd('Page.getFrameTree', {})['frameTree']['frame']['id']
+        self._events.subscribe(self._on_event)
+
+    def check(self, crawler) -> bool:
+        if self._events is None:
+            return self._js(crawler, _LIFECYCLE_JS[self.name])
+        self._events.poll()
+        if self.name in self._seen:
+            return True
+        # 不是导航时，事件可能在start之前已经发生过
+        return not self.navigation and self.name in _LIFECYCLE_JS and self._js(crawler, _LIFECYCLE_JS[self.name])
+
+    def stop(self, crawler):
+        if self._events is not None:
+            self._events.unsubscribe(self._on_event)
+            self._events = None
+
+    def _on_event(self, method: str, params: Dict):
+        if method != 'Page.lifecycleEvent' or params.get('frameId') != self._frame_id:
+            return
+        if params.get('name') == 'init':
+            self._seen.clear()
+        self._seen.add(params.get('name'))
+
+
+class NetworkIdle(ReadyCondition):
+    """
+    Wait until at most `max_inflight` requests are pending for `idle_ms` milliseconds. Needs CDP events.
+    """
+
+    def __init__(self, idle_ms: int = 500, max_inflight: int = 0):
+        self.idle_ms = idle_ms
+        self.max_inflight = max_inflight
+        self._reset()
+
+    def _reset(self):
+        super()._reset()
+        self._inflight: Set[str] = set()
+        self._requests: int = 0
+        self._last_activity: float = 0.0
+        self._events = None
+
+    def __repr__(self):
+        return f"NetworkIdle(idle_ms={self.idle_ms}, max_inflight={self.max_inflight})"
+
+    def start(self, crawler, navigation: bool = True):
+        super().start(crawler, navigation)
+        assert crawler.cdp_events is not None, \
+            "NetworkIdle needs CDP events, use page_load_strategy='eager' or 'none'."
+        self._events = crawler.cdp_events
+        self._events.poll()
+        self._inflight.clear()
+        self._requests = 0
+        self._last_activity = time.monotonic()
+        self._events.subscribe(self._on_event)
+
+    def check(self, crawler) -> bool:
+        self._events.poll()
+        # 导航时至少要看到文档本身的请求
+        if self.navigation and not self._requests:
+            return False
+        return len(self._inflight) <= self.max_inflight and \
+            (time.monotonic() - self._last_activity) * 1000 >= self.idle_ms
+
+    def stop(self, crawler):
+        if self._events is not None:
+            self._events.unsubscribe(self._on_event)
+            self._events = None
+
+    def _on_event(self, method: str, params: Dict):
+        if method == 'Network.requestWillBeSent':
+            self._requests += 1
+            self._inflight.add(params.get('requestId'))
+        elif method in ('Network.loadingFinished', 'Network.loadingFailed'):
+            self._inflight.discard(params.get('requestId'))
+        else:
+            return
+        self._last_activity = time.monotonic()
+
+
+class Selector(ReadyCondition):
+    """
+    Wait until a CSS selector matches an element. 通过JS判断，不受implicitly_wait影响。
+    """
+
+    def __init__(self, css: str, visible: bool = False):
+        """
+        :param css: CSS选择器
+        :param visible: 是否要求元素可见
+        """
+        self.css = css
+        self.visible = visible
+
+    def __repr__(self):
+        return f"Selector({self.css!r}, visible={self.visible})"
+
+    def check(self, crawler) -> bool:
+        if self.visible:
+            return self._js(crawler, "(e => e && e.getClientRects().length > 0)"
+                                     "(document.querySelector(arguments[0]))", self.css)
+        return self._js(crawler, "document.querySelector(arguments[0]) !== null", self.css)
+
+
+def wait_until(crawler, condition: ReadyCondition, timeout: float = ReadyConfig.timeout,
+               poll: float = ReadyConfig.poll) -> float:
+    """
+    轮询condition直到其成立，condition.start需要已经被调用过
+    :return: 等待的时间(s)，超时抛出TimeoutException
+    """
+    t0 = time.monotonic()
+    error: Optional[WebDriverException] = None
+    try:
+        while True:
+            try:
+                if condition.check(crawler):
+                    break
+            except TimeoutException:
+                raise
+            except WebDriverException as e:
+                # 导航过程中文档被替换时，执行脚本可能会失败
+                error = e
+            if time.monotonic() - t0 >= timeout:
+                raise TimeoutException(f"{condition!r} not ready after {timeout}s. | {repr(error)}")
+            time.sleep(poll)
+    finally:
+        condition.stop(crawler)
+    return time.monotonic() - t0
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 13:20
+# @Author  : Histranger
+# @File    : resource_blocker.py
+# @Software: PyCharm
+import logging
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import *
+
+from cdp_events import CDPEventLog
+
+
+def _suffixes(*extensions: str) -> List[str]:
+    """
+    >>> _suffixes('png')
+    ['*.png', '*.png?*']
+    """
+    # 静态资源的url常带有版本号等查询参数，如logo.png?v=2
+    return [_ for ext in extensions for _ in (f'*.{ext}', f'*.{ext}?*')]
+
+
+# 资源类别 ==> Network.setBlockedURLs的通配符
+# 按url匹配，没有扩展名的资源(如CDN的图片接口)只能通过自定义通配符屏蔽
+RESOURCE_PATTERNS: Dict[str, List[str]] = {
+    'image': _suffixes('png', 'jpg', 'jpeg', 'gif', 'webp', 'avif', 'svg', 'ico', 'bmp'),
+    'font': _suffixes('woff', 'woff2', 'ttf', 'otf', 'eot') + ['*fonts.gstatic.com/*'],
+    'media': _suffixes('mp4', 'webm', 'mp3', 'ogg', 'wav', 'm4a', 'mov', 'avi', 'm3u8'),
+    'stylesheet': _suffixes('css') + ['*fonts.googleapis.com/css*'],
+    'tracker': ['*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*', '*googlesyndication.com*',
+                '*facebook.net*', '*hotjar.com*', '*clarity.ms*', '*scorecardresearch.com*', '*quantserve.com*'],
+}
+
+# 预设 ==> 资源类别
+BLOCK_PRESETS: Dict[str, List[str]] = {
+    'no-media': ['image', 'media'],
+    'no-trackers': ['tracker'],
+    'text-only': ['image', 'font', 'media', 'stylesheet', 'tracker'],
+}
+
+# 被屏蔽的请求没有响应，无法得知真实大小，只能按资源类型粗略估计节省的流量(bytes)
+ESTIMATED_BYTES: Dict[str, int] = {
+    'Image': 30_000,
+    'Font': 40_000,
+    'Media': 500_000,
+    'Stylesheet': 15_000,
+    'Script': 25_000,
+}
+ESTIMATED_BYTES_DEFAULT: int = 5_000
+
+
+def expand_block_patterns(block: Union[str, Sequence[str]]) -> List[str]:
+    """
+    把预设名、资源类别和自定义通配符展开为通配符列表
+
+    >>> expand_block_patterns('no-media')[:3]
+    ['*.png', '*.png?*', '*.jpg']
+    >>> expand_block_patterns(['font', '*/ads/*'])[-1]
+    '*/ads/*'
+    """
+    if isinstance(block, str):
+        block = [block]
+
+    patterns: List[str] = []
+    for item in block:
+        for category in BLOCK_PRESETS.get(item, [item]):
+            for pattern in RESOURCE_PATTERNS.get(category, [category]):
+                if pattern not in patterns:
+                    patterns.append(pattern)
+    return patterns
+
+
+@dataclass
+class BlockStats:
+    url: str = ""
+    blocked: int = 0
+    bytes_saved: int = 0  # 估计值，见ESTIMATED_BYTES
+    by_type: Counter = field(default_factory=Counter)
+
+    def merge(self, other: 'BlockStats'):
+        self.blocked += other.blocked
+        self.bytes_saved += other.bytes_saved
+        self.by_type.update(other.by_type)
+
+
+class ResourceBlocker:
+    """
+    Block images, fonts, media, trackers and custom URL patterns through CDP `Network.setBlockedURLs`.
+
+    被屏蔽的请求以Network.loadingFailed(blockedReason)事件出现在performance日志中，
+    ResourceBlocker据此统计每个页面屏蔽的请求数和估计节省的流量。
+    """
+
+    def __init__(self, block: Union[str, Sequence[str]]):
+        """
+        :param block: 预设名(见BLOCK_PRESETS)、资源类别(见RESOURCE_PATTERNS)或自定义通配符，或它们的列表
+        """
+        self.patterns: List[str] = expand_block_patterns(block)
+        assert self.patterns, "block must not be empty."
+
+        self.page: BlockStats = BlockStats()  # 当前页面
+        self.total: BlockStats = BlockStats()  # 所有页面
+        self._events: Optional[CDPEventLog] = None
+
+    def __repr__(self):
+        return f"ResourceBlocker(patterns={len(self.patterns)})"
+
+    def attach(self, driver, events: CDPEventLog):
+        """
+        在driver上开启屏蔽，events需要使用开启了performance日志的driver创建
+        """
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': self.patterns})
+        self._events = events
+        self._events.subscribe(self._on_event)
+        logging.info(f"{self!r} attached.")
+
+    def start_page(self, url: str):
+        if self._events:
+            self._events.poll()
+        self.page = BlockStats(url=url)
+
+    def finish_page(self) -> BlockStats:
+        if self._events:
+            self._events.poll()
+        self.total.merge(self.page)
+        return self.page
+
+    def _on_event(self, method: str, params: Dict):
+        if method != 'Network.loadingFailed' or not params.get('blockedReason'):
+            return
+        type_ = params.get('type', 'Other')
+        self.page.blocked += 1
+        self.page.by_type[type_] += 1
+        self.page.bytes_saved += ESTIMATED_BYTES.get(type_, ESTIMATED_BYTES_DEFAULT)
@@ -0,0 +1,364 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/19 19:30
+# @Author  : Histranger
+# @File    : retry_policy.py
+# @Software: PyCharm
+"""
+Failure-classifying retry policy with per-host circuit breakers for try_get.
+
+原来的try_get对所有失败都以固定的interval重试retries次，DNS解析失败、net::ERR_错误页、超时
+和缺少key_msg没有区别，已经宕机的host每次都要占用浏览器retries × page_load_timeout。
+
+RetryPolicy先把每次失败归类（见FAILURE_CLASSES），再按该类的RetryRule决定是否重试以及
+指数退避加抖动的等待时间；CircuitBreakers按host统计连续的“host不可达”类失败，达到阈值后
+熔断（open），熔断期间try_get立即返回outcome='circuit_open'且不使用浏览器，冷却后放行一次
+探测（half_open），探测成功则恢复（closed），失败则再次熔断。
+
+每次尝试都记录在TryGetResult.attempts中（AttemptRecord）。
+
+>>> policy = RetryPolicy(breakers=CircuitBreakers(threshold=3, cooldown=60))  # doctest: +SKIP
+>>> result = cc.try_get('https://etherscan.io', key_msg='Balance', retries=5, policy=policy)  # doctest: +SKIP
+>>> [(_.failure, round(_.delay, 2)) for _ in result.attempts]  # doctest: +SKIP
+[('connection', 0.83), ('connection', 1.71), (None, 0.0)]
+"""
+import logging
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import *
+from urllib.parse import urlsplit
+
+from metrics import REGISTRY
+
+FAILURES_TOTAL = REGISTRY.counter('crawler_failures_total', "Failed page load attempts by failure class.", ['failure'])
+BREAKER_TRANSITIONS_TOTAL = REGISTRY.counter('crawler_breaker_transitions_total',
+                                             "Circuit breaker state changes by new state.", ['state'])
+
+# 失败类别：
+# dns          域名解析失败，host大概率不存在或DNS故障
+# connection   连接被拒绝、重置、超时等，host不可达
+# timeout      页面加载或就绪条件超时
+# net_error    其他net::ERR_错误，如证书错误、ERR_ABORTED
+# network      本机网络问题（断网、代理），与host无关
+# webdriver    浏览器或chromedriver自身的错误
+# err_msg      页面中有err_msg
+# key_msg_missing  页面中没有key_msg
+FAILURE_CLASSES = ('dns', 'connection', 'timeout', 'net_error', 'network', 'webdriver', 'err_msg', 'key_msg_missing')
+
+_NET_ERROR = re.compile(r'\bERR_[A-Z0-9_]{3,}')
+_DNS_ERRORS = {'ERR_NAME_NOT_RESOLVED', 'ERR_ICANN_NAME_COLLISION'}
+_CONNECTION_ERRORS = {'ERR_CONNECTION_REFUSED', 'ERR_CONNECTION_RESET', 'ERR_CONNECTION_CLOSED',
+                      'ERR_CONNECTION_FAILED', 'ERR_CONNECTION_TIMED_OUT', 'ERR_CONNECTION_ABORTED',
+                      'ERR_ADDRESS_UNREACHABLE', 'ERR_EMPTY_RESPONSE', 'ERR_SSL_PROTOCOL_ERROR'}
+_TIMEOUT_ERRORS = {'ERR_TIMED_OUT'}
+_NETWORK_ERRORS = {'ERR_INTERNET_DISCONNECTED', 'ERR_NETWORK_CHANGED', 'ERR_NETWORK_ACCESS_DENIED',
+                   'ERR_PROXY_CONNECTION_FAILED', 'ERR_TUNNEL_CONNECTION_FAILED', 'ERR_NAME_RESOLUTION_FAILED'}
+
+
+def classify_net_error(code: str) -> str:
+    """
+    >>> classify_net_error('ERR_NAME_NOT_RESOLVED'), classify_net_error('ERR_CERT_DATE_INVALID')
+    ('dns', 'net_error')
+    """
+    if code in _DNS_ERRORS or code.startswith('ERR_DNS_'):
+        return 'dns'
+    if code in _CONNECTION_ERRORS:
+        return 'connection'
+    if code in _TIMEOUT_ERRORS:
+        return 'timeout'
+    if code in _NETWORK_ERRORS:
+        return 'network'
+    return 'net_error'
+
+
+def classify_failure(outcome: Optional[str], msg: str = "", page_source: Optional[str] = None) -> Optional[str]:
+    """
+    :param outcome: TryGetResult.outcome
+    :param msg: TryGetResult.msg，异常时为str(e)
+    :param page_source: 页面快照，Chrome的错误页中有ERR_错误码
+    :return: FAILURE_CLASSES之一，成功时返回None
+
+    >>> classify_failure('webdriver_exception', "Message: unknown error: net::ERR_CONNECTION_REFUSED")
+    'connection'
+    >>> classify_failure('err_msg_hit', "err_msg[ERR_] in page source.", '<div class="error-code">ERR_NAME_NOT_RESOLVED</div>')
+    'dns'
+    """
+    if outcome == 'ok':
+        return None
+    if outcome == 'timeout':
+        return 'timeout'
+    if outcome == 'key_msg_missing':
+        return 'key_msg_missing'
+    if outcome == 'webdriver_exception':
+        match = _NET_ERROR.search(msg)
+        return classify_net_error(match.group()) if match else 'webdriver'
+    # err_msg_hit：默认的err_msg='ERR_'命中的往往是Chrome的错误页
+    match = _NET_ERROR.search(page_source or '')
+    return classify_net_error(match.group()) if match else 'err_msg'
+
+
+@dataclass
+class RetryRule:
+    """
+    一类失败的重试规则，第n次该类失败后等待min(cap, base * multiplier ** (n - 1))，再减去其中随机的jitter比例
+    """
+    max_attempts: int = 3  # 该类失败最多出现的次数，达到后不再重试
+    base: float = 0.2  # 第一次重试前的等待时间(s)
+    cap: float = 10.0  # 等待时间上限(s)
+    multiplier: float = 2.0
+    jitter: float = 0.5  # 0不抖动，1为full jitter
+    trips_breaker: bool = False  # 是否计入host的熔断器
+
+
+# host不可达的失败计入熔断器，页面内容的失败说明host可以访问
+DEFAULT_RULES: Dict[str, RetryRule] = {
+    'dns': RetryRule(max_attempts=2, base=2.0, cap=10.0, trips_breaker=True),
+    'connection': RetryRule(max_attempts=3, base=1.0, cap=10.0, trips_breaker=True),
+    'timeout': RetryRule(max_attempts=2, base=1.0, cap=10.0, trips_breaker=True),
+    'net_error': RetryRule(max_attempts=2, base=0.5, cap=5.0, trips_breaker=True),
+    'network': RetryRule(max_attempts=3, base=2.0, cap=30.0),
+    'webdriver': RetryRule(max_attempts=3, base=0.2, cap=2.0),
+    'err_msg': RetryRule(max_attempts=3, base=0.5, cap=5.0),
+    'key_msg_missing': RetryRule(max_attempts=3, base=0.2, cap=5.0),
+}
+
+
+@dataclass
+class AttemptRecord:
+    """
+    try_get的一次尝试
+    """
+    index: int  # 从1开始
+    outcome: str  # 同TryGetResult.outcome
+    failure: Optional[str]  # FAILURE_CLASSES之一，成功时为None
+    msg: str
+    elapsed: float  # 本次尝试用时(s)
+    delay: float = 0.0  # 本次尝试后的等待时间(s)
+
+
+@dataclass
+class CircuitBreakerConfig:
+    threshold: int = 3  # 连续多少次host不可达后熔断
+    cooldown: float = 60.0  # 熔断后多久放行一次探测(s)
+    max_cooldown: float = 600.0  # 探测失败时冷却时间翻倍，直到该上限(s)
+
+
+class CircuitBreaker:
+    """
+    单个host的熔断器：closed ==> open ==> half_open ==> closed/open
+
+    >>> breaker = CircuitBreaker(threshold=2, cooldown=10)
+    >>> breaker.failure(now=0); breaker.failure(now=1); breaker.state
+    'open'
+    >>> breaker.allow(now=5), breaker.retry_in(now=5)
+    (False, 6)
+    >>> breaker.allow(now=11), breaker.allow(now=11), breaker.state
+    (True, False, 'half_open')
+    >>> breaker.success(); breaker.state
+    'closed'
+    """
+
+    def __init__(self, threshold: int = CircuitBreakerConfig.threshold, cooldown: float = CircuitBreakerConfig.cooldown,
+                 max_cooldown: float = CircuitBreakerConfig.max_cooldown):
+        assert threshold >= 1 and cooldown > 0, "threshold must be >= 1 and cooldown positive."
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max(max_cooldown, cooldown)
+        self.state: str = 'closed'
+        self.failures: int = 0  # 连续失败次数
+        self.opened_at: float = 0.0
+        self.current_cooldown: float = cooldown
+        self._probing: bool = False
+
+    def __repr__(self):
+        return f"CircuitBreaker(state={self.state!r}, failures={self.failures}, cooldown={self.current_cooldown})"
+
+    def _transition(self, state: str):
+        if state != self.state:
+            self.state = state
+            BREAKER_TRANSITIONS_TOTAL.labels(state=state).inc()
+
+    def allow(self, now: Optional[float] = None) -> bool:
+        """
+        :return: 是否可以访问该host；冷却结束后只放行一次探测，直到探测结果被记录
+        """
+        now = time.monotonic() if now is None else now
+        if self.state == 'closed':
+            return True
+        if self.state == 'open' and now - self.opened_at >= self.current_cooldown:
+            self._transition('half_open')
+        if self.state == 'half_open' and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def retry_in(self, now: Optional[float] = None) -> float:
+        """
+        :return: 距离下一次探测的时间(s)，探测进行中时为0
+        """
+        if self.state != 'open':
+            return 0.0
+        now = time.monotonic() if now is None else now
+        return max(self.opened_at + self.current_cooldown - now, 0.0)
+
+    def success(self):
+        self.failures = 0
+        self._probing = False
+        self.current_cooldown = self.cooldown
+        self._transition('closed')
+
+    def failure(self, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        self.failures += 1
+        if self.state == 'half_open':
+            # 探测失败，冷却时间翻倍
+            self.current_cooldown = min(self.current_cooldown * 2, self.max_cooldown)
+        elif self.state == 'closed' and self.failures < self.threshold:
+            return
+        self._probing = False
+        self.opened_at = now
+        self._transition('open')
+
+    def release(self):
+        """
+        放弃探测（如调用方出错），下一个请求可以重新探测
+        """
+        self._probing = False
+
+
+class CircuitBreakers:
+    """
+    按host（urlsplit(url).netloc）的熔断器，多个crawler线程共享
+    """
+
+    def __init__(self, threshold: int = CircuitBreakerConfig.threshold, cooldown: float = CircuitBreakerConfig.cooldown,
+                 max_cooldown: float = CircuitBreakerConfig.max_cooldown):
+        """
+        :param threshold: 连续多少次host不可达后熔断
+        :param cooldown: 熔断后多久放行一次探测(s)
+        :param max_cooldown: 探测失败时冷却时间翻倍，直到该上限(s)
+        """
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def __repr__(self):
+        return f"CircuitBreakers(hosts={len(self._breakers)}, open={self.open_hosts()})"
+
+    def _get(self, host: str) -> CircuitBreaker:
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = self._breakers[host] = CircuitBreaker(self.threshold, self.cooldown, self.max_cooldown)
+        return breaker
+
+    def get(self, host: str) -> CircuitBreaker:
+        with self._lock:
+            return self._get(host)
+
+    def allow(self, host: str, now: Optional[float] = None) -> Tuple[bool, float]:
+        """
+        :return: (是否可以访问, 不可以时距离下一次探测的时间(s))
+        """
+        with self._lock:
+            breaker = self._get(host)
+            if breaker.allow(now):
+                return True, 0.0
+            return False, breaker.retry_in(now)
+
+    def record(self, host: str, ok: bool, now: Optional[float] = None):
+        """
+        :param ok: host是否可以访问，页面内容不符合要求也算可以访问
+        """
+        with self._lock:
+            breaker = self._get(host)
+            state = breaker.state
+            if ok:
+                breaker.success()
+            else:
+                breaker.failure(now)
+            if breaker.state != state:
+                logging.info(f"host[{host}] circuit {state} ==> {breaker.state}.")
+
+    def release(self, host: str):
+        with self._lock:
+            self._get(host).release()
+
+    def open_hosts(self) -> List[str]:
+        with self._lock:
+            return [host for host, breaker in self._breakers.items() if breaker.state != 'closed']
+
+
+class RetryPolicy:
+    """
+    按失败类别决定是否重试、等待多久，并维护host的熔断器；可以在多个crawler之间共享。
+    try_get的retries仍是总尝试次数的上限，interval被RetryRule的退避时间代替。
+    """
+
+    def __init__(self, rules: Optional[Dict[str, RetryRule]] = None, breakers: Optional[CircuitBreakers] = None,
+                 budget: Optional[float] = None, rng: Optional[random.Random] = None):
+        """
+        :param rules: 失败类别 ==> RetryRule，覆盖DEFAULT_RULES中的同名类别
+        :param breakers: host的熔断器，None时不熔断
+        :param budget: 单次try_get的总时间预算(s)，下一次重试会超出预算时不再重试
+        :param rng: 抖动使用的随机数生成器
+        """
+        self.rules = {**DEFAULT_RULES, **(rules or {})}
+        self.breakers = breakers
+        self.budget = budget
+        self.rng = rng or random.Random()
+
+    def __repr__(self):
+        return f"RetryPolicy(rules={list(self.rules)}, breakers={self.breakers!r}, budget={self.budget})"
+
+    def rule(self, failure: str) -> RetryRule:
+        return self.rules.get(failure) or RetryRule()
+
+    def backoff(self, failure: str, count: int) -> float:
+        """
+        :param count: 该类失败已经出现的次数，从1开始
+        :return: 下一次尝试前的等待时间(s)
+        """
+        rule = self.rule(failure)
+        delay = min(rule.cap, rule.base * rule.multiplier ** (count - 1))
+        return delay * (1 - rule.jitter * self.rng.random())
+
+    def next_delay(self, failure: str, count: int, elapsed: float,
+                   retry_after: Optional[float] = None) -> Optional[float]:
+        """
+        :param count: 该类失败已经出现的次数，从1开始
+        :param elapsed: 本次try_get已经用去的时间(s)
+        :param retry_after: 服务器要求等待的时间(s)
+        :return: 下一次尝试前的等待时间(s)，不应重试时返回None
+        """
+        if count >= self.rule(failure).max_attempts:
+            return None
+        delay = max(self.backoff(failure, count), retry_after or 0.0)
+        if self.budget is not None and elapsed + delay >= self.budget:
+            return None
+        return delay
+
+    def allow(self, url: str) -> Tuple[bool, float]:
+        """
+        :return: (是否可以访问url所在的host, 不可以时距离下一次探测的时间(s))
+        """
+        if self.breakers is None:
+            return True, 0.0
+        return self.breakers.allow(urlsplit(url).netloc)
+
+    def record(self, url: str, failure: Optional[str]):
+        """
+        记录一次尝试的结果，计入host的熔断器
+        """
+        if self.breakers is not None:
+            self.breakers.record(urlsplit(url).netloc, failure is None or not self.rule(failure).trips_breaker)
+
+    def release(self, url: str):
+        """
+        尝试没有结果（如调用方出错）时释放探测，见CircuitBreaker.release
+        """
+        if self.breakers is not None:
+            self.breakers.release(urlsplit(url).netloc)
@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 19:00
+# @Author  : Histranger
+# @File    : scheduler.py
+# @Software: PyCharm
+import heapq
+import itertools
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from typing import *
+from urllib.parse import urlsplit
+
+from crawler_base import TryGetResult
+
+
+@dataclass
+class SchedulerConfig:
+    rate: float = 1.0  # 每个host每秒的请求数
+    burst: int = 1  # 令牌桶容量
+    max_per_host: int = 2  # 每个host同时进行的请求数
+    poll: float = 0.1  # crawl_scheduled检查停止信号的间隔(s)
+    max_attempts: int = 3  # crawl_scheduled中被429/503限流的url最多访问的次数
+
+
+class TokenBucket:
+    """
+    >>> bucket = TokenBucket(rate=2, burst=1, now=0)
+    >>> bucket.try_take(now=0), bucket.try_take(now=0.1), bucket.try_take(now=0.5)
+    (True, False, True)
+    >>> bucket.available_at(now=0.5)
+    1.0
+    """
+
+    def __init__(self, rate: float, burst: int = 1, now: Optional[float] = None):
+        assert rate > 0 and burst >= 1, "rate must be positive and burst >= 1."
+        self.rate = rate
+        self.burst = burst
+        self.tokens: float = burst
+        self.updated_at: float = time.monotonic() if now is None else now
+
+    def __repr__(self):
+        return f"TokenBucket(rate={self.rate}, burst={self.burst})"
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_take(self, now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def available_at(self, now: Optional[float] = None) -> float:
+        """
+        :return: 下一个令牌可用的时间
+        """
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        return now if self.tokens >= 1 else now + (1 - self.tokens) / self.rate
+
+
+@dataclass(order=True)
+class Task:
+    priority: int
+    seq: int
+    url: str = field(compare=False)
+    host: str = field(compare=False)
+    payload: Any = field(default=None, compare=False)
+    attempts: int = field(default=0, compare=False)  # 重新加入frontier之前已经访问过的次数
+
+
+@dataclass
+class _Host:
+    bucket: TokenBucket
+    max_inflight: int
+    queue: List[Task] = field(default_factory=list)
+    inflight: int = 0
+    blocked_until: float = 0.0
+
+
+def parse_retry_after(value: Optional[Union[str, float]]) -> Optional[float]:
+    """
+    :param value: Retry-After响应头，秒数或HTTP日期
+    :return: 需要等待的秒数
+
+    >>> parse_retry_after('120')
+    120.0
+    >>> parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT')
+    0.0
+    """
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class PolitenessScheduler:
+    """
+    A priority frontier with per-host token buckets, concurrency caps and Retry-After.
+
+    next总是返回当前可以访问的优先级最高的url（数值越小越优先），某个host的令牌用完、并发已满
+    或处于Retry-After期间时，跳过该host继续调度其他host，浏览器不会因为一个慢host而空闲。
+
+    >>> scheduler = PolitenessScheduler(rate=0.5, max_per_host=1)  # doctest: +SKIP
+    >>> scheduler.add('https://etherscan.io/address/0x...', priority=0)  # doctest: +SKIP
+    >>> for result in crawl_scheduled(scheduler, pool, key_msg='Balance'):  # doctest: +SKIP
+    ...     print(result)
+    """
+
+    def __init__(self, rate: float = SchedulerConfig.rate, burst: int = SchedulerConfig.burst,
+                 max_per_host: int = SchedulerConfig.max_per_host,
+                 host_limits: Optional[Dict[str, Dict]] = None):
+        """
+        :param rate: 每个host每秒的请求数
+        :param burst: 令牌桶容量，即允许的突发请求数
+        :param max_per_host: 每个host同时进行的请求数
+        :param host_limits: 个别host的限制，如{'etherscan.io': {'rate': 0.2, 'max_per_host': 1}}
+        """
+        self.rate = rate
+        self.burst = burst
+        self.max_per_host = max_per_host
+        self.host_limits = host_limits or {}
+
+        self._cond = threading.Condition()
+        self._hosts: Dict[str, _Host] = {}
+        # (队首优先级, 队首序号, host)，队首变化后旧条目作废
+        self._heap: List[Tuple[int, int, str]] = []
+        self._seq = itertools.count()
+        self._pending: int = 0
+        self._inflight: int = 0
+        self._closed: bool = False
+
+    def __repr__(self):
+        return f"PolitenessScheduler(hosts={len(self._hosts)}, pending={self._pending}, inflight={self._inflight})"
+
+    def __len__(self):
+        return self._pending
+
+    @property
+    def finished(self) -> bool:
+        """
+        已关闭，或frontier为空且没有进行中的请求，next不会再返回Task
+        """
+        with self._cond:
+            return self._closed or (not self._pending and not self._inflight)
+
+    def add(self, url: str, priority: int = 0, payload: Any = None):
+        with self._cond:
+            self._push(url, priority, payload)
+
+    def _push(self, url: str, priority: int, payload: Any, attempts: int = 0):
+        """
+        需要持有self._cond
+        """
+        host = urlsplit(url).netloc
+        state = self._hosts.get(host)
+        if state is None:
+            limits = self.host_limits.get(host, {})
+            state = self._hosts[host] = _Host(
+                bucket=TokenBucket(limits.get('rate', self.rate), limits.get('burst', self.burst)),
+                max_inflight=limits.get('max_per_host', self.max_per_host),
+            )
+        task = Task(priority, next(self._seq), url, host, payload, attempts)
+        heapq.heappush(state.queue, task)
+        self._pending += 1
+        if state.queue[0] is task:
+            heapq.heappush(self._heap, (task.priority, task.seq, host))
+        self._cond.notify()
+
+    def close(self):
+        """
+        不再调度新的url，阻塞在next中的调用者返回None
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def next(self, timeout: Optional[float] = None) -> Optional[Task]:
+        """
+        阻塞直到有可以访问的url
+        :return: Task，frontier为空且没有进行中的请求、调度器已关闭或超时时返回None
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._closed or (not self._pending and not self._inflight):
+                    return None
+                task, wake_at = self._pop_eligible(time.monotonic())
+                if task is not None:
+                    return task
+                if deadline is not None:
+                    wake_at = min(wake_at, deadline) if wake_at is not None else deadline
+                    if time.monotonic() >= deadline:
+                        return None
+                self._cond.wait(None if wake_at is None else max(wake_at - time.monotonic(), 0.001))
+
+    def done(self, task: Task, retry_after: Optional[float] = None, requeue: bool = False):
+        """
+        :param task: next返回的Task
+        :param retry_after: host要求等待的时间(s)，期间不会调度该host
+        :param requeue: 是否重新加入frontier，如被限流后在retry_after之后重新访问
+        """
+        with self._cond:
+            if requeue:
+                # 在减少inflight之前加入，调用者不会看到frontier暂时为空而认为已经完成
+                self._push(task.url, task.priority, task.payload, task.attempts + 1)
+            state = self._hosts[task.host]
+            state.inflight -= 1
+            self._inflight -= 1
+            if retry_after:
+                state.blocked_until = max(state.blocked_until, time.monotonic() + retry_after)
+                logging.info(f"host[{task.host}] retry after {retry_after}s.")
+            # 并发槽位被释放，host可能重新可调度
+            if state.queue:
+                heapq.heappush(self._heap, (state.queue[0].priority, state.queue[0].seq, task.host))
+            self._cond.notify_all()
+
+    def _pop_eligible(self, now: float) -> Tuple[Optional[Task], Optional[float]]:
+        """
+        :return: (可以访问的Task, 没有时最早可能可以访问的时间)
+        """
+        deferred: List[Tuple[int, int, str]] = []
+        wake_at: Optional[float] = None
+        task: Optional[Task] = None
+        seen: Set[str] = set()
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            priority, seq, host = entry
+            state = self._hosts[host]
+            # 作废的条目，或同一个host的重复条目
+            if not state.queue or state.queue[0].seq != seq or host in seen:
+                continue
+            seen.add(host)
+            if state.inflight >= state.max_inflight:
+                # done时会重新加入
+                continue
+            if state.blocked_until > now:
+                deferred.append(entry)
+                wake_at = min(wake_at or state.blocked_until, state.blocked_until)
+                continue
+            if not state.bucket.try_take(now):
+                deferred.append(entry)
+                available_at = state.bucket.available_at(now)
+                wake_at = min(wake_at or available_at, available_at)
+                continue
+
+            task = heapq.heappop(state.queue)
+            state.inflight += 1
+            self._inflight += 1
+            self._pending -= 1
+            if state.queue:
+                heapq.heappush(self._heap, (state.queue[0].priority, state.queue[0].seq, host))
+            break
+
+        for entry in deferred:
+            heapq.heappush(self._heap, entry)
+        return task, wake_at
+
+
+def crawl_scheduled(scheduler: PolitenessScheduler, pool, stop_event: Optional[threading.Event] = None,
+                    max_attempts: int = SchedulerConfig.max_attempts, **try_get_kwargs) -> Iterator[TryGetResult]:
+    """
+    按scheduler的调度在pool上访问url，按完成顺序逐个返回TryGetResult。
+    result.retry_after（如HybridFetcher或浏览器遇到429/503时）会暂停调度对应的host，并把url重新加入frontier，
+    等待之后重新访问，最多访问max_attempts次；重新加入的url不返回中间的结果。
+    调度在单独的线程中进行，所有host都在等待令牌时，已完成的结果仍然立即返回。
+    :param scheduler: PolitenessScheduler
+    :param pool: CrawlerPool，并发数即开始时池的大小
+    :param stop_event: 停止信号
+    :param max_attempts: 被限流的url最多访问的次数，之后返回最后一次的结果
+    :param try_get_kwargs: 传递给try_get的参数
+    """
+    assert max_attempts >= 1, "max_attempts must be >= 1."
+    concurrency = pool.size
+    # 进行中和已完成但还未被取走的结果数
+    slots = threading.Semaphore(concurrency)
+    results: queue.Queue = queue.Queue()
+    stop = threading.Event()
+    done = object()
+
+    def _stopped() -> bool:
+        return stop.is_set() or (stop_event is not None and stop_event.is_set())
+
+    def _run(task: Task):
+        result: Optional[TryGetResult] = None
+        try:
+            with pool.checkout() as crawler:
+                result = crawler.try_get(task.url, **try_get_kwargs)
+        except Exception as e:
+            logging.warning(f"crawl url[{task.url}] failed. | {repr(e)}")
+            result = TryGetResult(ok=False, msg=repr(e), url=task.url)
+        finally:
+            retry_after = result.retry_after if result else None
+            requeue = retry_after is not None and task.attempts + 1 < max_attempts
+            scheduler.done(task, retry_after=retry_after, requeue=requeue)
+            # 重新加入的url只释放槽位，不返回结果
+            results.put(None if requeue else result)
+
+    def _feed():
+        try:
+            with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='CrawlScheduled') as executor:
+                while not _stopped():
+                    if not slots.acquire(timeout=SchedulerConfig.poll):
+                        continue
+                    task = scheduler.next(timeout=SchedulerConfig.poll)
+                    if task is None:
+                        slots.release()
+                        if scheduler.finished:
+                            break
+                        continue
+                    executor.submit(_run, task)
+        except Exception as e:
+            logging.warning(f"schedule failed. | {repr(e)}")
+        finally:
+            results.put(done)
+
+    feeder = threading.Thread(target=_feed, name='CrawlScheduledFeeder', daemon=True)
+    feeder.start()
+    try:
+        while (result := results.get()) is not done:
+            slots.release()
+            if result is not None:
+                yield result
+    finally:
+        stop.set()
+        feeder.join()
@@ -0,0 +1,460 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 22:00
+# @Author  : Histranger
+# @File    : segment_store.py
+# @Software: PyCharm
+"""
+Append-only storage of crawled pages in rolling compressed segment files.
+
+目录结构：
+    seg-000001.dat    段文件：文件头 + 记录，每条记录单独压缩，可以随机读取
+    seg-000001.idx    段索引：按url指纹排序的(指纹, 偏移量, 长度)，每条20字节，段写满或关闭时生成
+    dicts/<id>.dict   压缩字典
+
+>>> with SegmentWriter('./pages') as writer:  # doctest: +SKIP
+...     writer.write_result(cc.try_get(url, key_msg='Balance'))
+>>> reader = SegmentReader('./pages')  # doctest: +SKIP
+>>> reader.get(url).page_source  # doctest: +SKIP
+>>> for record in reader:  # doctest: +SKIP
+...     parse(record.page_source)
+"""
+import bisect
+import collections
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import *
+
+from disk_utils import FileLock
+from url_seen import canonicalize_url, url_fingerprint
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# magic | 版本 | 压缩方式 | 字典id(全0表示不使用字典)
+SEGMENT_HEADER = struct.Struct('<4sBB8s')
+SEGMENT_MAGIC = b'CESG'
+# url指纹 | 元数据长度 | 数据长度 | crc32(元数据 + 数据)
+RECORD_HEADER = struct.Struct('<qIII')
+# url指纹 | 记录偏移量 | 记录长度
+INDEX_ENTRY = struct.Struct('<qQI')
+
+CODECS: Dict[str, int] = {'none': 0, 'zlib': 1, 'zstd': 2}
+_NO_DICT = bytes(8)
+
+
+@dataclass
+class SegmentStoreConfig:
+    segment_bytes: int = 256 << 20  # 段文件大小上限
+    codec: str = 'zlib'  # 'none'、'zlib'或'zstd'(需要安装zstandard)
+    level: int = 6
+    dict_bytes: int = 32 << 10  # zlib的窗口为32KB，更大的字典没有意义
+
+
+@dataclass
+class Record:
+    url: str
+    page_source: str
+    meta: Dict = field(default_factory=dict)
+    segment: int = 0
+    offset: int = 0
+
+
+def train_dictionary(samples: Sequence[str], size: int = SegmentStoreConfig.dict_bytes, codec: str = 'zlib') -> bytes:
+    """
+    用同一站点的页面训练压缩字典，页面之间重复的部分（head、导航栏、页脚等）不必在每条记录中重复保存
+    :param samples: 样本页面，几十个即可
+    :param size: 字典大小
+    :param codec: 'zlib'或'zstd'
+    """
+    if codec == 'zstd':
+        assert zstandard is not None, "codec zstd needs package zstandard."
+        return zstandard.train_dictionary(size, [_.encode('utf-8') for _ in samples]).as_bytes()
+
+    # zlib的字典只是一段预置的数据：选出在多数样本中都出现的行，越常见越靠后（离被压缩的数据越近）
+    counter = collections.Counter()
+    for sample in samples:
+        counter.update(set(_.strip() for _ in sample.splitlines() if len(_.strip()) >= 8))
+    common = [line for line, n in counter.most_common() if n * 2 >= len(samples)]
+    chunks, total = [], 0
+    for line in common:
+        data = line.encode('utf-8') + b'\n'
+        if total + len(data) > size:
+            break
+        chunks.append(data)
+        total += len(data)
+    return b''.join(reversed(chunks))
+
+
+class _Codec:
+
+    def __init__(self, codec: str, level: int, dictionary: Optional[bytes]):
+        assert codec in CODECS, f"codec must be one of {list(CODECS)}."
+        assert codec != 'zstd' or zstandard is not None, "codec zstd needs package zstandard."
+        self.codec = codec
+        self.level = level
+        self.dictionary = dictionary or None
+        if codec == 'zstd':
+            zdict = zstandard.ZstdCompressionDict(self.dictionary) if self.dictionary else None
+            self._zstd_c = zstandard.ZstdCompressor(level=level, dict_data=zdict)
+            self._zstd_d = zstandard.ZstdDecompressor(dict_data=zdict)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.codec == 'zlib':
+            if self.dictionary:
+                c = zlib.compressobj(self.level, zdict=self.dictionary)
+                return c.compress(data) + c.flush()
+            return zlib.compress(data, self.level)
+        if self.codec == 'zstd':
+            return self._zstd_c.compress(data)
+        return data
+
+    def decompress(self, data: bytes) -> bytes:
+        if self.codec == 'zlib':
+            if self.dictionary:
+                d = zlib.decompressobj(zdict=self.dictionary)
+                return d.decompress(data) + d.flush()
+            return zlib.decompress(data)
+        if self.codec == 'zstd':
+            return self._zstd_d.decompress(data)
+        return data
+
+
+def _segment_path(root: Path, segment: int, suffix: str = '.dat') -> Path:
+    return root / f"seg-{segment:06d}{suffix}"
+
+
+def _list_segments(root: Path) -> List[int]:
+    return sorted(int(_.stem[4:]) for _ in root.glob('seg-*.dat'))
+
+
+def _dict_id(dictionary: Optional[bytes]) -> bytes:
+    return hashlib.sha1(dictionary).digest()[:8] if dictionary else _NO_DICT
+
+
+def _load_dictionary(root: Path, dict_id: bytes) -> Optional[bytes]:
+    if dict_id == _NO_DICT:
+        return None
+    return (root / 'dicts' / f"{dict_id.hex()}.dict").read_bytes()
+
+
+def _scan_segment(f: BinaryIO) -> Iterator[Tuple[int, int, int, bytes, bytes]]:
+    """
+    顺序读取段文件中完整且校验通过的记录
+    :return: (指纹, 偏移量, 长度, 元数据, 压缩后的数据)
+    """
+    f.seek(SEGMENT_HEADER.size)
+    offset = SEGMENT_HEADER.size
+    while True:
+        header = f.read(RECORD_HEADER.size)
+        if len(header) < RECORD_HEADER.size:
+            return
+        fingerprint, meta_len, data_len, crc = RECORD_HEADER.unpack(header)
+        body = f.read(meta_len + data_len)
+        if len(body) < meta_len + data_len or zlib.crc32(body) != crc:
+            return
+        length = RECORD_HEADER.size + len(body)
+        yield fingerprint, offset, length, body[:meta_len], body[meta_len:]
+        offset += length
+
+
+def _write_index(path: Path, entries: Dict[int, Tuple[int, int]]):
+    """
+    :param entries: 指纹 ==> (偏移量, 长度)，同一url只保留最后一次写入
+    """
+    tmp = path.with_suffix('.idx.tmp')
+    with open(tmp, 'wb') as f:
+        for fingerprint in sorted(entries):
+            f.write(INDEX_ENTRY.pack(fingerprint, *entries[fingerprint]))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class SegmentWriter:
+    """
+    Appends pages to rolling segment files. 线程安全，同一目录同时只能有一个SegmentWriter（文件锁）。
+
+    关闭时为当前段生成索引；没有正常关闭的段会在下次打开时扫描、截掉不完整的记录并补上索引。
+    """
+
+    def __init__(self, root: Union[str, Path], codec: str = SegmentStoreConfig.codec,
+                 level: int = SegmentStoreConfig.level, dictionary: Optional[bytes] = None,
+                 segment_bytes: int = SegmentStoreConfig.segment_bytes, fsync: bool = False):
+        """
+        :param root: 存储目录
+        :param codec: 'none'、'zlib'或'zstd'(需要安装zstandard)
+        :param level: 压缩级别
+        :param dictionary: 压缩字典，见train_dictionary，会保存在root/dicts中供读取时使用
+        :param segment_bytes: 段文件大小上限，超过后写入新的段
+        :param fsync: 每个段关闭时是否fsync
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.codec = _Codec(codec, level, dictionary)
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+
+        self._dict_id = _dict_id(dictionary)
+        if dictionary:
+            path = self.root / 'dicts' / f"{self._dict_id.hex()}.dict"
+            if not path.exists():
+                path.parent.mkdir(exist_ok=True)
+                path.write_bytes(dictionary)
+
+        self._writer_lock = FileLock(self.root / 'writer.lock', timeout=0)
+        self._writer_lock.acquire()
+        self._lock = threading.Lock()
+        self._file: Optional[BinaryIO] = None
+        self._entries: Dict[int, Tuple[int, int]] = {}
+        self.segment: int = 0
+        self.records: int = 0
+        self.bytes_in: int = 0
+        self.bytes_out: int = 0
+
+        segments = _list_segments(self.root)
+        for segment in segments:
+            if not _segment_path(self.root, segment, '.idx').exists():
+                self._recover(segment)
+        self.segment = segments[-1] if segments else 0
+        self._open_segment()
+
+    def __repr__(self):
+        return f"SegmentWriter(root={self.root}, codec={self.codec.codec}, segment={self.segment}, records={self.records})"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def ratio(self) -> float:
+        """
+        :return: 压缩后大小 / 原始大小
+        """
+        return self.bytes_out / self.bytes_in if self.bytes_in else 0.0
+
+    def write(self, url: str, page_source: str, **meta) -> Tuple[int, int, int]:
+        """
+        :param url: 网址
+        :param page_source: 页面
+        :param meta: 其他需要保存的信息，需要可以被json序列化
+        :return: (段号, 偏移量, 长度)
+        """
+        fingerprint = url_fingerprint(url)
+        raw = page_source.encode('utf-8')
+        data = self.codec.compress(raw)
+        meta_bytes = json.dumps({'url': url, 'ts': time.time(), **meta}, ensure_ascii=False).encode('utf-8')
+        header = RECORD_HEADER.pack(fingerprint, len(meta_bytes), len(data),
+                                    zlib.crc32(data, zlib.crc32(meta_bytes)))
+        length = len(header) + len(meta_bytes) + len(data)
+
+        with self._lock:
+            if self._file.tell() + length > self.segment_bytes and self._entries:
+                self._seal()
+                self._open_segment()
+            offset = self._file.tell()
+            self._file.write(header)
+            self._file.write(meta_bytes)
+            self._file.write(data)
+            self._entries[fingerprint] = (offset, length)
+            self.records += 1
+            self.bytes_in += len(raw)
+            self.bytes_out += length
+            return self.segment, offset, length
+
+    def write_result(self, result, **meta) -> Optional[Tuple[int, int, int]]:
+        """
+        :param result: TryGetResult，没有page_source时不保存；键为请求的url，按请求的url读取，
+                       重定向后的网址保存在meta['final_url']中
+        """
+        if result.page_source is None:
+            return None
+        return self.write(result.url, result.page_source, ok=result.ok, msg=result.msg, marker=result.marker,
+                          via=result.via, final_url=result.final_url, **meta)
+
+    def flush(self):
+        with self._lock:
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._seal()
+                self._file = None
+            self._writer_lock.release()
+
+    def _open_segment(self):
+        self.segment += 1
+        self._file = open(_segment_path(self.root, self.segment), 'xb', buffering=1 << 20)
+        self._file.write(SEGMENT_HEADER.pack(SEGMENT_MAGIC, 1, CODECS[self.codec.codec], self._dict_id))
+        self._entries = {}
+
+    def _seal(self):
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._file.close()
+        _write_index(_segment_path(self.root, self.segment, '.idx'), self._entries)
+        logging.debug(f"segment[{self.segment}] sealed. | {len(self._entries)} urls")
+
+    def _recover(self, segment: int):
+        path = _segment_path(self.root, segment)
+        entries: Dict[int, Tuple[int, int]] = {}
+        end = SEGMENT_HEADER.size
+        with open(path, 'r+b') as f:
+            for fingerprint, offset, length, _, _ in _scan_segment(f):
+                entries[fingerprint] = (offset, length)
+                end = offset + length
+            if f.seek(0, os.SEEK_END) > end:
+                logging.warning(f"segment[{segment}] truncated to {end} bytes.")
+                f.truncate(end)
+        _write_index(_segment_path(self.root, segment, '.idx'), entries)
+
+
+class _SegmentIndex:
+    """
+    有序索引文件上的二分查找，不载入内存
+    """
+
+    def __init__(self, path: Path):
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self._n = size // INDEX_ENTRY.size
+
+    def __len__(self):
+        return self._n
+
+    def __getitem__(self, i: int) -> int:
+        # 供bisect使用，只返回指纹
+        return INDEX_ENTRY.unpack_from(self._mmap, i * INDEX_ENTRY.size)[0]
+
+    def get(self, fingerprint: int) -> Optional[Tuple[int, int]]:
+        i = bisect.bisect_left(self, fingerprint)
+        if i == self._n:
+            return None
+        found, offset, length = INDEX_ENTRY.unpack_from(self._mmap, i * INDEX_ENTRY.size)
+        return (offset, length) if found == fingerprint else None
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+        self._file.close()
+
+
+class SegmentReader:
+    """
+    Random access by url and streaming iteration over all records.
+
+    get从最新的段开始查找，同一url多次写入时返回最后一次；正在写入的段（还没有索引）在打开时扫描一次。
+    """
+
+    def __init__(self, root: Union[str, Path]):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._indexes: Dict[int, Union[_SegmentIndex, Dict[int, Tuple[int, int]]]] = {}
+        self._codecs: Dict[int, _Codec] = {}
+        self.refresh()
+
+    def __repr__(self):
+        return f"SegmentReader(root={self.root}, segments={len(self._indexes)})"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __iter__(self) -> Iterator[Record]:
+        return self.iter_records()
+
+    @property
+    def segments(self) -> List[int]:
+        return sorted(self._indexes)
+
+    def refresh(self):
+        """
+        重新加载段列表，读取期间有新的数据写入时调用
+        """
+        with self._lock:
+            for segment in _list_segments(self.root):
+                index = self._indexes.get(segment)
+                if isinstance(index, _SegmentIndex):
+                    continue
+                idx_path = _segment_path(self.root, segment, '.idx')
+                if idx_path.exists():
+                    self._indexes[segment] = _SegmentIndex(idx_path)
+                else:
+                    with open(_segment_path(self.root, segment), 'rb') as f:
+                        self._codec(segment, f)
+                        self._indexes[segment] = {fp: (offset, length) for fp, offset, length, _, _ in _scan_segment(f)}
+
+    def get(self, url: str) -> Optional[Record]:
+        fingerprint = url_fingerprint(url)
+        for segment in reversed(self.segments):
+            location = self._indexes[segment].get(fingerprint)
+            if location is None:
+                continue
+            offset, length = location
+            with open(_segment_path(self.root, segment), 'rb') as f:
+                codec = self._codec(segment, f)
+                f.seek(offset)
+                data = f.read(length)
+            record = self._decode(codec, data, segment, offset)
+            if canonicalize_url(record.url) == canonicalize_url(url):
+                return record
+        return None
+
+    def __contains__(self, url: str) -> bool:
+        fingerprint = url_fingerprint(url)
+        return any(self._indexes[_].get(fingerprint) is not None for _ in self.segments)
+
+    def iter_records(self, segments: Optional[Iterable[int]] = None) -> Iterator[Record]:
+        """
+        按写入顺序读取全部记录，段文件顺序读取，适合批量后处理
+        :param segments: 只读取这些段，默认全部
+        """
+        for segment in (self.segments if segments is None else segments):
+            with open(_segment_path(self.root, segment), 'rb', buffering=1 << 20) as f:
+                codec = self._codec(segment, f)
+                for _, offset, _, meta, data in _scan_segment(f):
+                    yield self._record(codec, meta, data, segment, offset)
+
+    def close(self):
+        with self._lock:
+            for index in self._indexes.values():
+                if isinstance(index, _SegmentIndex):
+                    index.close()
+            self._indexes.clear()
+
+    def _codec(self, segment: int, f: BinaryIO) -> _Codec:
+        if segment not in self._codecs:
+            f.seek(0)
+            magic, _, codec_id, dict_id = SEGMENT_HEADER.unpack(f.read(SEGMENT_HEADER.size))
+            assert magic == SEGMENT_MAGIC, f"segment[{segment}] is not a segment file."
+            codec = {v: k for k, v in CODECS.items()}[codec_id]
+            self._codecs[segment] = _Codec(codec, SegmentStoreConfig.level, _load_dictionary(self.root, dict_id))
+        return self._codecs[segment]
+
+    def _decode(self, codec: _Codec, data: bytes, segment: int, offset: int) -> Record:
+        _, meta_len, data_len, crc = RECORD_HEADER.unpack_from(data)
+        body = data[RECORD_HEADER.size:]
+        assert zlib.crc32(body) == crc, f"record at segment[{segment}] offset[{offset}] is corrupted."
+        return self._record(codec, body[:meta_len], body[meta_len:], segment, offset)
+
+    @staticmethod
+    def _record(codec: _Codec, meta: bytes, data: bytes, segment: int, offset: int) -> Record:
+        meta = json.loads(meta)
+        return Record(meta.pop('url'), codec.decompress(data).decode('utf-8'), meta, segment, offset)
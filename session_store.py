@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 18:10
+# @Author  : Histranger
+# @File    : session_store.py
+# @Software: PyCharm
+import hashlib
+import json
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import *
+
+from disk_utils import CACHE_DIR, FileLock, atomic_write_text
+
+SESSIONS_DIR: Path = CACHE_DIR / 'sessions'
+
+# Network.setCookies接受的字段
+_COOKIE_FIELDS: Tuple[str, ...] = ('name', 'value', 'domain', 'path', 'secure', 'httpOnly', 'sameSite', 'expires')
+
+_SNAPSHOT_LOCAL_STORAGE_JS = "return [location.origin, Object.assign({}, window.localStorage)];"
+
+# 在每个新文档上执行，每个标签页、每个origin只恢复一次localStorage
+_RESTORE_LOCAL_STORAGE_JS = """
+(function (storages) {
+    var items = storages[location.origin];
+    if (!items || sessionStorage.getItem('__crawlerEngineSessionRestored')) return;
+    for (var k in items) localStorage.setItem(k, items[k]);
+    sessionStorage.setItem('__crawlerEngineSessionRestored', '1');
+})(%s);
+"""
+
+
+@dataclass
+class SessionStoreConfig:
+    max_age: float = 7 * 24 * 3600  # 会话最长保存时间(s)
+    lock_timeout: float = 600.0  # 等待其他浏览器完成登录的最长时间(s)
+
+
+class SessionStore:
+    """
+    Snapshots of cookies and localStorage after login, one JSON file per (site, account).
+
+    cookies通过CDP Network.getAllCookies/Network.setCookies读写，注入时不需要先打开对应的页面；
+    localStorage只保存快照时所在origin的内容，通过Page.addScriptToEvaluateOnNewDocument在打开该origin时恢复。
+    """
+
+    def __init__(self, root: Union[str, Path] = SESSIONS_DIR, max_age: float = SessionStoreConfig.max_age):
+        """
+        :param root: 会话文件所在目录
+        :param max_age: 会话最长保存时间(s)，超过则视为过期
+        """
+        self.root = Path(root)
+        self.max_age = max_age
+
+    def __repr__(self):
+        return f"SessionStore(root={self.root})"
+
+    def path(self, site: str, account: str) -> Path:
+        # 文件名中不出现账号本身
+        digest = hashlib.sha1(account.encode('utf-8')).hexdigest()[:16]
+        return self.root / f"{re.sub(r'[^A-Za-z0-9_.-]', '_', site)}__{digest}.json"
+
+    def lock(self, site: str, account: str, timeout: Optional[float] = SessionStoreConfig.lock_timeout) -> FileLock:
+        return FileLock(self.path(site, account).with_suffix('.lock'), timeout=timeout)
+
+    def save(self, driver, site: str, account: str) -> Dict:
+        session = self.snapshot(driver, site)
+        atomic_write_text(self.path(site, account), json.dumps(session))
+        logging.info(f"session[{site}] saved. | {len(session['cookies'])} cookies")
+        return session
+
+    def load(self, site: str, account: str) -> Optional[Dict]:
+        """
+        :return: 未过期的会话，不存在或已过期时返回None
+        """
+        try:
+            with open(self.path(site, account), encoding='utf-8') as f:
+                session = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logging.warning(f"load session[{site}] failed. | {repr(e)}")
+            return None
+
+        if expired := self.expired(session):
+            logging.info(f"session[{site}] expired. | {expired}")
+            return None
+        return session
+
+    def expired(self, session: Dict, now: Optional[float] = None) -> Optional[str]:
+        """
+        :return: 过期原因，未过期返回None
+        """
+        now = now or time.time()
+        if now - session.get('saved_at', 0) > self.max_age:
+            return f"older than {self.max_age}s"
+        # 会话cookie(expires <= 0)在浏览器关闭后本应失效，但站点通常仍然接受，由调用者的有效性检查判断
+        persistent = [_ for _ in session['cookies'] if _.get('expires', -1) > 0]
+        if persistent and all(_['expires'] < now for _ in persistent):
+            return "all cookies expired"
+        if not session['cookies']:
+            return "no cookies"
+        return None
+
+    def delete(self, site: str, account: str):
+        self.path(site, account).unlink(missing_ok=True)
+
+    @staticmethod
+    def snapshot(driver, site: Optional[str] = None) -> Dict:
+        """
+        :return: 当前浏览器的cookies和当前origin的localStorage，格式与save保存的会话相同
+        """
+        try:
+            cookies = driver.execute_cdp_cmd('Network.getAllCookies', {})['cookies']
+        except Exception as e:
+            logging.warning(f"Network.getAllCookies failed, use get_cookies. | {repr(e)}")
+            cookies = [{**_, 'expires': _.pop('expiry', -1)} for _ in driver.get_cookies()]
+        try:
+            origin, local_storage = driver.execute_script(_SNAPSHOT_LOCAL_STORAGE_JS)
+        except Exception as e:
+            # about:blank、data:等页面没有localStorage
+            logging.warning(f"snapshot localStorage failed. | {repr(e)}")
+            origin, local_storage = None, {}
+
+        return {
+            'site': site,
+            'saved_at': time.time(),
+            'cookies': [{k: _[k] for k in _COOKIE_FIELDS if k in _} for _ in cookies],
+            'local_storage': {origin: local_storage} if local_storage else {},
+        }
+
+    @staticmethod
+    def inject(driver, session: Dict):
+        cookies = []
+        for cookie in session['cookies']:
+            cookie = dict(cookie)
+            if cookie.get('expires', -1) <= 0:
+                cookie.pop('expires', None)
+            cookies.append(cookie)
+        driver.execute_cdp_cmd('Network.setCookies', {'cookies': cookies})
+        if session.get('local_storage'):
+            source = _RESTORE_LOCAL_STORAGE_JS % json.dumps(session['local_storage'])
+            driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': source})
+        logging.info(f"session[{session.get('site')}] injected. | {len(cookies)} cookies")
+
+
+@dataclass
+class SessionSpec:
+    """
+    crawler启动时注入的会话，见ChromeCrawler/UCCrawler的session参数
+    """
+    site: str
+    account: str
+    store: SessionStore = field(default_factory=SessionStore)
+
+    def load(self) -> Optional[Dict]:
+        return self.store.load(self.site, self.account)
+
+
+def ensure_session(crawler, spec: SessionSpec, is_valid: Callable[[Any], bool],
+                   login: Callable[[Any], bool]) -> bool:
+    """
+    保证crawler处于登录状态：优先注入已保存的会话，失效时才重新登录并保存。
+    持有该会话的文件锁，多个浏览器（或进程）同时调用时只有一个会真正登录，其余等待后直接复用。
+    :param crawler: ChromeCrawler、UCCrawler等
+    :param spec: 会话
+    :param is_valid: 检查crawler是否处于登录状态，如访问个人主页并检查是否被重定向到登录页
+    :param login: 登录，成功返回True
+    :return: 是否处于登录状态
+    """
+    with spec.store.lock(spec.site, spec.account):
+        if session := spec.load():
+            spec.store.inject(crawler.driver, session)
+            if is_valid(crawler):
+                logging.info(f"session[{spec.site}] reused.")
+                return True
+            logging.info(f"session[{spec.site}] invalid, login again.")
+            spec.store.delete(spec.site, spec.account)
+
+        if not login(crawler):
+            return False
+        spec.store.save(crawler.driver, spec.site, spec.account)
+        return True
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/19 17:10
+# @Author  : Histranger
+# @File    : test_asset_cache.py
+# @Software: PyCharm
+import base64
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from asset_cache import AssetCache, AssetInterceptor, CachedAsset, freshness_lifetime
+
+JS = b'console.log("hello");' * 100
+
+
+class FakeConnection:
+    """
+    A browser-level CDPConnection: records commands and dispatches events to listeners like the reader thread.
+    """
+
+    def __init__(self):
+        self.sent = []
+        self.listeners = {}
+        self.closed = False
+        self._cond = threading.Condition()
+
+    def send(self, method, params=None, session_id=None, timeout=None):
+        with self._cond:
+            self.sent.append((method, params or {}, session_id))
+            self._cond.notify_all()
+        if method == 'Target.getTargets':
+            return {'targetInfos': [{'targetId': 'T1', 'type': 'page'}, {'targetId': 'W1', 'type': 'service_worker'}]}
+        if method == 'Target.attachToTarget':
+            return {'sessionId': 'S' + params['targetId']}
+        if method == 'Fetch.getResponseBody':
+            return {'body': base64.b64encode(JS).decode('ascii'), 'base64Encoded': True}
+        return {}
+
+    def add_listener(self, listener, session_id=None):
+        self.listeners.setdefault(session_id, []).append(listener)
+
+    def remove_listener(self, listener, session_id=None):
+        self.listeners[session_id].remove(listener)
+
+    def emit(self, method, params, session_id=None):
+        for listener in list(self.listeners.get(session_id, [])):
+            listener(method, params)
+
+    def close(self):
+        self.closed = True
+
+    def wait_for(self, method, request_id=None, timeout=2.0):
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                for sent in self.sent:
+                    if sent[0] == method and (request_id is None or sent[1].get('requestId') == request_id):
+                        return sent
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise AssertionError(f"{method} not sent.")
+                self._cond.wait(remaining)
+
+
+def paused(request_id, url='https://etherscan.io/assets/app.js', status=None, headers=None, request_headers=None):
+    params = {'requestId': request_id, 'resourceType': 'Script',
+              'request': {'url': url, 'method': 'GET',
+                          'headers': {'Referer': 'https://etherscan.io/', **(request_headers or {})}}}
+    if status is not None:
+        params['responseStatusCode'] = status
+        params['responseHeaders'] = [{'name': k, 'value': v} for k, v in (headers or {}).items()]
+    return params
+
+
+class FreshnessTestCase(unittest.TestCase):
+
+    def test_freshness(self):
+        self.assertEqual(freshness_lifetime({'cache-control': 'public, max-age=600, s-maxage=60'}), 60.0)
+        self.assertEqual(freshness_lifetime({'expires': 'Thu, 01 Jan 2026 01:00:00 GMT',
+                                             'date': 'Thu, 01 Jan 2026 00:00:00 GMT'}), 3600.0)
+        self.assertEqual(freshness_lifetime({'last-modified': 'Thu, 01 Jan 2026 00:00:00 GMT',
+                                             'date': 'Sun, 11 Jan 2026 00:00:00 GMT'}, heuristic_max=1e9), 86400.0)
+        self.assertEqual(freshness_lifetime({'cache-control': 'no-cache', 'etag': '"v1"'}), 0.0)
+        self.assertEqual(freshness_lifetime({'etag': '"v1"'}), 0.0)
+        for headers in ({}, {'cache-control': 'no-store, max-age=600'}, {'cache-control': 'max-age=600', 'vary': 'Cookie'},
+                        {'cache-control': 'max-age=600', 'set-cookie': 'a=1'}, {'cache-control': 'no-cache'}):
+            self.assertIsNone(freshness_lifetime(headers), headers)
+        self.assertEqual(freshness_lifetime({'cache-control': 'max-age=600', 'vary': 'Accept-Encoding'}), 600.0)
+
+
+class AssetCacheTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / 'assets.sqlite3'
+        self.cache = AssetCache(self.path, max_bytes=3000)
+
+    def tearDown(self) -> None:
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def test_put_get(self):
+        asset = CachedAsset('https://etherscan.io/a.css', 200, [('Content-Type', 'text/css')], b'a' * 1000,
+                            etag='"v1"', expires_at=time.time() + 60)
+        self.assertTrue(self.cache.put(asset))
+        with AssetCache(self.path) as other:  # 另一个进程
+            self.assertEqual(other.get(asset.url), asset)
+        self.assertIsNone(self.cache.get('https://etherscan.io/b.css'))
+        self.assertFalse(self.cache.put(CachedAsset('https://etherscan.io/big.js', 200, [], b'b' * 5000)))
+
+    def test_lru(self):
+        for i, name in enumerate('abc'):
+            self.cache.put(CachedAsset(f'https://etherscan.io/{name}.js', 200, [], b'x' * 1000), now=100 + i)
+        self.cache.get('https://etherscan.io/a.js', now=200)
+        self.cache.put(CachedAsset('https://etherscan.io/d.js', 200, [], b'x' * 1000), now=201)
+        self.assertIsNone(self.cache.get('https://etherscan.io/b.js'))
+        self.assertEqual((len(self.cache), self.cache.size, self.cache.stats.evictions), (3, 3000, 1))
+
+
+class AssetInterceptorTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = AssetCache(Path(self.tmp.name) / 'assets.sqlite3')
+        self.connection = FakeConnection()
+        self.interceptor = AssetInterceptor(self.cache)
+        self.interceptor.attach(self.connection, own=True)
+
+    def tearDown(self) -> None:
+        self.interceptor.close()
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def test_attach(self):
+        attached = [_[1]['targetId'] for _ in self.connection.sent if _[0] == 'Target.attachToTarget']
+        self.assertEqual(attached, ['T1'])
+        method, params, session_id = self.connection.wait_for('Fetch.enable')
+        self.assertEqual(session_id, 'ST1')
+        self.assertIn({'urlPattern': '*', 'resourceType': 'Font', 'requestStage': 'Response'}, params['patterns'])
+
+        self.connection.emit('Target.targetCreated', {'targetInfo': {'targetId': 'T2', 'type': 'page'}})
+        self.connection.wait_for('Fetch.enable')
+        time.sleep(0.1)
+        self.assertEqual(len(self.connection.listeners['ST2']), 1)
+        self.connection.emit('Target.targetDestroyed', {'targetId': 'T2'})
+        self.assertEqual(self.connection.listeners['ST2'], [])
+
+    def test_miss_then_hit(self):
+        self.connection.emit('Fetch.requestPaused', paused('R1'), 'ST1')
+        self.assertNotIn('headers', self.connection.wait_for('Fetch.continueRequest', 'R1')[1])
+
+        headers = {'Cache-Control': 'public, max-age=600', 'Content-Type': 'application/javascript',
+                   'Content-Encoding': 'br'}
+        self.connection.sent.clear()
+        self.connection.emit('Fetch.requestPaused', paused('R1', status=200, headers=headers), 'ST1')
+        self.connection.wait_for('Fetch.continueRequest', 'R1')
+        self.assertEqual(self.connection.sent[0][0], 'Fetch.getResponseBody')
+        self.assertEqual(self.cache.get('https://etherscan.io/assets/app.js').headers,
+                         [('Cache-Control', 'public, max-age=600'), ('Content-Type', 'application/javascript')])
+
+        self.connection.emit('Fetch.requestPaused', paused('R2', url='https://etherscan.io/assets/app.js#x'), 'ST1')
+        method, params, session_id = self.connection.wait_for('Fetch.fulfillRequest', 'R2')
+        self.assertEqual((params['responseCode'], base64.b64decode(params['body'])), (200, JS))
+        self.assertEqual((self.cache.stats.hits, self.cache.stats.misses), (1, 1))
+        self.assertEqual((self.cache.stats.bytes_saved, self.cache.stats.bytes_fetched), (len(JS), len(JS)))
+        self.assertEqual(self.cache.stats.hit_ratio, 0.5)
+
+    def test_revalidate(self):
+        url = 'https://etherscan.io/assets/app.js'
+        self.cache.put(CachedAsset(url, 200, [('Content-Type', 'application/javascript')], JS, etag='"v1"',
+                                   expires_at=time.time() - 1))
+        self.connection.emit('Fetch.requestPaused', paused('R1'), 'ST1')
+        headers = {_['name']: _['value'] for _ in self.connection.wait_for('Fetch.continueRequest', 'R1')[1]['headers']}
+        self.assertEqual(headers, {'Referer': 'https://etherscan.io/', 'If-None-Match': '"v1"'})
+
+        self.connection.emit('Fetch.requestPaused', paused('R1', status=304, headers={'Cache-Control': 'max-age=60'}),
+                             'ST1')
+        self.connection.wait_for('Fetch.fulfillRequest', 'R1')
+        self.assertEqual((self.cache.stats.hits, self.cache.stats.revalidated), (1, 1))
+        self.assertTrue(self.cache.get(url).fresh())
+
+    def test_not_cacheable(self):
+        for request_id, status, headers in (('R1', 200, {'Cache-Control': 'no-store'}), ('R2', 404, {})):
+            self.connection.emit('Fetch.requestPaused', paused(request_id, status=status, headers=headers), 'ST1')
+            self.connection.wait_for('Fetch.continueRequest', request_id)
+        self.assertEqual(len(self.cache), 0)
+        self.assertNotIn('Fetch.getResponseBody', [_[0] for _ in self.connection.sent])
+        # 不可缓存的请求也计入misses，hit_ratio不会偏高
+        self.assertEqual((self.cache.stats.misses, self.cache.stats.uncacheable, self.cache.stats.hit_ratio), (2, 2, 0.0))
+
+    def test_authorization(self):
+        url = 'https://etherscan.io/assets/app.js'
+        self.cache.put(CachedAsset(url, 200, [('Content-Type', 'application/javascript')], JS,
+                                   expires_at=time.time() + 600))
+        auth = {'Authorization': 'Bearer token'}
+        self.connection.emit('Fetch.requestPaused', paused('R1', request_headers=auth), 'ST1')
+        self.assertNotIn('headers', self.connection.wait_for('Fetch.continueRequest', 'R1')[1])
+
+        # 带Authorization的请求的响应不存入共享缓存，即使响应可缓存
+        self.cache.clear()
+        self.connection.sent.clear()
+        headers = {'Cache-Control': 'public, max-age=600'}
+        self.connection.emit('Fetch.requestPaused', paused('R1', status=200, headers=headers, request_headers=auth),
+                             'ST1')
+        self.connection.wait_for('Fetch.continueRequest', 'R1')
+        self.assertEqual(len(self.cache), 0)
+        self.assertNotIn('Fetch.getResponseBody', [_[0] for _ in self.connection.sent])
+        self.assertEqual((self.cache.stats.hits, self.cache.stats.uncacheable), (0, 1))
+
+    def test_content_length(self):
+        headers = {'Cache-Control': 'public, max-age=600', 'Content-Length': str(self.cache.max_entry_bytes + 1)}
+        self.connection.emit('Fetch.requestPaused', paused('R1', status=200, headers=headers), 'ST1')
+        self.connection.wait_for('Fetch.continueRequest', 'R1')
+        self.assertNotIn('Fetch.getResponseBody', [_[0] for _ in self.connection.sent])
+        self.assertEqual((len(self.cache), self.cache.stats.uncacheable), (0, 1))
+
+    def test_close(self):
+        self.interceptor.close()
+        self.assertTrue(self.connection.closed)
+        self.assertEqual(self.connection.listeners[None], [])
+        self.assertEqual(self.connection.listeners['ST1'], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 15:40
+# @Author  : Histranger
+# @File    : test_batch_runner.py
+# @Software: PyCharm
+import json
+import logging
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from batch_runner import Checkpoint, run_batch
+from crawler_base import TryGetResult
+from crawler_pool import CrawlerPool
+from segment_store import SegmentReader, SegmentWriter
+from test_fakes import PoolCrawler
+from url_seen import SeenSet
+
+logging.basicConfig(level=logging.INFO)
+
+
+class RecordingCrawler(PoolCrawler):
+    crawled = []
+    lock = threading.Lock()
+
+    def try_get(self, url, key_msg=None, **kwargs):
+        with self.lock:
+            self.crawled.append(url)
+        ok = key_msg is None or key_msg in url
+        return TryGetResult(ok=ok, msg=f"get url[{url}] OK." if ok else "key_msg NOT in page source.", url=url)
+
+
+class BatchRunnerTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        RecordingCrawler.crawled = []
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.input = self.root / 'requests.jsonl'
+        self.out = self.root / 'results.jsonl'
+        lines = [json.dumps({'url': f'https://example.com/{i}', 'key_msg': 'Balance' if i == 1 else None})
+                 for i in range(50)]
+        lines.insert(10, 'not json')
+        lines.insert(20, '')
+        self.input.write_text('\n'.join(lines) + '\n')
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def results(self):
+        return [json.loads(_) for _ in self.out.read_text().splitlines()]
+
+    def test_run(self):
+        with CrawlerPool(RecordingCrawler, size=4) as pool:
+            stats = run_batch(self.input, self.out, pool)
+        self.assertEqual((stats.done, stats.ok, stats.failed, stats.bad_lines), (51, 49, 1, 1))
+        self.assertEqual(len(self.results()), 51)
+        checkpoint = Checkpoint(f"{self.out}.ckpt")
+        self.assertEqual(checkpoint.watermark, self.input.stat().st_size)
+        self.assertEqual(checkpoint.done, {})
+
+    def test_resume(self):
+        stop_event = threading.Event()
+
+        class StopCrawler(RecordingCrawler):
+            def try_get(self, url, **kwargs):
+                if len(self.crawled) >= 20:
+                    stop_event.set()
+                return super().try_get(url, **kwargs)
+
+        with CrawlerPool(StopCrawler, size=4) as pool:
+            first = run_batch(self.input, self.out, pool, stop_event=stop_event)
+        self.assertLess(first.done, 51)
+
+        with CrawlerPool(RecordingCrawler, size=4) as pool:
+            second = run_batch(self.input, self.out, pool)
+        self.assertEqual(first.done + second.done, 51)
+        self.assertEqual(len(RecordingCrawler.crawled), 50)
+        self.assertEqual(len(set(RecordingCrawler.crawled)), 50)
+        self.assertEqual(len({_['offset'] for _ in self.results()}), 51)
+
+    def test_killed_between_saves(self):
+        stop_event = threading.Event()
+        saves = []
+        save = Checkpoint.save
+
+        class StopCrawler(RecordingCrawler):
+            def try_get(self, url, **kwargs):
+                if len(self.crawled) >= 20:
+                    stop_event.set()
+                return super().try_get(url, **kwargs)
+
+        def _save(checkpoint):
+            # 只有第一次保存成功，之后的结果都完成在被kill之前、下一次保存之前
+            if not saves:
+                save(checkpoint)
+            saves.append(checkpoint.watermark)
+
+        with mock.patch.object(Checkpoint, 'save', _save), CrawlerPool(StopCrawler, size=4) as pool:
+            first = run_batch(self.input, self.out, pool, stop_event=stop_event)
+        self.assertGreater(first.done, 1)
+        written = {_['url'] for _ in self.results()}
+        with open(self.out, 'a') as f:
+            f.write('{"offset": 9')  # 写了一半的行
+
+        RecordingCrawler.crawled = []
+        with CrawlerPool(RecordingCrawler, size=4) as pool:
+            second = run_batch(self.input, self.out, pool)
+        # 上次保存checkpoint之后写入的结果不再重复访问和写入
+        self.assertEqual(first.done + second.done, 51)
+        self.assertEqual(written & set(RecordingCrawler.crawled), set())
+        results = [json.loads(_) for _ in self.out.read_text().splitlines() if _.endswith('}')]
+        self.assertEqual(len(results), 51)
+        self.assertEqual(len({_['offset'] for _ in results}), 51)
+
+    def test_seen(self):
+        with open(self.input, 'a') as f:
+            f.write(json.dumps({'url': 'https://EXAMPLE.com/3#dup'}) + '\n')
+        with SeenSet(self.root / 'seen', capacity=1000) as seen, CrawlerPool(RecordingCrawler, size=4) as pool:
+            first = run_batch(self.input, self.out, pool, seen=seen)
+            second = run_batch(self.input, self.root / 'again.jsonl', pool, seen=seen)
+        self.assertEqual((first.done, first.duplicates), (51, 1))
+        # 失败的https://example.com/1不记录在seen中，第二次运行重新访问
+        self.assertEqual((second.done, second.bad_lines, second.duplicates), (2, 1, 50))
+        self.assertEqual(len(RecordingCrawler.crawled), 51)
+
+    def test_seen_failed(self):
+        self.input.write_text(json.dumps({'url': 'https://example.com/0', 'key_msg': 'Balance'}) + '\n')
+        with SeenSet(self.root / 'seen', capacity=1000) as seen, CrawlerPool(RecordingCrawler, size=1) as pool:
+            first = run_batch(self.input, self.out, pool, seen=seen)
+            self.assertNotIn('https://example.com/0', seen)
+            # 下一次运行(另一个任务文件)中同一个url重新访问并成功
+            again = self.root / 'again.jsonl'
+            again.write_text(json.dumps({'url': 'https://example.com/0'}) + '\n')
+            second = run_batch(again, self.root / 'again.out.jsonl', pool, seen=seen)
+            self.assertIn('https://example.com/0', seen)
+        self.assertEqual((first.failed, second.ok, second.duplicates), (1, 1, 0))
+        self.assertEqual(RecordingCrawler.crawled, ['https://example.com/0'] * 2)
+
+    def test_store(self):
+        class PageCrawler(RecordingCrawler):
+            def try_get(self, url, **kwargs):
+                result = super().try_get(url, **kwargs)
+                result.page_source = f'<p>{url}</p>'
+                return result
+
+        with SegmentWriter(self.root / 'pages') as store, CrawlerPool(PageCrawler, size=4) as pool:
+            run_batch(self.input, self.out, pool, store=store)
+        with SegmentReader(self.root / 'pages') as reader:
+            self.assertEqual(reader.get('https://example.com/7').page_source, '<p>https://example.com/7</p>')
+            self.assertEqual(len(list(reader)), 50)
+        self.assertTrue(all('segment' in _ for _ in self.results() if _['url']))
+
+    def test_checkpoint_out_of_order(self):
+        checkpoint = Checkpoint(self.root / 'ckpt')
+        checkpoint.mark(10, 20)
+        checkpoint.mark(20, 30)
+        self.assertEqual(checkpoint.watermark, 0)
+        self.assertIn(20, checkpoint)
+        self.assertNotIn(0, checkpoint)
+        checkpoint.mark(0, 10)
+        self.assertEqual((checkpoint.watermark, checkpoint.done), (30, {}))
+
+
+if __name__ == '__main__':
+    unittest.main()
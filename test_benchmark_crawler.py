@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/19 00:50
+# @Author  : Histranger
+# @File    : test_benchmark_crawler.py
+# @Software: PyCharm
+import json
+import logging
+import os
+import tempfile
+import unittest
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+from benchmark_crawler import KEY_MSG, SyntheticSite, compare, main, percentile, run_benchmark
+from crawler_base import check_page
+from markers import MarkerMatcher
+from proc_stats import process_tree, tree_rss_bytes
+from test_fakes import PoolCrawler
+
+logging.basicConfig(level=logging.INFO)
+
+
+class HTTPCrawler(PoolCrawler):
+    """
+    用urllib代替浏览器，只用于测试测量逻辑
+    """
+
+    def try_get(self, url, key_msg=None, **kwargs):
+        self.pages += 1
+        try:
+            with urllib.request.urlopen(url) as response:
+                body = response.read().decode('utf-8')
+        except urllib.error.HTTPError as e:
+            body = e.read().decode('utf-8')
+        return check_page(MarkerMatcher(key_msg, None), url, body)
+
+
+class BrokenCrawler(HTTPCrawler):
+
+    def __init__(self, **kwargs):
+        raise RuntimeError('no chrome')
+
+
+class BenchmarkTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.site = SyntheticSite().__enter__()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.site.__exit__(None, None, None)
+
+    def test_site(self):
+        workload = self.site.workload(12)
+        self.assertEqual(len({_ for _, _ in workload}), 12)
+        self.assertEqual(sum(kind == 'not_found' for kind, _ in workload), 2)
+        crawler = HTTPCrawler()
+        results = {kind: crawler.try_get(url, key_msg=KEY_MSG) for kind, url in workload[:6]}
+        self.assertTrue(results['large_dom'].ok)
+        self.assertGreater(len(results['large_dom'].page_source), 10 * len(results['small_dom'].page_source))
+        self.assertFalse(results['not_found'].ok)
+        self.assertFalse(results['server_error'].ok)
+
+    def test_run_benchmark(self):
+        result = run_benchmark(HTTPCrawler, 'http', self.site, concurrency=3, pages=24)
+        self.assertEqual((result.pages, result.ok, result.failed), (24, 16, 8))
+        self.assertGreater(result.pages_per_sec, 0)
+        self.assertLessEqual(result.latency['p50'], result.latency['p99'])
+        self.assertEqual(set(result.latency_by_kind), {'small_dom', 'large_dom', 'slow_js', 'delayed_resource',
+                                                       'not_found', 'server_error'})
+        if os.path.exists('/proc'):
+            self.assertGreater(result.peak_rss_bytes, 0)
+
+    def test_launch_failure(self):
+        result = run_benchmark(BrokenCrawler, 'broken', self.site, concurrency=2, pages=4)
+        self.assertIn('failed to launch', result.error)
+        self.assertEqual(result.pages, 0)
+
+    def test_compare(self):
+        old = {'results': [{'crawler': 'chrome', 'headless': True, 'concurrency': 4, 'pages_per_sec': 10.0,
+                            'latency': {'p95': 1.0}}]}
+        new = {'results': [{'crawler': 'chrome', 'headless': True, 'concurrency': 4, 'pages_per_sec': 8.0,
+                            'latency': {'p95': 1.05}},
+                           {'crawler': 'uc', 'headless': True, 'concurrency': 4, 'pages_per_sec': 8.0,
+                            'latency': {'p95': 1.0}}]}
+        lines = compare(old, new)
+        self.assertIn('REGRESSION', lines[0])
+        self.assertIn('not comparable', lines[1])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, data in (('old.json', old), ('new.json', new)):
+                Path(tmp, name).write_text(json.dumps(data))
+            main(['--compare', str(Path(tmp, 'old.json')), str(Path(tmp, 'new.json'))])
+
+    def test_percentile(self):
+        self.assertEqual(percentile([3, 1, 2], 0.5), 2)
+        self.assertIsNone(percentile([], 0.5))
+
+    @unittest.skipUnless(os.path.exists('/proc'), "needs /proc.")
+    def test_proc_stats(self):
+        self.assertIn(os.getpid(), process_tree(os.getpid()))
+        self.assertGreater(tree_rss_bytes(os.getpid()), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
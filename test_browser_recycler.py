@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/19 10:10
+# @Author  : Histranger
+# @File    : test_browser_recycler.py
+# @Software: PyCharm
+import logging
+import os
+import unittest
+
+from browser_recycler import BrowserRecycler, RecycleConfig, tree_rss
+from crawler_base import BaseCrawler
+from proc_stats import PROC
+from test_fakes import CDPDriver
+
+logging.basicConfig(level=logging.INFO)
+
+
+class BrowserDriver(CDPDriver):
+    """
+    The driver of the `generation`-th launched browser.
+    """
+
+    def __init__(self, generation):
+        super().__init__()
+        self.generation = generation
+        self.quit = False
+
+    def get(self, url):
+        self.url = url
+
+    @property
+    def page_source(self):
+        return f'<p>Balance, browser {self.generation}</p>'
+
+
+class RecyclingCrawler(BaseCrawler):
+
+    def __init__(self, recycle):
+        self.launches = 0
+        self._launch()
+        self.recycler = BrowserRecycler(recycle)
+        self.pages = 0
+
+    def close(self):
+        self._quit()
+
+    def _launch(self):
+        self.launches += 1
+        self.driver = BrowserDriver(self.launches)
+
+    def _quit(self):
+        self.driver.quit = True
+
+    @property
+    def root_pids(self):
+        return [os.getpid()]
+
+
+class BrowserRecyclerTestCase(unittest.TestCase):
+
+    @unittest.skipUnless(PROC.exists(), "no /proc.")
+    def test_tree_rss(self):
+        self.assertGreater(tree_rss([os.getpid(), os.getpid()]), 0)
+        self.assertIsNone(tree_rss([]))
+
+    def test_pages(self):
+        cc = RecyclingCrawler(RecycleConfig(max_pages=2))
+        results = [cc.try_get(f'https://etherscan.io/address/{i}', key_msg='Balance').ok for i in range(5)]
+        self.assertEqual(cc.launches, 3)
+        self.assertTrue(all(results))
+        self.assertEqual(cc.recycler.stats.reasons, {'pages': 2})
+        self.assertIn('browser 3', cc.try_get('https://etherscan.io/', key_msg='Balance').page_source)
+
+    def test_uptime(self):
+        cc = RecyclingCrawler(RecycleConfig(max_uptime=0))
+        cc.try_get('https://etherscan.io/')
+        self.assertEqual(cc.launches, 1)  # 还没有访问过页面时不重启
+        cc.try_get('https://etherscan.io/')
+        self.assertEqual(cc.recycler.stats.reasons, {'uptime': 1})
+
+    @unittest.skipUnless(PROC.exists(), "no /proc.")
+    def test_rss(self):
+        cc = RecyclingCrawler(RecycleConfig(max_rss=1, check_every=3))
+        for _ in range(7):
+            cc.try_get('https://etherscan.io/')
+        self.assertEqual(cc.recycler.stats.reasons, {'rss': 2})
+        self.assertEqual([_[1] for _ in cc.recycler.stats.rss_samples], [3, 3])
+        self.assertGreater(cc.recycler.stats.peak_rss, 0)
+
+    def test_carry_over(self):
+        cc = RecyclingCrawler(RecycleConfig(max_pages=1))
+        cc.try_get('https://etherscan.io/')
+        old = cc.driver
+        old.cookies = [{'name': 'ASP.NET_SessionId', 'value': 'foo', 'domain': 'etherscan.io', 'expires': -1}]
+        cc.try_get('https://etherscan.io/')
+        self.assertTrue(old.quit)
+        self.assertEqual([_['name'] for _ in cc.driver.cookies], ['ASP.NET_SessionId'])
+        self.assertIn('"theme": "dark"', cc.driver.scripts[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/19 02:00
+# @Author  : Histranger
+# @File    : test_cdp_crawler.py
+# @Software: PyCharm
+import json
+import queue
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import websocket
+from selenium.common import JavascriptException, TimeoutException, WebDriverException
+
+from cdp_crawler import CDPConnection, CDPCrawler, CDPError, CDPEventStream, CDPPage, find_chrome_binary
+from crawler_factory import create_crawler, get_crawler_cls
+
+
+class FakeWebSocket:
+    """
+    A tiny in-process Chrome: answers commands with handler(method, params), and lets tests push events.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.inbox = queue.Queue()
+        self.sent = []
+
+    def settimeout(self, timeout):
+        pass
+
+    def send(self, data):
+        message = json.loads(data)
+        self.sent.append(message)
+        result = self.handler(message['method'], message['params'])
+        if result is None:
+            return  # 不回复，用于测试超时
+        response = {'id': message['id'], **({'error': result['error']} if 'error' in result else {'result': result})}
+        self.inbox.put(json.dumps(response))
+        for event in result.get('_events', []):
+            self.emit(*event, session_id=message.get('sessionId'))
+
+    def emit(self, method, params, session_id=None):
+        self.inbox.put(json.dumps({'method': method, 'params': params, **({'sessionId': session_id} if session_id else {})}))
+
+    def recv(self):
+        data = self.inbox.get()
+        if data is None:
+            raise websocket.WebSocketConnectionClosedException("closed")
+        return data
+
+    def close(self):
+        self.inbox.put(None)
+
+
+class FakeBrowser:
+    """
+    Page.navigate 成功时推送lifecycle事件，url中含有'slow'时不推送
+    """
+
+    def __init__(self):
+        self.location = 'about:blank'
+        self.ws = FakeWebSocket(self.handle)
+
+    def handle(self, method, params):
+        if method == 'Page.navigate':
+            if 'unreachable' in params['url']:
+                return {'frameId': 'T1', 'errorText': 'net::ERR_NAME_NOT_RESOLVED'}
+            self.location = params['url']
+            events = [] if 'slow' in params['url'] else [
+                ('Page.lifecycleEvent', {'frameId': 'T1', 'loaderId': 'L1', 'name': 'DOMContentLoaded'}),
+                ('Page.lifecycleEvent', {'frameId': 'T1', 'loaderId': 'L1', 'name': 'load'}),
+            ]
+            return {'frameId': 'T1', 'loaderId': 'L1', '_events': events}
+        if method == 'Runtime.evaluate':
+            expression = params['expression']
+            if expression == 'location.href':
+                return {'result': {'type': 'string', 'value': self.location}}
+            if 'XMLSerializer' in expression:
+                return {'result': {'type': 'string', 'value': f'<html><body>Balance of {self.location}</body></html>'}}
+            if 'throw' in expression:
+                return {'result': {}, 'exceptionDetails': {'text': 'Uncaught', 'exception': {'description': 'Error: boom'}}}
+            return {'result': {'type': 'string', 'value': expression}}
+        if method == 'Network.getCookies':
+            return {'cookies': [{'name': 'a', 'value': '1', 'expires': 2e9}, {'name': 'b', 'value': '2', 'expires': -1}]}
+        if method == 'Never.answer':
+            return None
+        if method == 'Bad.method':
+            return {'error': {'code': -32601, 'message': "'Bad.method' wasn't found"}}
+        return {}
+
+
+class CDPTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.browser = FakeBrowser()
+        with mock.patch.object(websocket, 'create_connection', return_value=self.browser.ws):
+            self.connection = CDPConnection('ws://127.0.0.1:1/devtools/browser/x', timeout=1)
+        self.page = CDPPage(self.connection, 'T1', 'S1', page_load_timeout=0.5)
+
+    def tearDown(self) -> None:
+        self.connection.close()
+
+    def test_send(self):
+        self.assertEqual(self.connection.send('Page.enable'), {})
+        with self.assertRaisesRegex(CDPError, 'wasn.t found'):
+            self.connection.send('Bad.method')
+        with self.assertRaises(TimeoutException):
+            self.connection.send('Never.answer', timeout=0.1)
+        self.assertEqual(self.browser.ws.sent[0]['method'], 'Page.enable')
+
+    def test_get(self):
+        self.page.get('https://etherscan.io/address/1')
+        self.assertEqual(self.page.current_url, 'https://etherscan.io/address/1')
+        self.assertIn('Balance', self.page.page_source)
+        self.assertTrue(all(_.get('sessionId') == 'S1' for _ in self.browser.ws.sent))
+
+        with self.assertRaisesRegex(WebDriverException, 'ERR_NAME_NOT_RESOLVED'):
+            self.page.get('https://unreachable.example/')
+        with self.assertRaises(TimeoutException):
+            self.page.get('https://etherscan.io/slow')
+        self.page.page_load_strategy = 'none'
+        self.page.get('https://etherscan.io/slow')
+
+    def test_execute_script(self):
+        expression = self.page.execute_script("return arguments[0] + 1;", 41)
+        self.assertIn("return arguments[0] + 1;", expression)
+        self.assertTrue(expression.endswith('.apply(null, [41])'))
+        with self.assertRaisesRegex(JavascriptException, 'boom'):
+            self.page.execute_script("throw new Error('boom');")
+        self.assertEqual(self.page.get_cookies(), [{'name': 'a', 'value': '1', 'expiry': 2000000000},
+                                                   {'name': 'b', 'value': '2', 'expires': -1}])
+
+    def test_event_stream(self):
+        events = CDPEventStream(self.connection, 'S1')
+        received = []
+        events.subscribe(lambda method, params: received.append(method))
+        self.browser.ws.emit('Network.requestWillBeSent', {}, session_id='S1')
+        self.browser.ws.emit('Network.requestWillBeSent', {}, session_id='S2')
+        self.page.get('https://etherscan.io/')  # 事件按顺序到达，get返回时前面的事件已经入队
+        events.poll()
+        self.assertEqual(received, ['Network.requestWillBeSent', 'Page.lifecycleEvent', 'Page.lifecycleEvent'])
+        self.assertEqual(events.poll(), [])
+        events.close()
+
+    def test_try_get(self):
+        crawler = CDPCrawler.__new__(CDPCrawler)
+        crawler.driver, crawler.pages = self.page, 0
+        result = crawler.try_get('https://etherscan.io/address/2', key_msg='Balance', interval=0)
+        self.assertTrue(result.ok)
+        result = crawler.try_get('https://unreachable.example/', retries=2, interval=0)
+        self.assertEqual((result.ok, result.outcome), (False, 'webdriver_exception'))
+
+    def test_connection_lost(self):
+        self.browser.ws.close()
+        with self.assertRaises(CDPError):
+            self.page.get('https://etherscan.io/slow')
+
+
+class LaunchTestCase(unittest.TestCase):
+
+    def test_devtools_url(self):
+        crawler = CDPCrawler.__new__(CDPCrawler)
+        with tempfile.TemporaryDirectory() as user_data_dir:
+            crawler.user_data_dir = user_data_dir
+            crawler.process = mock.Mock(poll=mock.Mock(return_value=None))
+            threading.Timer(0.1, lambda: (Path(user_data_dir) / 'DevToolsActivePort').write_text(
+                '40123\n/devtools/browser/abc\n')).start()
+            self.assertEqual(crawler._wait_devtools_url(), 'ws://127.0.0.1:40123/devtools/browser/abc')
+
+            crawler.process = mock.Mock(poll=mock.Mock(return_value=1), returncode=1)
+            (Path(user_data_dir) / 'DevToolsActivePort').unlink()
+            with self.assertRaisesRegex(WebDriverException, 'exited'):
+                crawler._wait_devtools_url()
+
+    def test_factory(self):
+        self.assertIs(get_crawler_cls('cdp'), CDPCrawler)
+        with self.assertRaisesRegex(AssertionError, 'type_ not in'):
+            get_crawler_cls('firefox')
+
+    @unittest.skipIf(find_chrome_binary() is None, "chrome is not installed.")
+    def test_live(self):
+        with create_crawler('cdp', headless=True) as crawler:
+            result = crawler.try_get('data:text/html,<p>Balance</p>', key_msg='Balance')
+            self.assertTrue(result.ok)
+            self.assertIsNotNone(crawler.process)
+        self.assertFalse(Path(crawler.user_data_dir).exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
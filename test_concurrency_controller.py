@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/19 21:40
+# @Author  : Histranger
+# @File    : test_concurrency_controller.py
+# @Software: PyCharm
+import logging
+import threading
+import time
+import unittest
+from unittest import mock
+
+from concurrency_controller import ConcurrencyConfig, ConcurrencyController
+from crawler_base import TryGetResult
+from crawler_pool import CrawlerPool, crawl_many
+from retry_policy import AttemptRecord
+from test_fakes import SleepCrawler
+
+logging.basicConfig(level=logging.INFO)
+
+GiB = 1 << 30
+
+
+def result(elapsed, failure=None):
+    outcome = 'ok' if failure is None else 'webdriver_exception'
+    return TryGetResult(ok=failure is None, msg="", attempts=[AttemptRecord(1, outcome, failure, "", elapsed)])
+
+
+class TimedCrawler(SleepCrawler):
+    """
+    Records the attempt like BaseCrawler.try_get, and how many crawlers run at the same time.
+    """
+    running = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def try_get(self, url, **kwargs):
+        with self.lock:
+            TimedCrawler.running += 1
+            TimedCrawler.peak = max(TimedCrawler.peak, TimedCrawler.running)
+        t0 = time.perf_counter()
+        try:
+            ret = super().try_get(url, **kwargs)
+        finally:
+            with self.lock:
+                TimedCrawler.running -= 1
+        ret.attempts = [AttemptRecord(1, 'ok', None, ret.msg, time.perf_counter() - t0)]
+        return ret
+
+
+class ConcurrencyControllerTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.load = 0.2
+        self.mem = 8 * GiB
+        for patcher in (mock.patch('concurrency_controller.load_per_cpu', lambda: self.load),
+                        mock.patch('concurrency_controller.mem_available', lambda: self.mem)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.controller = ConcurrencyController(ConcurrencyConfig(min_size=1, max_size=10, min_samples=4,
+                                                                  decrease_cooldown=30))
+
+    def observe(self, elapsed, n=4, failure=None):
+        for _ in range(n):
+            self.controller.observe(result(elapsed, failure))
+
+    def test_slow_start_then_aimd(self):
+        decide = self.controller.decide
+        self.assertEqual(decide(2, 2, now=0).reason, "0 samples < 4")
+        self.observe(1.0)
+        self.assertEqual((decide(2, 2, now=0).action, decide(2, 2, now=0).new), ('increase', 4))
+        self.assertEqual(decide(2, 1, now=0).action, 'hold')  # 有空闲的浏览器
+
+        self.controller.pool = mock.Mock(size=8, in_use=8, max_size=10)
+        self.controller._samples.clear()
+        self.observe(2.0)
+        decision = self.controller.tick(now=100)
+        self.assertEqual((decision.action, decision.new), ('decrease', 5))
+        self.assertIn('baseline 1.05s', decision.reason)
+        self.controller.pool.resize.assert_called_once_with(5)
+        self.assertEqual(len(self.controller._samples), 0)
+
+        # 第一次减小之后加性增大
+        self.observe(1.0)
+        self.assertEqual(decide(5, 5, now=200).new, 6)
+        self.assertEqual(decide(10, 10, now=200).reason, "already at max_size")
+
+    def test_host_resources(self):
+        self.load = 3.0
+        decision = self.controller.decide(4, 4, now=100)
+        self.assertEqual((decision.action, decision.new, decision.reason), ('decrease', 2, "load 3.00/cpu > 1.0"))
+        self.controller._last_decrease = 90
+        self.assertEqual(self.controller.decide(4, 4, now=100).reason, "load 3.00/cpu > 1.0, cooling down")
+        self.assertEqual(self.controller.decide(1, 1, now=200).reason, "load 3.00/cpu > 1.0, already at min_size")
+
+        self.load, self.mem = 0.2, GiB // 2
+        self.assertEqual(self.controller.decide(4, 4, now=200).new, 2)
+        self.mem = GiB + (100 << 20)
+        self.observe(1.0)
+        self.assertIn("no room for another browser", self.controller.decide(4, 4, now=200).reason)
+
+    def test_error_rate(self):
+        self.observe(1.0, n=3)
+        self.observe(1.0, n=3, failure='timeout')
+        self.observe(1.0, n=5, failure='dns')  # host的问题，不计入
+        decision = self.controller.decide(4, 4, now=100)
+        self.assertEqual((decision.action, decision.new, decision.reason), ('decrease', 2, "error rate 27% > 20%"))
+
+    def test_pool_resize(self):
+        with CrawlerPool(SleepCrawler, size=4, max_size=6) as pool:
+            crawlers = [slot.crawler for slot in pool._idle]
+            with pool.checkout() as borrowed:
+                pool.resize(1)
+                self.assertEqual((pool.size, pool.in_use, sum(_.closed for _ in crawlers)), (1, 1, 3))
+            self.assertFalse(borrowed.closed)
+            pool.resize(6)
+            with self.assertRaises(AssertionError):
+                pool.resize(7)
+
+    def test_crawl_many(self):
+        TimedCrawler.peak = 0
+        controller = ConcurrencyController(ConcurrencyConfig(min_size=1, max_size=4, interval=0.05, min_samples=2))
+        urls = ['https://example.com/0.02'] * 60
+        results = list(crawl_many(urls, crawler_cls=TimedCrawler, controller=controller))
+        self.assertEqual(len(results), 60)
+        self.assertIsNone(controller._thread)
+        self.assertTrue(any(_.action == 'increase' for _ in controller.decisions))
+        self.assertGreater(TimedCrawler.peak, 1)
+        self.assertLessEqual(TimedCrawler.peak, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
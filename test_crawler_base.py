@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 12:10
+# @Author  : Histranger
+# @File    : test_crawler_base.py
+# @Software: PyCharm
+import logging
+import re
+import unittest
+
+from selenium.common import WebDriverException
+
+from test_fakes import FakeCrawler, FakeDriver, perf_entry
+
+logging.basicConfig(level=logging.INFO)
+
+
+class TryGetTestCase(unittest.TestCase):
+    url = 'https://example.com/'
+    url_404 = 'https://example.com/404'
+    url_down = 'https://down.example.com/'
+
+    def setUp(self) -> None:
+        self.cc = FakeCrawler({
+            self.url: '<h1>Welcome</h1><p>ERR_ is only a word here</p>',
+            self.url_404: '<h1>404  Not Found</h1><hr>nginx',
+            self.url_down: WebDriverException('net::ERR_NAME_NOT_RESOLVED'),
+        })
+
+    def test_ok(self):
+        ok, msg = self.cc.try_get(self.url_404, err_msg='ERR_')
+        self.assertTrue(ok, msg)
+        self.assertEqual(msg, f"get url[{self.url_404}] OK.")
+        self.assertEqual(self.cc.driver.page_source_reads, 1)
+
+    def test_err_msg(self):
+        result = self.cc.try_get(self.url_404, interval=0, err_msg=['ERR_', re.compile(r'404\s+not found', re.I)])
+        self.assertFalse(result.ok)
+        self.assertEqual(result.marker, r'404\s+not found')
+        self.assertEqual(result.msg, r"err_msg[404\s+not found] in page source.")
+        # 每次尝试只读取一次page_source
+        self.assertEqual(self.cc.driver.page_source_reads, 3)
+
+    def test_key_msg(self):
+        result = self.cc.try_get(self.url, key_msg=['nginx', 'Welcome'])
+        self.assertTrue(result.ok, result.msg)
+        self.assertEqual(result.marker, 'Welcome')
+        self.assertEqual(self.cc.pages, 1)
+
+    def test_key_msg_missing(self):
+        ok, msg = self.cc.try_get(self.url_404, interval=0, retries=2, key_msg=['Welcome', 'Hello'])
+        self.assertFalse(ok)
+        self.assertEqual(msg, "key_msg[Welcome|Hello] NOT in page source.")
+        self.assertEqual(self.cc.pages, 2)
+
+    def test_webdriver_exception(self):
+        ok, msg = self.cc.try_get(self.url_down, interval=0)
+        self.assertFalse(ok)
+        self.assertIn('WebDriverException', msg)
+
+
+class EventDriver(FakeDriver):
+    """
+    Puts the main document response (url ==> (status, headers)) into the performance log on get.
+    """
+
+    def __init__(self, pages, responses):
+        super().__init__(pages)
+        self.responses = responses
+        self.log = [perf_entry('Network.responseReceived', type='Document',
+                               response={'url': 'https://example.com/old', 'status': 429, 'headers': {}})]
+
+    def get(self, url):
+        super().get(url)
+        status, headers = self.responses[url]
+        for type_, url_ in (('Document', url), ('Document', url + 'iframe'), ('Script', url + 'app.js')):
+            response = {'url': url_, 'status': status if url_ == url else 200, 'headers': headers}
+            self.log.append(perf_entry('Network.responseReceived', type=type_, response=response))
+
+    def get_log(self, type_):
+        log, self.log = self.log, []
+        return log
+
+
+class RetryAfterTestCase(unittest.TestCase):
+    url = 'https://example.com/'
+    url_429 = 'https://example.com/429'
+
+    def setUp(self) -> None:
+        pages = {self.url: '<p>Balance</p>', self.url_429: '<h1>Too Many Requests</h1>'}
+        self.cc = FakeCrawler(driver=EventDriver(pages, {
+            self.url: (200, {}),
+            self.url_429: (429, {'retry-after': '120', 'Content-Type': 'text/html'}),
+        }), cdp_events=True)
+
+    def test_retry_after(self):
+        result = self.cc.try_get(self.url_429, interval=0, retries=3, key_msg='Balance')
+        self.assertEqual((result.ok, result.retry_after), (False, 120.0))
+        # 服务器要求等待，不再立即重试
+        self.assertEqual(self.cc.pages, 1)
+        self.assertEqual(repr(self.cc.cdp_events), "CDPEventLog(listeners=0)")
+
+        result = self.cc.try_get(self.url, key_msg='Balance')
+        self.assertEqual((result.ok, result.retry_after), (True, None))
+
+    def test_without_events(self):
+        self.cc.cdp_events = None
+        result = self.cc.try_get(self.url_429, interval=0, retries=2, key_msg='Balance')
+        self.assertEqual((result.retry_after, self.cc.pages), (None, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 11:05
+# @Author  : Histranger
+# @File    : test_crawler_pool.py
+# @Software: PyCharm
+import logging
+import tempfile
+import threading
+import time
+import unittest
+
+from crawler_pool import CrawlerPool, crawl_many
+from test_fakes import SleepCrawler
+from url_seen import SeenSet
+
+logging.basicConfig(level=logging.INFO)
+
+
+class CrawlerPoolTestCase(unittest.TestCase):
+
+    def test_warm_and_reuse(self):
+        with CrawlerPool(SleepCrawler, size=2, headless=True) as pool:
+            self.assertEqual(pool.stats.launches, 2)
+            with pool.checkout() as c1:
+                self.assertEqual(c1.kwargs, {'headless': True})
+            with pool.checkout() as c2:
+                self.assertIs(c1, c2)
+            self.assertEqual(pool.stats.launches, 2)
+            self.assertEqual(pool.stats.checkouts, 2)
+
+    def test_recycle_by_pages(self):
+        with CrawlerPool(SleepCrawler, size=1, max_pages=3) as pool:
+            with pool.checkout() as c1:
+                c1.pages = 3
+            with pool.checkout() as c2:
+                self.assertIsNot(c1, c2)
+            self.assertTrue(c1.closed)
+            self.assertEqual(pool.stats.recycles, 1)
+
+    def test_recycle_by_idle(self):
+        with CrawlerPool(SleepCrawler, size=1, max_idle=0.05) as pool:
+            with pool.checkout() as c1:
+                pass
+            time.sleep(0.1)
+            with pool.checkout() as c2:
+                self.assertIsNot(c1, c2)
+
+    def test_recycle_unhealthy(self):
+        with CrawlerPool(SleepCrawler, size=1) as pool:
+            with pool.checkout() as c1:
+                c1.driver.alive = False
+            with pool.checkout() as c2:
+                self.assertIsNot(c1, c2)
+            self.assertEqual(pool.stats.health_check_failures, 1)
+
+    def test_checkout_timeout(self):
+        with CrawlerPool(SleepCrawler, size=1) as pool:
+            with pool.checkout():
+                with self.assertRaises(TimeoutError):
+                    with pool.checkout(timeout=0.05):
+                        pass
+
+    def test_threads(self):
+        in_use = set()
+        lock = threading.Lock()
+        errors = []
+
+        def work(pool):
+            for _ in range(20):
+                with pool.checkout() as c:
+                    with lock:
+                        if id(c) in in_use:
+                            errors.append("crawler checked out twice.")
+                        in_use.add(id(c))
+                    time.sleep(0.001)
+                    with lock:
+                        in_use.discard(id(c))
+
+        with CrawlerPool(SleepCrawler, size=3, warm=False) as pool:
+            threads = [threading.Thread(target=work, args=(pool,)) for _ in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            self.assertFalse(errors, errors)
+            self.assertLessEqual(pool.stats.launches, 3)
+            self.assertEqual(pool.stats.checkouts, 160)
+
+    def test_close_closes_crawlers(self):
+        pool = CrawlerPool(SleepCrawler, size=2)
+        with pool.checkout() as c1:
+            pool.close()
+        self.assertTrue(c1.closed)
+        with self.assertRaises(RuntimeError):
+            with pool.checkout():
+                pass
+
+
+class CrawlManyTestCase(unittest.TestCase):
+
+    def test_stream_as_completed(self):
+        urls = ['https://example.com/0.2', 'https://example.com/0.01', 'https://example.com/0.05']
+        results = list(crawl_many(urls, concurrency=3, crawler_cls=SleepCrawler))
+        self.assertEqual([_.url for _ in results], [urls[1], urls[2], urls[0]])
+        self.assertTrue(all(_.ok for _ in results))
+
+    def test_backpressure(self):
+        consumed = []
+
+        def urls():
+            for i in range(1000):
+                consumed.append(i)
+                yield 'https://example.com/0'
+
+        with CrawlerPool(SleepCrawler, size=2) as pool:
+            stream = crawl_many(urls(), concurrency=2, pool=pool)
+            for _ in range(5):
+                next(stream)
+            stream.close()
+            self.assertLessEqual(len(consumed), 5 + 2)
+            # 关闭后pool仍然可用，且crawler均已归还
+            with pool.checkout(timeout=1):
+                pass
+
+    def test_stop_event(self):
+        stop_event = threading.Event()
+        results = []
+        for result in crawl_many(('https://example.com/0' for _ in range(1000)), concurrency=2,
+                                 crawler_cls=SleepCrawler, stop_event=stop_event):
+            results.append(result)
+            if len(results) == 3:
+                stop_event.set()
+        self.assertLessEqual(len(results), 3 + 2)
+
+    def test_seen_after_completion(self):
+        urls = ['https://example.com/ok/0', 'https://example.com/fail/0', 'https://EXAMPLE.com/ok/0#x']
+        with tempfile.TemporaryDirectory() as root, SeenSet(root, capacity=1000) as seen:
+            FlakyCrawler.failing = True
+            first = list(crawl_many(urls, concurrency=2, crawler_cls=FlakyCrawler, seen=seen))
+            self.assertEqual(sorted((_.url, _.ok) for _ in first),
+                             [('https://example.com/fail/0', False), ('https://example.com/ok/0', True)])
+            self.assertNotIn('https://example.com/fail/0', seen)
+
+            # 失败的url下次运行时重新访问
+            FlakyCrawler.failing = False
+            second = list(crawl_many(urls, concurrency=2, crawler_cls=FlakyCrawler, seen=seen))
+            self.assertEqual([(_.url, _.ok) for _ in second], [('https://example.com/fail/0', True)])
+            self.assertIn('https://example.com/fail/0', seen)
+
+    def test_launch_failure(self):
+        launches = []
+
+        class LaunchFailCrawler(SleepCrawler):
+            def __init__(self, **kwargs):
+                launches.append(1)
+                if len(launches) == 2:
+                    raise RuntimeError("chrome failed to start.")
+                super().__init__(**kwargs)
+
+        urls = [f'https://example.com/{i}/0.01' for i in range(6)]
+        with CrawlerPool(LaunchFailCrawler, size=2, warm=False) as pool:
+            results = list(crawl_many(urls, pool=pool))
+            # 一次启动失败只影响一个url，其余的url继续访问
+            self.assertEqual(sorted(_.url for _ in results), urls)
+            self.assertEqual([_.msg for _ in results if not _.ok], ["RuntimeError('chrome failed to start.')"])
+            self.assertEqual(pool.stats.launch_failures, 1)
+
+
+class FlakyCrawler(SleepCrawler):
+    failing = True
+
+    def try_get(self, url, **kwargs):
+        if self.failing and '/fail/' in url:
+            raise RuntimeError("browser crashed.")
+        return super().try_get(url, **kwargs)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/19 14:10
+# @Author  : Histranger
+# @File    : test_dom_snapshot.py
+# @Software: PyCharm
+import unittest
+
+from dom_snapshot import _CHUNK_JS, _SNAPSHOT_JS, DOMSnapshot
+from test_fakes import FakeCrawler
+
+TABLE = '<table id="txs">' + ''.join(f'<tr><td>0x{i:04x}</td><td>Ξ{i}</td></tr>' for i in range(100)) + '</table>'
+PAGE = f'<html><body><div id="balance">Balance: 1 ETH</div>{TABLE}<footer>{"x" * 10000}</footer></body></html>'
+
+
+class SnapshotDriver:
+    """
+    Emulates the injected scripts for the elements #balance and #txs.
+    """
+
+    elements = {'#balance': ('<div id="balance">Balance: 1 ETH</div>', 'Balance: 1 ETH'), '#txs': (TABLE, 'txs')}
+
+    def __init__(self):
+        self.cursors = {}
+        self.calls = 0
+
+    @property
+    def page_source(self):
+        return PAGE
+
+    def get(self, url):
+        pass
+
+    def execute_script(self, script, *args):
+        self.calls += 1
+        if script == _SNAPSHOT_JS:
+            selector, mode, all_ = args
+            parts = [self.elements[_][mode == 'text'] for _ in selector.split(', ') if _ in self.elements]
+            return parts if all_ else (parts[0] if parts else None)
+        assert script == _CHUNK_JS
+        op, snapshot_id = args[:2]
+        if op == 'open':
+            if args[2] not in self.elements:
+                return None
+            self.cursors[snapshot_id] = self.elements[args[2]][args[3] == 'text']
+            return True
+        if op == 'close':
+            self.cursors.pop(snapshot_id, None)
+            return None
+        rest = self.cursors.get(snapshot_id)
+        if not rest:
+            self.cursors.pop(snapshot_id, None)
+            return None
+        self.cursors[snapshot_id] = rest[args[2]:]
+        return rest[:args[2]]
+
+
+class DOMSnapshotTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.driver = SnapshotDriver()
+        self.dom = DOMSnapshot(self.driver)
+
+    def test_outer_html(self):
+        self.assertEqual(self.dom.outer_html('#txs'), TABLE)
+        self.assertEqual(self.dom.text('#balance'), 'Balance: 1 ETH')
+        self.assertIsNone(self.dom.outer_html('#nothing'))
+        self.assertEqual(self.dom.outer_html('#balance, #txs', all=True), [SnapshotDriver.elements['#balance'][0], TABLE])
+        self.assertEqual(self.dom.stats.round_trips, 4)
+        balance_html, balance_text = SnapshotDriver.elements['#balance']
+        self.assertEqual(self.dom.stats.bytes, len(TABLE.encode('utf-8')) * 2 + len(balance_text) + len(balance_html))
+
+    def test_iter_html(self):
+        chunks = list(self.dom.iter_html('#txs', chunk_size=1000))
+        self.assertEqual(''.join(chunks), TABLE)
+        self.assertTrue(all(len(_) <= 1000 for _ in chunks))
+        self.assertEqual(self.dom.stats.bytes, len(TABLE.encode('utf-8')))
+        self.assertEqual(self.driver.cursors, {})
+        self.assertEqual(list(self.dom.iter_html('#nothing')), [])
+
+    def test_iter_close(self):
+        chunks = self.dom.iter_html('#txs', chunk_size=100)
+        next(chunks)
+        self.assertEqual(len(self.driver.cursors), 1)
+        chunks.close()
+        self.assertEqual(self.driver.cursors, {})
+
+    def test_try_get(self):
+        cc = FakeCrawler(driver=SnapshotDriver())
+        result = cc.try_get('https://etherscan.io/address/0x', key_msg='Balance', snapshot='#txs')
+        self.assertFalse(result.ok)  # Balance不在#txs中
+        self.assertEqual(result.page_source, TABLE)
+        result = cc.try_get('https://etherscan.io/address/0x', key_msg='Balance', snapshot='#balance', retries=1)
+        self.assertTrue(result.ok)
+        cc.try_get('https://etherscan.io/address/0x', key_msg='Balance', retries=1)
+        self.assertGreater(cc.dom.stats.bytes, len(PAGE))
+        self.assertEqual(cc.dom.stats.round_trips, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 14:55
+# @Author  : Histranger
+# @File    : test_driver_resolver.py
+# @Software: PyCharm
+import json
+import logging
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from driver_resolver import DriverResolver
+
+logging.basicConfig(level=logging.INFO)
+
+
+class DriverResolverTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.manifest_path = self.root / 'manifest.json'
+        self.installs = 0
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def installer(self) -> str:
+        self.installs += 1
+        path = self.root / f'chromedriver-{self.installs}'
+        path.write_text('')
+        return str(path)
+
+    def resolver(self, version='116.0.5845.96') -> DriverResolver:
+        return DriverResolver(self.manifest_path, installer=self.installer, version_detector=lambda: version)
+
+    def test_resolve_once_per_process(self):
+        resolver = self.resolver()
+        threads = [threading.Thread(target=resolver.resolve) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(self.installs, 1)
+        self.assertEqual(json.loads(self.manifest_path.read_text()), {'116.0.5845.96': resolver.resolve()})
+
+    def test_shared_manifest(self):
+        path = self.resolver().resolve()
+        # 另一个进程中的resolver直接读取manifest
+        self.assertEqual(self.resolver().resolve(), path)
+        self.assertEqual(self.installs, 1)
+        # Chrome升级后重新安装
+        self.assertNotEqual(self.resolver('117.0.5938.62').resolve(), path)
+        self.assertEqual(self.installs, 2)
+
+    def test_stale_manifest(self):
+        path = self.resolver().resolve()
+        Path(path).unlink()
+        self.assertNotEqual(self.resolver().resolve(), path)
+
+    def test_unknown_version(self):
+        resolver = self.resolver(None)
+        self.assertEqual(resolver.resolve(), resolver.resolve())
+        self.assertFalse(self.manifest_path.exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
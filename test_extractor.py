@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/19 13:00
+# @Author  : Histranger
+# @File    : test_extractor.py
+# @Software: PyCharm
+import pickle
+import unittest
+
+from selenium.webdriver.common.by import By
+
+from extractor import MISSING, Extractor, Field, compile_schema, missing_fields
+from test_fakes import FakeCrawler
+
+
+class ScriptResultDriver:
+    """
+    Returns a canned result of the injected script and records the calls.
+    """
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.calls = []
+
+    def execute_script(self, script, *args):
+        self.calls.append(args)
+        return self.raw
+
+
+SCHEMA = {
+    'balance': '#balance',
+    'value': Field('#value', type_=float),
+    'title': Field('//title', by=By.XPATH),
+    'txs': Field('#txs tr', many=True, fields={
+        'hash': 'td a',
+        'block': Field('td.block', type_=int),
+        'href': Field('td a', attr='href'),
+    }),
+    'tags': Field('.tag', many=True),
+    'gone': Field('#gone', default=''),
+    'bad': Field('div[', default=None),
+}
+
+RAW = {
+    'balance': '  0.1 ETH\n',
+    'value': '$1,234.50',
+    'title': 'Address | Etherscan',
+    'txs': [
+        {'hash': '0xabc', 'block': '18,000,001', 'href': 'https://etherscan.io/tx/0xabc'},
+        {'hash': '0xdef', 'block': None, 'href': None},
+    ],
+    'tags': ['Exchange ', ' Binance'],
+    'gone': None,
+    'bad': {'__error__': "SyntaxError: 'div[' is not a valid selector"},
+}
+
+
+class ExtractorTestCase(unittest.TestCase):
+
+    def test_compile(self):
+        spec = compile_schema(SCHEMA)
+        self.assertEqual([_['name'] for _ in spec], list(SCHEMA))
+        self.assertEqual(spec[2]['by'], 'xpath')
+        self.assertEqual(spec[3]['fields'][2], {'name': 'href', 'selector': 'td a', 'by': 'css', 'attr': 'href',
+                                                'many': False})
+        with self.assertRaisesRegex(AssertionError, 'by not in'):
+            Field('#x', by='id')
+
+    def test_extract(self):
+        cc = FakeCrawler(driver=ScriptResultDriver(RAW))
+        data = cc.extract(SCHEMA, root='#content')
+        self.assertEqual(len(cc.driver.calls), 1)
+        self.assertEqual(cc.driver.calls[0][1], '#content')
+        self.assertEqual(data['balance'], '0.1 ETH')
+        self.assertIs(data['value'], MISSING)  # '$'无法转换为float
+        self.assertEqual(data['txs'][0], {'hash': '0xabc', 'block': 18000001, 'href': 'https://etherscan.io/tx/0xabc'})
+        self.assertEqual(data['tags'], ['Exchange', 'Binance'])
+        self.assertEqual((data['gone'], data['bad']), ('', None))
+        self.assertEqual(missing_fields(data), ['value', 'txs[1].block', 'txs[1].href'])
+
+    def test_root_missing(self):
+        extractor = Extractor(SCHEMA, root='#nothing')
+        data = extractor.extract(ScriptResultDriver(None))
+        self.assertEqual(data['txs'], [])
+        self.assertIs(data['balance'], MISSING)
+
+    def test_missing(self):
+        self.assertFalse(MISSING)
+        self.assertEqual(repr(MISSING), 'MISSING')
+        self.assertIs(pickle.loads(pickle.dumps(MISSING)), MISSING)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/20 10:00
+# @Author  : Histranger
+# @File    : test_fakes.py
+# @Software: PyCharm
+"""
+Fake drivers and crawlers shared by the tests, none of them starts a browser.
+
+- FakeDriver/FakeCrawler：url ==> page source，用于测试BaseCrawler.try_get及基于它的功能；
+- ScriptDriver/PoolCrawler：没有页面的crawler，用于CrawlerPool及基于它的batch_runner、scheduler等，
+  子类覆盖try_get；
+- CDPDriver：记录CDP命令，保存cookie和新文档脚本，按批返回performance日志。
+"""
+import json
+import time
+from typing import *
+
+from cdp_events import CDPEventLog
+from crawler_base import BaseCrawler, TryGetResult
+
+
+def perf_entry(method: str, **params) -> Dict:
+    """
+    :return: chromedriver performance日志中的一项
+    """
+    return {'level': 'INFO', 'message': json.dumps({'message': {'method': method, 'params': params}})}
+
+
+class FakeDriver:
+    """
+    url ==> page source, an Exception value will be raised by get.
+    """
+
+    def __init__(self, pages: Dict[str, Union[str, Exception]]):
+        self.pages = pages
+        self.current = None
+        self.current_url = None
+        self.gets = 0
+        self.page_source_reads = 0
+
+    def get(self, url):
+        self.gets += 1
+        page = self.pages[url]
+        if isinstance(page, Exception):
+            raise page
+        self.current = page
+        self.current_url = url
+
+    @property
+    def page_source(self):
+        self.page_source_reads += 1
+        return self.current
+
+
+class FakeCrawler(BaseCrawler):
+
+    def __init__(self, pages: Optional[Dict] = None, driver=None, cdp_events: bool = False):
+        """
+        :param pages: 用于FakeDriver，指定driver时忽略
+        :param driver: 其他的fake driver
+        :param cdp_events: 是否从driver的performance日志读取CDP事件
+        """
+        self.driver = driver if driver is not None else FakeDriver(pages or {})
+        self.cdp_events = CDPEventLog(self.driver) if cdp_events else None
+        self.pages = 0
+
+    def close(self):
+        pass
+
+
+class ScriptDriver:
+    """
+    Passes the health check of CrawlerPool until it dies.
+    """
+
+    def __init__(self):
+        self.alive = True
+
+    def execute_script(self, script, *args):
+        if not self.alive:
+            raise RuntimeError("driver is dead.")
+        return 1
+
+
+class PoolCrawler:
+    """
+    A crawler without browser, try_get always succeeds.
+    """
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.driver = ScriptDriver()
+        self.pages = 0
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+    def try_get(self, url, **kwargs):
+        self.pages += 1
+        return TryGetResult(ok=True, msg=f"get url[{url}] OK.", url=url)
+
+
+class SleepCrawler(PoolCrawler):
+    """
+    try_get sleeps for the seconds at the end of the url.
+    """
+
+    def try_get(self, url, **kwargs):
+        time.sleep(float(url.rsplit('/', 1)[-1]))
+        return super().try_get(url, **kwargs)
+
+
+class CDPDriver:
+    """
+    每次get_log依次返回batches中的一批performance日志，execute_script返回页面的localStorage。
+    """
+
+    def __init__(self, batches: Iterable[List[Dict]] = ()):
+        self.batches = list(batches)
+        self.cdp_cmds = []
+        self.cookies = []
+        self.scripts = []  # Page.addScriptToEvaluateOnNewDocument
+
+    def get_log(self, type_):
+        assert type_ == 'performance'
+        return self.batches.pop(0) if self.batches else []
+
+    def execute_cdp_cmd(self, cmd, params):
+        self.cdp_cmds.append((cmd, params))
+        if cmd == 'Network.getAllCookies':
+            return {'cookies': [dict(_, size=10) for _ in self.cookies]}
+        if cmd == 'Network.setCookies':
+            self.cookies = list(params['cookies'])
+        elif cmd == 'Page.addScriptToEvaluateOnNewDocument':
+            self.scripts.append(params['source'])
+        elif cmd == 'Page.getFrameTree':
+            return {'frameTree': {'frame': {'id': 'main'}}}
+        return {}
+
+    def execute_script(self, script, *args):
+        return ['https://etherscan.io', {'theme': 'dark'}]
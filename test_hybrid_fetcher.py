@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 17:45
+# @Author  : Histranger
+# @File    : test_hybrid_fetcher.py
+# @Software: PyCharm
+import logging
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from crawler_base import TryGetResult
+from hybrid_fetcher import DomainDecisions, HybridFetcher
+from test_fakes import PoolCrawler
+
+logging.basicConfig(level=logging.INFO)
+
+PAGES = {
+    '/ssr': (200, '<html><body><h1>Balance: 1 ETH</h1></body></html>'),
+    '/spa': (200, '<html><body><noscript>You need to enable JavaScript to run this app.</noscript>'
+                  '<div id="root"></div></body></html>'),
+    '/blocked': (403, '<html><body>Forbidden</body></html>'),
+}
+
+
+class Handler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        status, body = PAGES.get(self.path, (404, 'Not Found'))
+        body = body.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class BrowserCrawler(PoolCrawler):
+    """
+    Records the urls it is asked for, the page always has the key_msg.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.urls = []
+
+    def try_get(self, url, **kwargs):
+        self.urls.append(url)
+        return TryGetResult(ok=True, msg="key_msg[Balance] in page source.", url=url, marker='Balance')
+
+
+class HybridFetcherTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_port}"
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.server.shutdown()
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / 'decisions.json'
+        self.crawler = BrowserCrawler()
+        self.fetcher = HybridFetcher(self.crawler, decisions=DomainDecisions(self.path), learn_after=2)
+
+    def tearDown(self) -> None:
+        self.fetcher.close()
+        self.tmp.cleanup()
+
+    def test_http_fast_path(self):
+        result = self.fetcher.try_get(f"{self.base}/ssr", key_msg='Balance')
+        self.assertTrue(result.ok, result.msg)
+        self.assertEqual(result.via, 'http')
+        self.assertIn('1 ETH', result.page_source)
+        self.assertEqual(self.crawler.urls, [])
+
+    def test_fallback(self):
+        for path in ('/spa', '/blocked'):
+            result = self.fetcher.try_get(f"{self.base}{path}")
+            self.assertTrue(result.ok, result.msg)
+            self.assertEqual(result.via, 'browser')
+        # 标记判断失败时同样回退
+        result = self.fetcher.try_get(f"{self.base}/ssr", key_msg='Transactions')
+        self.assertEqual(result.via, 'browser')
+
+    def test_learn_and_persist(self):
+        self.fetcher.try_get(f"{self.base}/spa")
+        self.fetcher.try_get(f"{self.base}/spa")
+        host = self.base.split('//')[1]
+        self.assertEqual(self.fetcher.decisions.get(host).mode, 'browser')
+
+        # 另一次运行直接使用浏览器，不再尝试HTTP
+        fetcher = HybridFetcher(self.crawler, decisions=DomainDecisions(self.path), reprobe_every=3)
+        fetcher.http = None
+        fetcher.try_get(f"{self.base}/ssr")
+        fetcher.try_get(f"{self.base}/ssr")
+        self.assertEqual(len(self.crawler.urls), 4)
+
+        # 每reprobe_every次请求重新尝试一次HTTP，成功后重新开始尝试HTTP
+        fetcher.http = self.fetcher.http
+        self.assertEqual(fetcher.try_get(f"{self.base}/ssr").via, 'http')
+        self.assertEqual(fetcher.decisions.get(host).mode, 'probe')
+
+
+    def test_reprobe_failed(self):
+        class FailedCrawler(BrowserCrawler):
+            def try_get(self, url, **kwargs):
+                self.urls.append(url)
+                return TryGetResult(ok=False, msg="key_msg[Balance] NOT in page source.", url=url)
+
+        host = self.base.split('//')[1]
+        self.fetcher.try_get(f"{self.base}/spa")
+        self.fetcher.try_get(f"{self.base}/spa")
+        fetcher = HybridFetcher(FailedCrawler(), decisions=self.fetcher.decisions, reprobe_every=2)
+        fetcher.try_get(f"{self.base}/spa")
+        self.assertEqual(fetcher.decisions.get(host).browser_requests, 1)
+
+        # 重新尝试HTTP，HTTP和浏览器都失败后重新计数
+        self.assertEqual(fetcher.try_get(f"{self.base}/spa").via, 'browser')
+        self.assertEqual((fetcher.decisions.get(host).mode, fetcher.decisions.get(host).browser_requests),
+                         ('browser', 0))
+        # 下一个请求直接使用浏览器，不再尝试HTTP
+        fetcher.http = None
+        fetcher.try_get(f"{self.base}/spa")
+        self.assertEqual(fetcher.decisions.get(host).browser_requests, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 23:40
+# @Author  : Histranger
+# @File    : test_metrics.py
+# @Software: PyCharm
+import logging
+import math
+import unittest
+import urllib.request
+
+from selenium.common import TimeoutException, WebDriverException
+
+from metrics import ATTEMPTS_TOTAL, PHASE_SECONDS, RETRIES, TRY_GET_TOTAL, Histogram, Registry, start_metrics_server
+from test_fakes import FakeCrawler
+
+logging.basicConfig(level=logging.INFO)
+
+
+class MetricsTestCase(unittest.TestCase):
+
+    def test_render(self):
+        registry = Registry()
+        counter = registry.counter('pages_total', "Pages.", ['outcome'])
+        counter.labels(outcome='ok').inc()
+        counter.labels(outcome='ok').inc(2)
+        counter.labels(outcome='a"b').inc()
+        histogram = registry.histogram('wait_seconds', "Waits.", buckets=(0.1, 1))
+        for value in (0.05, 0.5, 0.5, 3):
+            histogram.observe(value)
+        text = registry.render()
+        self.assertIn('# TYPE pages_total counter', text)
+        self.assertIn('pages_total{outcome="ok"} 3', text)
+        self.assertIn('pages_total{outcome="a\\"b"} 1', text)
+        self.assertIn('wait_seconds_bucket{le="0.1"} 1', text)
+        self.assertIn('wait_seconds_bucket{le="1"} 3', text)
+        self.assertIn('wait_seconds_bucket{le="+Inf"} 4', text)
+        self.assertIn('wait_seconds_sum 4.05', text)
+        self.assertIn('wait_seconds_count 4', text)
+        self.assertIs(registry.counter('pages_total', "Pages.", ['outcome']), counter)
+
+        gauge = registry.gauge('browsers', "Browsers.")
+        gauge.set(3)
+        gauge.inc()
+        self.assertIn('# TYPE browsers gauge', registry.render())
+        self.assertIn('browsers 4', registry.render())
+
+    def test_quantile(self):
+        histogram = Histogram('h', "h", buckets=(1, 2, 3, 4))
+        self.assertTrue(math.isnan(histogram.quantile(0.5)))
+        for value in (0.5, 1.5, 2.5, 3.5):
+            histogram.observe(value)
+        self.assertAlmostEqual(histogram.quantile(0.5), 2.0)
+        self.assertAlmostEqual(histogram.quantile(1.0), 4.0)
+
+    def test_server(self):
+        registry = Registry()
+        registry.counter('up', "Up.").inc()
+        server = start_metrics_server(0, registry=registry)
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+            with urllib.request.urlopen(url) as response:
+                self.assertIn('text/plain', response.headers['Content-Type'])
+                self.assertIn('up 1', response.read().decode('utf-8'))
+        finally:
+            server.shutdown()
+
+    def test_try_get(self):
+        crawler = FakeCrawler({
+            'https://example.com/': '<p>Balance</p>',
+            'https://example.com/404': '404 Not Found',
+            'https://down.example.com/': WebDriverException('net::ERR_NAME_NOT_RESOLVED'),
+            'https://slow.example.com/': TimeoutException('timeout'),
+        })
+        ok = TRY_GET_TOTAL.labels(outcome='ok').value
+        missing = ATTEMPTS_TOTAL.labels(outcome='key_msg_missing').value
+        errors = ATTEMPTS_TOTAL.labels(outcome='webdriver_exception').value
+        timeouts = TRY_GET_TOTAL.labels(outcome='timeout').value
+        navigations = PHASE_SECONDS.labels(phase='navigate').count
+        sleeps = PHASE_SECONDS.labels(phase='retry_sleep').count
+        retries = RETRIES.count
+
+        self.assertEqual(crawler.try_get('https://example.com/', key_msg='Balance').outcome, 'ok')
+        self.assertEqual(crawler.try_get('https://example.com/404', key_msg='Balance', interval=0).outcome,
+                         'key_msg_missing')
+        crawler.try_get('https://down.example.com/', retries=2, interval=0)
+        crawler.try_get('https://slow.example.com/', retries=1)
+
+        self.assertEqual(TRY_GET_TOTAL.labels(outcome='ok').value - ok, 1)
+        self.assertEqual(ATTEMPTS_TOTAL.labels(outcome='key_msg_missing').value - missing, 3)
+        self.assertEqual(ATTEMPTS_TOTAL.labels(outcome='webdriver_exception').value - errors, 2)
+        self.assertEqual(TRY_GET_TOTAL.labels(outcome='timeout').value - timeouts, 1)
+        self.assertEqual(PHASE_SECONDS.labels(phase='navigate').count - navigations, 7)
+        self.assertEqual(PHASE_SECONDS.labels(phase='retry_sleep').count - sleeps, 3)
+        self.assertEqual(RETRIES.count - retries, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/19 11:40
+# @Author  : Histranger
+# @File    : test_multi_tab.py
+# @Software: PyCharm
+import json
+import logging
+import threading
+import time
+import unittest
+
+from cdp_events import CDPEventLog
+from crawler_base import BaseCrawler
+from crawler_pool import crawl_many
+from multi_tab import MultiTabCrawler, tab_pool
+from readiness import Lifecycle
+
+logging.basicConfig(level=logging.INFO)
+
+
+class FakePage:
+    """
+    A CDPPage-like target, get takes 0.1s.
+    """
+
+    def __init__(self):
+        self.url = 'about:blank'
+        self.closed = False
+
+    def get(self, url):
+        time.sleep(0.1)
+        self.url = url
+
+    @property
+    def page_source(self):
+        return f'<p>Balance of {self.url}</p>'
+
+    def execute_script(self, script, *args):
+        return 1
+
+    def close(self):
+        self.closed = True
+
+
+class FakeCDPCrawler(BaseCrawler):
+
+    def __init__(self):
+        self.driver = FakePage()
+        self.pages_opened = []
+        self.closed = False
+
+    def new_page(self):
+        page = FakePage()
+        self.pages_opened.append(page)
+        return page
+
+    def create_event_source(self, page):
+        raise AssertionError("normal page load strategy needs no events.")
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSwitchTo:
+
+    def __init__(self, driver):
+        self.driver = driver
+
+    def new_window(self, type_hint=None):
+        handle = f'W{len(self.driver.windows)}'
+        self.driver.windows[handle] = 'about:blank'
+        self.driver.current_window_handle = handle
+
+    def window(self, handle):
+        assert handle in self.driver.windows
+        self.driver.switches += 1
+        self.driver.current_window_handle = handle
+
+
+class FakeWebDriver:
+    """
+    One WebDriver session: commands act on the current window only.
+    """
+
+    def __init__(self):
+        self.windows = {'W0': 'about:blank'}
+        self.current_window_handle = 'W0'
+        self.switch_to = FakeSwitchTo(self)
+        self.switches = 0
+        self._busy = threading.Lock()
+        # 整个会话共享的performance日志，in_flight是导航期间其他窗口到达的响应
+        self.log = []
+        self.in_flight = []
+
+    def get(self, url):
+        # WebDriver命令不能并发
+        assert self._busy.acquire(blocking=False), "concurrent WebDriver commands."
+        try:
+            time.sleep(0.01)
+            self.windows[self.current_window_handle] = url
+            self.log.extend(self.in_flight)
+            self.in_flight = []
+            self.log.append(document_entry(self.current_window_handle, url))
+        finally:
+            self._busy.release()
+
+    def get_log(self, log_type):
+        log, self.log = self.log, []
+        return log
+
+    def execute_cdp_cmd(self, cmd, params):
+        return {}
+
+    @property
+    def page_source(self):
+        url = self.windows[self.current_window_handle]
+        return 'Too Many Requests' if url.endswith('/429') else f'<p>Balance of {url}</p>'
+
+    def execute_script(self, script, *args):
+        return 1
+
+    def close(self):
+        del self.windows[self.current_window_handle]
+
+
+def document_entry(webview, url):
+    status, headers = (429, {'Retry-After': '30'}) if url.endswith('/429') else (200, {})
+    message = {'method': 'Network.responseReceived',
+               'params': {'type': 'Document', 'response': {'url': url, 'status': status, 'headers': headers}}}
+    return {'message': json.dumps({'webview': webview, 'message': message})}
+
+
+class FakeChromeCrawler(BaseCrawler):
+
+    def __init__(self, track_responses=False):
+        self.driver = FakeWebDriver()
+        self.track_responses = track_responses
+        self.cdp_events = CDPEventLog(self.driver) if track_responses else None
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class MultiTabTestCase(unittest.TestCase):
+    urls = [f'https://etherscan.io/address/{i}' for i in range(16)]
+
+    def check_results(self, results):
+        self.assertEqual(sorted(_.url for _ in results), sorted(self.urls))
+        for result in results:
+            self.assertTrue(result.ok)
+            self.assertIn(result.url, result.page_source)
+
+    def test_cdp_tabs_parallel(self):
+        crawler = FakeCDPCrawler()
+        with MultiTabCrawler(crawler, tabs=8) as browser:
+            t0 = time.perf_counter()
+            with browser.tab_pool() as pool:
+                self.assertEqual(browser.open_tabs, 8)
+                results = list(crawl_many(self.urls, concurrency=8, pool=pool, key_msg='Balance'))
+            elapsed = time.perf_counter() - t0
+            self.check_results(results)
+            self.assertLess(elapsed, 1.0)  # 串行需要1.6s
+            self.assertEqual(browser.open_tabs, 0)
+        self.assertTrue(all(_.closed for _ in crawler.pages_opened))
+        self.assertFalse(crawler.driver.closed)
+        self.assertTrue(crawler.closed)
+
+    def test_webdriver_tabs(self):
+        crawler = FakeChromeCrawler()
+        with MultiTabCrawler(crawler, tabs=4) as browser:
+            with browser.tab_pool() as pool:
+                self.assertEqual(len(crawler.driver.windows), 5)
+                results = list(crawl_many(self.urls, concurrency=4, pool=pool, key_msg='Balance'))
+            self.check_results(results)
+            self.assertEqual(list(crawler.driver.windows), ['W0'])
+
+    def test_webdriver_tab_events(self):
+        crawler = FakeChromeCrawler(track_responses=True)
+        with MultiTabCrawler(crawler) as browser:
+            tab1, tab2 = browser.new_tab(), browser.new_tab()
+            # tab2的响应在tab1导航期间写入共享的日志，不能被当作tab1的主文档
+            crawler.driver.in_flight = [document_entry(tab2.driver.window_handle, self.urls[1])]
+            result = tab1.try_get('https://etherscan.io/429', key_msg='Balance', retries=1)
+            self.assertEqual((result.ok, result.retry_after), (False, 30.0))
+
+            # tab1的429在tab2导航期间到达，tab2读取日志时不会丢失tab1的事件
+            document = []
+            tab1.cdp_events.subscribe(lambda method, params: document.append(params['response']['status']))
+            crawler.driver.in_flight = [document_entry(tab1.driver.window_handle, 'https://etherscan.io/429')]
+            result = tab2.try_get(self.urls[1], key_msg='Balance', retries=1)
+            self.assertEqual((result.ok, result.retry_after), (True, None))
+            self.assertEqual(document, [429])
+
+    def test_ready_copied(self):
+        crawler = FakeChromeCrawler()
+        browser = MultiTabCrawler(crawler)
+        tab = browser.new_tab()
+        ready = Lifecycle('load')
+        tab.driver.execute_script = lambda script, *args: True
+        self.assertTrue(tab.try_get(self.urls[0], ready=ready).ok)
+        self.assertFalse(ready.navigation)
+        browser.close()
+
+    def test_tab_pool(self):
+        crawlers = [FakeCDPCrawler(), FakeCDPCrawler()]
+        with tab_pool(crawlers, tabs=3) as pool:
+            self.assertEqual(pool.size, 6)
+            self.assertEqual([len(_.pages_opened) for _ in crawlers], [3, 3])
+            results = list(crawl_many(self.urls, concurrency=6, pool=pool, key_msg='Balance'))
+        self.check_results(results)
+        self.assertFalse(any(_.closed for _ in crawlers))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 21:30
+# @Author  : Histranger
+# @File    : test_page_cache.py
+# @Software: PyCharm
+import logging
+import multiprocessing
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from page_cache import CachedPage, PageCache, cache_key
+from test_fakes import FakeCrawler, FakeDriver
+
+logging.basicConfig(level=logging.INFO)
+
+
+class RedirectDriver(FakeDriver):
+    """
+    Every url is redirected to url?redirected=1.
+    """
+
+    def get(self, url):
+        super().get(url)
+        self.current_url = url + '?redirected=1'
+
+
+def _put_pages(path, start):
+    with PageCache(path) as cache:
+        for i in range(start, start + 50):
+            cache.put(cache_key(f'https://example.com/{i}'), CachedPage(f'https://example.com/{i}', None, 'x' * i, None, 'OK'))
+
+
+class PageCacheTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / 'pages.sqlite3'
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def page(self, i, size=100):
+        return CachedPage(f'https://example.com/{i}', None, os.urandom(size).hex(), 'Balance', 'OK')
+
+    def test_key(self):
+        self.assertEqual(cache_key('https://Example.com/a#x', {'b': 1, 'a': 2}), cache_key('https://example.com/a', {'a': 2, 'b': 1}))
+        self.assertNotEqual(cache_key('https://example.com/a', {'key_msg': 'A'}), cache_key('https://example.com/a', {'key_msg': 'B'}))
+
+    def test_put_get(self):
+        with PageCache(self.path) as cache:
+            self.assertIsNone(cache.get('k'))
+            cache.put('k', self.page(1))
+            page = cache.get('k')
+            self.assertEqual((page.url, page.marker), ('https://example.com/1', 'Balance'))
+            self.assertEqual((cache.stats.hits, cache.stats.misses, cache.stats.stores), (1, 1, 1))
+            cache.put('k', self.page(1, size=10))
+            self.assertEqual(len(cache), 1)
+            self.assertEqual(cache.size, cache._db.execute('SELECT SUM(size) FROM pages').fetchone()[0])
+
+    def test_ttl(self):
+        with PageCache(self.path, ttl=10) as cache:
+            cache.put('a', self.page(1), now=1000)
+            cache.put('b', self.page(2), ttl=100, now=1000)
+            self.assertIsNone(cache.get('a', now=1011))
+            self.assertIsNotNone(cache.get('b', now=1011))
+            self.assertEqual((cache.stats.expired, len(cache)), (1, 1))
+            # put时删除过期条目使用索引，不扫描整个表
+            plan = cache._db.execute('EXPLAIN QUERY PLAN DELETE FROM pages WHERE expires_at <= ?', (0,)).fetchall()
+            self.assertIn('pages_expires_at', str(plan))
+
+    def test_lru(self):
+        with PageCache(self.path) as cache:
+            for i in range(3):
+                cache.put(str(i), self.page(i, size=1000), now=1000 + i)
+            # 能放下3个页面，放不下4个
+            cache.max_bytes = cache.size + 100
+            cache.get('0', now=1010)
+            cache.put('3', self.page(3, size=1000), now=1011)
+            self.assertEqual(cache.stats.evictions, 1)
+            self.assertIsNone(cache.get('1', now=1012))
+            self.assertIsNotNone(cache.get('0', now=1012))
+            self.assertLessEqual(cache.size, cache.max_bytes)
+
+    def test_processes(self):
+        processes = [multiprocessing.Process(target=_put_pages, args=(self.path, i * 50)) for i in range(4)]
+        for _ in processes:
+            _.start()
+        for _ in processes:
+            _.join()
+        with PageCache(self.path) as cache:
+            self.assertEqual(len(cache), 200)
+            self.assertEqual(cache.get(cache_key('https://example.com/120')).page_source, 'x' * 120)
+
+    def test_try_get(self):
+        crawler = FakeCrawler(driver=RedirectDriver({'https://example.com/': '<p>Balance: 1 ETH</p>',
+                                                     'https://example.com/404': 'Not Found'}))
+        with PageCache(self.path) as cache:
+            first = crawler.try_get('https://example.com/', key_msg='Balance', cache=cache)
+            second = crawler.try_get('https://example.com/', key_msg='Balance', cache=cache)
+            self.assertEqual(crawler.driver.gets, 1)
+            self.assertEqual((first.via, second.via), ('browser', 'cache'))
+            self.assertEqual((second.ok, second.msg, second.marker), (first.ok, first.msg, first.marker))
+            self.assertEqual(second.final_url, 'https://example.com/?redirected=1')
+
+            # key_msg不同，不能复用判断结果
+            crawler.try_get('https://example.com/', key_msg='Token', retries=1, cache=cache)
+            self.assertEqual(crawler.driver.gets, 2)
+            # 失败的结果不缓存
+            crawler.try_get('https://example.com/404', key_msg='Balance', retries=1, cache=cache)
+            crawler.try_get('https://example.com/404', key_msg='Balance', retries=1, cache=cache)
+            self.assertEqual(crawler.driver.gets, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
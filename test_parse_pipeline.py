@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/19 15:40
+# @Author  : Histranger
+# @File    : test_parse_pipeline.py
+# @Software: PyCharm
+import glob
+import logging
+import os
+import re
+import time
+import unittest
+
+from crawler_base import TryGetResult
+from parse_pipeline import ParsePipeline, parse_many
+from test_fakes import PoolCrawler
+
+logging.basicConfig(level=logging.INFO)
+
+
+def page(url):
+    # 大于shm_threshold，且包含非ASCII字符
+    rows = ''.join(f'<tr><td>0x{i:064x}</td><td>Ξ{i}</td></tr>' for i in range(1000))
+    return f'<p>Balance of {url}</p><table>{rows}</table>'
+
+
+def parse_txs(url, html):
+    if url.endswith('/bad'):
+        raise ValueError(f"cannot parse {url}")
+    return len(re.findall(r'0x[0-9a-f]{64}', html)), html.count('Ξ'), os.getpid()
+
+
+def parse_slow(url, html):
+    time.sleep(0.2)
+    return len(html)
+
+
+class PageCrawler(PoolCrawler):
+    """
+    Fetching takes 10ms.
+    """
+
+    def try_get(self, url, key_msg=None, **kwargs):
+        time.sleep(0.01)
+        if url.endswith('/missing'):
+            return TryGetResult(False, "key_msg missing.", url, page_source='<p>Not Found</p>')
+        return TryGetResult(True, f"get url[{url}] OK.", url, page_source=page(url))
+
+
+class ParsePipelineTestCase(unittest.TestCase):
+
+    @staticmethod
+    def shm_segments():
+        return set(glob.glob('/dev/shm/psm_*'))
+
+    def test_parse_many(self):
+        before = self.shm_segments()
+        urls = [f'https://etherscan.io/address/{i}' for i in range(12)] + \
+               ['https://etherscan.io/address/bad', 'https://etherscan.io/address/missing']
+        with ParsePipeline(parse_txs, parsers=2) as pipeline:
+            results = {_.url: _ for _ in parse_many(urls, pipeline, concurrency=4, crawler_cls=PageCrawler,
+                                                        key_msg='Balance')}
+        self.assertEqual(sorted(results), sorted(urls))
+        for url in urls[:12]:
+            self.assertTrue(results[url].ok)
+            self.assertEqual(results[url].data[:2], (1000, 1000))
+            self.assertNotEqual(results[url].data[2], os.getpid())
+        self.assertIn('ValueError', results[urls[12]].error)
+        self.assertEqual((results[urls[13]].ok, results[urls[13]].error), (False, "key_msg missing."))
+        self.assertEqual(pipeline.stats.fetch.items, 14)
+        self.assertEqual(pipeline.stats.parse.items, 13)
+        self.assertEqual(pipeline.stats.parse_errors, 1)
+        self.assertEqual(pipeline.stats.shm_transfers, 13)
+        self.assertEqual(self.shm_segments() - before, set())
+
+    def test_backpressure(self):
+        urls = [f'https://etherscan.io/address/{i}' for i in range(6)]
+        with ParsePipeline(parse_slow, parsers=1, queue_size=1, shm_threshold=1 << 30) as pipeline:
+            t0 = time.perf_counter()
+            results = list(parse_many(urls, pipeline, concurrency=4, crawler_cls=PageCrawler))
+            elapsed = time.perf_counter() - t0
+        self.assertEqual(len(results), 6)
+        self.assertEqual(pipeline.stats.max_queued, 1)
+        self.assertEqual(pipeline.stats.shm_transfers, 0)
+        self.assertGreater(pipeline.stats.backpressure, 0.5)
+        self.assertGreater(elapsed, 1.0)
+        report = pipeline.stats.report(pipeline.parsers)
+        self.assertLess(report['parse_pages_per_s'], report['fetch_pages_per_s'] + 1)
+        self.assertGreater(report['parse_utilization'], 0.8)
+
+    def test_parse_failed(self):
+        result = TryGetResult(False, "key_msg missing.", 'https://etherscan.io/x', page_source='<p>x</p>')
+        with ParsePipeline(parse_slow, parsers=1, parse_failed=True) as pipeline:
+            pipeline.submit(result)
+            parsed, = pipeline.results(wait=True)
+        self.assertEqual((parsed.ok, parsed.data, parsed.error), (False, 8, "key_msg missing."))
+        with self.assertRaises(RuntimeError):
+            pipeline.submit(result)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/19 18:40
+# @Author  : Histranger
+# @File    : test_profile_template.py
+# @Software: PyCharm
+import logging
+import os
+import stat
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from benchmark_crawler import SyntheticSite, run_startup_benchmark
+from crawler_base import BaseCrawler
+from disk_utils import FileLock
+from profile_template import ProfileTemplate, ProfileTemplateConfig, clone_tree
+
+logging.basicConfig(level=logging.INFO)
+
+# 模拟Chrome首次运行：写入配置文件、组件、锁和缓存，直到SIGTERM
+FAKE_CHROME = f"""#!{sys.executable}
+import os, signal, sys, time
+from pathlib import Path
+if '--version' in sys.argv:
+    print(os.environ.get('FAKE_CHROME_VERSION', 'Chromium 120.0'))
+    sys.exit(0)
+root = Path([_ for _ in sys.argv if _.startswith('--user-data-dir=')][0].split('=', 1)[1])
+with open(Path(__file__).with_suffix('.runs'), 'a') as f:
+    f.write('run\\n')
+files = {{'Local State': '{{}}', 'First Run': '', 'Default/Preferences': '{{}}', 'Default/Cookies': 'sqlite',
+         'Default/Local Storage/leveldb/000003.ldb': 'table', 'ZxcvbnData/3/passwords.txt': 'password',
+         'Default/Cache/Cache_Data/index': 'cache', 'SingletonLock': ''}}
+for name, text in files.items():
+    (root / name).parent.mkdir(parents=True, exist_ok=True)
+    (root / name).write_text(text)
+(root / 'DevToolsActivePort').write_text('9222\\n/devtools/browser/x')
+signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+while True:
+    time.sleep(0.05)
+"""
+
+
+class FakeCrawler(BaseCrawler):
+
+    def __init__(self, headless=True, profile_template=None):
+        self.profile_template = profile_template
+        self.driver = self
+        self._clone_profile()
+
+    def execute_script(self, script, *args):
+        return 1
+
+    def get(self, url):
+        assert self.profile_template is None or Path(self.profile_dir, 'Local State').exists()
+
+    @property
+    def page_source(self):
+        return '<p>Balance</p>'
+
+    def close(self):
+        self._remove_profile()
+
+
+@unittest.skipIf(os.name == 'nt', "fake chrome is a posix script.")
+class ProfileTemplateTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.binary = Path(self.tmp.name) / 'chrome'
+        self.binary.write_text(FAKE_CHROME)
+        self.binary.chmod(self.binary.stat().st_mode | stat.S_IEXEC)
+        patcher = mock.patch.object(ProfileTemplateConfig, 'settle', 0.05)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.template = ProfileTemplate(Path(self.tmp.name) / 'template', binary_path=str(self.binary),
+                                        reflink=False)
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    @property
+    def builds(self) -> int:
+        path = self.binary.with_suffix('.runs')
+        return len(path.read_text().split()) if path.exists() else 0
+
+    def test_build(self):
+        self.template.ensure()
+        root = self.template.path
+        self.assertTrue((root / 'Default' / 'Preferences').exists())
+        for name in ('SingletonLock', 'DevToolsActivePort', 'Default/Cache'):
+            self.assertFalse((root / name).exists(), name)
+        self.assertEqual(self.template.info()['version'], 'Chromium 120.0')
+
+        self.template.ensure()
+        ProfileTemplate(root, binary_path=str(self.binary)).ensure()  # 另一个进程
+        self.assertEqual(self.builds, 1)
+        with mock.patch.dict(os.environ, {'FAKE_CHROME_VERSION': 'Chromium 121.0'}):
+            ProfileTemplate(root, binary_path=str(self.binary)).ensure()
+        self.assertEqual(self.builds, 2)
+        self.assertEqual(self.template.info()['version'], 'Chromium 121.0')
+        self.assertEqual([_.name for _ in root.parent.iterdir() if _.name.startswith('.')], [])
+
+    def test_clone(self):
+        clone = Path(self.template.clone())
+        stats = self.template.last_clone
+        self.assertEqual(clone.parent, self.template.clones_dir)
+        self.assertFalse((clone / '.template.json').exists())
+        self.assertEqual((stats.files, stats.hardlinked, stats.copied), (6, 5, 1))
+        self.assertTrue(os.path.samefile(clone / 'Local State', self.template.path / 'Local State'))
+        self.assertFalse(os.path.samefile(clone / 'Default/Cookies', self.template.path / 'Default/Cookies'))
+        (clone / 'Default/Cookies').write_text('changed')
+        self.assertEqual((self.template.path / 'Default/Cookies').read_text(), 'sqlite')
+        self.template.remove_clone(clone)
+        self.assertFalse(clone.exists())
+
+    def test_clone_during_rebuild(self):
+        self.template.ensure()
+        clones = []
+        # 另一个进程正在替换模板，克隆等到替换完成
+        with FileLock(self.template.path.parent / 'template.lock'):
+            thread = threading.Thread(target=lambda: clones.append(Path(self.template.clone())))
+            thread.start()
+            thread.join(0.3)
+            self.assertTrue(thread.is_alive())
+            (self.template.path / 'Default' / 'Cookies').write_text('rebuilt')
+        thread.join()
+        self.assertEqual((clones[0] / 'Default' / 'Cookies').read_text(), 'rebuilt')
+        with FileLock(self.template.path.parent / 'template.lock', shared=True):
+            self.template.remove_clone(self.template.clone())  # 多个克隆可以同时进行
+
+    def test_clone_tree_copy(self):
+        self.template.ensure()
+        dst = Path(self.tmp.name) / 'copy'
+        dst.mkdir()
+        stats = clone_tree(self.template.path, dst, reflink=False, hardlink=False)
+        self.assertEqual((stats.files, stats.copied), (6, 6))
+
+    def test_prune(self):
+        self.template.clones_dir.mkdir(parents=True)
+        dead = self.template.clones_dir / 'clone-999999999-x'
+        dead.mkdir()
+        alive = Path(self.template.clone())
+        self.assertFalse(dead.exists())
+        self.assertTrue(alive.exists())
+
+    def test_crawler(self):
+        cc = FakeCrawler(profile_template=self.template)
+        first = cc.profile_dir
+        cc._clone_profile()  # 重启浏览器时
+        self.assertFalse(os.path.exists(first))
+        cc.close()
+        self.assertIsNone(cc.profile_dir)
+        self.assertEqual(list(self.template.clones_dir.iterdir()), [])
+
+    def test_startup_benchmark(self):
+        with SyntheticSite() as site:
+            results = [run_startup_benchmark(FakeCrawler, 'fake', site, runs=3, template=template)
+                       for template in (None, self.template)]
+        self.assertEqual([(_.template, _.runs, _.error) for _ in results], [(False, 3, None), (True, 3, None)])
+        self.assertIsNotNone(results[1].first_get['p50'])
+        self.assertEqual(list(self.template.clones_dir.iterdir()), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
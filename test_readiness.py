@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 16:40
+# @Author  : Histranger
+# @File    : test_readiness.py
+# @Software: PyCharm
+import logging
+import threading
+import unittest
+
+from selenium.common import TimeoutException
+
+from readiness import Lifecycle, NetworkIdle, Selector, wait_until
+from test_fakes import CDPDriver, FakeCrawler, perf_entry
+
+logging.basicConfig(level=logging.INFO)
+
+
+class EventDriver(CDPDriver):
+    """
+    每次get_log依次返回batches中的一批事件，Selector的脚本返回selector_found。
+    """
+
+    def __init__(self, batches=(), selector_found=True):
+        super().__init__(batches)
+        self.selector_found = selector_found
+        self.executed = []
+
+    def execute_script(self, script, *args):
+        self.executed.append(script)
+        return self.selector_found
+
+
+class ReadinessTestCase(unittest.TestCase):
+
+    def test_lifecycle(self):
+        driver = EventDriver([
+            # start时读取并丢弃旧页面的事件
+            [perf_entry('Page.lifecycleEvent', frameId='main', name='DOMContentLoaded')],
+            [perf_entry('Page.lifecycleEvent', frameId='main', name='init')],
+            [perf_entry('Page.lifecycleEvent', frameId='iframe', name='DOMContentLoaded')],
+            [perf_entry('Page.lifecycleEvent', frameId='main', name='DOMContentLoaded')],
+        ])
+        crawler = FakeCrawler(driver=driver, cdp_events=True)
+        condition = Lifecycle('DOMContentLoaded')
+        condition.start(crawler)
+        wait_until(crawler, condition, timeout=1, poll=0)
+        self.assertEqual(driver.batches, [])
+        self.assertEqual(driver.cdp_cmds, [('Page.getFrameTree', {})])
+
+    def test_lifecycle_timeout(self):
+        crawler = FakeCrawler(driver=EventDriver(), cdp_events=True)
+        condition = Lifecycle('networkIdle')
+        condition.start(crawler)
+        with self.assertRaises(TimeoutException):
+            wait_until(crawler, condition, timeout=0.05, poll=0.01)
+        # 超时后不再订阅事件
+        self.assertEqual(repr(crawler.cdp_events), "CDPEventLog(listeners=0)")
+
+    def test_lifecycle_needs_cdp_events(self):
+        with self.assertRaises(AssertionError):
+            Lifecycle('networkIdle').start(FakeCrawler(driver=EventDriver()))
+
+    def test_network_idle(self):
+        driver = EventDriver([
+            [],
+            [perf_entry('Network.requestWillBeSent', requestId='1'),
+             perf_entry('Network.requestWillBeSent', requestId='2')],
+            [perf_entry('Network.loadingFinished', requestId='1')],
+            [perf_entry('Network.loadingFailed', requestId='2')],
+        ])
+        crawler = FakeCrawler(driver=driver, cdp_events=True)
+        condition = NetworkIdle(idle_ms=20)
+        condition.start(crawler)
+        self.assertGreaterEqual(wait_until(crawler, condition, timeout=1, poll=0.005), 0.02)
+        self.assertEqual(driver.batches, [])
+
+    def test_selector(self):
+        driver = EventDriver()
+        crawler = FakeCrawler(driver=driver)
+        condition = Selector('#balance')
+        condition.start(crawler)
+        wait_until(crawler, condition, timeout=1)
+        # 导航时只认新文档
+        self.assertIn('__crawlerEngineOldDocument === undefined', driver.executed[-1])
+
+        driver.selector_found = False
+        condition.start(crawler, navigation=False)
+        with self.assertRaises(TimeoutException):
+            wait_until(crawler, condition, timeout=0.05, poll=0.01)
+
+
+class TabDriver(EventDriver):
+    """
+    A browser whose main frame is `frame_id`; get waits until every crawler has started waiting.
+    """
+
+    def __init__(self, frame_id, barrier):
+        super().__init__([[], [perf_entry('Page.lifecycleEvent', frameId=frame_id, name='DOMContentLoaded')]])
+        self.frame_id = frame_id
+        self.barrier = barrier
+
+    def execute_cdp_cmd(self, cmd, params):
+        return {'frameTree': {'frame': {'id': self.frame_id}}}
+
+    def get(self, url):
+        self.barrier.wait(timeout=1)
+
+    @property
+    def page_source(self):
+        return '<p>Balance</p>'
+
+
+class SharedConditionTestCase(unittest.TestCase):
+
+    def test_shared_condition(self):
+        barrier = threading.Barrier(2)
+        crawlers = [FakeCrawler(driver=TabDriver(frame_id, barrier), cdp_events=True) for frame_id in ('A', 'B')]
+        condition = Lifecycle('DOMContentLoaded')  # 同一个对象，如crawl_many(ready=...)
+        results = {}
+
+        def _run(crawler):
+            results[crawler.driver.frame_id] = crawler.try_get('https://example.com/', retries=1, ready=condition,
+                                                               ready_timeout=0.5)
+
+        threads = [threading.Thread(target=_run, args=(_,)) for _ in crawlers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual({k: (v.ok, v.outcome) for k, v in results.items()}, {'A': (True, 'ok'), 'B': (True, 'ok')})
+        for crawler in crawlers:
+            self.assertEqual(repr(crawler.cdp_events), "CDPEventLog(listeners=0)")
+        self.assertIsNone(condition._events)
+
+        crawlers[0].wait_ready(condition, timeout=0.5)
+        self.assertIsNone(condition._frame_id)
+
+
+if __name__ == '__main__':
+    unittest.main()
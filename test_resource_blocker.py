@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 13:50
+# @Author  : Histranger
+# @File    : test_resource_blocker.py
+# @Software: PyCharm
+import logging
+import re
+import unittest
+
+from cdp_events import CDPEventLog
+from resource_blocker import ResourceBlocker, ESTIMATED_BYTES, expand_block_patterns
+from test_fakes import CDPDriver, perf_entry
+
+logging.basicConfig(level=logging.INFO)
+
+
+def blocked(url, patterns):
+    """
+    按整个url匹配，只有*是通配符
+    """
+    return any(re.fullmatch('.*'.join(map(re.escape, _.split('*'))), url) for _ in patterns)
+
+
+class ResourceBlockerTestCase(unittest.TestCase):
+
+    def test_expand(self):
+        patterns = expand_block_patterns(['text-only', '*.png', '*/ads/*'])
+        self.assertIn('*.woff2', patterns)
+        self.assertIn('*google-analytics.com*', patterns)
+        self.assertEqual(patterns.count('*.png'), 1)
+        self.assertEqual(patterns[-1], '*/ads/*')
+
+    def test_query_string(self):
+        patterns = expand_block_patterns('text-only')
+        for url in ('https://example.com/logo.png', 'https://example.com/logo.png?v=2',
+                    'https://cdn.example.com/app.css?h=abc', 'https://example.com/f/inter.woff2?v=3.19#iefix',
+                    'https://fonts.gstatic.com/s/inter/v13/abc', 'https://fonts.googleapis.com/css2?family=Inter'):
+            self.assertTrue(blocked(url, patterns), url)
+        for url in ('https://example.com/', 'https://example.com/app.js?v=2', 'https://example.com/png/list'):
+            self.assertFalse(blocked(url, patterns), url)
+
+    def test_block_stats(self):
+        driver = CDPDriver()
+        blocker = ResourceBlocker('no-media')
+        blocker.attach(driver, CDPEventLog(driver))
+        self.assertEqual(driver.cdp_cmds[1], ('Network.setBlockedURLs', {'urls': blocker.patterns}))
+
+        # 上一个页面残留的事件不计入当前页面
+        driver.batches = [[perf_entry('Network.loadingFailed', requestId='0', type='Image', blockedReason='inspector')]]
+        blocker.start_page('https://example.com')
+        driver.batches = [[
+            perf_entry('Network.loadingFailed', requestId='1', type='Image', blockedReason='inspector'),
+            perf_entry('Network.loadingFailed', requestId='2', type='Media', blockedReason='inspector'),
+            perf_entry('Network.loadingFailed', requestId='3', type='Script', errorText='net::ERR_FAILED'),
+            perf_entry('Network.loadingFinished', requestId='4'),
+        ]]
+        stats = blocker.finish_page()
+        self.assertEqual(stats.blocked, 2)
+        self.assertEqual(stats.by_type, {'Image': 1, 'Media': 1})
+        self.assertEqual(stats.bytes_saved, ESTIMATED_BYTES['Image'] + ESTIMATED_BYTES['Media'])
+        self.assertEqual(blocker.total.blocked, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
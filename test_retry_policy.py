@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/19 20:10
+# @Author  : Histranger
+# @File    : test_retry_policy.py
+# @Software: PyCharm
+import logging
+import random
+import unittest
+from unittest import mock
+
+from selenium.common import TimeoutException, WebDriverException
+
+from retry_policy import CircuitBreaker, CircuitBreakers, RetryPolicy, RetryRule, classify_failure
+from test_fakes import FakeCrawler
+
+logging.basicConfig(level=logging.INFO)
+
+CHROME_ERROR_PAGE = '<div id="main-message"><h1>This site can’t be reached</h1>' \
+                    '<div class="error-code">ERR_CONNECTION_REFUSED</div></div>'
+
+
+class ClassifyTestCase(unittest.TestCase):
+
+    def test_classify(self):
+        cases = [
+            (('ok', "get url OK."), None),
+            (('timeout', str(TimeoutException('timeout: Timed out receiving message from renderer'))), 'timeout'),
+            (('webdriver_exception', str(WebDriverException('unknown error: net::ERR_NAME_NOT_RESOLVED'))), 'dns'),
+            (('webdriver_exception', str(WebDriverException('unknown error: net::ERR_DNS_TIMED_OUT'))), 'dns'),
+            (('webdriver_exception', str(WebDriverException('unknown error: net::ERR_INTERNET_DISCONNECTED'))),
+             'network'),
+            (('webdriver_exception', str(WebDriverException('invalid session id'))), 'webdriver'),
+            (('err_msg_hit', "err_msg[ERR_] in page source.", CHROME_ERROR_PAGE), 'connection'),
+            (('err_msg_hit', "err_msg[ERR_] in page source.", '<p>ERR_ is only a word here</p>'), 'err_msg'),
+            (('err_msg_hit', "err_msg[ERR_] in page source.", '<p>ERR_CERT_DATE_INVALID</p>'), 'net_error'),
+            (('key_msg_missing', "key_msg[Balance] NOT in page source.", CHROME_ERROR_PAGE), 'key_msg_missing'),
+        ]
+        for args, failure in cases:
+            self.assertEqual(classify_failure(*args), failure, args)
+
+
+class CircuitBreakerTestCase(unittest.TestCase):
+
+    def test_states(self):
+        breaker = CircuitBreaker(threshold=3, cooldown=10, max_cooldown=25)
+        for now in range(2):
+            breaker.failure(now=now)
+        self.assertEqual(breaker.state, 'closed')
+        breaker.success()
+        for now in range(3):
+            breaker.failure(now=now)
+        self.assertEqual(breaker.state, 'open')
+        self.assertFalse(breaker.allow(now=11.9))
+        self.assertTrue(breaker.allow(now=12))
+        self.assertFalse(breaker.allow(now=12))  # 只放行一次探测
+
+        # 探测失败，冷却时间翻倍直到上限
+        breaker.failure(now=13)
+        self.assertEqual((breaker.state, breaker.retry_in(now=13)), ('open', 20.0))
+        self.assertTrue(breaker.allow(now=33))
+        breaker.failure(now=33)
+        self.assertEqual(breaker.current_cooldown, 25)
+
+        self.assertTrue(breaker.allow(now=58))
+        breaker.release()
+        self.assertTrue(breaker.allow(now=58))
+        breaker.success()
+        self.assertEqual((breaker.state, breaker.failures, breaker.current_cooldown), ('closed', 0, 10))
+
+    def test_hosts(self):
+        breakers = CircuitBreakers(threshold=1, cooldown=10)
+        breakers.record('down.example.com', False, now=0)
+        self.assertEqual(breakers.allow('down.example.com', now=1), (False, 9.0))
+        self.assertEqual(breakers.allow('example.com', now=1), (True, 0.0))
+        self.assertEqual(breakers.open_hosts(), ['down.example.com'])
+
+
+class RetryPolicyTestCase(unittest.TestCase):
+    url = 'https://example.com/'
+    url_missing = 'https://example.com/missing'
+    url_down = 'https://down.example.com/'
+    url_refused = 'https://refused.example.com/'
+
+    def setUp(self) -> None:
+        self.cc = FakeCrawler({
+            self.url: '<h1>Welcome</h1>',
+            self.url_missing: '<h1>Loading...</h1>',
+            self.url_down: WebDriverException('unknown error: net::ERR_NAME_NOT_RESOLVED'),
+            self.url_refused: WebDriverException('unknown error: net::ERR_CONNECTION_REFUSED'),
+        })
+        self.breakers = CircuitBreakers(threshold=2, cooldown=60)
+        self.policy = RetryPolicy(breakers=self.breakers, rng=random.Random(0))
+        patcher = mock.patch('crawler_base.time.sleep')
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_backoff(self):
+        policy = RetryPolicy({'timeout': RetryRule(max_attempts=10, base=1, cap=5, jitter=0)})
+        self.assertEqual([policy.next_delay('timeout', n, 0) for n in range(1, 6)], [1, 2, 4, 5, 5])
+        self.assertIsNone(policy.next_delay('timeout', 10, 0))
+        self.assertEqual(policy.next_delay('timeout', 1, 0, retry_after=30), 30)
+
+        delays = [self.policy.backoff('connection', 2) for _ in range(100)]
+        self.assertTrue(all(1.0 <= _ <= 2.0 for _ in delays))
+        self.assertGreater(len(set(delays)), 1)
+
+        self.policy.budget = 10
+        self.assertIsNone(self.policy.next_delay('connection', 1, 9.5))
+
+    def test_per_class_attempts(self):
+        result = self.cc.try_get(self.url_down, retries=5, policy=self.policy)
+        # dns失败只重试一次，而不是retries次
+        self.assertEqual([(_.index, _.outcome, _.failure) for _ in result.attempts],
+                         [(1, 'webdriver_exception', 'dns'), (2, 'webdriver_exception', 'dns')])
+        self.assertEqual(self.sleep.call_count, 1)
+        self.assertTrue(2.0 * 0.5 <= self.sleep.call_args[0][0] <= 2.0)
+        self.assertEqual(result.attempts[0].delay, self.sleep.call_args[0][0])
+        self.assertEqual(result.attempts[1].delay, 0.0)
+
+        result = self.cc.try_get(self.url_missing, key_msg='Balance', retries=5, policy=self.policy)
+        self.assertEqual(result.outcome, 'key_msg_missing')
+        self.assertEqual(len(result.attempts), 3)
+
+    def test_circuit_open(self):
+        result = self.cc.try_get(self.url_refused, retries=5, policy=self.policy)
+        # 两次连接失败后熔断，第三次尝试不再使用浏览器
+        self.assertEqual(result.outcome, 'circuit_open')
+        self.assertEqual(len(result.attempts), 2)
+        self.assertAlmostEqual(result.retry_after, 60, delta=1)
+        self.assertEqual(self.cc.pages, 2)
+
+        result = self.cc.try_get('https://refused.example.com/other', policy=self.policy)
+        self.assertEqual((result.ok, result.outcome, result.attempts), (False, 'circuit_open', []))
+        self.assertEqual(self.cc.pages, 2)
+
+        # 页面内容的失败说明host可以访问，不计入熔断器
+        self.cc.try_get(self.url_missing, key_msg='Balance', retries=5, policy=self.policy)
+        self.assertEqual(self.breakers.open_hosts(), ['refused.example.com'])
+
+        # 冷却后放行一次探测，成功则恢复
+        self.cc.driver.pages[self.url_refused] = '<h1>Welcome</h1>'
+        breaker = self.breakers.get('refused.example.com')
+        breaker.opened_at -= 60
+        result = self.cc.try_get(self.url_refused, policy=self.policy)
+        self.assertTrue(result.ok, result.msg)
+        self.assertEqual(breaker.state, 'closed')
+
+    def test_without_policy(self):
+        result = self.cc.try_get(self.url_down, interval=0.5, retries=3)
+        self.assertEqual([(_.failure, _.delay) for _ in result.attempts], [('dns', 0.5), ('dns', 0.5), ('dns', 0.0)])
+        self.assertEqual(result.outcome, 'webdriver_exception')
+        result = self.cc.try_get(self.url)
+        self.assertEqual([(_.outcome, _.failure) for _ in result.attempts], [('ok', None)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 19:40
+# @Author  : Histranger
+# @File    : test_scheduler.py
+# @Software: PyCharm
+import logging
+import threading
+import time
+import unittest
+
+from crawler_base import TryGetResult
+from crawler_pool import CrawlerPool
+from scheduler import PolitenessScheduler, crawl_scheduled
+from test_fakes import PoolCrawler
+
+logging.basicConfig(level=logging.INFO)
+
+
+class LimitedCrawler(PoolCrawler):
+    lock = threading.Lock()
+    log = []
+
+    def try_get(self, url, **kwargs):
+        with self.lock:
+            first = all(_[1] != url for _ in self.log)
+            self.log.append((time.monotonic(), url))
+        time.sleep(0.01)
+        # /429总是被限流，/429-once只在第一次访问时被限流
+        limited = url.endswith('/429') or (url.endswith('/429-once') and first)
+        retry_after = 0.2 if limited else None
+        return TryGetResult(ok=retry_after is None, msg="", url=url, retry_after=retry_after)
+
+
+class PolitenessSchedulerTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        LimitedCrawler.log = []
+
+    def test_priority(self):
+        scheduler = PolitenessScheduler(rate=1000, burst=10, max_per_host=10)
+        scheduler.add('https://a.com/low', priority=5)
+        scheduler.add('https://b.com/high', priority=0)
+        scheduler.add('https://a.com/mid', priority=1)
+        urls = [scheduler.next().url for _ in range(3)]
+        self.assertEqual(urls, ['https://b.com/high', 'https://a.com/mid', 'https://a.com/low'])
+
+    def test_skip_busy_host(self):
+        scheduler = PolitenessScheduler(rate=1000, burst=10, max_per_host=1)
+        scheduler.add('https://slow.com/1', priority=0)
+        scheduler.add('https://slow.com/2', priority=0)
+        scheduler.add('https://fast.com/1', priority=9)
+        first = scheduler.next()
+        # slow.com并发已满，调度其他host
+        self.assertEqual(scheduler.next().url, 'https://fast.com/1')
+        self.assertIsNone(scheduler.next(timeout=0.05))
+        scheduler.done(first)
+        self.assertEqual(scheduler.next(timeout=0.05).url, 'https://slow.com/2')
+
+    def test_rate(self):
+        scheduler = PolitenessScheduler(rate=20, burst=1, max_per_host=10)
+        for i in range(4):
+            scheduler.add(f'https://a.com/{i}')
+        t0 = time.monotonic()
+        for _ in range(4):
+            scheduler.done(scheduler.next())
+        self.assertGreaterEqual(time.monotonic() - t0, 3 / 20 * 0.9)
+
+    def test_retry_after(self):
+        scheduler = PolitenessScheduler(rate=1000, burst=10, max_per_host=10)
+        scheduler.add('https://a.com/1')
+        scheduler.add('https://a.com/2')
+        scheduler.done(scheduler.next(), retry_after=0.1)
+        t0 = time.monotonic()
+        scheduler.next()
+        self.assertGreaterEqual(time.monotonic() - t0, 0.09)
+
+    def test_crawl_scheduled(self):
+        scheduler = PolitenessScheduler(rate=1000, burst=10, max_per_host=1)
+        for i in range(5):
+            scheduler.add(f'https://slow.com/{i}')
+        scheduler.add('https://limited.com/429')
+        scheduler.add('https://limited.com/ok')
+        for i in range(5):
+            scheduler.add(f'https://host{i}.com/')
+        with CrawlerPool(LimitedCrawler, size=4) as pool:
+            results = list(crawl_scheduled(scheduler, pool))
+        self.assertEqual(len(results), 12)
+
+        times = {url: t for t, url in reversed(LimitedCrawler.log)}  # 第一次访问的时间
+        self.assertGreaterEqual(times['https://limited.com/ok'] - times['https://limited.com/429'], 0.19)
+        # 一直被限流的url访问max_attempts次后返回最后一次的结果
+        self.assertEqual([_[1] for _ in LimitedCrawler.log].count('https://limited.com/429'), 3)
+        self.assertEqual([(_.ok, _.retry_after) for _ in results if _.url.endswith('/429')], [(False, 0.2)])
+        # 同一个host不会并发
+        slow = sorted(t for t, url in LimitedCrawler.log if 'slow.com' in url)
+        self.assertTrue(all(b - a >= 0.009 for a, b in zip(slow, slow[1:])))
+
+    def test_requeue_after_retry_after(self):
+        scheduler = PolitenessScheduler(rate=1000, burst=10, max_per_host=1)
+        scheduler.add('https://limited.com/429-once')
+        with CrawlerPool(LimitedCrawler, size=2) as pool:
+            results = list(crawl_scheduled(scheduler, pool))
+        # 被限流的url在retry_after之后重新访问，只返回成功的结果
+        self.assertEqual([(_.url, _.ok) for _ in results], [('https://limited.com/429-once', True)])
+        (t0, _), (t1, _) = LimitedCrawler.log
+        self.assertGreaterEqual(t1 - t0, 0.19)
+        self.assertEqual(len(scheduler), 0)
+
+    def test_results_not_blocked_by_rate_limit(self):
+        scheduler = PolitenessScheduler(rate=2, burst=1, max_per_host=2)
+        scheduler.add('https://limited.com/1')
+        scheduler.add('https://limited.com/2')
+        with CrawlerPool(LimitedCrawler, size=2) as pool:
+            t0 = time.monotonic()
+            stream = crawl_scheduled(scheduler, pool)
+            self.assertEqual(next(stream).url, 'https://limited.com/1')
+            # 第二个令牌0.5s后才可用，已完成的结果不必等待它
+            self.assertLess(time.monotonic() - t0, 0.3)
+            self.assertEqual(next(stream).url, 'https://limited.com/2')
+            self.assertGreaterEqual(time.monotonic() - t0, 0.49)
+            self.assertEqual(list(stream), [])
+
+    def test_close_early(self):
+        scheduler = PolitenessScheduler(rate=0.5, burst=1)
+        for i in range(3):
+            scheduler.add(f'https://limited.com/{i}')
+        with CrawlerPool(LimitedCrawler, size=2) as pool:
+            stream = crawl_scheduled(scheduler, pool)
+            next(stream)
+            t0 = time.monotonic()
+            stream.close()
+            self.assertLess(time.monotonic() - t0, 0.5)
+            self.assertEqual(len(scheduler), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 22:40
+# @Author  : Histranger
+# @File    : test_segment_store.py
+# @Software: PyCharm
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from crawler_base import TryGetResult
+from segment_store import SegmentReader, SegmentWriter, train_dictionary, zstandard
+
+
+def make_page(i: int) -> str:
+    return '\n'.join([
+        '<html><head><title>Address | Etherscan</title>',
+        '<link rel="stylesheet" href="/assets/css/vendor.min.css">',
+        '<script src="/assets/js/bundle.min.js"></script></head><body>',
+        '<nav class="navbar navbar-expand-lg">Home Blockchain Tokens NFTs Resources</nav>',
+        f'<div id="balance">Balance: {i * 7 % 1000} ETH</div>',
+        f'<div id="txs">{" ".join(str(i * _) for _ in range(20))}</div>',
+        '<footer>Etherscan is a Block Explorer and Analytics Platform for Ethereum</footer>',
+        '</body></html>',
+    ])
+
+
+class SegmentStoreTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def write_pages(self, n: int, **kwargs):
+        with SegmentWriter(self.root, **kwargs) as writer:
+            for i in range(n):
+                writer.write(f'https://etherscan.io/address/{i}', make_page(i), ok=True)
+        return writer
+
+    def test_get_and_iter(self):
+        self.write_pages(300, segment_bytes=16 << 10)
+        with SegmentReader(self.root) as reader:
+            self.assertGreater(len(reader.segments), 1)
+            record = reader.get('https://ETHERSCAN.io/address/42#x')
+            self.assertEqual((record.url, record.page_source, record.meta['ok']),
+                             ('https://etherscan.io/address/42', make_page(42), True))
+            self.assertIsNone(reader.get('https://etherscan.io/address/300'))
+            urls = [_.url for _ in reader]
+        self.assertEqual(urls, [f'https://etherscan.io/address/{i}' for i in range(300)])
+
+    def test_latest_wins(self):
+        with SegmentWriter(self.root, segment_bytes=4 << 10) as writer:
+            for version in range(3):
+                for i in range(10):
+                    writer.write(f'https://etherscan.io/address/{i}', f'v{version}')
+        with SegmentReader(self.root) as reader:
+            self.assertEqual(reader.get('https://etherscan.io/address/3').page_source, 'v2')
+
+    def test_dictionary(self):
+        dictionary = train_dictionary([make_page(i) for i in range(1000, 1030)])
+        self.assertIn(b'<footer>', dictionary)
+        plain = self.write_pages(100)
+        with SegmentWriter(self.root / 'dict', dictionary=dictionary) as with_dict:
+            for i in range(100):
+                with_dict.write(f'https://etherscan.io/address/{i}', make_page(i))
+        self.assertLess(with_dict.ratio, plain.ratio)
+        with SegmentReader(self.root / 'dict') as reader:
+            self.assertEqual(reader.get('https://etherscan.io/address/7').page_source, make_page(7))
+
+    @unittest.skipIf(zstandard is None, "zstandard is not installed.")
+    def test_zstd(self):
+        self.write_pages(50, codec='zstd')
+        with SegmentReader(self.root) as reader:
+            self.assertEqual(reader.get('https://etherscan.io/address/7').page_source, make_page(7))
+
+    def test_recover(self):
+        writer = SegmentWriter(self.root)
+        for i in range(10):
+            writer.write(f'https://etherscan.io/address/{i}', make_page(i))
+        writer.flush()
+        # 模拟崩溃：没有生成索引，最后一条记录只写了一半
+        path = self.root / 'seg-000001.dat'
+        with open(path, 'ab') as f:
+            f.write(b'\x01\x02\x03')
+        writer._file.close()
+        writer._writer_lock.release()
+
+        with SegmentReader(self.root) as reader:
+            self.assertEqual(reader.get('https://etherscan.io/address/9').page_source, make_page(9))
+        with SegmentWriter(self.root) as writer:
+            self.assertEqual(writer.segment, 2)
+            writer.write('https://etherscan.io/address/10', make_page(10))
+        self.assertTrue((self.root / 'seg-000001.idx').exists())
+        with SegmentReader(self.root) as reader:
+            self.assertEqual(len(list(reader)), 11)
+
+    def test_single_writer(self):
+        with SegmentWriter(self.root):
+            with self.assertRaises(TimeoutError):
+                SegmentWriter(self.root)
+
+    def test_threads(self):
+        with SegmentWriter(self.root, segment_bytes=32 << 10) as writer:
+            threads = [threading.Thread(target=lambda k=k: [
+                writer.write_result(TryGetResult(True, 'OK', f'https://etherscan.io/address/{k}-{i}',
+                                                 page_source=make_page(i)))
+                for i in range(50)]) for k in range(8)]
+            for _ in threads:
+                _.start()
+            for _ in threads:
+                _.join()
+            writer.write_result(TryGetResult(False, 'failed', 'https://etherscan.io/'))
+        with SegmentReader(self.root) as reader:
+            self.assertEqual(len(list(reader)), 400)
+            self.assertEqual(reader.get('https://etherscan.io/address/3-7').meta['msg'], 'OK')
+
+    def test_redirect(self):
+        url = 'https://etherscan.io/address/0xabc'
+        result = TryGetResult(True, 'OK', url, page_source=make_page(1),
+                              final_url='https://etherscan.io/address/0xABC?tab=overview')
+        with SegmentWriter(self.root) as writer:
+            writer.write_result(result)
+        with SegmentReader(self.root) as reader:
+            record = reader.get(url)
+            self.assertEqual((record.url, record.meta['final_url']), (url, result.final_url))
+            self.assertIsNone(reader.get(result.final_url))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 18:40
+# @Author  : Histranger
+# @File    : test_session_store.py
+# @Software: PyCharm
+import logging
+import tempfile
+import threading
+import time
+import unittest
+
+from session_store import SessionSpec, SessionStore, ensure_session
+from test_fakes import CDPDriver, FakeCrawler
+
+logging.basicConfig(level=logging.INFO)
+
+
+class SessionStoreTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = SessionStore(self.tmp.name)
+        self.logins = 0
+        self.lock = threading.Lock()
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def login(self, crawler) -> bool:
+        with self.lock:
+            self.logins += 1
+        time.sleep(0.05)
+        crawler.driver.cookies = [{'name': 'ASP.NET_SessionId', 'value': 'foo', 'domain': 'etherscan.io',
+                                   'path': '/', 'expires': time.time() + 3600}]
+        return True
+
+    @staticmethod
+    def is_valid(crawler) -> bool:
+        return any(_['name'] == 'ASP.NET_SessionId' for _ in crawler.driver.cookies)
+
+    def test_save_and_inject(self):
+        driver = CDPDriver()
+        driver.cookies = [{'name': 'a', 'value': '1', 'domain': '.etherscan.io', 'expires': -1}]
+        self.store.save(driver, 'etherscan.io', 'foo@bar.com')
+        self.assertNotIn('foo@bar.com', str(self.store.path('etherscan.io', 'foo@bar.com')))
+
+        session = self.store.load('etherscan.io', 'foo@bar.com')
+        new_driver = CDPDriver()
+        self.store.inject(new_driver, session)
+        # 会话cookie不带expires，多余的字段被去掉
+        self.assertEqual(new_driver.cookies, [{'name': 'a', 'value': '1', 'domain': '.etherscan.io'}])
+        self.assertIn('"theme": "dark"', new_driver.scripts[0])
+
+    def test_expired(self):
+        now = time.time()
+        cookies = [{'name': 'a', 'value': '1', 'expires': now - 1}]
+        self.assertEqual(self.store.expired({'saved_at': now, 'cookies': cookies}), "all cookies expired")
+        self.assertEqual(self.store.expired({'saved_at': now - self.store.max_age - 1, 'cookies': cookies}),
+                         f"older than {self.store.max_age}s")
+        cookies.append({'name': 'b', 'value': '2', 'expires': now + 60})
+        self.assertIsNone(self.store.expired({'saved_at': now, 'cookies': cookies}))
+
+    def test_login_once(self):
+        spec = SessionSpec('etherscan.io', 'foo', self.store)
+        crawlers = [FakeCrawler(driver=CDPDriver()) for _ in range(8)]
+        threads = [threading.Thread(target=ensure_session, args=(_, spec, self.is_valid, self.login))
+                   for _ in crawlers]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(self.logins, 1)
+        self.assertTrue(all(self.is_valid(_) for _ in crawlers))
+
+    def test_relogin_when_invalid(self):
+        spec = SessionSpec('etherscan.io', 'foo', self.store)
+        self.assertTrue(ensure_session(FakeCrawler(driver=CDPDriver()), spec, self.is_valid, self.login))
+        self.assertTrue(ensure_session(FakeCrawler(driver=CDPDriver()), spec, lambda _: False, self.login))
+        self.assertEqual(self.logins, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
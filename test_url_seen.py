@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 20:30
+# @Author  : Histranger
+# @File    : test_url_seen.py
+# @Software: PyCharm
+import tempfile
+import unittest
+from pathlib import Path
+
+from url_seen import BloomFilter, SeenSet, canonicalize_url, url_fingerprint
+
+
+class CanonicalizeUrlTestCase(unittest.TestCase):
+
+    def test_canonicalize(self):
+        cases = [
+            ('HTTPS://Etherscan.IO:443/address/0xabc#tx', 'https://etherscan.io/address/0xabc'),
+            ('http://example.com', 'http://example.com/'),
+            ('http://example.com:8080/a?b=2&a=1', 'http://example.com:8080/a?a=1&b=2'),
+            ('https://example.com/a?utm_source=x&gclid=1&id=3', 'https://example.com/a?id=3'),
+            ('https://example.com/a?x=', 'https://example.com/a?x='),
+        ]
+        for url, expected in cases:
+            self.assertEqual(canonicalize_url(url), expected)
+            self.assertEqual(canonicalize_url(expected), expected)
+
+    def test_fingerprint(self):
+        self.assertEqual(url_fingerprint('https://Example.com/?b=1&a=2'), url_fingerprint('https://example.com/?a=2&b=1'))
+        self.assertNotEqual(url_fingerprint('https://example.com/1'), url_fingerprint('https://example.com/2'))
+
+
+class SeenSetTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_add(self):
+        with SeenSet(self.root, capacity=1000, batch=7) as seen:
+            self.assertTrue(all(seen.add(f'https://example.com/{i}') for i in range(500)))
+            self.assertFalse(any(seen.add(f'https://EXAMPLE.com/{i}#x') for i in range(500)))
+            self.assertIn('https://example.com/42', seen)
+            self.assertNotIn('https://example.com/501', seen)
+
+    def test_false_positive_confirmed(self):
+        # 极小的Bloom filter几乎总是误判，由sqlite确认后不应漏掉任何新url
+        with SeenSet(self.root, capacity=10, error_rate=0.5, batch=1) as seen:
+            self.assertTrue(all(seen.add(f'https://example.com/{i}') for i in range(1000)))
+            self.assertEqual(seen._db.execute('SELECT COUNT(*) FROM seen').fetchone()[0], 1000)
+
+    def test_persist(self):
+        with SeenSet(self.root, capacity=1000) as seen:
+            for i in range(100):
+                seen.add(f'https://example.com/{i}')
+        with SeenSet(self.root, capacity=1000) as seen:
+            self.assertTrue(seen.bloom.was_clean)
+            self.assertFalse(seen.add('https://example.com/7'))
+            self.assertTrue(seen.add('https://example.com/100'))
+
+    def test_rebuild_after_crash(self):
+        seen = SeenSet(self.root, capacity=1000, batch=1)
+        for i in range(100):
+            seen.add(f'https://example.com/{i}')
+        # 模拟崩溃：sqlite已提交，Bloom filter的内容丢失且没有正常关闭
+        seen.bloom.clear()
+        seen.bloom.flush()
+        seen._db.close()
+        seen.bloom._mmap.close()
+        seen.bloom._file.close()
+
+        with SeenSet(self.root, capacity=1000) as seen:
+            self.assertFalse(seen.bloom.was_clean)
+            self.assertFalse(any(seen.add(f'https://example.com/{i}') for i in range(100)))
+
+    def test_bloom_size(self):
+        bloom = BloomFilter(self.root / 'size.bloom', capacity=1_000_000, error_rate=0.001)
+        try:
+            # 约1.8字节/URL
+            self.assertLess(bloom.path.stat().st_size, 2 * 1_000_000)
+            self.assertEqual(bloom.k, 10)
+        finally:
+            bloom.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,12 +5,18 @@
 # @Software: PyCharm
 import copy
 import logging
-import time
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Sequence, Union
 from dataclasses import dataclass
 
 import undetected_chromedriver as uc
-from selenium.common import WebDriverException, TimeoutException
+
+from asset_cache import AssetCache
+from browser_recycler import BrowserRecycler, RecycleConfig
+from cdp_events import enable_performance_log
+from crawler_base import BaseCrawler
+from metrics import LAUNCH_SECONDS
+from profile_template import ProfileTemplate
+from session_store import SessionSpec
 
 logging.basicConfig(level=logging.INFO)
 
@@ -21,7 +27,7 @@ class UCCrawlerConfig:
     explicitly_wait: int = 5
 
 
-class UCCrawler:
+class UCCrawler(BaseCrawler):
     """
     An undetected chromedriver base on undetected-chromedriver.
     自动下载的driver缓存，在win下一般在：~/appdata/roaming/undetected_chromedriver.
@@ -30,15 +36,35 @@ class UCCrawler:
     """
 
     def __init__(self, headless: bool = True, proxy: Optional[Dict] = None,
-                 driver_path: Optional[str] = None, *args, **kwargs):
+                 driver_path: Optional[str] = None, block_resources: Optional[Union[str, Sequence[str]]] = None,
+                 page_load_strategy: str = 'normal', session: Optional[SessionSpec] = None,
+                 recycle: Optional[RecycleConfig] = None, asset_cache: Optional[AssetCache] = None,
+                 profile_template: Optional[ProfileTemplate] = None, track_responses: bool = False,
+                 *args, **kwargs):
         """
         :param headless: 是否使用无头模式
         :param proxy: 是否开启代理，proxy必须是一个字典，且键必须包含ip和port
         :param driver_path: 是否指定chromedriver，一般当你的chrome版本过新时，需要手动下载，可以到这里看看：https://googlechromelabs.github.io/chrome-for-testing/#stable
+        :param block_resources: 是否屏蔽图片、字体、媒体等资源，可以是预设名("text-only"、"no-media"、"no-trackers")、
+                                资源类别("image"、"font"等)或自定义通配符，或它们的列表，见resource_blocker.py
+        :param page_load_strategy: 页面加载策略，'normal'等待load事件，'eager'等待DOMContentLoaded，'none'不等待；
+                                   后两者配合try_get的ready参数，满足就绪条件后立即返回，见readiness.py
+        :param session: 启动时注入的已保存会话(cookies和localStorage)，见session_store.py
+        :param recycle: 浏览器进程树的RSS、页面数、运行时间预算，超出时在两个页面之间重启浏览器，见browser_recycler.py
+        :param asset_cache: 所有浏览器共享的静态资源缓存，通过CDP Fetch拦截JS、CSS、字体和图片，见asset_cache.py
+        :param profile_template: 预先构建的user-data-dir模板，每次启动时克隆一份代替--incognito，见profile_template.py
+        :param track_responses: 通过CDP事件读取主文档的状态码，429/503时把Retry-After写入result.retry_after，见scheduler.py；
+                                屏蔽资源或eager/none策略下总是读取
         """
         self.headless = headless
         self.proxy = copy.deepcopy(proxy)
         self.driver_path = driver_path
+        self.block_resources = copy.deepcopy(block_resources)
+        self.page_load_strategy = page_load_strategy
+        self.session = session
+        self.asset_cache = asset_cache
+        self.profile_template = profile_template
+        self.track_responses = track_responses
 
         self.opts = uc.ChromeOptions()
 
@@ -48,7 +74,12 @@ class UCCrawler:
             self.opts.add_argument('--headless')  # open headless mode
             self.opts.add_argument("--disable-gpu")  # disable gpu
 
-        self.opts.add_argument("--incognito")
+        if self.profile_template:
+            # 每次启动都使用新的副本，与--incognito同样不保留上一次的状态
+            for flag in self.profile_template.flags:
+                self.opts.add_argument(flag)
+        else:
+            self.opts.add_argument("--incognito")
         self.opts.add_argument("--start-maximized")
         self.opts.add_argument("--disable-extensions")
 
@@ -56,74 +87,63 @@ class UCCrawler:
             assert 'ip' in self.proxy and 'port' in self.proxy, "proxy must be a dict with key ip and port."
             self.opts.add_argument(f"--proxy-server={proxy['ip']}:{proxy['port']}")
 
-        if self.driver_path:
-            logging.info(f"Use ChromeDriver[{self.driver_path}].")
-            self.driver = uc.Chrome(headless=self.headless, options=self.opts,
-                                    executable_path=self.driver_path,
-                                    use_subprocess=True, *args, **kwargs)
-        else:
-            # if chromedriver version error, try use param `version_main`.
-            self.driver = uc.Chrome(headless=self.headless, options=self.opts,
-                                    use_subprocess=True, *args, **kwargs)
-        self.driver.implicitly_wait(UCCrawlerConfig.implicitly_wait)
-
-        logging.info("UCCrawler Started.")
+        self.opts.page_load_strategy = self.page_load_strategy
+        if self.uses_cdp_events:
+            enable_performance_log(self.opts)
 
-    def __enter__(self):
-        return self
+        self._args, self._kwargs = args, kwargs
+        self._launch()
+        self.recycler = BrowserRecycler(recycle) if recycle else None
+        # 已访问的页面数，CrawlerPool据此回收浏览器
+        self.pages: int = 0
 
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        self.close()
+        logging.info("UCCrawler Started.")
 
     def __repr__(self):
-        return f"UCCrawler(headless={self.headless}, proxy={self.proxy})"
+        return f"UCCrawler(headless={self.headless}, proxy={self.proxy}, block_resources={self.block_resources}, " \
+               f"page_load_strategy={self.page_load_strategy})"
 
     def close(self):
-        self.driver.close()
+        self._quit()
         logging.info("UCCrawler Closed.")
 
-    def try_get(self, url: str, interval: float = 0.2, retries: int = 3,
-                key_msg: str = None, err_msg: str = 'ERR_') -> (bool, str):
-        """
-        尝试访问url
-        :param url: 网址
-        :param interval: 尝试间隔
-        :param retries: 尝试次数
-        :param key_msg: 关键词
-        :param err_msg: 错误信息
-        :return: 是否成功访问url，详细信息
-        """
-        ok: bool = True
-        msg: str = ""
-
-        index = 0
-        while index < retries:
-            if index:
-                time.sleep(interval)
-            index += 1
-
-            try:
-                self.driver.get(url)
-            except (WebDriverException, TimeoutException) as e:
-                ok, msg = False, repr(e)
-                continue
+    def _launch(self):
+        # uc.Chrome会修改options，重启时需要一份新的
+        opts = copy.deepcopy(self.opts)
+        kwargs = dict(self._kwargs)
+        if profile_dir := self._clone_profile():
+            # 指定user_data_dir时uc不会删除它，由_remove_profile删除
+            kwargs['user_data_dir'] = profile_dir
+        with LAUNCH_SECONDS.labels(crawler='uc').time():
+            if self.driver_path:
+                logging.info(f"Use ChromeDriver[{self.driver_path}].")
+                self.driver = uc.Chrome(headless=self.headless, options=opts,
+                                        executable_path=self.driver_path,
+                                        use_subprocess=True, *self._args, **kwargs)
             else:
-                # 如果页面中存在key_msg，那么访问成功
-                if key_msg:
-                    if key_msg in self.driver.page_source:
-                        ok, msg = True, f"key_msg[{key_msg}] in page source."
-                        break
-                    else:
-                        ok, msg = False, f"key_msg[{key_msg}] NOT in page source."
-                        continue
-                # 如果错误信息err_msg在页面中
-                if err_msg in self.driver.page_source:
-                    ok, msg = False, f"err_msg[{err_msg}] in page source."
-                    continue
-                else:
-                    ok, msg = True, f"get url[{url}] OK."
-                    break
-        return ok, msg
+                # if chromedriver version error, try use param `version_main`.
+                self.driver = uc.Chrome(headless=self.headless, options=opts,
+                                        use_subprocess=True, *self._args, **kwargs)
+            self.driver.implicitly_wait(UCCrawlerConfig.implicitly_wait)
+            self._setup_cdp_events()
+            self._setup_asset_cache()
+            self._inject_session()
+
+    def _quit(self):
+        # driver.close只关闭窗口，chromedriver和Chrome进程仍在运行
+        self._teardown_asset_cache()
+        try:
+            self.driver.quit()
+        finally:
+            self._remove_profile()
+
+    @property
+    def root_pids(self) -> List[int]:
+        # use_subprocess时Chrome由Python启动，不是chromedriver的子进程
+        pids = [getattr(self.driver, 'browser_pid', None)]
+        process = getattr(getattr(self.driver, 'service', None), 'process', None)
+        pids.append(process.pid if process else None)
+        return [_ for _ in pids if _]
 
 
 if __name__ == '__main__':
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 20:00
+# @Author  : Histranger
+# @File    : url_seen.py
+# @Software: PyCharm
+import hashlib
+import logging
+import math
+import mmap
+import sqlite3
+import struct
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import *
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# 不影响页面内容的查询参数
+TRACKING_PARAMS: Set[str] = {'gclid', 'fbclid', 'msclkid', 'yclid', '_ga', 'ref', 'ref_src'}
+_DEFAULT_PORTS: Dict[str, int] = {'http': 80, 'https': 443}
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    >>> canonicalize_url('HTTPS://Etherscan.IO:443/address/0xabc?utm_source=x&b=2&a=1#tx')
+    'https://etherscan.io/address/0xabc?a=1&b=2'
+    >>> canonicalize_url('http://example.com')
+    'http://example.com/'
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    if parts.username:
+        host = f"{parts.username}{':' + parts.password if parts.password else ''}@{host}"
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                   if not k.startswith('utm_') and k not in TRACKING_PARAMS)
+    return urlunsplit((scheme, host, parts.path or '/', urlencode(query), ''))
+
+
+def url_fingerprint(url: str, canonical: bool = False) -> int:
+    """
+    :param canonical: url是否已经规范化
+    :return: 64位指纹(有符号，可以直接作为sqlite的INTEGER)
+    """
+    digest = hashlib.blake2b((url if canonical else canonicalize_url(url)).encode('utf-8'), digest_size=8).digest()
+    return struct.unpack('<q', digest)[0]
+
+
+def _mix64(x: int) -> int:
+    # splitmix64，由指纹派生出Bloom filter的第二个哈希
+    x = (x + 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+    return x ^ (x >> 31)
+
+
+@dataclass
+class SeenSetConfig:
+    capacity: int = 50_000_000
+    error_rate: float = 0.001
+    batch: int = 10_000  # 每批写入精确存储的指纹数
+
+
+class BloomFilter:
+    """
+    A Bloom filter whose bit array lives in an mmap'd file, so it survives restarts.
+
+    文件头：magic(4) | 位数m(8) | 哈希数k(4) | 元素数(8) | clean(1)，
+    clean为0表示上次没有正常关闭，内容可能缺失。
+    """
+    MAGIC = b'CEBF'
+    HEADER = struct.Struct('<4sQIQB')
+
+    def __init__(self, path: Union[str, Path], capacity: int = SeenSetConfig.capacity,
+                 error_rate: float = SeenSetConfig.error_rate):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        created = not self.path.exists()
+        if created:
+            m = max(int(-capacity * math.log(error_rate) / math.log(2) ** 2), 64)
+            k = max(round(m / capacity * math.log(2)), 1)
+            with open(self.path, 'wb') as f:
+                f.write(self.HEADER.pack(self.MAGIC, m, k, 0, 1))
+                f.truncate(self.HEADER.size + (m + 7) // 8)
+
+        self._file = open(self.path, 'r+b')
+        self._mmap = mmap.mmap(self._file.fileno(), 0)
+        magic, self.m, self.k, self.count, clean = self.HEADER.unpack_from(self._mmap, 0)
+        assert magic == self.MAGIC, f"{self.path} is not a bloom filter file."
+        self.capacity = capacity
+        self.was_clean: bool = bool(clean)
+        self._write_header(clean=0)
+
+    def __repr__(self):
+        return f"BloomFilter(path={self.path}, m={self.m}, k={self.k}, count={self.count})"
+
+    def _positions(self, fingerprint: int) -> Iterator[int]:
+        h1 = fingerprint & 0xFFFFFFFFFFFFFFFF
+        h2 = _mix64(h1) | 1
+        for i in range(self.k):
+            yield (h1 + i * h2) % self.m
+
+    def __contains__(self, fingerprint: int) -> bool:
+        mm, offset = self._mmap, self.HEADER.size
+        return all(mm[offset + (p >> 3)] & (1 << (p & 7)) for p in self._positions(fingerprint))
+
+    def add(self, fingerprint: int):
+        mm, offset = self._mmap, self.HEADER.size
+        for p in self._positions(fingerprint):
+            mm[offset + (p >> 3)] |= 1 << (p & 7)
+        self.count += 1
+        if self.count == self.capacity:
+            logging.warning(f"{self!r} reaches its capacity, false positive rate will grow.")
+
+    def clear(self):
+        self._mmap[self.HEADER.size:] = bytes(len(self._mmap) - self.HEADER.size)
+        self.count = 0
+
+    def flush(self, clean: bool = False):
+        self._write_header(clean=int(clean))
+        self._mmap.flush()
+
+    def close(self):
+        self.flush(clean=True)
+        self._mmap.close()
+        self._file.close()
+
+    def _write_header(self, clean: int):
+        self.HEADER.pack_into(self._mmap, 0, self.MAGIC, self.m, self.k, self.count, clean)
+
+
+class SeenSet:
+    """
+    A memory-bounded, persistent set of seen URLs.
+
+    URL先规范化再计算指纹，Bloom filter(mmap文件，约1.8字节/URL@0.1%)判断一定没见过的URL，
+    可能见过的URL再到sqlite中按64位指纹精确确认，因此Bloom filter的误判不会导致漏爬。
+    精确存储只保存指纹，不保存URL本身。
+
+    >>> with SeenSet('./seen') as seen:  # doctest: +SKIP
+    ...     seen.add('https://etherscan.io/address/0xabc')
+    True
+    """
+
+    def __init__(self, root: Union[str, Path], capacity: int = SeenSetConfig.capacity,
+                 error_rate: float = SeenSetConfig.error_rate, batch: int = SeenSetConfig.batch):
+        """
+        :param root: 数据目录
+        :param capacity: 预计的URL数量，决定Bloom filter的大小，创建后不能修改
+        :param error_rate: Bloom filter的误判率
+        :param batch: 每批写入sqlite的指纹数
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.batch = batch
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.root / 'seen.sqlite3', check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS seen (fp INTEGER PRIMARY KEY) WITHOUT ROWID')
+        self._buffer: Set[int] = set()
+
+        self.bloom = BloomFilter(self.root / 'seen.bloom', capacity, error_rate)
+        if not self.bloom.was_clean:
+            self._rebuild_bloom()
+
+    def __repr__(self):
+        return f"SeenSet(root={self.root}, bloom={self.bloom!r})"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __contains__(self, url: str) -> bool:
+        fingerprint = url_fingerprint(url)
+        with self._lock:
+            return self._contains(fingerprint)
+
+    def add(self, url: str) -> bool:
+        """
+        :return: url是否第一次出现
+        """
+        fingerprint = url_fingerprint(url)
+        with self._lock:
+            if self._contains(fingerprint):
+                return False
+            self.bloom.add(fingerprint)
+            self._buffer.add(fingerprint)
+            if len(self._buffer) >= self.batch:
+                self._flush_buffer()
+            return True
+
+    def flush(self):
+        with self._lock:
+            self._flush_buffer()
+            self.bloom.flush()
+
+    def close(self):
+        with self._lock:
+            self._flush_buffer()
+            self._db.close()
+            self.bloom.close()
+
+    def _contains(self, fingerprint: int) -> bool:
+        if fingerprint not in self.bloom:
+            return False
+        if fingerprint in self._buffer:
+            return True
+        return self._db.execute('SELECT 1 FROM seen WHERE fp = ?', (fingerprint,)).fetchone() is not None
+
+    def _flush_buffer(self):
+        if not self._buffer:
+            return
+        with self._db:
+            self._db.executemany('INSERT OR IGNORE INTO seen (fp) VALUES (?)', ((_,) for _ in self._buffer))
+        self._buffer.clear()
+
+    def _rebuild_bloom(self):
+        """
+        上次没有正常关闭时，sqlite中已提交的指纹可能没有写入Bloom filter，按sqlite重建
+        """
+        logging.warning(f"{self.bloom.path} was not closed cleanly, rebuild from sqlite.")
+        self.bloom.clear()
+        for (fingerprint,) in self._db.execute('SELECT fp FROM seen'):
+            self.bloom.add(fingerprint)
+        self.bloom.flush()